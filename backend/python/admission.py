@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+class AdmissionRejected(RuntimeError):
+    pass
+
+
+# Semaphore and holder tables shared by every worker process. Created once in
+# the parent before it forks the workers (see gunicorn.conf.py), so all of
+# them draw on the same limit. Every held slot and every waiting caller is
+# recorded against its process id; a worker killed mid-scrape (gunicorn's
+# timeout SIGKILL) cannot release anything, so the parent calls reclaim() with
+# its pid once it has exited. The in-flight and waiting figures are counted
+# from the tables, so they cannot drift.
+class AdmissionState:
+    def __init__(self, limit: int, max_queue: int = 0) -> None:
+        ctx = multiprocessing.get_context()
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.slots = ctx.BoundedSemaphore(self.limit)
+        # Holder pid per slot / per queue place; 0 when free
+        self.holders = ctx.Array("i", self.limit, lock=False)
+        self.waiters = ctx.Array("i", max(1, self.max_queue), lock=False)
+        self.reclaimed = ctx.Value("i", 0, lock=False)
+        self.lock = ctx.Lock()
+
+    def take_holder(self, pid: int) -> int:
+        # Called with a slot acquired, so a free entry exists
+        with self.lock:
+            for index, holder in enumerate(self.holders):
+                if not holder:
+                    self.holders[index] = pid
+                    return index
+        raise RuntimeError("admission slot acquired without a free holder entry")
+
+    def release_holder(self, index: int, pid: int) -> None:
+        with self.lock:
+            if self.holders[index] != pid:
+                # Reclaimed meanwhile; the slot was released then
+                return
+            self.holders[index] = 0
+        self.slots.release()
+
+    def take_waiter(self, pid: int) -> Optional[int]:
+        with self.lock:
+            for index in range(self.max_queue):
+                if not self.waiters[index]:
+                    self.waiters[index] = pid
+                    return index
+        return None
+
+    def release_waiter(self, index: int, pid: int) -> None:
+        with self.lock:
+            if self.waiters[index] == pid:
+                self.waiters[index] = 0
+
+    def reclaim(self, pid: int) -> int:
+        # Frees whatever the exited process `pid` held; returns the slots freed
+        freed = 0
+        with self.lock:
+            for index, holder in enumerate(self.holders):
+                if holder == pid:
+                    self.holders[index] = 0
+                    freed += 1
+            for index in range(self.max_queue):
+                if self.waiters[index] == pid:
+                    self.waiters[index] = 0
+            self.reclaimed.value += freed
+        for _ in range(freed):
+            try:
+                self.slots.release()
+            except ValueError:
+                break
+        return freed
+
+    def in_flight(self) -> int:
+        with self.lock:
+            return sum(1 for holder in self.holders if holder)
+
+    def waiting(self) -> int:
+        with self.lock:
+            return sum(1 for index in range(self.max_queue) if self.waiters[index])
+
+
+_shared_state: Optional[AdmissionState] = None
+
+
+def install_shared_state(state: AdmissionState) -> None:
+    # Called in each forked worker before the app module is imported
+    global _shared_state
+    _shared_state = state
+
+
+def shared_state() -> Optional[AdmissionState]:
+    return _shared_state
+
+
+# Global cap on concurrent browser scrapes with a bounded wait queue. Callers
+# beyond `limit` wait for a slot; once `max_queue` callers are already waiting,
+# new ones are rejected straight away instead of piling up browsers. A shared
+# `state` brings its own limit and queue size.
+class AdmissionControl:
+    def __init__(self, limit: int, max_queue: int, timeout: float, state: Optional[AdmissionState] = None) -> None:
+        self.state = state or AdmissionState(limit, max_queue)
+        self.max_queue = self.state.max_queue
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._local_in_flight = 0
+        self._stats: Dict[str, float] = {
+            "admitted": 0,
+            "queued": 0,
+            "rejectedQueueFull": 0,
+            "rejectedTimeout": 0,
+            "waitTimeTotal": 0.0,
+            "waitTimeMax": 0.0,
+        }
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None) -> Iterator[None]:
+        pid = os.getpid()
+        holder = self._acquire(pid, self.timeout if timeout is None else timeout)
+        with self._cond:
+            self._local_in_flight += 1
+        try:
+            yield
+        finally:
+            self.state.release_holder(holder, pid)
+            with self._cond:
+                self._local_in_flight -= 1
+                self._cond.notify_all()
+
+    def _acquire(self, pid: int, timeout: float) -> int:
+        state = self.state
+        started = time.monotonic()
+        if not state.slots.acquire(block=False):
+            waiter = state.take_waiter(pid)
+            if waiter is None:
+                self._count("rejectedQueueFull")
+                raise AdmissionRejected("Too many tracking requests in progress; try again shortly.")
+            self._count("queued")
+            try:
+                acquired = state.slots.acquire(timeout=max(0.0, timeout))
+            finally:
+                state.release_waiter(waiter, pid)
+            if not acquired:
+                self._count("rejectedTimeout")
+                raise AdmissionRejected(f"No scrape slot became free within {timeout:.1f}s; try again shortly.")
+        holder = state.take_holder(pid)
+        waited = time.monotonic() - started
+        with self._cond:
+            self._stats["admitted"] += 1
+            self._stats["waitTimeTotal"] += waited
+            self._stats["waitTimeMax"] = max(self._stats["waitTimeMax"], waited)
+        return holder
+
+    def _count(self, key: str) -> None:
+        with self._cond:
+            self._stats[key] += 1
+
+    def drain(self, timeout: float) -> bool:
+        # Waits for this process's scrapes to finish; True if none are left
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._local_in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            admitted = int(self._stats["admitted"])
+            return {
+                "limit": self.state.limit,
+                "maxQueue": self.max_queue,
+                "inFlight": self.state.in_flight(),
+                "waiting": self.state.waiting(),
+                "processInFlight": self._local_in_flight,
+                "slotsReclaimed": self.state.reclaimed.value,
+                "admitted": admitted,
+                "queued": int(self._stats["queued"]),
+                "rejectedQueueFull": int(self._stats["rejectedQueueFull"]),
+                "rejectedTimeout": int(self._stats["rejectedTimeout"]),
+                "waitTimeAvg": round(self._stats["waitTimeTotal"] / admitted, 4) if admitted else 0.0,
+                "waitTimeMax": round(self._stats["waitTimeMax"], 4),
+            }
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-in for the ZIM tracking page. It serves the search form the
+# scraper drives and, once submitted, one of the saved result fragments in
+# fixtures/. Point the service at it with ZIM_TRACK_URL=<url printed below>.
+# JSON_PATH answers the same lookups the way the site's tracking XHR would,
+# for exercising the fast path.
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+TRACK_PATH = "/tools/track-a-shipment"
+JSON_PATH = "/api/v2/tracking"
+
+# Identifier -> fixture file; the fixture's file stem also works as an identifier
+FIXTURES: Dict[str, str] = {
+    "ZIMU1234567": "container_small.html",
+    "ZIMU7654321": "container_large.html",
+    "ZIMUSHH30500001": "bol_multi.html",
+}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Track a Shipment | Mock ZIM</title></head>
+<body>
+  <div id="onetrust-banner-sdk">
+    <button id="onetrust-accept-btn-handler" type="button"
+            onclick="document.getElementById('onetrust-banner-sdk').style.display='none'">Accept</button>
+  </div>
+  <form method="get" action="{path}">
+    <input type="text" id="shipment-main-search-2" name="consNumber" value="">
+    <input type="submit" value="Search">
+  </form>
+  {results}
+</body>
+</html>
+"""
+
+NO_RESULTS = '<div class="tracing-no-results">No results were found for {identifier}.</div>'
+
+
+def load_fixtures() -> Dict[str, str]:
+    fixtures: Dict[str, str] = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as fh:
+                fixtures[name] = fh.read()
+    return fixtures
+
+
+def json_activities(rows: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    activities = []
+    for row in rows:
+        stamp = f"{row['date']} {row['time']}".strip()
+        when = datetime.strptime(stamp, "%d-%b-%Y %H:%M" if row["time"] else "%d-%b-%Y")
+        activities.append(
+            {
+                "activityDesc": row["activity"],
+                "activityDateTz": when.isoformat() if row["time"] else when.date().isoformat(),
+                "placeFromDesc": row["location"],
+                "vesselName": row["vessel"],
+            }
+        )
+    return activities
+
+
+def render_json(fixtures: Dict[str, str], identifier: str) -> Optional[Dict[str, Any]]:
+    # The fixture page re-expressed as tracking JSON; None when unknown
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from html_parser import parse_snapshot
+
+    name = FIXTURES.get(identifier.strip().upper()) or f"{identifier.strip().lower()}.html"
+    if name not in fixtures:
+        return None
+    snapshot = parse_snapshot(fixtures[name])
+    if snapshot.get("variant") == "reference":
+        blocks = {label.lower(): value for block in snapshot.get("detailBlocks") or [] for label, value in block}
+        return {
+            "blNumber": identifier,
+            "etaDate": snapshot.get("eta"),
+            "portOfLoading": blocks.get("port of loading"),
+            "portOfDischarge": blocks.get("port of discharge"),
+            "containers": [
+                {
+                    "unitNumber": card["containerNum"],
+                    "cargoType": card["containerType"],
+                    "activities": json_activities(card["activities"]),
+                }
+                for card in snapshot.get("cards") or []
+            ],
+        }
+    header = snapshot.get("header") or {}
+    return {
+        "unitNumber": header.get("containerNum"),
+        "cargoType": header.get("typeAndSize"),
+        "activities": json_activities(snapshot.get("rows") or []),
+    }
+
+
+def render_page(fixtures: Dict[str, str], identifier: Optional[str]) -> str:
+    results = ""
+    if identifier is not None:
+        name = FIXTURES.get(identifier.strip().upper()) or f"{identifier.strip().lower()}.html"
+        results = fixtures.get(name) or NO_RESULTS.format(identifier=identifier)
+    return PAGE_TEMPLATE.format(path=TRACK_PATH, results=results)
+
+
+class MockSiteHandler(BaseHTTPRequestHandler):
+    fixtures: Dict[str, str] = {}
+    delay = 0.0
+
+    def do_GET(self) -> None:
+        parts = urlsplit(self.path)
+        path = parts.path.rstrip("/")
+        if path not in (TRACK_PATH, JSON_PATH):
+            self.send_error(404)
+            return
+        if self.delay:
+            time.sleep(self.delay)
+        identifier = (parse_qs(parts.query).get("consNumber") or [None])[0]
+        if path == JSON_PATH:
+            data = render_json(self.fixtures, identifier or "")
+            if data is None:
+                self.send_error(404)
+                return
+            body = json.dumps(data).encode("utf-8")
+            content_type = "application/json"
+        else:
+            body = render_page(self.fixtures, identifier).encode("utf-8")
+            content_type = "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_mock_site(host: str = "127.0.0.1", port: int = 0, delay: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    # Serves in a daemon thread; returns the server and the tracking URL
+    handler = type("Handler", (MockSiteHandler,), {"fixtures": load_fixtures(), "delay": delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-zim", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{TRACK_PATH}"
+
+
+if __name__ == "__main__":
+    # Usage: python benchmarks/mock_site.py --port 8765 [--delay 0.2]
+    parser = argparse.ArgumentParser(description="Serve the saved ZIM tracking fixtures locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+    server, url = start_mock_site(args.host, args.port, args.delay)
+    print(f"Mock tracking site on {url}")
+    print("Identifiers: " + ", ".join(f"{k} ({v})" for k, v in FIXTURES.items()))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from mock_site import FIXTURES, FIXTURES_DIR, start_mock_site  # noqa: E402
+
+# Benchmarks the tracker against the local mock site: parse-only time per
+# fixture, end-to-end scrape latency, throughput at several concurrency levels
+# and peak RSS of the process tree (service + Chrome). Results are written as
+# JSON; pass --baseline to compare against an earlier run.
+#
+# Usage: python benchmarks/run_benchmark.py --output bench.json [--baseline old.json]
+# Compare memory per lookup with --tabs 1 (a browser per lookup) vs --tabs 4.
+# The "memory" section compares a 1,000-container result held as nested dicts
+# with the typed model the result cache keeps (--memory-containers to change).
+
+# Metric paths compared against a baseline and whether higher is better
+TRACKED_METRICS: List[Tuple[str, bool]] = [
+    ("parse.*.meanMs", False),
+    ("latency.*.p50Ms", False),
+    ("latency.*.p95Ms", False),
+    ("throughput.*.requestsPerSecond", True),
+    ("peakRssBytes", False),
+    ("startup.importMs", False),
+    ("startup.warmBrowserMs", False),
+    ("concurrentLookupsPerGb", True),
+    ("memory.typedBytes", False),
+    ("memory.typedWithBodyBytes", False),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ms = [s * 1000.0 for s in samples]
+    return {
+        "samples": len(ms),
+        "meanMs": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "p50Ms": round(percentile(ms, 50), 3),
+        "p95Ms": round(percentile(ms, 95), 3),
+        "maxMs": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def tree_rss_bytes(pid: int) -> int:
+    # Sum of VmRSS over the process and all its descendants (Linux /proc)
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as fh:
+                for line in fh:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as fh:
+                    pending.extend(int(child) for child in fh.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class RssSampler:
+    def __init__(self, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def start(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> int:
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+    def sample(self) -> None:
+        rss = tree_rss_bytes(os.getpid()) if os.path.isdir("/proc") else 0
+        if not rss:
+            # ru_maxrss is KiB on Linux and bytes on macOS; covers this process only
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rss *= 1 if sys.platform == "darwin" else 1024
+        self.peak = max(self.peak, rss)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+
+def timed(fn: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def bench_parse(service, url: str, iterations: int) -> Dict[str, Any]:
+    from html_parser import parse_snapshot
+
+    results: Dict[str, Any] = {}
+    for identifier, fixture in FIXTURES.items():
+        with urllib.request.urlopen(f"{url}?consNumber={identifier}") as response:
+            page = response.read().decode("utf-8")
+        parse_snapshot(page)
+        samples = [
+            timed(lambda: service.payload_from_snapshot(parse_snapshot(page), identifier))
+            for _ in range(iterations)
+        ]
+        results[fixture.rsplit(".", 1)[0]] = {"pageBytes": len(page.encode("utf-8")), **summarize(samples)}
+    return results
+
+
+def retained_bytes(build: Callable[[], Any]) -> Tuple[Any, int]:
+    # Bytes still allocated once build() has returned (its temporaries freed)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = build()
+        gc.collect()
+        return value, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(service, containers: int) -> Dict[str, Any]:
+    # Memory held by one B/L result with `containers` containers, built from
+    # the bol_multi fixture's cards. Each copy gets fresh strings (as parsing a
+    # page does) and its own gate times, so only the vessel moves repeat. The
+    # nested-dict figure is the payload the builders used to return: the same
+    # JSON decoded, with the routes list shared by all containers as before.
+    from html_parser import parse_snapshot
+
+    with open(os.path.join(FIXTURES_DIR, "bol_multi.html"), encoding="utf-8") as fh:
+        page = fh.read()
+
+    def snapshot() -> Dict[str, Any]:
+        parsed = parse_snapshot(page)
+        template = json.dumps(parsed["cards"])
+        cards = []
+        for i in range(containers):
+            card = json.loads(template)[i % len(parsed["cards"])]
+            card["containerNum"] = f"ZIMU{i:07d}"
+            for activity in (card["activities"][0], card["activities"][-1]):
+                activity["time"] = f"{i // 60 % 24:02d}:{i % 60:02d}"
+            cards.append(card)
+        parsed["cards"] = cards
+        return parsed
+
+    def typed() -> Any:
+        return service.payload_from_snapshot(snapshot(), "ZIMUBENCH")
+
+    result, typed_bytes = retained_bytes(typed)
+    started = time.perf_counter()
+    body = result.encode()
+    first_encode = time.perf_counter() - started
+    memoized_encode = timed(result.encode)
+
+    def nested() -> Dict[str, Any]:
+        payload = json.loads(body)
+        routes = payload["containers"][0]["routes"]
+        for container in payload["containers"]:
+            container["routes"] = routes
+        return payload
+
+    payload, dict_bytes = retained_bytes(nested)
+    assert len(payload["containers"]) == containers
+    return {
+        "containers": containers,
+        "dictBytes": dict_bytes,
+        "typedBytes": typed_bytes,
+        "encodedBodyBytes": len(body),
+        "typedWithBodyBytes": typed_bytes + sys.getsizeof(body),
+        "dictToTypedRatio": round(dict_bytes / typed_bytes, 2) if typed_bytes else None,
+        "firstEncodeMs": round(first_encode * 1000.0, 3),
+        "memoizedEncodeMs": round(memoized_encode * 1000.0, 3),
+    }
+
+
+def bench_latency(service, iterations: int, fields: Optional[str] = None) -> Dict[str, Any]:
+    from deadline import Deadline
+
+    projection = service.parse_fields(fields)
+    results: Dict[str, Any] = {}
+    for identifier, fixture in FIXTURES.items():
+        # First run warms the pool browser and parks it on the tracking page
+        service.scrape_container_or_bol(identifier)
+        samples: List[float] = []
+        commands: List[float] = []
+        stages: Dict[str, List[float]] = {}
+        for _ in range(iterations):
+            deadline = Deadline(service.settings.REQUEST_TIMEOUT)
+            samples.append(
+                timed(lambda: service.scrape_container_or_bol(identifier, deadline=deadline, fields=projection))
+            )
+            commands.append(deadline.details.get("webdriverCommands", 0))
+            for name, seconds in deadline.timings().items():
+                stages.setdefault(name, []).append(seconds)
+        results[fixture.rsplit(".", 1)[0]] = {
+            **summarize(samples),
+            "webdriverCommandsMean": round(statistics.fmean(commands), 1),
+            "stagesMeanMs": {name: round(statistics.fmean(v) * 1000.0, 3) for name, v in stages.items()},
+        }
+    return results
+
+
+def bench_throughput(service, levels: List[int], requests_per_level: int) -> Dict[str, Any]:
+    identifiers = list(FIXTURES)
+    results: Dict[str, Any] = {}
+    for level in levels:
+        samples: List[float] = []
+        errors = 0
+
+        def one(index: int) -> None:
+            nonlocal errors
+            identifier = identifiers[index % len(identifiers)]
+            started = time.perf_counter()
+            try:
+                service.scrape_container_or_bol(identifier)
+            except Exception:
+                errors += 1
+                return
+            samples.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            list(executor.map(one, range(requests_per_level)))
+        elapsed = time.perf_counter() - started
+        results[str(level)] = {
+            "requests": requests_per_level,
+            "errors": errors,
+            "seconds": round(elapsed, 3),
+            "requestsPerSecond": round(len(samples) / elapsed, 3) if elapsed else 0.0,
+            **summarize(samples),
+        }
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    for key, value in report.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def metric_matches(pattern: str, path: str) -> bool:
+    parts, names = pattern.split("."), path.split(".")
+    return len(parts) == len(names) and all(p in ("*", n) for p, n in zip(parts, names))
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    # Relative change per tracked metric; a regression is a move in the bad
+    # direction by more than `threshold` percent
+    current, previous = flatten(report), flatten(baseline)
+    rows: List[Dict[str, Any]] = []
+    for path, value in sorted(current.items()):
+        rule = next((higher for pattern, higher in TRACKED_METRICS if metric_matches(pattern, path)), None)
+        if rule is None or not previous.get(path):
+            continue
+        change = (value - previous[path]) / previous[path] * 100.0
+        worse = -change if rule else change
+        rows.append(
+            {
+                "metric": path,
+                "baseline": previous[path],
+                "current": value,
+                "changePct": round(change, 2),
+                "regression": worse > threshold,
+            }
+        )
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ZIM tracker against the local mock site.")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    parser.add_argument("--iterations", type=int, default=10, help="latency samples per fixture")
+    parser.add_argument("--parse-iterations", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,2,4", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=24, help="requests per concurrency level")
+    parser.add_argument("--extraction", default="webdriver", help="webdriver, script, html or compare")
+    parser.add_argument("--delay", type=float, default=0.0, help="mock site response delay in seconds")
+    parser.add_argument("--tabs", type=int, default=1, help="lookups per browser, each in its own tab")
+    parser.add_argument("--fields", help="projection for the latency phase, e.g. currentStatus,podETA")
+    parser.add_argument("--parse-only", action="store_true", help="skip the phases that need Chrome")
+    parser.add_argument("--memory-containers", type=int, default=1000, help="containers in the memory comparison")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    tabs = max(1, args.tabs)
+    browsers = -(-max(levels or [1]) // tabs)
+    server, url = start_mock_site(delay=args.delay)
+
+    # Settings are read at import time, so configure the service first
+    os.environ.update(
+        {
+            "ZIM_TRACK_URL": url,
+            "ZIM_EXTRACTION_MODE": args.extraction,
+            "ZIM_POOL_MIN_SIZE": "1",
+            "ZIM_POOL_MAX_SIZE": str(browsers),
+            "ZIM_BROWSER_TABS": str(tabs),
+            "ZIM_FAST_PATH_ENABLED": "0",
+            "ZIM_STORE_ENABLED": "0",
+            "ZIM_WATCHLIST_ENABLED": "0",
+        }
+    )
+    import_started = time.perf_counter()
+    import zim_tracker_service as service
+
+    import_ms = round((time.perf_counter() - import_started) * 1000.0, 3)
+
+    sampler = RssSampler().start()
+    report: Dict[str, Any] = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "extraction": args.extraction,
+            "mockDelaySeconds": args.delay,
+            "concurrencyLevels": levels,
+            "tabsPerBrowser": tabs,
+            "fields": args.fields,
+            "browsers": browsers,
+        },
+        "startup": {"importMs": import_ms},
+        "parse": bench_parse(service, url, args.parse_iterations),
+        "memory": bench_memory(service, args.memory_containers),
+    }
+
+    if not args.parse_only:
+        try:
+            # Cold start: chromedriver resolution plus launching and parking one browser
+            report["startup"]["warmBrowserMs"] = round(timed(lambda: service.driver_pool.warm(1)) * 1000.0, 3)
+            report["latency"] = bench_latency(service, args.iterations, args.fields)
+            report["throughput"] = bench_throughput(service, levels, args.requests)
+        except Exception as exc:
+            report["browserError"] = f"{exc.__class__.__name__}: {exc}"
+        finally:
+            service.driver_pool.close()
+
+    report["peakRssBytes"] = sampler.stop()
+    if "throughput" in report and report["peakRssBytes"]:
+        # Highest concurrency level served, per GB of peak RSS
+        report["concurrentLookupsPerGb"] = round(max(levels) / (report["peakRssBytes"] / 1024 ** 3), 3)
+    server.shutdown()
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            rows = compare(report, json.load(fh), args.threshold)
+        report["comparison"] = {"baseline": args.baseline, "thresholdPct": args.threshold, "metrics": rows}
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['metric']:<48} {row['baseline']:>12} -> {row['current']:>12} ({row['changePct']:+.1f}%) {flag}")
+        if any(row["regression"] for row in rows):
+            exit_code = 1
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Wrote {args.output}")
+    if "browserError" in report:
+        print(f"Browser phases skipped: {report['browserError']}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
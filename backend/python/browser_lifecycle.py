@@ -0,0 +1,426 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+log = logging.getLogger(__name__)
+
+PROFILE_PREFIX = "zim-chrome-"
+# Written into a browser's profile directory: "<chromedriver pid> <start time>"
+DRIVER_MARKER = "chromedriver.pid"
+# Process names that belong to a browser we launched
+BROWSER_PROCESS_NAMES = ("chrome", "chromium", "chromedriver", "undetected_chromedriver")
+
+
+# Process helpers (Linux /proc; elsewhere they report nothing and the manager
+# falls back to use-count recycling only)
+
+def process_ids() -> List[int]:
+    try:
+        return [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return []
+
+
+def read_status(pid: int) -> Dict[str, str]:
+    status: Dict[str, str] = {}
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                key, _, value = line.partition(":")
+                status[key] = value.strip()
+    except OSError:
+        pass
+    return status
+
+
+def read_cmdline(pid: int) -> List[str]:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as fh:
+            return [part.decode("utf-8", "replace") for part in fh.read().split(b"\0") if part]
+    except OSError:
+        return []
+
+
+def process_start_time(pid: int) -> Optional[str]:
+    # Clock ticks since boot; tells a reused pid apart from the original
+    try:
+        with open(f"/proc/{pid}/stat") as fh:
+            fields = fh.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    return fields[19] if len(fields) > 19 else None
+
+
+def process_rss(pid: int) -> int:
+    rss = read_status(pid).get("VmRSS", "")
+    return int(rss.split()[0]) * 1024 if rss else 0
+
+
+def descendants(pid: int) -> List[int]:
+    found: List[int] = []
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            tasks = os.listdir(f"/proc/{current}/task")
+        except OSError:
+            continue
+        for task in tasks:
+            try:
+                with open(f"/proc/{current}/task/{task}/children") as fh:
+                    children = [int(child) for child in fh.read().split()]
+            except (OSError, ValueError):
+                continue
+            found.extend(children)
+            pending.extend(children)
+    return found
+
+
+def tree_rss(pid: int) -> int:
+    return sum(process_rss(p) for p in [pid, *descendants(pid)])
+
+
+def pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # A zombie is dead for our purposes
+    return read_status(pid).get("State", "").split(" ")[:1] != ["Z"]
+
+
+def kill_pids(pids: List[int]) -> int:
+    killed = 0
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except OSError:
+            continue
+        try:
+            # Reap it if it is our child; otherwise init does
+            os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            pass
+    return killed
+
+
+def write_driver_marker(profile_dir: str, driver_pid: int) -> None:
+    try:
+        with open(os.path.join(profile_dir, DRIVER_MARKER), "w") as fh:
+            fh.write(f"{driver_pid} {process_start_time(driver_pid) or ''}")
+    except OSError as exc:
+        log.warning("Could not record chromedriver pid %d: %s", driver_pid, exc)
+
+
+def read_driver_marker(profile_dir: str) -> Optional[int]:
+    # The recorded chromedriver pid, if that process is still the one recorded
+    try:
+        with open(os.path.join(profile_dir, DRIVER_MARKER)) as fh:
+            pid_text, _, started = fh.read().strip().partition(" ")
+        pid = int(pid_text)
+    except (OSError, ValueError):
+        return None
+    if started and process_start_time(pid) != started:
+        return None
+    return pid
+
+
+def profile_owner(profile_dir: str) -> Optional[int]:
+    # zim-chrome-<owner pid>-<random>
+    name = os.path.basename(profile_dir.rstrip("/"))
+    if not name.startswith(PROFILE_PREFIX):
+        return None
+    try:
+        return int(name[len(PROFILE_PREFIX):].split("-", 1)[0])
+    except ValueError:
+        return None
+
+
+class _Browser:
+    __slots__ = ("driver", "profile_dir", "browser_pid", "driver_pid", "started_at", "uses", "rss", "over_cap")
+
+    def __init__(self, driver: Any, profile_dir: str) -> None:
+        self.driver = driver
+        self.profile_dir = profile_dir
+        self.browser_pid = int(getattr(driver, "browser_pid", 0) or 0)
+        process = getattr(getattr(driver, "service", None), "process", None)
+        self.driver_pid = int(getattr(process, "pid", 0) or 0)
+        self.started_at = time.monotonic()
+        self.uses = 0
+        self.rss = 0
+        self.over_cap = False
+
+    def pids(self) -> List[int]:
+        pids = [p for p in (self.browser_pid, self.driver_pid) if p]
+        if self.browser_pid:
+            pids.extend(descendants(self.browser_pid))
+        return pids
+
+
+# Owns every browser the service launches: each gets its own temp profile
+# directory and its chrome/chromedriver PIDs are tracked so quitting can kill
+# whatever driver.quit() leaves behind. Browsers are flagged for recycling
+# after `max_uses` scrapes, past `max_rss` bytes, or (largest first) while the
+# total across all browsers exceeds `total_rss`. A periodic sweep refreshes
+# RSS figures and kills browsers orphaned by a crashed or killed process.
+class BrowserLifecycle:
+    def __init__(
+        self,
+        max_uses: int = 50,
+        max_rss: int = 0,
+        total_rss: int = 0,
+        sweep_interval: float = 60.0,
+        profile_root: Optional[str] = None,
+    ) -> None:
+        self.max_uses = max(0, max_uses)
+        self.max_rss = max(0, max_rss)
+        self.total_rss = max(0, total_rss)
+        self.sweep_interval = sweep_interval
+        self.profile_root = profile_root or tempfile.gettempdir()
+
+        self._lock = threading.Lock()
+        self._browsers: Dict[int, _Browser] = {}
+        # Profiles handed to a factory that has not returned yet
+        self._launching: Set[str] = set()
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stats: Dict[str, int] = {
+            "launched": 0,
+            "quit": 0,
+            "recycledUses": 0,
+            "recycledRss": 0,
+            "recycledMemoryCap": 0,
+            "killedLeftover": 0,
+            "orphansKilled": 0,
+            "profilesRemoved": 0,
+        }
+
+    # Lifecycle
+
+    def start(self) -> None:
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="browser-lifecycle", daemon=True)
+        # Leftovers from an earlier run are cleaned before any browser starts
+        self.kill_orphans()
+        self._sweeper.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # Launch / quit
+
+    def launch(self, factory: Callable[[str], Any]) -> Any:
+        # `factory` receives the profile directory the browser must use
+        os.makedirs(self.profile_root, exist_ok=True)
+        profile_dir = tempfile.mkdtemp(prefix=f"{PROFILE_PREFIX}{os.getpid()}-", dir=self.profile_root)
+        # Until the driver is tracked the sweep must not take its profile or
+        # its half-started chrome for leftovers
+        with self._lock:
+            self._launching.add(profile_dir)
+        try:
+            driver = factory(profile_dir)
+        except Exception:
+            with self._lock:
+                self._launching.discard(profile_dir)
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            raise
+        browser = _Browser(driver, profile_dir)
+        if browser.driver_pid:
+            # chromedriver has no profile argument; this is how the sweep
+            # knows it is ours
+            write_driver_marker(profile_dir, browser.driver_pid)
+        with self._lock:
+            self._launching.discard(profile_dir)
+            self._browsers[id(driver)] = browser
+            self._stats["launched"] += 1
+        return driver
+
+    def quit(self, driver: Any) -> None:
+        with self._lock:
+            browser = self._browsers.pop(id(driver), None)
+            self._stats["quit"] += 1
+        # Collect the tree first; once chrome exits its children are reparented
+        pids = browser.pids() if browser is not None else []
+        try:
+            driver.quit()
+        except Exception as exc:
+            log.warning("driver.quit() failed: %s", exc)
+        if browser is None:
+            return
+        time.sleep(0.1 if any(pid_alive(p) for p in pids) else 0)
+        leftover = [p for p in pids if pid_alive(p)]
+        if leftover:
+            killed = kill_pids(leftover)
+            with self._lock:
+                self._stats["killedLeftover"] += killed
+        for pid in (browser.browser_pid, browser.driver_pid):
+            if not pid:
+                continue
+            try:
+                os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                pass
+        if os.path.isdir(browser.profile_dir):
+            shutil.rmtree(browser.profile_dir, ignore_errors=True)
+            with self._lock:
+                self._stats["profilesRemoved"] += 1
+
+    # Recycling
+
+    def should_recycle(self, driver: Any, uses: int) -> bool:
+        with self._lock:
+            browser = self._browsers.get(id(driver))
+        if browser is None:
+            return False
+        browser.uses = uses
+        reason = None
+        if self.max_uses and uses >= self.max_uses:
+            reason = "recycledUses"
+        elif browser.over_cap:
+            reason = "recycledMemoryCap"
+        elif self.max_rss and browser.browser_pid:
+            browser.rss = tree_rss(browser.browser_pid)
+            if browser.rss > self.max_rss:
+                reason = "recycledRss"
+        if reason is None:
+            return False
+        with self._lock:
+            self._stats[reason] += 1
+        return True
+
+    def refresh(self) -> int:
+        # Re-reads every browser's RSS and flags the largest ones for recycling
+        # until the total fits under the cap. Returns the total.
+        with self._lock:
+            browsers = list(self._browsers.values())
+        for browser in browsers:
+            browser.rss = tree_rss(browser.browser_pid) if browser.browser_pid else 0
+        total = sum(b.rss for b in browsers)
+        if self.total_rss and total > self.total_rss:
+            excess = total - self.total_rss
+            for browser in sorted(browsers, key=lambda b: b.rss, reverse=True):
+                if excess <= 0:
+                    break
+                browser.over_cap = True
+                excess -= browser.rss
+        return total
+
+    # Orphans
+
+    def kill_orphans(self) -> int:
+        # A browser is orphaned when its profile directory belongs to a dead
+        # process, or to this process but no tracked or launching browser.
+        # chromedriver has no profile argument; it is matched to a profile
+        # through the marker written at launch. Drivers without one were not
+        # started by this service and are never touched.
+        with self._lock:
+            live_profiles: Set[str] = {b.profile_dir for b in self._browsers.values()} | self._launching
+            live_pids: Set[int] = {p for b in self._browsers.values() for p in (b.browser_pid, b.driver_pid) if p}
+        me = os.getpid()
+        driver_profiles = self._driver_profiles()
+        orphans: List[int] = []
+        for pid in process_ids():
+            if pid == me or pid in live_pids:
+                continue
+            cmdline = read_cmdline(pid)
+            if not cmdline or not os.path.basename(cmdline[0]).startswith(BROWSER_PROCESS_NAMES):
+                continue
+            profile = next(
+                (arg.split("=", 1)[1] for arg in cmdline if arg.startswith("--user-data-dir=")), None
+            )
+            if profile is None:
+                profile = driver_profiles.get(pid)
+            if profile is None:
+                continue
+            owner = profile_owner(profile)
+            if owner is None:
+                continue
+            if (owner == me and profile not in live_profiles) or (owner != me and not pid_alive(owner)):
+                orphans.append(pid)
+        killed = kill_pids(orphans)
+        removed = self._remove_stale_profiles(live_profiles)
+        with self._lock:
+            self._stats["orphansKilled"] += killed
+            self._stats["profilesRemoved"] += removed
+        if killed or removed:
+            log.info("Killed %d orphaned browser processes, removed %d stale profiles", killed, removed)
+        return killed
+
+    def _driver_profiles(self) -> Dict[int, str]:
+        # chromedriver pid -> profile directory, from the launch markers
+        found: Dict[int, str] = {}
+        try:
+            names = os.listdir(self.profile_root)
+        except OSError:
+            return found
+        for name in names:
+            if not name.startswith(PROFILE_PREFIX):
+                continue
+            path = os.path.join(self.profile_root, name)
+            pid = read_driver_marker(path)
+            if pid is not None:
+                found[pid] = path
+        return found
+
+    def _remove_stale_profiles(self, live_profiles: Set[str]) -> int:
+        me = os.getpid()
+        removed = 0
+        try:
+            names = os.listdir(self.profile_root)
+        except OSError:
+            return 0
+        for name in names:
+            path = os.path.join(self.profile_root, name)
+            owner = profile_owner(path)
+            if owner is None or path in live_profiles:
+                continue
+            if owner == me or not pid_alive(owner):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.refresh()
+                self.kill_orphans()
+            except Exception:
+                log.exception("Browser sweep failed")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            browsers = list(self._browsers.values())
+            counters = dict(self._stats)
+        return {
+            "live": len(browsers),
+            "maxUses": self.max_uses,
+            "maxRssBytes": self.max_rss,
+            "totalRssCapBytes": self.total_rss,
+            "totalRssBytes": sum(b.rss for b in browsers),
+            "browsers": [
+                {
+                    "pid": b.browser_pid or None,
+                    "rssBytes": b.rss,
+                    "uses": b.uses,
+                    "ageSeconds": round(now - b.started_at, 1),
+                    "overCap": b.over_cap,
+                }
+                for b in browsers
+            ],
+            **counters,
+        }
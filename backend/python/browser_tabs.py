@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.chrome.webdriver import WebDriver as ChromeWebDriver
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+
+log = logging.getLogger(__name__)
+
+# Set on the current document before navigating; a page without it is the new one
+NAVIGATION_MARKER = "__zimNavigating"
+
+
+class _Host:
+    # One browser process: the anchor window it was launched with (never used
+    # for lookups, so closing tabs never ends the session) plus its tabs
+    __slots__ = ("driver", "anchor", "lock", "current", "tabs", "closed_uses", "retiring")
+
+    def __init__(self, driver: Any) -> None:
+        self.driver = driver
+        self.anchor = driver.current_window_handle
+        # WebDriver commands are session-wide, so tabs of one browser take
+        # turns; `current` avoids re-sending switch-to-window for the same tab
+        self.lock = threading.RLock()
+        self.current = self.anchor
+        self.tabs: List["Tab"] = []
+        # Lookups served by tabs already closed
+        self.closed_uses = 0
+        self.retiring = False
+
+    def uses(self) -> int:
+        return self.closed_uses + sum(tab.uses for tab in self.tabs if tab is not None)
+
+    def run(self, handle: str, driver_command: str, params: Optional[Dict[str, Any]]) -> Any:
+        with self.lock:
+            if self.current != handle:
+                self.driver.execute(Command.SWITCH_TO_WINDOW, {"handle": handle})
+                self.current = handle
+            return self.driver.execute(driver_command, params)
+
+
+# A WebDriver bound to one tab of a shared browser. It is a shallow copy of the
+# browser's driver whose every command first switches to this tab's window, so
+# element lookups, scripts and the existing parsers all act on this tab only.
+# Navigation is issued without blocking the browser: get() starts the load and
+# polls for the new document between other tabs' commands.
+class Tab(ChromeWebDriver):
+    def __init__(self, host: _Host, handle: str, context_id: Optional[str]) -> None:
+        # Deliberately not calling the WebDriver constructor: the session is
+        # the host's, and uc's driver class (whose __del__ quits the browser)
+        # must not be copied
+        self.__dict__.update(host.driver.__dict__)
+        self.__dict__.pop("execute", None)
+        self._switch_to = SwitchTo(self)
+        self.host = host
+        self.handle = handle
+        self.context_id = context_id
+        self.page_load_timeout = 60.0
+        self.uses = 0
+
+    def execute(self, driver_command: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        return self.host.run(self.handle, driver_command, params)
+
+    def set_page_load_timeout(self, time_to_wait: float) -> None:
+        self.page_load_timeout = float(time_to_wait)
+
+    def get(self, url: str) -> None:
+        self.execute_script(f"window.{NAVIGATION_MARKER} = true; window.location.href = arguments[0];", url)
+        deadline = time.monotonic() + self.page_load_timeout
+        while True:
+            try:
+                if self.execute_script(
+                    f"return !window.{NAVIGATION_MARKER} && document.readyState === 'complete';"
+                ):
+                    return
+            except Exception:
+                # The old document can vanish mid-script while the new one commits
+                pass
+            if time.monotonic() >= deadline:
+                raise TimeoutException(f"Timed out loading {url} after {self.page_load_timeout:.1f}s")
+            time.sleep(0.05)
+
+    def quit(self) -> None:
+        raise RuntimeError("Tabs are closed through their TabbedBrowsers.")
+
+
+# Serves lookups from tabs of a few shared browsers instead of one browser per
+# lookup. Each tab lives in its own browser context (separate cookies, storage
+# and cache) where Chrome allows it, and a browser is filled up to
+# `tabs_per_browser` before another is launched. `launch`/`destroy` start and
+# stop whole browsers; `prepare` runs on every new tab.
+class TabbedBrowsers:
+    def __init__(
+        self,
+        launch: Callable[[], Any],
+        destroy: Callable[[Any], None],
+        tabs_per_browser: int = 4,
+        prepare: Optional[Callable[[Tab], None]] = None,
+        retire: Optional[Callable[[Any, int], bool]] = None,
+    ) -> None:
+        self.launch = launch
+        self.destroy = destroy
+        self.tabs_per_browser = max(1, tabs_per_browser)
+        self.prepare = prepare
+        self.retire = retire
+        self._lock = threading.Lock()
+        self._hosts: List[_Host] = []
+        self._launching = 0
+        self._stats: Dict[str, int] = {
+            "tabsOpened": 0,
+            "tabsClosed": 0,
+            "isolatedContexts": 0,
+            "sharedContexts": 0,
+            "browsersLaunched": 0,
+            "browsersRetired": 0,
+        }
+
+    def open_tab(self) -> Tab:
+        host = self._reserve_host()
+        try:
+            tab = self._create_tab(host)
+            if self.prepare is not None:
+                self.prepare(tab)
+        except Exception:
+            with self._lock:
+                host.tabs.remove(None)
+            self._close_host_if_empty(host)
+            raise
+        with self._lock:
+            host.tabs[host.tabs.index(None)] = tab
+            self._stats["tabsOpened"] += 1
+        return tab
+
+    def _reserve_host(self) -> _Host:
+        with self._lock:
+            # Fill the busiest browser with room first so idle ones can retire
+            candidates = [
+                h for h in self._hosts if not h.retiring and len(h.tabs) < self.tabs_per_browser
+            ]
+            if candidates:
+                host = max(candidates, key=lambda h: len(h.tabs))
+                host.tabs.append(None)
+                return host
+            self._launching += 1
+        try:
+            host = _Host(self.launch())
+        finally:
+            with self._lock:
+                self._launching -= 1
+        with self._lock:
+            host.tabs.append(None)
+            self._hosts.append(host)
+            self._stats["browsersLaunched"] += 1
+        return host
+
+    def _create_tab(self, host: _Host) -> Tab:
+        with host.lock:
+            driver = host.driver
+            if host.current != host.anchor:
+                driver.execute(Command.SWITCH_TO_WINDOW, {"handle": host.anchor})
+                host.current = host.anchor
+            context_id = None
+            try:
+                context_id = driver.execute_cdp_cmd("Target.createBrowserContext", {"disposeOnDetach": True})[
+                    "browserContextId"
+                ]
+            except Exception as exc:
+                log.debug("Isolated browser context unavailable, sharing the default one: %s", exc)
+            params: Dict[str, Any] = {"url": "about:blank"}
+            if context_id:
+                params["browserContextId"] = context_id
+            handle = driver.execute_cdp_cmd("Target.createTarget", params)["targetId"]
+            # chromedriver names windows by target id once it has seen them
+            if handle not in driver.window_handles:
+                raise RuntimeError(f"New tab {handle} is not visible to chromedriver.")
+        with self._lock:
+            self._stats["isolatedContexts" if context_id else "sharedContexts"] += 1
+        return Tab(host, handle, context_id)
+
+    def close_tab(self, tab: Tab) -> None:
+        host = tab.host
+        with host.lock:
+            driver = host.driver
+            try:
+                if host.current != host.anchor:
+                    driver.execute(Command.SWITCH_TO_WINDOW, {"handle": host.anchor})
+                    host.current = host.anchor
+                driver.execute_cdp_cmd("Target.closeTarget", {"targetId": tab.handle})
+                if tab.context_id:
+                    driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": tab.context_id})
+            except Exception as exc:
+                # The browser itself is probably gone; it is quit below
+                log.debug("Closing tab %s failed: %s", tab.handle, exc)
+                host.retiring = True
+        with self._lock:
+            if tab in host.tabs:
+                host.tabs.remove(tab)
+                host.closed_uses += tab.uses
+            self._stats["tabsClosed"] += 1
+        self._close_host_if_empty(host)
+
+    def _close_host_if_empty(self, host: _Host) -> None:
+        # A browser is quit once its last tab has closed
+        with self._lock:
+            if host.tabs or host not in self._hosts:
+                return
+            self._hosts.remove(host)
+            if host.retiring:
+                self._stats["browsersRetired"] += 1
+        self.destroy(host.driver)
+
+    def should_recycle(self, tab: Tab, uses: int) -> bool:
+        # Use counts and memory limits apply to the whole browser: once it is
+        # due for recycling it takes no new tabs and each tab retires as it is
+        # returned, the last one quitting the browser
+        host = tab.host
+        with self._lock:
+            tab.uses = uses
+            if host.retiring or self.retire is None:
+                return host.retiring
+            total = host.uses()
+        # The retire check may read the browser's RSS; keep it off the lock
+        retiring = self.retire(host.driver, total)
+        with self._lock:
+            host.retiring = host.retiring or retiring
+            return host.retiring
+
+    def close(self) -> None:
+        with self._lock:
+            hosts, self._hosts = self._hosts, []
+        for host in hosts:
+            self.destroy(host.driver)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tabsPerBrowser": self.tabs_per_browser,
+                "browsers": len(self._hosts),
+                "launching": self._launching,
+                "openTabs": sum(len(h.tabs) for h in self._hosts),
+                "tabsByBrowser": [len(h.tabs) for h in self._hosts],
+                **self._stats,
+            }
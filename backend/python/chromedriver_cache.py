@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+DRIVER_NAME = "undetected_chromedriver"
+# Marker undetected-chromedriver writes into the binary it has patched
+PATCH_MARKER = b"undetected chromedriver"
+VERSION_PATTERN = re.compile(r"(\d+)\.(\d+)\.(\d+)\.(\d+)")
+
+
+class DriverInfo:
+    __slots__ = ("driver_path", "browser_path", "browser_version", "version_main", "source", "seconds")
+
+    def __init__(
+        self,
+        driver_path: Optional[str],
+        browser_path: Optional[str],
+        browser_version: Optional[str],
+        source: str,
+        seconds: float,
+    ) -> None:
+        self.driver_path = driver_path
+        self.browser_path = browser_path
+        self.browser_version = browser_version
+        self.version_main = int(browser_version.split(".", 1)[0]) if browser_version else None
+        self.source = source
+        self.seconds = seconds
+
+    def uc_arguments(self) -> Dict[str, Any]:
+        # Keyword arguments that let uc.Chrome skip discovery and patching
+        arguments: Dict[str, Any] = {}
+        if self.driver_path:
+            arguments["driver_executable_path"] = self.driver_path
+        if self.browser_path:
+            arguments["browser_executable_path"] = self.browser_path
+        if self.version_main:
+            arguments["version_main"] = self.version_main
+        return arguments
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "driverPath": self.driver_path,
+            "browserPath": self.browser_path,
+            "browserVersion": self.browser_version,
+            "source": self.source,
+            "seconds": round(self.seconds, 4),
+        }
+
+
+def find_browser(configured: Optional[str] = None) -> Optional[str]:
+    if configured:
+        return configured
+    # Deferred: importing undetected_chromedriver pulls in all of selenium
+    import undetected_chromedriver as uc
+
+    return uc.find_chrome_executable()
+
+
+def browser_version(browser_path: str) -> Optional[str]:
+    try:
+        output = subprocess.run(
+            [browser_path, "--version"], capture_output=True, text=True, timeout=30
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = VERSION_PATTERN.search(output or "")
+    return match.group(0) if match else None
+
+
+def is_patched(path: str) -> bool:
+    try:
+        with open(path, "rb") as fh:
+            return fh.read().find(PATCH_MARKER) != -1
+    except OSError:
+        return False
+
+
+# Patched chromedriver binaries kept per Chrome version in a directory shared
+# by every worker (and across restarts): <cache_dir>/<chrome version>/. Without
+# it, each uc.Chrome() deletes, re-downloads and re-patches the driver. The
+# entry's metadata records the Chrome version it was built for, so a browser
+# upgrade gets a fresh driver and old versions are pruned.
+class ChromedriverCache:
+    def __init__(self, cache_dir: str, browser_path: Optional[str] = None) -> None:
+        self.cache_dir = cache_dir
+        self.configured_browser = browser_path
+        self._lock = threading.Lock()
+        self._info: Optional[DriverInfo] = None
+
+    def info(self) -> Optional[DriverInfo]:
+        return self._info
+
+    def ensure(self) -> DriverInfo:
+        # Resolves once per process; the file lock makes concurrent workers
+        # wait for the first one's download instead of racing it
+        with self._lock:
+            if self._info is None:
+                self._info = self._resolve()
+            return self._info
+
+    def _resolve(self) -> DriverInfo:
+        started = time.perf_counter()
+        browser_path = find_browser(self.configured_browser)
+        version = browser_version(browser_path) if browser_path else None
+        if not version:
+            # Unknown browser: leave discovery and patching to uc
+            return DriverInfo(None, browser_path, None, "uc", time.perf_counter() - started)
+
+        entry_dir = os.path.join(self.cache_dir, version)
+        driver_path = os.path.join(entry_dir, DRIVER_NAME)
+        if self._valid(entry_dir, driver_path, version):
+            return DriverInfo(driver_path, browser_path, version, "cache", time.perf_counter() - started)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another worker may have built it while we waited
+            if self._valid(entry_dir, driver_path, version):
+                return DriverInfo(driver_path, browser_path, version, "cache", time.perf_counter() - started)
+            self._build(entry_dir, driver_path, version)
+            self._prune(version)
+        return DriverInfo(driver_path, browser_path, version, "patched", time.perf_counter() - started)
+
+    def _valid(self, entry_dir: str, driver_path: str, version: str) -> bool:
+        try:
+            with open(os.path.join(entry_dir, "metadata.json"), encoding="utf-8") as fh:
+                metadata = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        return metadata.get("browserVersion") == version and os.access(driver_path, os.X_OK) and is_patched(driver_path)
+
+    def _build(self, entry_dir: str, driver_path: str, version: str) -> None:
+        from undetected_chromedriver.patcher import Patcher
+
+        log.info("Downloading and patching chromedriver for Chrome %s", version)
+        patcher = Patcher(version_main=int(version.split(".", 1)[0]))
+        patcher.auto()
+        os.makedirs(entry_dir, exist_ok=True)
+        # Copy then rename so a reader never sees a half-written binary
+        staging = f"{driver_path}.{os.getpid()}.tmp"
+        shutil.copyfile(patcher.executable_path, staging)
+        os.chmod(staging, 0o755)
+        os.replace(staging, driver_path)
+        with open(os.path.join(entry_dir, "metadata.json"), "w", encoding="utf-8") as fh:
+            json.dump(
+                {
+                    "browserVersion": version,
+                    "driverVersion": str(getattr(patcher, "version_full", "") or "") or None,
+                    "patchedAt": time.time(),
+                },
+                fh,
+            )
+
+    def _prune(self, keep: str) -> None:
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name != keep and VERSION_PATTERN.fullmatch(name) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
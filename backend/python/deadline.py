@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from selenium.common.exceptions import TimeoutException
+
+
+class DeadlineExceeded(TimeoutError):
+    def __init__(self, stage: str, timeout: float) -> None:
+        super().__init__(f"Request deadline of {timeout:.1f}s exceeded during '{stage}'.")
+        self.stage = stage
+
+
+# One time budget shared by every stage of a tracking request. Each wait asks
+# for min(its own cap, what is left) instead of stacking fixed timeouts.
+class Deadline:
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self.expires = self.started + timeout
+        self.stages: List[Tuple[str, float]] = []
+        self.current_stage = "start"
+        self.failed_stage: Optional[str] = None
+        # Per-request facts reported next to the timings (command count, variant)
+        self.details: Dict[str, Any] = {}
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def budget(self, cap: Optional[float] = None) -> float:
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(self.current_stage, self.timeout)
+        return remaining if cap is None else min(cap, remaining)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        # Stages may nest (e.g. row parsing inside extract); the innermost
+        # stage an exception escapes from is the one blamed for the failure
+        outer = self.current_stage
+        self.current_stage = name
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            if self.failed_stage is None:
+                self.failed_stage = name
+            raise
+        finally:
+            self.stages.append((name, time.monotonic() - started))
+            self.current_stage = outer
+
+    def wait_any(self, driver, conditions: Dict[str, Callable[[Any], Any]], cap: float) -> Tuple[str, Any]:
+        try:
+            return wait_any(driver, conditions, self.budget(cap))
+        except TimeoutException:
+            if self.remaining() <= 0:
+                raise DeadlineExceeded(self.current_stage, self.timeout)
+            raise
+
+    def timings(self) -> Dict[str, float]:
+        timings: Dict[str, float] = {}
+        for name, seconds in self.stages:
+            timings[name] = round(timings.get(name, 0.0) + seconds, 4)
+        timings["total"] = round(self.elapsed(), 4)
+        return timings
+
+
+def wait_any(
+    driver,
+    conditions: Dict[str, Callable[[Any], Any]],
+    timeout: float,
+    poll_frequency: float = 0.1,
+) -> Tuple[str, Any]:
+    # Polls every condition on each tick and returns (name, value) for the
+    # first one that resolves. Raises selenium's TimeoutException otherwise.
+    def any_resolved(drv):
+        for name, condition in conditions.items():
+            try:
+                value = condition(drv)
+            except Exception:
+                continue
+            if value:
+                return name, value
+        return False
+
+    # Imported here: selenium's support package drags in the whole remote
+    # WebDriver, which only matters once a browser is in use
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    return WebDriverWait(driver, timeout, poll_frequency=poll_frequency).until(any_resolved)
+
+
+class StageStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._deadlines_exceeded: Dict[str, int] = {}
+
+    def record(self, deadline: Deadline) -> None:
+        with self._lock:
+            for name, seconds in deadline.timings().items():
+                entry = self._stages.setdefault(name, {"count": 0, "totalSeconds": 0.0, "maxSeconds": 0.0})
+                entry["count"] += 1
+                entry["totalSeconds"] += seconds
+                entry["maxSeconds"] = max(entry["maxSeconds"], seconds)
+
+    def record_exceeded(self, stage: str) -> None:
+        with self._lock:
+            self._deadlines_exceeded[stage] = self._deadlines_exceeded.get(stage, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {
+                    name: {
+                        "count": int(entry["count"]),
+                        "avgSeconds": round(entry["totalSeconds"] / entry["count"], 4) if entry["count"] else 0.0,
+                        "maxSeconds": round(entry["maxSeconds"], 4),
+                    }
+                    for name, entry in self._stages.items()
+                },
+                "deadlinesExceeded": dict(self._deadlines_exceeded),
+            }
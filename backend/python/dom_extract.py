@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+# Collects everything the payload builders need from the results page in a
+# single WebDriver round-trip. `arguments[0]` is the results wrapper element.
+# The returned structure mirrors what the element-by-element walk in
+# zim_tracker_service collects:
+#   variant        "reference" (B/L layout) or "container"
+#   header         container layout header fields
+#   rows           container layout activity rows in DOM order (null if the
+#                  activities table is missing)
+#   cards          B/L layout containers with their activity timelines
+#   eta            text of #etaDate
+#   detailBlocks   [[label, value], ...] per `.block-new` of the details card
+#   vesselTexts    texts of the progress-bar vessel blocks
+# Texts are textContent with whitespace runs collapsed, exactly as
+# html_parser.txt() reads the same page, so both give the same snapshot.
+EXTRACT_SCRIPT = r"""
+var results = arguments[0] || document.querySelector("div.tracing-result-wrapper");
+
+function txt(el) { return el ? (el.textContent || "").replace(/\s+/g, " ").trim() : ""; }
+function q(root, sel) { return root ? root.querySelector(sel) : null; }
+function qa(root, sel) { return root ? Array.prototype.slice.call(root.querySelectorAll(sel)) : []; }
+function optText(root, sel) { var el = q(root, sel); return el ? txt(el) : null; }
+function anchorText(block) { if (!block) { return ""; } return txt(q(block, "a") || block); }
+function row(date, time, activity, location, vessel) {
+  return {date: date || "", time: time || "", activity: activity || "", location: location || "", vessel: vessel || ""};
+}
+
+var snapshot = {variant: q(results, ".routing-details-v2") ? "reference" : "container"};
+
+if (snapshot.variant === "reference") {
+  snapshot.cards = qa(results, ".routing-details-v2 li.card-container-v2").map(function (card) {
+    return {
+      containerNum: optText(card, ".unit-number"),
+      containerType: optText(card, "div[id$='_cargoType']"),
+      lastActivity: optText(card, "div[id$='_activityDesc']"),
+      activities: qa(card, ".card-desktop-inner li.card-container-activity").map(function (item) {
+        return row(
+          optText(item, "div[id$='_activityDateTz'] .date"),
+          optText(item, "div[id$='_activityDateTz'] .time"),
+          optText(item, "div[id$='_activityDesc']"),
+          optText(item, "div[id$='_placeFromDesc']"),
+          anchorText(q(item, "div[id$='_vessel']"))
+        );
+      })
+    };
+  });
+
+  snapshot.eta = txt(document.querySelector("#etaDate"));
+  var detailsCard = document.querySelector(".tracing-details-card .card-body");
+  snapshot.detailBlocks = qa(detailsCard, ".block-new").map(function (block) {
+    var pairs = [];
+    qa(block, ".card-content-text").forEach(function (ci) {
+      var label = q(ci, ".label");
+      if (!label) { return; }
+      var divs = qa(ci, "div");
+      pairs.push([txt(label), divs.length ? txt(divs[divs.length - 1]) : ""]);
+    });
+    return pairs;
+  });
+  snapshot.vesselTexts = qa(document, ".progress-bar-v2 .vessel").map(txt);
+} else {
+  var consNumber = q(results, ".cons-number");
+  var lastActivity = null;
+  qa(document, ".last-activity-value").some(function (el) {
+    var value = txt(el);
+    if (value) { lastActivity = value; }
+    return !!value;
+  });
+  snapshot.header = {
+    containerNum: consNumber ? txt(consNumber) : null,
+    typeAndSize: optText(document, "#typeAndSize"),
+    lastActivity: lastActivity
+  };
+
+  var activities = q(results, ".one-container-activities");
+  snapshot.rows = activities ? qa(activities, ".activity-row").map(function (el) {
+    var items = qa(el, ".activity-item");
+    return row(
+      optText(items[0], ".date"),
+      optText(items[0], ".time"),
+      optText(items[1], ".text-style"),
+      optText(items[2], ".text-style"),
+      anchorText(q(items[3], ".text-style"))
+    );
+  }) : null;
+}
+
+return snapshot;
+"""
+
+
+def extract_snapshot(driver, results=None) -> Dict[str, Any]:
+    return driver.execute_script(EXTRACT_SCRIPT, results) or {}
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class _PooledDriver:
+    __slots__ = ("driver", "created_at", "last_used", "uses")
+
+    def __init__(self, driver: Any) -> None:
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+def quit_driver(driver: Any) -> None:
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def is_driver_alive(driver: Any) -> bool:
+    try:
+        driver.execute_script("return document.readyState")
+        return True
+    except Exception:
+        return False
+
+
+# Bounded pool of pre-launched browsers that requests borrow and return.
+# `factory` launches a new driver and `reset` wipes per-request state before a
+# driver goes back on the idle list. Drivers that fail the health check on
+# checkout, or fail the reset, are quit and replaced on demand. `retire(driver,
+# uses)` may ask for a driver to be recycled instead of returned, and
+# `destroy` replaces the plain driver.quit().
+class DriverPool:
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        reset: Optional[Callable[[Any], None]] = None,
+        min_size: int = 1,
+        max_size: int = 4,
+        idle_timeout: float = 300.0,
+        checkout_timeout: float = 30.0,
+        reap_interval: float = 30.0,
+        retire: Optional[Callable[[Any, int], bool]] = None,
+        destroy: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        self.factory = factory
+        self.reset = reset
+        self.retire = retire
+        self.destroy = destroy or quit_driver
+        self.max_size = max(1, max_size)
+        self.min_size = max(0, min(min_size, self.max_size))
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.reap_interval = reap_interval
+
+        self._cond = threading.Condition()
+        self._idle: List[_PooledDriver] = []
+        self._in_use = 0
+        self._launching = 0
+        self._waiting = 0
+        self._closed = False
+        self._reaper: Optional[threading.Thread] = None
+        # Resets navigate the browser, so they run off the borrower's thread
+        self._reset_executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix="driver-pool-reset")
+
+        self._stats: Dict[str, float] = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "launchFailures": 0,
+            "evictedIdle": 0,
+            "recycled": 0,
+            "discarded": 0,
+            "waitTimeTotal": 0.0,
+            "waitTimeMax": 0.0,
+        }
+
+    # Lifecycle
+
+    def start(self) -> None:
+        with self._cond:
+            if self._reaper is not None or self._closed:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="driver-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def close(self, wait: bool = False) -> None:
+        # wait=True blocks until drivers still being returned have been quit
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for entry in idle:
+            self.destroy(entry.driver)
+        self._reset_executor.shutdown(wait=wait)
+
+    def warm(self, count: int, timeout: Optional[float] = None) -> int:
+        # Launches up to `count` browsers and parks them through `reset` on
+        # the caller's thread, so they are ready once this returns. Returns
+        # the number of idle drivers. These checkouts are not uses.
+        entries: List[_PooledDriver] = []
+        try:
+            for _ in range(min(count, self.max_size)):
+                entries.append(self._acquire(self.checkout_timeout if timeout is None else timeout, counted=False))
+        finally:
+            for entry in entries:
+                self._release(entry)
+        with self._cond:
+            return len(self._idle)
+
+    # Borrow / return
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        entry = self._acquire(self.checkout_timeout if timeout is None else timeout)
+        try:
+            yield entry.driver
+        finally:
+            # The driver counts as in use until its reset has finished
+            try:
+                self._reset_executor.submit(self._release, entry)
+            except RuntimeError:
+                self._release(entry)
+
+    def _acquire(self, timeout: float, counted: bool = True) -> _PooledDriver:
+        self.start()
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Driver pool is closed.")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._total() < self.max_size:
+                        self._launching += 1
+                        entry = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No browser available within {timeout:.1f}s "
+                            f"(max_size={self.max_size})."
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        if entry is None:
+            entry = self._launch_reserved()
+        elif not is_driver_alive(entry.driver):
+            with self._cond:
+                # Swap the dead driver's slot for a launch reservation
+                self._in_use -= 1
+                self._launching += 1
+            self._discard(entry)
+            entry = self._launch_reserved()
+
+        if not counted:
+            return entry
+        waited = time.monotonic() - started
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["waitTimeTotal"] += waited
+            self._stats["waitTimeMax"] = max(self._stats["waitTimeMax"], waited)
+        entry.uses += 1
+        return entry
+
+    def _launch_reserved(self) -> _PooledDriver:
+        # Caller has already reserved a slot via self._launching; the new
+        # driver counts as in use until released
+        try:
+            entry = _PooledDriver(self.factory())
+        except Exception:
+            with self._cond:
+                self._launching -= 1
+                self._stats["launchFailures"] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._launching -= 1
+            self._in_use += 1
+            self._stats["created"] += 1
+        return entry
+
+    def _release(self, entry: _PooledDriver) -> None:
+        healthy = True
+        if self._retiring(entry):
+            healthy = False
+        # No point parking a browser the pool is about to quit
+        elif self.reset is not None and not self._closed:
+            try:
+                self.reset(entry.driver)
+            except Exception:
+                healthy = False
+        with self._cond:
+            self._in_use -= 1
+            if healthy and not self._closed:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+        self._discard(entry)
+
+    def _retiring(self, entry: _PooledDriver) -> bool:
+        if self.retire is None or self._closed:
+            return False
+        try:
+            retiring = self.retire(entry.driver, entry.uses)
+        except Exception:
+            return False
+        if retiring:
+            with self._cond:
+                self._stats["recycled"] += 1
+        return retiring
+
+    def _discard(self, entry: _PooledDriver) -> None:
+        self.destroy(entry.driver)
+        with self._cond:
+            if entry in self._idle:
+                self._idle.remove(entry)
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    # Maintenance
+
+    def _total(self) -> int:
+        return len(self._idle) + self._in_use + self._launching
+
+    def _reap_loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+            self.reap()
+            time.sleep(self.reap_interval)
+
+    def reap(self) -> None:
+        now = time.monotonic()
+        expired: List[_PooledDriver] = []
+        with self._cond:
+            # Idle list is LIFO, so the oldest entries sit at the front
+            while self._idle and self._total() > self.min_size:
+                if now - self._idle[0].last_used < self.idle_timeout:
+                    break
+                expired.append(self._idle.pop(0))
+            self._stats["evictedIdle"] += len(expired)
+            idle = list(self._idle)
+        # Idle browsers flagged for recycling (memory cap) go now rather than
+        # on their next release
+        retired = [entry for entry in idle if self._retiring(entry)]
+        with self._cond:
+            for entry in retired:
+                if entry in self._idle:
+                    self._idle.remove(entry)
+                    expired.append(entry)
+            missing = max(0, self.min_size - self._total())
+            self._launching += missing
+        for entry in expired:
+            self.destroy(entry.driver)
+
+        # Replacements are parked like warm-up browsers: through reset, with
+        # no use counted
+        for _ in range(missing):
+            try:
+                entry = self._launch_reserved()
+            except Exception:
+                continue
+            self._release(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            checkouts = int(self._stats["checkouts"])
+            return {
+                "minSize": self.min_size,
+                "maxSize": self.max_size,
+                "size": self._total(),
+                "idle": len(self._idle),
+                "inUse": self._in_use,
+                "launching": self._launching,
+                "waiting": self._waiting,
+                "checkouts": checkouts,
+                "timeouts": int(self._stats["timeouts"]),
+                "created": int(self._stats["created"]),
+                "launchFailures": int(self._stats["launchFailures"]),
+                "evictedIdle": int(self._stats["evictedIdle"]),
+                "recycled": int(self._stats["recycled"]),
+                "discarded": int(self._stats["discarded"]),
+                "waitTimeAvg": round(self._stats["waitTimeTotal"] / checkouts, 4) if checkouts else 0.0,
+                "waitTimeMax": round(self._stats["waitTimeMax"], 4),
+            }
@@ -0,0 +1,684 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from jobs import (
+    FAILED,
+    QUEUED,
+    RUNNING,
+    SUCCEEDED,
+    CallbackPolicy,
+    Job,
+    JobError,
+    JobQueueFull,
+    SharedJobRecords,
+    callback_session,
+    deliver_callback,
+    iso_time,
+)
+from result_cache import cache_key
+
+log = logging.getLogger(__name__)
+
+READY, LEASED, DONE = "ready", "leased", "done"
+# Runner failures (HTTP statuses) another attempt may get past: the site or
+# this worker's browsers were busy, or the deadline ran out
+RETRYABLE_STATUSES = (503, 504)
+
+# Lives next to SharedJobRecords' jobs table, which keeps the document every
+# poll reads; this table is the queue state behind it
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_queue (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL,
+    lease_token TEXT,
+    lease_owner TEXT,
+    enqueued_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_job_queue_visible ON job_queue (state, visible_at);
+CREATE INDEX IF NOT EXISTS idx_job_queue_finished ON job_queue (state, finished_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_job_queue_lease ON job_queue (lease_token);
+
+CREATE TABLE IF NOT EXISTS job_workers (
+    id TEXT PRIMARY KEY,
+    info TEXT NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Lease:
+    __slots__ = ("token", "job_id", "attempts", "payload", "exhausted")
+
+    def __init__(self, token: str, job_id: str, attempts: int, payload: Dict[str, Any], exhausted: bool) -> None:
+        self.token = token
+        self.job_id = job_id
+        self.attempts = attempts
+        self.payload = payload
+        # Earlier attempts used up the retries (their workers died mid-job)
+        self.exhausted = exhausted
+
+    def job(self) -> Job:
+        payload = self.payload
+        job = Job(payload["identifier"], payload["refType"], payload.get("options") or {}, payload.get("callbackUrl"))
+        job.id = self.job_id
+        return job
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "token": self.token,
+            "jobId": self.job_id,
+            "attempts": self.attempts,
+            "payload": self.payload,
+            "exhausted": self.exhausted,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Lease":
+        return cls(data["token"], data["jobId"], int(data["attempts"]), data["payload"], bool(data["exhausted"]))
+
+
+# Durable job queue in SQLite, shared by the front end and every scrape worker
+# on the host (remote hosts go through the front end, see RemoteJobStore).
+# Workers lease jobs for `visibility_timeout` seconds and keep extending the
+# lease while they run; a job whose lease lapses (worker crashed or hung) is
+# handed to the next worker that asks. Completion needs the current lease
+# token, so a late or repeated completion is a no-op.
+class DurableJobStore(SharedJobRecords):
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: float = 60.0,
+        max_attempts: int = 3,
+        retention: float = 3600.0,
+    ) -> None:
+        super().__init__(path)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retention = retention
+        with self._lock:
+            self._conn.executescript(QUEUE_SCHEMA)
+
+    def _update_record(
+        self, conn: sqlite3.Connection, job_id: str, expires_at: Optional[float] = None, **fields: Any
+    ) -> Optional[Dict[str, Any]]:
+        row = conn.execute("SELECT body FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        body = json.loads(row[0])
+        body.update(fields)
+        conn.execute(
+            "UPDATE jobs SET status = ?, body = ?, expires_at = COALESCE(?, expires_at) WHERE id = ?",
+            (body["status"], json.dumps(body), expires_at, job_id),
+        )
+        return body
+
+    # Front end
+
+    def enqueue(self, job: Job, max_ready: int = 0) -> None:
+        # Raises JobQueueFull past `max_ready` waiting jobs, and
+        # sqlite3.IntegrityError when the idempotency key is already taken
+        now = time.time()
+        payload = {
+            "identifier": job.identifier,
+            "refType": job.ref_type,
+            "options": job.options,
+            "callbackUrl": job.callback_url,
+        }
+        with self._transaction() as conn:
+            if max_ready:
+                ready = conn.execute("SELECT COUNT(*) FROM job_queue WHERE state = ?", (READY,)).fetchone()[0]
+                if ready >= max_ready:
+                    raise JobQueueFull(f"Job queue is full ({ready} waiting); try again shortly.")
+            self._insert_record(conn, job)
+            conn.execute(
+                "INSERT INTO job_queue (id, payload, state, visible_at, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                (job.id, json.dumps(payload), READY, now, now),
+            )
+
+    # Workers
+
+    def lease(self, worker_id: str, limit: int) -> List[Lease]:
+        now = time.time()
+        leases: List[Lease] = []
+        # One IMMEDIATE transaction, so two workers never lease the same row
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, payload, attempts FROM job_queue WHERE state IN (?, ?) AND visible_at <= ? "
+                "ORDER BY enqueued_at LIMIT ?",
+                (READY, LEASED, now, max(1, limit)),
+            ).fetchall()
+            for job_id, payload, attempts in rows:
+                token = uuid.uuid4().hex
+                attempts += 1
+                conn.execute(
+                    "UPDATE job_queue SET state = ?, attempts = ?, visible_at = ?, lease_token = ?, lease_owner = ? "
+                    "WHERE id = ?",
+                    (LEASED, attempts, now + self.visibility_timeout, token, worker_id, job_id),
+                )
+                self._update_record(
+                    conn, job_id, status=RUNNING, startedAt=iso_time(now), attempts=attempts, worker=worker_id
+                )
+                leases.append(Lease(token, job_id, attempts, json.loads(payload), attempts > self.max_attempts))
+        return leases
+
+    def extend(self, tokens: List[str]) -> List[str]:
+        # Pushes back the visibility timeout of held leases; returns the
+        # tokens that are no longer held (expired and re-leased, or finished)
+        visible_at = time.time() + self.visibility_timeout
+        lost: List[str] = []
+        with self._transaction() as conn:
+            for token in tokens:
+                updated = conn.execute(
+                    "UPDATE job_queue SET visible_at = ? WHERE lease_token = ? AND state = ?",
+                    (visible_at, token, LEASED),
+                ).rowcount
+                if not updated:
+                    lost.append(token)
+        return lost
+
+    def complete(
+        self,
+        token: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        error_status: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        # Returns the finished job document, or None when the lease is no
+        # longer this caller's (nothing is written then)
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT id FROM job_queue WHERE lease_token = ? AND state = ?", (token, LEASED)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE job_queue SET state = ?, lease_token = NULL, finished_at = ? WHERE id = ?", (DONE, now, row[0])
+            )
+            fields: Dict[str, Any] = {
+                "status": status,
+                "finishedAt": iso_time(now),
+                "expiresAt": iso_time(now + self.retention),
+            }
+            if status == SUCCEEDED:
+                fields["result"] = result
+            else:
+                fields["error"] = {"message": error, "status": error_status}
+            return self._update_record(conn, row[0], expires_at=now + self.retention, **fields)
+
+    def retry(self, token: str, delay: float, error: Optional[str] = None) -> bool:
+        # Puts the job back for another worker after `delay` seconds; False
+        # once its attempts are used up or the lease is gone
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM job_queue WHERE lease_token = ? AND state = ? AND attempts < ?",
+                (token, LEASED, self.max_attempts),
+            ).fetchone()
+            if row is None:
+                return False
+            conn.execute(
+                "UPDATE job_queue SET state = ?, visible_at = ?, lease_token = NULL, lease_owner = NULL WHERE id = ?",
+                (READY, now + delay, row[0]),
+            )
+            self._update_record(conn, row[0], status=QUEUED, lastError=error)
+        return True
+
+    def payload(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # What the job was submitted with (identifier, refType, options)
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM job_queue WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def latest_result(self, identifier: str, ref_type: str, max_age: float) -> Optional[Tuple[Dict[str, Any], float]]:
+        # (result, age in seconds) of the newest successful full lookup of
+        # this identifier finished within `max_age`, whichever worker ran it
+        now = time.time()
+        key = cache_key(identifier, ref_type)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, finished_at FROM job_queue WHERE state = ? AND finished_at >= ? "
+                "ORDER BY finished_at DESC",
+                (DONE, now - max_age),
+            ).fetchall()
+            for job_id, payload, finished_at in rows:
+                payload = json.loads(payload)
+                # A ?fields= projection is not the whole result
+                if (payload.get("options") or {}).get("fields"):
+                    continue
+                if cache_key(payload["identifier"], payload["refType"]) != key:
+                    continue
+                row = self._conn.execute("SELECT body FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                body = json.loads(row[0]) if row is not None else {}
+                if body.get("status") == SUCCEEDED and body.get("result"):
+                    return body["result"], max(0.0, now - finished_at)
+        return None
+
+    def set_callback(self, job_id: str, callback: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            self._update_record(conn, job_id, callback=callback)
+
+    def heartbeat(self, worker_id: str, info: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_workers (id, info, heartbeat_at) VALUES (?, ?, ?)",
+                (worker_id, json.dumps(info), time.time()),
+            )
+
+    # Bookkeeping
+
+    def purge(self, now: float) -> int:
+        removed = super().purge(now)
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM job_queue WHERE state = ? AND finished_at <= ?", (DONE, now - self.retention)
+            )
+            self._conn.execute("DELETE FROM job_workers WHERE heartbeat_at <= ?", (now - self.retention,))
+        return removed
+
+    def queue_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            ready, delayed, leased, expired, oldest = conn.execute(
+                "SELECT "
+                "COALESCE(SUM(state = ? AND visible_at <= ?), 0), "
+                "COALESCE(SUM(state = ? AND visible_at > ?), 0), "
+                "COALESCE(SUM(state = ? AND visible_at > ?), 0), "
+                "COALESCE(SUM(state = ? AND visible_at <= ?), 0), "
+                "MIN(CASE WHEN state = ? THEN enqueued_at END) "
+                "FROM job_queue",
+                (READY, now, READY, now, LEASED, now, LEASED, now, READY),
+            ).fetchone()
+            worker_rows = conn.execute("SELECT id, info, heartbeat_at FROM job_workers").fetchall()
+        workers = []
+        for worker_id, info, heartbeat_at in worker_rows:
+            info = json.loads(info)
+            # A worker is gone once it has missed three heartbeats
+            alive = now - heartbeat_at <= 3 * float(info.get("heartbeatInterval") or 10.0)
+            workers.append({"id": worker_id, "alive": alive, "heartbeatAgeSeconds": round(now - heartbeat_at, 1), **info})
+        return {
+            "ready": ready,
+            "delayed": delayed,
+            "leased": leased,
+            "expiredLeases": expired,
+            "oldestReadySeconds": round(now - oldest, 1) if oldest is not None else 0.0,
+            "visibilityTimeout": self.visibility_timeout,
+            "maxAttempts": self.max_attempts,
+            "workersAlive": sum(1 for w in workers if w["alive"]),
+            "workerConcurrency": sum(int(w.get("concurrency") or 0) for w in workers if w["alive"]),
+            "workers": workers,
+        }
+
+
+def handle_remote(store: DurableJobStore, operation: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    # Server side of RemoteJobStore; raises KeyError/TypeError/ValueError on
+    # malformed requests
+    if operation == "lease":
+        leases = store.lease(str(body["workerId"]), int(body["limit"]))
+        return {"leases": [lease.to_dict() for lease in leases]}
+    if operation == "extend":
+        return {"lost": store.extend([str(token) for token in body["tokens"]])}
+    if operation == "complete":
+        record = store.complete(
+            str(body["token"]), str(body["status"]), body.get("result"), body.get("error"), body.get("errorStatus")
+        )
+        return {"record": record}
+    if operation == "retry":
+        return {"retried": store.retry(str(body["token"]), float(body["delay"]), body.get("error"))}
+    if operation == "callback":
+        store.set_callback(str(body["jobId"]), dict(body["callback"]))
+        return {}
+    if operation == "heartbeat":
+        store.heartbeat(str(body["workerId"]), dict(body["info"]))
+        return {}
+    raise ValueError(f"unknown queue operation {operation!r}")
+
+
+# The worker side of DurableJobStore for workers on other hosts: the same
+# calls, made against the front end's /api/zim/queue/<operation> endpoints.
+class RemoteJobStore:
+    def __init__(self, base_url: str, token: str, timeout: float = 30.0) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.headers["Authorization"] = f"Bearer {token}"
+
+    def _call(self, operation: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        response = self._session.post(f"{self.base_url}/api/zim/queue/{operation}", json=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def lease(self, worker_id: str, limit: int) -> List[Lease]:
+        return [Lease.from_dict(data) for data in self._call("lease", {"workerId": worker_id, "limit": limit})["leases"]]
+
+    def extend(self, tokens: List[str]) -> List[str]:
+        return self._call("extend", {"tokens": tokens})["lost"]
+
+    def complete(
+        self,
+        token: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        error_status: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        body = {"token": token, "status": status, "result": result, "error": error, "errorStatus": error_status}
+        return self._call("complete", body)["record"]
+
+    def retry(self, token: str, delay: float, error: Optional[str] = None) -> bool:
+        return bool(self._call("retry", {"token": token, "delay": delay, "error": error})["retried"])
+
+    def set_callback(self, job_id: str, callback: Dict[str, Any]) -> None:
+        self._call("callback", {"jobId": job_id, "callback": callback})
+
+    def heartbeat(self, worker_id: str, info: Dict[str, Any]) -> None:
+        self._call("heartbeat", {"workerId": worker_id, "info": info})
+
+
+# Front-end side of the durable backend, a drop-in for JobQueue: submit()
+# only enqueues and get() reads the shared record. Scrape workers
+# (scrape_worker.py) do the running.
+class DurableJobQueue:
+    def __init__(self, store: DurableJobStore, max_queue: int = 1000) -> None:
+        self.store = store
+        self.max_queue = max(1, max_queue)
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self._stats: Dict[str, int] = {"submitted": 0, "rejected": 0, "deduplicated": 0}
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def submit(
+        self,
+        identifier: str,
+        ref_type: str,
+        options: Optional[Dict[str, Any]] = None,
+        callback_url: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        self._purge()
+        if idempotency_key:
+            existing = self.store.find_idempotent(idempotency_key)
+            if existing is not None:
+                self._count("deduplicated")
+                return existing, False
+
+        job = Job(identifier, ref_type, options or {}, callback_url, idempotency_key)
+        try:
+            self.store.enqueue(job, self.max_queue)
+        except JobQueueFull:
+            self._count("rejected")
+            raise
+        except sqlite3.IntegrityError:
+            # Another front-end worker took the same idempotency key meanwhile
+            existing = self.store.find_idempotent(idempotency_key) if idempotency_key else None
+            if existing is None:
+                raise
+            self._count("deduplicated")
+            return existing, False
+        self._count("submitted")
+        return job.to_dict(), True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._purge()
+        return self.store.load(job_id)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + min(60.0, max(1.0, self.store.retention / 10))
+        try:
+            self.store.purge(now)
+        except sqlite3.Error:
+            log.exception("Could not purge expired jobs")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._stats)
+        return {"backend": "durable", "maxQueue": self.max_queue, **self.store.queue_stats(), **counters}
+
+
+# Runs leased jobs on up to `concurrency` threads. It leases only as many jobs
+# as it has free slots, so a busy worker leaves the rest to others. A
+# heartbeat thread extends the leases it holds and reports in. Transient
+# failures (see RETRYABLE_STATUSES) go back on the queue after `retry_delay`
+# until the store's attempt limit is reached.
+class QueueWorker:
+    def __init__(
+        self,
+        store: Any,
+        runner: Callable[[Job], Dict[str, Any]],
+        concurrency: int = 4,
+        worker_id: Optional[str] = None,
+        heartbeat_interval: float = 10.0,
+        poll_interval: float = 1.0,
+        retry_delay: float = 15.0,
+        callback_timeout: float = 10.0,
+        callback_attempts: int = 3,
+        callback_secret: Optional[str] = None,
+        callback_policy: Optional[CallbackPolicy] = None,
+    ) -> None:
+        self.store = store
+        self.runner = runner
+        self.concurrency = max(1, concurrency)
+        self.worker_id = worker_id or default_worker_id()
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.callback_timeout = callback_timeout
+        self.callback_attempts = callback_attempts
+        self.callback_secret = callback_secret
+        self.callback_policy = callback_policy
+
+        self._cond = threading.Condition()
+        self._held: Dict[str, Lease] = {}
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._session = callback_session(callback_policy)
+        self._started_at = time.time()
+        self._stats: Dict[str, int] = {
+            "leased": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retried": 0,
+            "leasesLost": 0,
+            "storeErrors": 0,
+        }
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        for target, name in ((self._poll_loop, "queue-poll"), (self._heartbeat_loop, "queue-heartbeat")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float) -> bool:
+        # Stops leasing and waits for running jobs; True if none are left.
+        # Leases still held when this gives up lapse and are retried elsewhere.
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._held:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # Leasing
+
+    def _poll_loop(self) -> None:
+        idle = self.poll_interval
+        while not self._stop.is_set():
+            with self._cond:
+                # Wait for a free slot
+                while len(self._held) >= self.concurrency and not self._stop.is_set():
+                    self._cond.wait(self.poll_interval)
+                free = self.concurrency - len(self._held)
+            if self._stop.is_set():
+                return
+            try:
+                leases = self.store.lease(self.worker_id, free)
+            except Exception as exc:
+                self._count("storeErrors")
+                log.warning("Leasing jobs failed: %s", exc)
+                leases = []
+            if not leases:
+                # Back off while the queue is empty, up to 10 poll intervals
+                self._stop.wait(idle)
+                idle = min(idle * 2, self.poll_interval * 10)
+                continue
+            idle = self.poll_interval
+            for lease in leases:
+                with self._cond:
+                    self._held[lease.token] = lease
+                    self._stats["leased"] += 1
+                threading.Thread(target=self._run, args=(lease,), name=f"job-{lease.job_id[:8]}", daemon=True).start()
+
+    def _run(self, lease: Lease) -> None:
+        try:
+            if lease.exhausted:
+                self._finish(
+                    lease,
+                    FAILED,
+                    error=f"Gave up after {lease.attempts - 1} attempts whose workers stopped responding.",
+                    error_status=500,
+                )
+                return
+            job = lease.job()
+            try:
+                result = self.runner(job)
+            except JobError as exc:
+                if exc.status in RETRYABLE_STATUSES and self._retry(lease, str(exc)):
+                    return
+                self._finish(lease, FAILED, error=str(exc), error_status=exc.status)
+                return
+            except Exception as exc:
+                log.exception("Job %s for %s failed", job.id, job.identifier)
+                self._finish(lease, FAILED, error=f"{exc.__class__.__name__}: {exc}", error_status=500)
+                return
+            self._finish(lease, SUCCEEDED, result=result)
+        except Exception:
+            # The store is unreachable; the lease lapses and the job is retried
+            self._count("storeErrors")
+            log.exception("Could not report job %s", lease.job_id)
+        finally:
+            with self._cond:
+                self._held.pop(lease.token, None)
+                self._cond.notify_all()
+
+    def _retry(self, lease: Lease, error: str) -> bool:
+        if not self.store.retry(lease.token, self.retry_delay, error):
+            return False
+        self._count("retried")
+        return True
+
+    def _finish(
+        self,
+        lease: Lease,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        error_status: Optional[int] = None,
+    ) -> None:
+        record = self.store.complete(lease.token, status, result, error, error_status)
+        if record is None:
+            # Our lease lapsed and another worker owns the job now
+            self._count("leasesLost")
+            log.warning("Dropped the result of job %s: its lease was lost", lease.job_id)
+            return
+        self._count(status)
+        callback_url = lease.payload.get("callbackUrl")
+        if callback_url:
+            callback = deliver_callback(
+                self._session,
+                callback_url,
+                record,
+                self.callback_secret,
+                self.callback_timeout,
+                self.callback_attempts,
+                self.callback_policy,
+            )
+            self.store.set_callback(lease.job_id, callback)
+
+    # Heartbeats
+
+    def _heartbeat_loop(self) -> None:
+        # Keeps extending leases while stop() drains the running jobs
+        while True:
+            if self._stop.is_set():
+                with self._cond:
+                    if not self._held:
+                        break
+                    self._cond.wait(self.heartbeat_interval)
+            else:
+                self._stop.wait(self.heartbeat_interval)
+            self.heartbeat()
+        # A last beat so the front end sees the worker stopped
+        self.heartbeat()
+
+    def heartbeat(self) -> None:
+        with self._cond:
+            tokens = list(self._held)
+        try:
+            lost = self.store.extend(tokens) if tokens else []
+            self.store.heartbeat(self.worker_id, self.info())
+        except Exception as exc:
+            self._count("storeErrors")
+            log.warning("Heartbeat failed: %s", exc)
+            return
+        if lost:
+            with self._cond:
+                self._stats["leasesLost"] += len(lost)
+            log.warning("Lost %d job leases (expired before they could be extended)", len(lost))
+
+    def info(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "host": socket.gethostname(),
+                "pid": os.getpid(),
+                "concurrency": self.concurrency,
+                "running": len(self._held),
+                "draining": self._stop.is_set(),
+                "heartbeatInterval": self.heartbeat_interval,
+                "startedAt": iso_time(self._started_at),
+                **self._stats,
+            }
+
+    def _count(self, key: str) -> None:
+        with self._cond:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workerId": self.worker_id, **self.info()}
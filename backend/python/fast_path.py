@@ -0,0 +1,468 @@
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+# Headers the browser sets itself or that must not be replayed verbatim
+SKIPPED_HEADERS = {
+    "host",
+    "content-length",
+    "connection",
+    "cookie",
+    "accept-encoding",
+    "transfer-encoding",
+}
+
+ACTIVITY_KEYS = ("activityDesc", "activityDescription", "activityName", "eventDescription", "eventName", "description")
+DATE_KEYS = ("activityDateTz", "activityDate", "activityDateTime", "eventDate", "eventDateTime", "dateTime", "date")
+LOCATION_KEYS = ("placeFromDesc", "placeDesc", "placeFrom", "locationName", "location", "place", "portName")
+VESSEL_KEYS = ("vesselName", "vessel", "vesselVoyage")
+VOYAGE_KEYS = ("voyage", "voyageNumber", "voyageNo", "voyageRef")
+CONTAINER_NUM_KEYS = ("unitNumber", "containerNumber", "consNumber", "unitPrefixNumber", "containerNo", "unitNo")
+CONTAINER_TYPE_KEYS = ("cargoType", "typeAndSize", "containerType", "unitType", "containerTypeSize")
+POL_KEYS = ("portOfLoading", "polName", "pol", "portOfLoadingName")
+POL_TERMINAL_KEYS = ("portOfLoadingTerminal", "polTerminal", "polTerminalName")
+SAILING_KEYS = ("sailingDate", "departureDate", "polSailingDate")
+POD_KEYS = ("portOfDischarge", "podName", "pod", "portOfDischargeName")
+POD_TERMINAL_KEYS = ("portOfDischargeTerminal", "podTerminal", "podTerminalName")
+ATA_KEYS = ("actualTimeOfArrival", "ata", "podAta")
+ETA_KEYS = ("etaDate", "eta", "podEta", "estimatedTimeOfArrival")
+
+
+class FastPathError(RuntimeError):
+    pass
+
+
+# The tracking XHR captured from a warm browser session, with the looked-up
+# identifier replaced by "{identifier}" in the URL and body.
+class RequestTemplate:
+    def __init__(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Optional[str] = None,
+        cookies: Optional[List[Dict[str, Any]]] = None,
+        response_keys: Optional[List[str]] = None,
+    ) -> None:
+        self.method = method.upper()
+        self.url = url
+        self.headers = headers or {}
+        self.body = body
+        self.cookies = cookies or []
+        self.response_keys = response_keys or []
+        self.captured_at = time.time()
+
+    def render(self, identifier: str) -> Tuple[str, Optional[str]]:
+        url = self.url.replace("{identifier}", quote(identifier, safe=""))
+        body = self.body.replace("{identifier}", identifier) if self.body is not None else None
+        return url, body
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "url": self.url,
+            "headers": self.headers,
+            "body": self.body,
+            "cookies": self.cookies,
+            "responseKeys": self.response_keys,
+            "capturedAt": self.captured_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RequestTemplate":
+        template = cls(
+            data["method"],
+            data["url"],
+            headers=data.get("headers"),
+            body=data.get("body"),
+            cookies=data.get("cookies"),
+            response_keys=data.get("responseKeys"),
+        )
+        template.captured_at = data.get("capturedAt") or template.captured_at
+        return template
+
+
+def find_tracking_request(
+    messages: List[Dict[str, Any]], identifier: str, url_pattern: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    # Picks the XHR/fetch whose URL or body carries the identifier and whose
+    # response was JSON. Returns {"requestId", "request"} or None.
+    candidates: Dict[str, Dict[str, Any]] = {}
+    json_responses = set()
+    encoded = quote(identifier, safe="")
+    for message in messages:
+        method = message.get("method")
+        params = message.get("params") or {}
+        if method == "Network.requestWillBeSent":
+            if (params.get("type") or "").lower() not in ("xhr", "fetch"):
+                continue
+            req = params.get("request") or {}
+            url = req.get("url") or ""
+            if url_pattern and url_pattern not in url:
+                continue
+            if identifier in url or encoded in url or identifier in (req.get("postData") or ""):
+                candidates[params.get("requestId")] = req
+        elif method == "Network.responseReceived":
+            response = params.get("response") or {}
+            if "json" in (response.get("mimeType") or "").lower() and (response.get("status") or 0) < 400:
+                json_responses.add(params.get("requestId"))
+    for request_id, req in candidates.items():
+        if request_id in json_responses:
+            return {"requestId": request_id, "request": req}
+    return None
+
+
+def template_from_request(req: Dict[str, Any], identifier: str, cookies: List[Dict[str, Any]]) -> RequestTemplate:
+    encoded = quote(identifier, safe="")
+    url = (req.get("url") or "").replace(encoded, "{identifier}").replace(identifier, "{identifier}")
+    body = req.get("postData")
+    if body is not None:
+        body = body.replace(identifier, "{identifier}")
+    headers = {
+        name: value
+        for name, value in (req.get("headers") or {}).items()
+        if name.lower() not in SKIPPED_HEADERS and not name.startswith(":")
+    }
+    return RequestTemplate(req.get("method") or "GET", url, headers=headers, body=body, cookies=cookies)
+
+
+# Serves lookups with a pooled keep-alive HTTP session once a tracking request
+# template has been captured (or loaded from ZIM_FAST_PATH_TEMPLATE). Any
+# failure raises FastPathError so the caller can fall back to Selenium.
+class FastPathClient:
+    def __init__(
+        self,
+        session_ttl: float = 600.0,
+        pool_size: int = 10,
+        timeout: float = 10.0,
+        url_pattern: Optional[str] = None,
+        max_failures: int = 3,
+    ) -> None:
+        self.session_ttl = session_ttl
+        self.timeout = timeout
+        self.url_pattern = url_pattern
+        self.max_failures = max_failures
+        self.pool_size = pool_size
+
+        self._lock = threading.Lock()
+        # Each template gets its own session holding its cookies; the two are
+        # swapped together so a lookup never mixes one's URL with other cookies
+        self._template: Optional[RequestTemplate] = None
+        self._session = self._new_session(None)
+        self._failures = 0
+        self._stats: Dict[str, int] = {
+            "lookups": 0,
+            "served": 0,
+            "fallbacks": 0,
+            "captures": 0,
+            "rejectedCaptures": 0,
+            "invalidations": 0,
+        }
+
+    def ready(self) -> bool:
+        with self._lock:
+            template = self._template
+        if template is None:
+            return False
+        if self.session_ttl and time.time() - template.captured_at > self.session_ttl:
+            self.invalidate("session expired", template)
+            return False
+        return True
+
+    def _new_session(self, template: Optional[RequestTemplate]) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        for cookie in template.cookies if template is not None else ():
+            session.cookies.set(
+                cookie.get("name"),
+                cookie.get("value"),
+                domain=cookie.get("domain"),
+                path=cookie.get("path") or "/",
+            )
+        return session
+
+    def configure(self, template: RequestTemplate) -> None:
+        # Lookups already sending on the previous session finish on it
+        session = self._new_session(template)
+        with self._lock:
+            self._template = template
+            self._session = session
+            self._failures = 0
+
+    def load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as fh:
+            self.configure(RequestTemplate.from_dict(json.load(fh)))
+
+    def invalidate(self, reason: str, template: Optional[RequestTemplate] = None) -> None:
+        # With `template`, only while that template is still the current one:
+        # a failed replay of a replaced template says nothing about its successor
+        with self._lock:
+            if self._template is None or (template is not None and self._template is not template):
+                return
+            self._template = None
+            self._stats["invalidations"] += 1
+        log.info("Fast path invalidated: %s", reason)
+
+    def capture(
+        self, driver, messages: List[Dict[str, Any]], identifier: str
+    ) -> Optional[Tuple[RequestTemplate, Any]]:
+        # Called with the performance log of a successful Selenium lookup, while
+        # the browser is still held: (template, JSON response) of its tracking
+        # XHR, for arm() to check against the scraped payload
+        found = find_tracking_request(messages, identifier, self.url_pattern)
+        if not found:
+            return None
+        try:
+            body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": found["requestId"]})
+            text = body.get("body") or ""
+            if body.get("base64Encoded"):
+                text = base64.b64decode(text).decode("utf-8", "replace")
+            sample = json.loads(text)
+        except Exception:
+            return None
+        template = template_from_request(found["request"], identifier, driver.get_cookies())
+        template.response_keys = sorted(sample.keys()) if isinstance(sample, dict) else []
+        return template, sample
+
+    def arm(
+        self,
+        captured: Tuple[RequestTemplate, Any],
+        identifier: str,
+        matches: Callable[[Dict[str, Any]], bool],
+    ) -> bool:
+        # Only a template whose JSON maps to exactly what the DOM showed
+        # (`matches` compares the payloads) serves lookups
+        template, sample = captured
+        snapshot = snapshot_from_json(sample, identifier)
+        try:
+            matched = snapshot is not None and matches(snapshot)
+        except Exception:
+            log.exception("Fast path check failed for %s", identifier)
+            matched = False
+        if not matched:
+            with self._lock:
+                self._stats["rejectedCaptures"] += 1
+            log.info("Fast path not armed: %s %s does not map to the scraped payload", template.method, template.url)
+            return False
+        self.configure(template)
+        with self._lock:
+            self._stats["captures"] += 1
+        log.info("Fast path captured %s %s", template.method, template.url)
+        return True
+
+    def lookup(self, identifier: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        with self._lock:
+            template, session = self._template, self._session
+            self._stats["lookups"] += 1
+        if template is None:
+            raise FastPathError("no captured tracking request")
+
+        url, body = template.render(identifier)
+        try:
+            response = session.request(
+                template.method,
+                url,
+                headers=template.headers,
+                data=body.encode("utf-8") if body is not None else None,
+                timeout=min(self.timeout, timeout) if timeout else self.timeout,
+            )
+        except requests.RequestException as exc:
+            self._record_failure(template, f"request failed: {exc}")
+            raise FastPathError(str(exc)) from exc
+
+        if response.status_code in (401, 403, 419, 429):
+            self.invalidate(f"upstream answered {response.status_code}", template)
+            self._record_failure(template, None)
+            raise FastPathError(f"upstream answered {response.status_code}")
+        if response.status_code >= 400:
+            self._record_failure(template, f"upstream answered {response.status_code}")
+            raise FastPathError(f"upstream answered {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError as exc:
+            self._record_failure(template, "response was not JSON")
+            raise FastPathError("response was not JSON") from exc
+
+        snapshot = snapshot_from_json(data, identifier)
+        if snapshot is None:
+            self._record_failure(template, "response had no activities")
+            raise FastPathError("response had no activities")
+        with self._lock:
+            if self._template is template:
+                self._failures = 0
+            self._stats["served"] += 1
+        return snapshot
+
+    def _record_failure(self, template: RequestTemplate, reason: Optional[str]) -> None:
+        with self._lock:
+            self._stats["fallbacks"] += 1
+            if self._template is not template:
+                return
+            self._failures += 1
+            exhausted = self._failures >= self.max_failures
+        if reason and exhausted:
+            self.invalidate(f"{self.max_failures} consecutive failures, last: {reason}", template)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            template = self._template
+            return {
+                "ready": template is not None,
+                "endpoint": f"{template.method} {template.url}" if template else None,
+                "capturedAt": template.captured_at if template else None,
+                **self._stats,
+            }
+
+
+# JSON -> snapshot mapping. The snapshot is the structure payload_from_snapshot
+# consumes, so the fast path ends in the same builders as the DOM paths.
+
+
+def walk(data: Any) -> Iterator[Any]:
+    yield data
+    if isinstance(data, dict):
+        for value in data.values():
+            yield from walk(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from walk(value)
+
+
+def scalar_text(value: Any) -> str:
+    if isinstance(value, dict):
+        for key in ("name", "description", "desc", "value", "text"):
+            if isinstance(value.get(key), (str, int, float)):
+                return str(value[key]).strip()
+        return ""
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return str(value).strip()
+    return ""
+
+
+def pick(data: Dict[str, Any], keys: Tuple[str, ...]) -> str:
+    for key in keys:
+        if key in data:
+            text = scalar_text(data[key])
+            if text:
+                return text
+    return ""
+
+
+def find_first(data: Any, keys: Tuple[str, ...]) -> str:
+    for node in walk(data):
+        if isinstance(node, dict):
+            text = pick(node, keys)
+            if text:
+                return text
+    return ""
+
+
+def is_activity(item: Any) -> bool:
+    return isinstance(item, dict) and bool(pick(item, ACTIVITY_KEYS)) and bool(pick(item, DATE_KEYS))
+
+
+def split_datetime(value: str) -> Tuple[str, str, Optional[datetime]]:
+    # ISO timestamps are rendered the way the tracking page shows them
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value, "", None
+    time_text = parsed.strftime("%H:%M") if "T" in value or " " in value.strip() else ""
+    return parsed.strftime("%d-%b-%Y"), time_text, parsed.replace(tzinfo=None)
+
+
+def activity_row(item: Dict[str, Any]) -> Tuple[Dict[str, str], Optional[datetime]]:
+    date_text, time_text, parsed = split_datetime(pick(item, DATE_KEYS))
+    vessel = pick(item, VESSEL_KEYS)
+    voyage = pick(item, VOYAGE_KEYS)
+    if vessel and voyage and voyage not in vessel:
+        vessel = f"{vessel}/{voyage}"
+    return (
+        {
+            "date": date_text,
+            "time": time_text,
+            "activity": pick(item, ACTIVITY_KEYS),
+            "location": pick(item, LOCATION_KEYS),
+            "vessel": vessel,
+        },
+        parsed,
+    )
+
+
+def ordered_rows(items: List[Dict[str, Any]], newest_first: bool) -> List[Dict[str, str]]:
+    rows = [activity_row(item) for item in items]
+    if all(parsed is not None for _, parsed in rows):
+        rows.sort(key=lambda pair: pair[1], reverse=newest_first)
+    return [row for row, _ in rows]
+
+
+def snapshot_from_json(data: Any, identifier: str) -> Optional[Dict[str, Any]]:
+    # Each list of activities is one container's timeline; its parent object
+    # carries the container number and type
+    timelines: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]] = []
+    for node in walk(data):
+        if not isinstance(node, dict):
+            continue
+        for value in node.values():
+            if isinstance(value, list) and value and any(is_activity(item) for item in value):
+                timelines.append((node, [item for item in value if is_activity(item)]))
+    if not timelines:
+        return None
+
+    normalized = "".join(identifier.split()).upper()
+    if len(timelines) == 1 and "".join(pick(timelines[0][0], CONTAINER_NUM_KEYS).split()).upper() in (normalized, ""):
+        parent, items = timelines[0]
+        rows = ordered_rows(items, newest_first=True)
+        return {
+            "variant": "container",
+            "header": {
+                "containerNum": pick(parent, CONTAINER_NUM_KEYS) or None,
+                "typeAndSize": pick(parent, CONTAINER_TYPE_KEYS) or None,
+                "lastActivity": rows[0]["activity"] if rows else None,
+            },
+            "rows": rows,
+        }
+
+    cards = []
+    for parent, items in timelines:
+        rows = ordered_rows(items, newest_first=False)
+        cards.append(
+            {
+                "containerNum": pick(parent, CONTAINER_NUM_KEYS) or None,
+                "containerType": pick(parent, CONTAINER_TYPE_KEYS) or None,
+                "lastActivity": rows[-1]["activity"] if rows else None,
+                "activities": rows,
+            }
+        )
+    return {
+        "variant": "reference",
+        "cards": cards,
+        "eta": find_first(data, ETA_KEYS),
+        "detailBlocks": [
+            [
+                ["Port of Loading", find_first(data, POL_KEYS)],
+                ["Terminal Name", find_first(data, POL_TERMINAL_KEYS)],
+                ["Sailing Date", find_first(data, SAILING_KEYS)],
+            ],
+            [
+                ["Port of Discharge", find_first(data, POD_KEYS)],
+                ["Terminal Name", find_first(data, POD_TERMINAL_KEYS)],
+                ["Actual Time of Arrival", find_first(data, ATA_KEYS)],
+            ],
+        ],
+        "vesselTexts": [],
+    }
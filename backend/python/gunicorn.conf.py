@@ -0,0 +1,57 @@
+# Production serving:  gunicorn -c gunicorn.conf.py zim_tracker_service:app
+#
+# Each worker process imports the app itself (no preload), so browsers, the
+# SQLite connections and background threads are never shared across a fork.
+# The admission semaphore is the one thing created here in the master and
+# inherited by every worker; the master frees the slots of a worker that dies
+# holding them (a timeout SIGKILL mid-scrape). On SIGTERM workers stop accepting, finish their
+# in-flight scrapes (up to ZIM_DRAIN_TIMEOUT) and quit their browsers. Route
+# traffic on /readyz, which only passes once a worker has a warm browser.
+
+import settings
+from admission import AdmissionState, install_shared_state
+
+bind = settings.SERVER_BIND
+workers = settings.SERVER_WORKERS
+worker_class = "gthread"
+threads = settings.SERVER_THREADS
+# A request can legitimately block for the whole scrape deadline
+timeout = int(settings.MAX_REQUEST_TIMEOUT + 30)
+graceful_timeout = int(settings.DRAIN_TIMEOUT + 5)
+keepalive = 5
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER
+
+admission_state = AdmissionState(settings.ADMISSION_LIMIT, settings.ADMISSION_QUEUE)
+
+
+def on_starting(server):
+    # Download and patch chromedriver once, before the workers all want it
+    from chromedriver_cache import ChromedriverCache
+
+    try:
+        ChromedriverCache(settings.DRIVER_CACHE_DIR, settings.CHROME_BINARY).ensure()
+    except Exception as exc:
+        server.log.warning("Chromedriver cache not prepared: %s", exc)
+
+
+def post_fork(server, worker):
+    install_shared_state(admission_state)
+
+
+def post_worker_init(worker):
+    import zim_tracker_service
+
+    zim_tracker_service.start_background()
+
+
+def child_exit(server, worker):
+    freed = admission_state.reclaim(worker.pid)
+    if freed:
+        server.log.warning("Reclaimed %d admission slots held by exited worker %s", freed, worker.pid)
+
+
+def worker_exit(server, worker):
+    import zim_tracker_service
+
+    zim_tracker_service.shutdown(settings.DRAIN_TIMEOUT)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import json
+import sys
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+
+# Parses a captured results page (driver.page_source) into the same snapshot
+# structure dom_extract.EXTRACT_SCRIPT returns, so payload_from_snapshot can
+# build the payload without holding on to a live browser.
+
+
+@lru_cache(maxsize=None)
+def _selector(css: str) -> CSSSelector:
+    return CSSSelector(css)
+
+
+def q(root, css: str):
+    if root is None:
+        return None
+    found = _selector(css)(root)
+    return found[0] if found else None
+
+
+def qa(root, css: str) -> List[Any]:
+    if root is None:
+        return []
+    return _selector(css)(root)
+
+
+def txt(el) -> str:
+    # Collapse whitespace the way rendered text would read
+    if el is None:
+        return ""
+    return " ".join(el.text_content().split())
+
+
+def opt_text(root, css: str) -> Optional[str]:
+    el = q(root, css)
+    return txt(el) if el is not None else None
+
+
+def anchor_text(block) -> str:
+    if block is None:
+        return ""
+    anchor = q(block, "a")
+    return txt(anchor if anchor is not None else block)
+
+
+def row(date: Optional[str], time: Optional[str], activity: Optional[str], location: Optional[str], vessel: Optional[str]) -> Dict[str, str]:
+    return {
+        "date": date or "",
+        "time": time or "",
+        "activity": activity or "",
+        "location": location or "",
+        "vessel": vessel or "",
+    }
+
+
+def parse_reference_cards(results) -> List[Dict[str, Any]]:
+    cards: List[Dict[str, Any]] = []
+    for card in qa(results, ".routing-details-v2 li.card-container-v2"):
+        cards.append(
+            {
+                "containerNum": opt_text(card, ".unit-number"),
+                "containerType": opt_text(card, "div[id$='_cargoType']"),
+                "lastActivity": opt_text(card, "div[id$='_activityDesc']"),
+                "activities": [
+                    row(
+                        opt_text(item, "div[id$='_activityDateTz'] .date"),
+                        opt_text(item, "div[id$='_activityDateTz'] .time"),
+                        opt_text(item, "div[id$='_activityDesc']"),
+                        opt_text(item, "div[id$='_placeFromDesc']"),
+                        anchor_text(q(item, "div[id$='_vessel']")),
+                    )
+                    for item in qa(card, ".card-desktop-inner li.card-container-activity")
+                ],
+            }
+        )
+    return cards
+
+
+def parse_detail_blocks(doc) -> List[List[List[str]]]:
+    blocks: List[List[List[str]]] = []
+    for block in qa(q(doc, ".tracing-details-card .card-body"), ".block-new"):
+        pairs: List[List[str]] = []
+        for ci in qa(block, ".card-content-text"):
+            label = q(ci, ".label")
+            if label is None:
+                continue
+            divs = qa(ci, "div")
+            pairs.append([txt(label), txt(divs[-1]) if divs else ""])
+        blocks.append(pairs)
+    return blocks
+
+
+def parse_container_rows(results) -> Optional[List[Dict[str, str]]]:
+    activities = q(results, ".one-container-activities")
+    if activities is None:
+        return None
+    rows: List[Dict[str, str]] = []
+    for el in qa(activities, ".activity-row"):
+        items = qa(el, ".activity-item")
+        items += [None] * (4 - len(items))
+        rows.append(
+            row(
+                opt_text(items[0], ".date"),
+                opt_text(items[0], ".time"),
+                opt_text(items[1], ".text-style"),
+                opt_text(items[2], ".text-style"),
+                anchor_text(q(items[3], ".text-style")),
+            )
+        )
+    return rows
+
+
+def parse_snapshot(page_source: str) -> Dict[str, Any]:
+    doc = lxml_html.fromstring(page_source)
+    results = q(doc, "div.tracing-result-wrapper")
+    if results is None:
+        raise RuntimeError("Results wrapper not found in page source.")
+
+    if q(results, ".routing-details-v2") is not None:
+        return {
+            "variant": "reference",
+            "cards": parse_reference_cards(results),
+            "eta": txt(q(doc, "#etaDate")),
+            "detailBlocks": parse_detail_blocks(doc),
+            "vesselTexts": [txt(el) for el in qa(doc, ".progress-bar-v2 .vessel")],
+        }
+
+    last_activity = None
+    for el in qa(doc, ".last-activity-value"):
+        value = txt(el)
+        if value:
+            last_activity = value
+            break
+
+    return {
+        "variant": "container",
+        "header": {
+            "containerNum": opt_text(results, ".cons-number"),
+            "typeAndSize": opt_text(doc, "#typeAndSize"),
+            "lastActivity": last_activity,
+        },
+        "rows": parse_container_rows(results),
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python html_parser.py saved_page.html
+    with open(sys.argv[1], encoding="utf-8") as fh:
+        print(json.dumps(parse_snapshot(fh.read()), indent=2, ensure_ascii=False))
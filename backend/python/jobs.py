@@ -0,0 +1,569 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+
+log = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT,
+    status TEXT NOT NULL,
+    body TEXT NOT NULL,
+    expires_at REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_idempotency ON jobs (idempotency_key);
+CREATE INDEX IF NOT EXISTS idx_jobs_expires ON jobs (expires_at);
+"""
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class JobError(RuntimeError):
+    # A failure the runner has already mapped to an HTTP status
+    def __init__(self, message: str, status: int) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def iso_time(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+# Where job callbacks may be sent, so a submitter cannot point the service at
+# its own network. The host must resolve, and only to public addresses unless
+# `allow_private`; a non-empty `allowed_hosts` (exact names, or ".example.com"
+# for any subdomain) admits nothing else. Checked on submit and again before
+# delivery, since the name may resolve differently by then. Sessions from
+# callback_session() also check the address each connection actually reached,
+# so a name that rebinds to an internal address after the check gets nothing.
+class CallbackPolicy:
+    def __init__(self, allowed_hosts: Optional[Sequence[str]] = None, allow_private: bool = False) -> None:
+        self.allowed_hosts = [host.lower().rstrip(".") for host in allowed_hosts or ()]
+        self.allow_private = allow_private
+
+    def host_allowed(self, host: str) -> bool:
+        if not self.allowed_hosts:
+            return True
+        return any(
+            host.endswith(allowed) if allowed.startswith(".") else host == allowed for allowed in self.allowed_hosts
+        )
+
+    def check(self, url: str) -> Optional[str]:
+        # None when `url` may be called back, otherwise why not
+        try:
+            parts = urlsplit(url)
+            host = (parts.hostname or "").lower().rstrip(".")
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+        except ValueError:
+            return "must be an absolute http(s) URL"
+        if parts.scheme not in ("http", "https") or not host:
+            return "must be an absolute http(s) URL"
+        if not self.host_allowed(host):
+            return f"host {host} is not an allowed callback host"
+        if self.allow_private:
+            return None
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+        except (OSError, UnicodeError):
+            return f"host {host} does not resolve"
+        for address in addresses:
+            refused = self.address_refused(address)
+            if refused:
+                return f"host {host} resolves to {refused}"
+        return None
+
+    def address_refused(self, address: str) -> Optional[str]:
+        if self.allow_private:
+            return None
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if ip.version == 6 and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            return f"non-public address {ip}"
+        return None
+
+
+class _PolicyConnection:
+    # Mixed into urllib3's connections: checks the peer of the freshly opened
+    # socket before the request (or the TLS handshake) goes out. Host header
+    # and SNI are untouched since the connection still targets the name.
+    callback_policy: CallbackPolicy
+
+    def _new_conn(self) -> socket.socket:
+        sock = super()._new_conn()  # type: ignore[misc]
+        refused = self.callback_policy.address_refused(sock.getpeername()[0])
+        if refused:
+            sock.close()
+            raise NewConnectionError(self, f"Callback connection refused: {refused}")
+        return sock
+
+
+class _PolicyAdapter(HTTPAdapter):
+    def __init__(self, policy: CallbackPolicy) -> None:
+        # HTTPAdapter.__init__ builds the pool manager, which needs the policy
+        self.policy = policy
+        super().__init__()
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {"callback_policy": self.policy}
+        http = type("CallbackHTTPConnection", (_PolicyConnection, HTTPConnection), attrs)
+        https = type("CallbackHTTPSConnection", (_PolicyConnection, HTTPSConnection), attrs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("CallbackHTTPConnectionPool", (HTTPConnectionPool,), {"ConnectionCls": http}),
+            "https": type("CallbackHTTPSConnectionPool", (HTTPSConnectionPool,), {"ConnectionCls": https}),
+        }
+
+
+def callback_session(policy: Optional[CallbackPolicy] = None) -> requests.Session:
+    session = requests.Session()
+    if policy is not None and not policy.allow_private:
+        # Through a proxy the checked peer would be the proxy
+        session.trust_env = False
+        adapter = _PolicyAdapter(policy)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    return session
+
+
+def deliver_callback(
+    session: requests.Session,
+    url: str,
+    job: Dict[str, Any],
+    secret: Optional[str] = None,
+    timeout: float = 10.0,
+    attempts: int = 3,
+    policy: Optional[CallbackPolicy] = None,
+) -> Dict[str, Any]:
+    # POSTs the finished job to `url`, signed with HMAC-SHA256 when a secret is
+    # set, retrying with backoff. Returns the job's new callback state.
+    # Redirects are not followed: they could lead past `policy`.
+    refused = policy.check(url) if policy is not None else None
+    if refused:
+        log.warning("Callback for job %s to %s refused: %s", job["id"], url, refused)
+        return {"url": url, "status": "failed", "attempts": 0, "lastError": f"refused: {refused}"}
+    body = json.dumps(job).encode("utf-8")
+    headers = {"Content-Type": "application/json", "X-Zim-Job-Id": job["id"]}
+    if secret:
+        digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        headers["X-Zim-Signature"] = f"sha256={digest}"
+    error = None
+    for attempt in range(1, max(1, attempts) + 1):
+        try:
+            response = session.post(url, data=body, headers=headers, timeout=timeout, allow_redirects=False)
+            if response.status_code < 300:
+                error = None
+                break
+            error = f"HTTP {response.status_code}"
+        except requests.RequestException as exc:
+            error = f"{exc.__class__.__name__}: {exc}"
+        if attempt < attempts:
+            time.sleep(2.0 ** attempt)
+    if error:
+        log.warning("Callback for job %s to %s failed: %s", job["id"], url, error)
+    return {"url": url, "status": "failed" if error else "delivered", "attempts": attempt, "lastError": error}
+
+
+class Job:
+    __slots__ = (
+        "id",
+        "identifier",
+        "ref_type",
+        "options",
+        "callback_url",
+        "idempotency_key",
+        "status",
+        "created_at",
+        "started_at",
+        "finished_at",
+        "expires_at",
+        "result",
+        "error",
+        "error_status",
+        "callback",
+    )
+
+    def __init__(
+        self,
+        identifier: str,
+        ref_type: str,
+        options: Dict[str, Any],
+        callback_url: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.identifier = identifier
+        self.ref_type = ref_type
+        self.options = options
+        self.callback_url = callback_url
+        self.idempotency_key = idempotency_key
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.expires_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.error_status: Optional[int] = None
+        self.callback: Optional[Dict[str, Any]] = (
+            {"url": callback_url, "status": "pending", "attempts": 0, "lastError": None} if callback_url else None
+        )
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "id": self.id,
+            "status": self.status,
+            "identifier": self.identifier,
+            "refType": self.ref_type,
+            "createdAt": iso_time(self.created_at),
+            "startedAt": iso_time(self.started_at),
+            "finishedAt": iso_time(self.finished_at),
+            "expiresAt": iso_time(self.expires_at),
+        }
+        if self.error is not None:
+            body["error"] = {"message": self.error, "status": self.error_status}
+        if include_result and self.result is not None:
+            body["result"] = self.result
+        if self.callback is not None:
+            body["callback"] = dict(self.callback)
+        return body
+
+
+# Job records visible to every worker process: one JSON document per job,
+# rewritten on each state change, so a poll answered by another gunicorn
+# worker than the one running the job still sees it. insert() is what makes
+# an idempotency key single-use across processes: the unique index turns a
+# second submit into sqlite3.IntegrityError.
+class SharedJobRecords:
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock up front, so the statements inside
+        # see no other process's writes in between
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _insert_record(self, conn: sqlite3.Connection, job: Job) -> None:
+        # An expired job keeps its key until purged; it no longer holds it
+        if job.idempotency_key:
+            conn.execute(
+                "DELETE FROM jobs WHERE idempotency_key = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                (job.idempotency_key, time.time()),
+            )
+        conn.execute(
+            "INSERT INTO jobs (id, idempotency_key, status, body, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (job.id, job.idempotency_key, job.status, json.dumps(job.to_dict()), job.expires_at),
+        )
+
+    def insert(self, job: Job) -> None:
+        # Raises sqlite3.IntegrityError when the idempotency key is taken
+        with self._transaction() as conn:
+            self._insert_record(conn, job)
+
+    def save(self, job: Job) -> None:
+        # State changes of a job insert() already stored
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, body = ?, expires_at = ? WHERE id = ?",
+                (job.status, json.dumps(job.to_dict()), job.expires_at, job.id),
+            )
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)", (job_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_idempotent(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM jobs WHERE idempotency_key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge(self, now: float) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Asynchronous tracking jobs. submit() returns immediately; `workers` threads
+# take jobs off a bounded queue (full means JobQueueFull, i.e. backpressure)
+# and run them through `runner`. Finished jobs stay readable for `retention`
+# seconds. A job with a callback URL is POSTed to it once finished, signed with
+# `callback_secret` when one is set, retrying with backoff on failure.
+class JobQueue:
+    def __init__(
+        self,
+        runner: Callable[[Job], Dict[str, Any]],
+        workers: int = 4,
+        max_queue: int = 1000,
+        retention: float = 3600.0,
+        records: Optional[SharedJobRecords] = None,
+        callback_timeout: float = 10.0,
+        callback_attempts: int = 3,
+        callback_secret: Optional[str] = None,
+        callback_policy: Optional[CallbackPolicy] = None,
+    ) -> None:
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.retention = retention
+        self.records = records
+        self.callback_timeout = callback_timeout
+        self.callback_attempts = max(1, callback_attempts)
+        self.callback_secret = callback_secret
+        self.callback_policy = callback_policy
+
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        # Finished jobs in expiry order
+        self._expiry: Deque[Job] = deque()
+        self._threads: List[threading.Thread] = []
+        self._running = 0
+        self._next_purge = 0.0
+        self._callbacks = ThreadPoolExecutor(max_workers=2, thread_name_prefix="job-callback")
+        self._session = callback_session(callback_policy)
+        self._stats: Dict[str, int] = {
+            "submitted": 0,
+            "rejected": 0,
+            "deduplicated": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "callbacksDelivered": 0,
+            "callbacksFailed": 0,
+        }
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self) -> None:
+        # Queued jobs are abandoned; running ones finish on their own
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        self._callbacks.shutdown(wait=False)
+
+    # Submit / look up
+
+    def submit(
+        self,
+        identifier: str,
+        ref_type: str,
+        options: Optional[Dict[str, Any]] = None,
+        callback_url: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        # Returns (job, created); a repeated idempotency key returns the
+        # original job instead of queueing another scrape
+        self.start()
+        self._purge()
+        if idempotency_key:
+            existing = self._find_idempotent(idempotency_key)
+            if existing is not None:
+                with self._lock:
+                    self._stats["deduplicated"] += 1
+                return existing, False
+
+        job = Job(identifier, ref_type, options or {}, callback_url, idempotency_key)
+        with self._lock:
+            # Only submitters add to the queue and they hold the lock, so a
+            # queue that is not full now still has room below. The queued
+            # record is written before a worker can overwrite it with running.
+            # Holding the lock also settles a key raced by two threads here;
+            # the record's unique key settles one raced by another process.
+            if idempotency_key and self._by_key.get(idempotency_key) in self._jobs:
+                self._stats["deduplicated"] += 1
+                return self._jobs[self._by_key[idempotency_key]].to_dict(), False
+            if self._queue.full():
+                self._stats["rejected"] += 1
+                raise JobQueueFull(f"Job queue is full ({self._queue.maxsize} waiting); try again shortly.")
+            if self.records is not None:
+                try:
+                    self.records.insert(job)
+                except sqlite3.IntegrityError:
+                    existing = self.records.find_idempotent(idempotency_key) if idempotency_key else None
+                    if existing is None:
+                        raise
+                    self._stats["deduplicated"] += 1
+                    return existing, False
+                except sqlite3.Error:
+                    log.exception("Could not store job %s", job.id)
+            self._jobs[job.id] = job
+            if idempotency_key:
+                self._by_key[idempotency_key] = job.id
+            self._stats["submitted"] += 1
+            self._queue.put_nowait(job)
+        return job.to_dict(), True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._purge()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        return self.records.load(job_id) if self.records is not None else None
+
+    def _find_idempotent(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job_id = self._by_key.get(key)
+            job = self._jobs.get(job_id) if job_id else None
+            if job is not None:
+                return job.to_dict()
+        return self.records.find_idempotent(key) if self.records is not None else None
+
+    # Execution
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._running += 1
+            self._save(job)
+            try:
+                result = self.runner(job)
+                outcome: Tuple[str, Any, Optional[int]] = (SUCCEEDED, result, None)
+            except JobError as exc:
+                outcome = (FAILED, str(exc), exc.status)
+            except Exception as exc:
+                log.exception("Job %s for %s failed", job.id, job.identifier)
+                outcome = (FAILED, f"{exc.__class__.__name__}: {exc}", 500)
+            self._finish(job, *outcome)
+
+    def _finish(self, job: Job, status: str, value: Any, error_status: Optional[int]) -> None:
+        now = time.time()
+        with self._lock:
+            job.status = status
+            job.finished_at = now
+            job.expires_at = now + self.retention
+            if status == SUCCEEDED:
+                job.result = value
+            else:
+                job.error, job.error_status = value, error_status
+            self._running -= 1
+            self._stats[status] += 1
+            self._expiry.append(job)
+        self._save(job)
+        if job.callback_url:
+            try:
+                self._callbacks.submit(self._deliver, job)
+            except RuntimeError:
+                pass
+
+    def _deliver(self, job: Job) -> None:
+        callback = deliver_callback(
+            self._session,
+            job.callback_url,
+            job.to_dict(),
+            self.callback_secret,
+            self.callback_timeout,
+            self.callback_attempts,
+            self.callback_policy,
+        )
+        with self._lock:
+            job.callback.update(callback)
+            self._stats["callbacksFailed" if callback["lastError"] else "callbacksDelivered"] += 1
+        self._save(job)
+
+    # Bookkeeping
+
+    def _save(self, job: Job) -> None:
+        if self.records is None:
+            return
+        try:
+            self.records.save(job)
+        except sqlite3.Error:
+            log.exception("Could not store job %s", job.id)
+
+    def _purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            while self._expiry and self._expiry[0].expires_at <= now:
+                job = self._expiry.popleft()
+                self._jobs.pop(job.id, None)
+                if job.idempotency_key and self._by_key.get(job.idempotency_key) == job.id:
+                    del self._by_key[job.idempotency_key]
+            # Expired shared records are only read-filtered, so deleting them
+            # now and then is enough
+            if now < self._next_purge:
+                return
+            self._next_purge = now + min(60.0, max(1.0, self.retention / 10))
+        if self.records is not None:
+            try:
+                self.records.purge(now)
+            except sqlite3.Error:
+                log.exception("Could not purge expired jobs")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "maxQueue": self._queue.maxsize,
+                "queued": self._queue.qsize(),
+                "running": self._running,
+                "retained": len(self._jobs),
+                "retentionSeconds": self.retention,
+                **self._stats,
+            }
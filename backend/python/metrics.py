@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from deadline import Deadline
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COMMAND_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Fields of the JSON stats sections that only ever grow; they are exported as
+# counters (<name>_total). Every other numeric field is a gauge.
+COUNTER_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "pool": ("checkouts", "timeouts", "created", "launchFailures", "evictedIdle", "recycled", "discarded"),
+    "browsers": (
+        "launched",
+        "quit",
+        "recycledUses",
+        "recycledRss",
+        "recycledMemoryCap",
+        "killedLeftover",
+        "orphansKilled",
+        "profilesRemoved",
+    ),
+    "tabs": ("tabsOpened", "tabsClosed", "isolatedContexts", "sharedContexts", "browsersLaunched", "browsersRetired"),
+    "cache": ("hits", "staleHits", "misses", "bypasses", "evictions", "refreshes", "refreshFailures"),
+    "coalescing": ("leaders", "coalesced", "errors", "waitsTimedOut"),
+    "admission": ("admitted", "queued", "rejectedQueueFull", "rejectedTimeout", "slotsReclaimed"),
+    "upstream": (
+        "increases",
+        "decreases",
+        "breakerOpened",
+        "breakerClosed",
+        "shortCircuited",
+        "rateLimited",
+        "concurrencyLimited",
+        "retries",
+        "staleServed",
+    ),
+    "jobs": ("submitted", "rejected", "deduplicated", "succeeded", "failed", "callbacksDelivered", "callbacksFailed"),
+    "fast_path": ("lookups", "served", "fallbacks", "captures", "rejectedCaptures", "invalidations"),
+}
+
+
+def instrument_commands(driver) -> None:
+    # Every WebDriver call, element lookups included, goes through
+    # driver.execute; count them on the driver so a borrower can diff
+    execute = driver.execute
+    driver.webdriver_commands = 0
+
+    def counted(driver_command, params=None):
+        driver.webdriver_commands += 1
+        return execute(driver_command, params)
+
+    driver.execute = counted
+
+
+def command_count(driver) -> int:
+    return getattr(driver, "webdriver_commands", 0)
+
+
+def snake_case(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(round(float(value), 6))
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Iterable[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def lines(self, name: str, labels: Tuple[Tuple[str, str], ...]) -> List[str]:
+        lines: List[str] = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', format_value(bound)),))} {cumulative}")
+        lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {self.count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {format_value(self.total)}")
+        lines.append(f"{name}_count{format_labels(labels)} {self.count}")
+        return lines
+
+
+# Per-request scrape instrumentation rendered in the Prometheus text format:
+# latency histograms per stage, WebDriver commands per scrape, the detected
+# page variant, and outcomes with the stage a failure happened in.
+class ScrapeMetrics:
+    def __init__(self, prefix: str = "zim") -> None:
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Histogram] = {}
+        self._commands = Histogram(COMMAND_BUCKETS)
+        self._variants: Dict[str, int] = {}
+        self._outcomes: Dict[str, int] = {}
+        self._failures: Dict[Tuple[str, str], int] = {}
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def record(self, deadline: Deadline, error: Optional[BaseException] = None) -> None:
+        for stage, seconds in deadline.timings().items():
+            self.observe_stage(stage, seconds)
+        with self._lock:
+            commands = deadline.details.get("webdriverCommands")
+            if commands is not None:
+                self._commands.observe(commands)
+            variant = deadline.details.get("variant")
+            if variant:
+                self._variants[variant] = self._variants.get(variant, 0) + 1
+            outcome = "success" if error is None else "failure"
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+            if error is not None:
+                key = (deadline.failed_stage or deadline.current_stage, error.__class__.__name__)
+                self._failures[key] = self._failures.get(key, 0) + 1
+
+    def render(self, sections: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        p = self.prefix
+        lines: List[str] = []
+        with self._lock:
+            lines.append(f"# HELP {p}_stage_duration_seconds Time spent in each tracking stage.")
+            lines.append(f"# TYPE {p}_stage_duration_seconds histogram")
+            for stage, histogram in sorted(self._stages.items()):
+                lines.extend(histogram.lines(f"{p}_stage_duration_seconds", (("stage", stage),)))
+
+            lines.append(f"# HELP {p}_webdriver_commands WebDriver commands issued per browser scrape.")
+            lines.append(f"# TYPE {p}_webdriver_commands histogram")
+            lines.extend(self._commands.lines(f"{p}_webdriver_commands", ()))
+
+            lines.append(f"# HELP {p}_variant_total Result page variants detected.")
+            lines.append(f"# TYPE {p}_variant_total counter")
+            for variant, count in sorted(self._variants.items()):
+                lines.append(f"{p}_variant_total{format_labels((('variant', variant),))} {count}")
+
+            lines.append(f"# HELP {p}_scrapes_total Tracking scrapes by outcome.")
+            lines.append(f"# TYPE {p}_scrapes_total counter")
+            for outcome, count in sorted(self._outcomes.items()):
+                lines.append(f"{p}_scrapes_total{format_labels((('outcome', outcome),))} {count}")
+
+            lines.append(f"# HELP {p}_scrape_failures_total Failed scrapes by the stage they failed in.")
+            lines.append(f"# TYPE {p}_scrape_failures_total counter")
+            for (stage, reason), count in sorted(self._failures.items()):
+                lines.append(f"{p}_scrape_failures_total{format_labels((('stage', stage), ('reason', reason)))} {count}")
+
+        # Numeric fields of the JSON stats sections become counters or gauges
+        for section, stats in (sections or {}).items():
+            counters = COUNTER_FIELDS.get(section, ())
+            for key, value in (stats or {}).items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{p}_{snake_case(section)}_{snake_case(key)}"
+                if key in counters:
+                    lines.append(f"# TYPE {name}_total counter")
+                    lines.append(f"{name}_total {format_value(value)}")
+                else:
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import bisect
+import csv
+import os
+import re
+import threading
+import time
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "port_locations.csv")
+
+# Country spellings seen on the tracking site (and their common variants),
+# keyed by the ISO code that prefixes every UN/LOCODE
+COUNTRY_NAMES: Dict[str, Tuple[str, ...]] = {
+    "AE": ("UNITED ARAB EMIRATES", "UAE", "U.A.E."),
+    "AO": ("ANGOLA",),
+    "AR": ("ARGENTINA",),
+    "AU": ("AUSTRALIA",),
+    "BD": ("BANGLADESH",),
+    "BE": ("BELGIUM",),
+    "BG": ("BULGARIA",),
+    "BH": ("BAHRAIN",),
+    "BJ": ("BENIN",),
+    "BR": ("BRAZIL", "BRASIL"),
+    "BS": ("BAHAMAS", "BAHAMAS, THE"),
+    "CA": ("CANADA",),
+    "CI": ("COTE D'IVOIRE", "IVORY COAST"),
+    "CL": ("CHILE",),
+    "CM": ("CAMEROON",),
+    "CN": ("CHINA", "CHINA. PEOPLE'S REPUBLIC", "CHINA, PEOPLE'S REPUBLIC", "PEOPLE'S REPUBLIC OF CHINA", "CHINA P.R."),
+    "CO": ("COLOMBIA",),
+    "CR": ("COSTA RICA",),
+    "CU": ("CUBA",),
+    "CW": ("CURACAO",),
+    "CY": ("CYPRUS",),
+    "DE": ("GERMANY",),
+    "DJ": ("DJIBOUTI",),
+    "DK": ("DENMARK",),
+    "DO": ("DOMINICAN REPUBLIC",),
+    "DZ": ("ALGERIA",),
+    "EC": ("ECUADOR",),
+    "EE": ("ESTONIA",),
+    "EG": ("EGYPT",),
+    "ES": ("SPAIN",),
+    "FI": ("FINLAND",),
+    "FJ": ("FIJI",),
+    "FR": ("FRANCE",),
+    "GB": ("UNITED KINGDOM", "GREAT BRITAIN", "U.K.", "ENGLAND"),
+    "GE": ("GEORGIA",),
+    "GH": ("GHANA",),
+    "GR": ("GREECE",),
+    "GT": ("GUATEMALA",),
+    "HK": ("HONG KONG", "HONG KONG SAR", "HONG KONG, CHINA"),
+    "HN": ("HONDURAS",),
+    "HR": ("CROATIA",),
+    "HT": ("HAITI",),
+    "ID": ("INDONESIA",),
+    "IE": ("IRELAND",),
+    "IL": ("ISRAEL",),
+    "IN": ("INDIA",),
+    "IQ": ("IRAQ",),
+    "IR": ("IRAN", "IRAN, ISLAMIC REPUBLIC OF"),
+    "IT": ("ITALY",),
+    "JM": ("JAMAICA",),
+    "JO": ("JORDAN",),
+    "JP": ("JAPAN",),
+    "KE": ("KENYA",),
+    "KH": ("CAMBODIA",),
+    "KR": ("KOREA", "KOREA, REPUBLIC OF", "SOUTH KOREA", "REPUBLIC OF KOREA"),
+    "KW": ("KUWAIT",),
+    "LB": ("LEBANON",),
+    "LK": ("SRI LANKA",),
+    "LT": ("LITHUANIA",),
+    "LV": ("LATVIA",),
+    "MA": ("MOROCCO",),
+    "MM": ("MYANMAR", "BURMA"),
+    "MT": ("MALTA",),
+    "MU": ("MAURITIUS",),
+    "MX": ("MEXICO",),
+    "MY": ("MALAYSIA",),
+    "MZ": ("MOZAMBIQUE",),
+    "NG": ("NIGERIA",),
+    "NL": ("NETHERLANDS", "THE NETHERLANDS", "HOLLAND"),
+    "NO": ("NORWAY",),
+    "NZ": ("NEW ZEALAND",),
+    "OM": ("OMAN",),
+    "PA": ("PANAMA",),
+    "PE": ("PERU",),
+    "PG": ("PAPUA NEW GUINEA",),
+    "PH": ("PHILIPPINES",),
+    "PK": ("PAKISTAN",),
+    "PL": ("POLAND",),
+    "PR": ("PUERTO RICO",),
+    "PT": ("PORTUGAL",),
+    "QA": ("QATAR",),
+    "RO": ("ROMANIA",),
+    "RU": ("RUSSIA", "RUSSIAN FEDERATION"),
+    "SA": ("SAUDI ARABIA",),
+    "SD": ("SUDAN",),
+    "SE": ("SWEDEN",),
+    "SG": ("SINGAPORE",),
+    "SI": ("SLOVENIA",),
+    "SN": ("SENEGAL",),
+    "SY": ("SYRIA", "SYRIAN ARAB REPUBLIC"),
+    "TG": ("TOGO",),
+    "TH": ("THAILAND",),
+    "TN": ("TUNISIA",),
+    "TR": ("TURKEY", "TURKIYE"),
+    "TT": ("TRINIDAD AND TOBAGO", "TRINIDAD & TOBAGO"),
+    "TW": ("TAIWAN", "TAIWAN, PROVINCE OF CHINA", "TAIWAN, CHINA"),
+    "TZ": ("TANZANIA", "TANZANIA, UNITED REPUBLIC OF"),
+    "UA": ("UKRAINE",),
+    "US": ("UNITED STATES", "UNITED STATES OF AMERICA", "USA", "U.S.A."),
+    "UY": ("URUGUAY",),
+    "VE": ("VENEZUELA",),
+    "VN": ("VIETNAM", "VIET NAM"),
+    "ZA": ("SOUTH AFRICA",),
+}
+
+# Shortest key a prefix or word-truncated match may be made from. Without a
+# recognised country to check it against, a partial match must also end on a
+# word boundary and name a single port ("LA" is no port, "NHAVA" is).
+MIN_PARTIAL = 3
+MIN_PARTIAL_UNQUALIFIED = 4
+
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+
+
+def normalize(name: str) -> str:
+    # "SHANGHAI (SH)" -> "SHANGHAI", "CHINA. PEOPLE'S REPUBLIC" -> "CHINA PEOPLE S REPUBLIC"
+    name = _PARENTHETICAL.sub(" ", (name or "").upper().replace("&", " AND "))
+    return " ".join(_NON_ALNUM.sub(" ", name).split())
+
+
+class PortMatch(NamedTuple):
+    unlocode: str
+    latitude: float
+    longitude: float
+    # The location text split at the country that was recognised, in the
+    # site's own spelling (None when no country was recognised)
+    city: Optional[str]
+    country: Optional[str]
+
+
+# Offline index of ports keyed by normalised name and alias. Ports live in
+# parallel arrays; names map to port positions, and a sorted name list serves
+# prefix lookups ("NHAVA" -> "NHAVA SHEVA").
+class PortIndex:
+    def __init__(self, rows: List[Tuple[str, str, float, float, List[str]]]) -> None:
+        self.codes: List[str] = []
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+        self._by_name: Dict[str, List[int]] = {}
+        for code, name, latitude, longitude, aliases in rows:
+            position = len(self.codes)
+            self.codes.append(code)
+            self.latitudes.append(latitude)
+            self.longitudes.append(longitude)
+            for alias in [name, *aliases]:
+                key = normalize(alias)
+                if key and position not in self._by_name.setdefault(key, []):
+                    self._by_name[key].append(position)
+        self._names = sorted(self._by_name)
+        self._countries: Dict[str, str] = {
+            normalize(spelling): iso for iso, spellings in COUNTRY_NAMES.items() for spelling in spellings
+        }
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> "PortIndex":
+        rows: List[Tuple[str, str, float, float, List[str]]] = []
+        with open(path, newline="", encoding="utf-8") as fh:
+            for record in csv.DictReader(fh):
+                aliases = [a for a in (record.get("aliases") or "").split("|") if a]
+                rows.append(
+                    (record["unlocode"], record["name"], float(record["latitude"]), float(record["longitude"]), aliases)
+                )
+        return cls(rows)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def split_country(self, location: str) -> Tuple[List[str], Optional[str], Optional[str]]:
+        # Returns (leading parts, ISO code, country text). The country may
+        # itself contain a comma ("KOREA, REPUBLIC OF"), so the longest
+        # recognised tail wins.
+        parts = [p.strip() for p in location.split(",") if p.strip()]
+        for size in (3, 2, 1):
+            if len(parts) <= size:
+                continue
+            tail = ", ".join(parts[-size:])
+            iso = self._countries.get(normalize(tail))
+            if iso:
+                return parts[:-size], iso, tail
+        return parts, None, None
+
+    def _candidates(self, key: str, qualified: bool) -> List[int]:
+        # `qualified`: a country was recognised and will filter the result
+        found = self._by_name.get(key)
+        if found:
+            return found
+        minimum = MIN_PARTIAL if qualified else MIN_PARTIAL_UNQUALIFIED
+        if len(key) < minimum:
+            return []
+        # Index names the key is a prefix of
+        prefix = key if qualified else key + " "
+        start = bisect.bisect_left(self._names, prefix)
+        positions: List[int] = []
+        for name in self._names[start:]:
+            if not name.startswith(prefix):
+                break
+            positions.extend(self._by_name[name])
+        if positions and (qualified or len(set(positions)) == 1):
+            return positions
+        # Drop trailing words ("PORT KLANG WESTPORTS" -> "PORT KLANG")
+        words = key.split()
+        while len(words) > 1:
+            words.pop()
+            truncated = " ".join(words)
+            if len(truncated) < minimum:
+                break
+            found = self._by_name.get(truncated)
+            if found:
+                return found
+        return []
+
+    def resolve(self, location: str) -> Optional[PortMatch]:
+        head, iso, country_text = self.split_country(location or "")
+        if not head:
+            return None
+        key = normalize(head[0])
+        if not key:
+            return None
+        positions = self._candidates(key, iso is not None)
+        if iso:
+            positions = [p for p in positions if self.codes[p][:2] == iso]
+        if not positions:
+            return None
+        position = positions[0]
+        city = ", ".join(head) if country_text else None
+        return PortMatch(
+            self.codes[position], self.latitudes[position], self.longitudes[position], city, country_text
+        )
+
+
+_index: Optional[PortIndex] = None
+_index_lock = threading.Lock()
+_load_seconds = 0.0
+
+
+def load_index(path: str = DEFAULT_PATH) -> PortIndex:
+    global _index, _load_seconds
+    with _index_lock:
+        started = time.perf_counter()
+        _index = PortIndex.load(path)
+        _load_seconds = time.perf_counter() - started
+        lookup_location.cache_clear()
+        return _index
+
+
+@lru_cache(maxsize=8192)
+def lookup_location(location: str) -> Optional[PortMatch]:
+    # Memoised per location string; the same few hundred names repeat across
+    # every timeline
+    if _index is None or not location:
+        return None
+    return _index.resolve(location)
+
+
+def stats() -> Dict[str, Any]:
+    info = lookup_location.cache_info()
+    return {
+        "ports": len(_index) if _index is not None else 0,
+        "loadMs": round(_load_seconds * 1000.0, 2),
+        "lookupHits": info.hits,
+        "lookupMisses": info.misses,
+        "lookupCached": info.currsize,
+    }
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Dict, Iterable, List
+
+# URL patterns for Network.setBlockedURLs per resource type. CDP blocking
+# matches on URL only, so types are approximated by file extension.
+RESOURCE_TYPE_PATTERNS: Dict[str, List[str]] = {
+    "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp"],
+    "font": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m3u8"],
+    "stylesheet": ["*.css"],
+}
+
+CONSENT_DOMAINS = ("cookielaw.org", "onetrust.com")
+
+
+def domain_matches(host: str, domain: str) -> bool:
+    host = host.lower().strip(".")
+    domain = domain.lower().strip(".")
+    return host == domain or host.endswith("." + domain)
+
+
+class BlockingProfile:
+    def __init__(
+        self,
+        resource_types: Iterable[str] = (),
+        deny_domains: Iterable[str] = (),
+        allow_domains: Iterable[str] = (),
+    ) -> None:
+        self.resource_types = [t.lower() for t in resource_types if t.lower() in RESOURCE_TYPE_PATTERNS]
+        self.allow_domains = [d.lower() for d in allow_domains if d]
+        # Setting blocked URLs has no exceptions, so a denied domain that
+        # is, contains or sits under an allowed one is dropped outright
+        self.deny_domains = [
+            d.lower()
+            for d in deny_domains
+            if d
+            and not any(domain_matches(d, allowed) or domain_matches(allowed, d) for allowed in self.allow_domains)
+        ]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.resource_types or self.deny_domains)
+
+    @property
+    def blocks_consent(self) -> bool:
+        return any(domain_matches(d, c) for d in self.deny_domains for c in CONSENT_DOMAINS)
+
+    def url_patterns(self) -> List[str]:
+        patterns: List[str] = []
+        for domain in self.deny_domains:
+            patterns.append(f"*://{domain}/*")
+            patterns.append(f"*://*.{domain}/*")
+        for resource_type in self.resource_types:
+            for ext in RESOURCE_TYPE_PATTERNS[resource_type]:
+                patterns.append(ext)
+                patterns.append(f"{ext}?*")
+        return patterns
+
+    def chrome_arguments(self) -> List[str]:
+        # Images without a recognisable extension are caught by Blink itself
+        if "image" in self.resource_types:
+            return ["--blink-settings=imagesEnabled=false"]
+        return []
+
+    def apply(self, driver) -> None:
+        if not self.enabled:
+            return
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.url_patterns()})
+
+
+def read_performance_log(driver) -> List[Dict[str, Any]]:
+    # Drains the CDP performance log and returns the decoded messages
+    # ({"method": ..., "params": ...}) accumulated since the previous read
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return []
+    messages: List[Dict[str, Any]] = []
+    for entry in entries:
+        try:
+            messages.append(json.loads(entry["message"])["message"])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return messages
+
+
+def summarize_network(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Bytes are only known for requests that loaded, so blocked traffic is
+    # reported as a request count per resource type
+    summary: Dict[str, Any] = {
+        "requests": 0,
+        "requestsBlocked": 0,
+        "requestsFailed": 0,
+        "bytesLoaded": 0,
+        "blockedByType": {},
+    }
+    types: Dict[str, str] = {}
+    for message in messages:
+        method = message.get("method")
+        params = message.get("params") or {}
+        if method == "Network.requestWillBeSent":
+            summary["requests"] += 1
+            types[params.get("requestId")] = (params.get("type") or "Other").lower()
+        elif method == "Network.loadingFinished":
+            summary["bytesLoaded"] += int(params.get("encodedDataLength") or 0)
+        elif method == "Network.loadingFailed":
+            if params.get("blockedReason"):
+                summary["requestsBlocked"] += 1
+                resource_type = types.get(params.get("requestId")) or (params.get("type") or "other").lower()
+                by_type = summary["blockedByType"]
+                by_type[resource_type] = by_type.get(resource_type, 0) + 1
+            else:
+                summary["requestsFailed"] += 1
+    return summary
+
+
+class NetworkStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Any] = {
+            "scrapes": 0,
+            "requests": 0,
+            "requestsBlocked": 0,
+            "requestsFailed": 0,
+            "bytesLoaded": 0,
+            "blockedByType": {},
+        }
+        self._last: Dict[str, Any] = {}
+
+    def record(self, summary: Dict[str, Any]) -> None:
+        with self._lock:
+            self._totals["scrapes"] += 1
+            for key in ("requests", "requestsBlocked", "requestsFailed", "bytesLoaded"):
+                self._totals[key] += summary.get(key, 0)
+            for resource_type, count in (summary.get("blockedByType") or {}).items():
+                by_type = self._totals["blockedByType"]
+                by_type[resource_type] = by_type.get(resource_type, 0) + count
+            self._last = summary
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._totals, "blockedByType": dict(self._totals["blockedByType"]), "lastScrape": dict(self._last)}
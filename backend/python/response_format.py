@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compact response mode (?compact=1). The default schema spells out every
+# field, most of them null, and repeats the B/L routes in every container.
+# Compact mode drops null fields and moves routes shared by several containers
+# into a top-level `sharedRoutes` list that containers point at via `routesRef`.
+
+
+def prune_nulls(value: Any) -> Any:
+    # Objects left empty (e.g. a vesselInfo that was all nulls) go too
+    if isinstance(value, dict):
+        pruned = {}
+        for k, v in value.items():
+            if v is None:
+                continue
+            v = prune_nulls(v)
+            if isinstance(v, dict) and not v:
+                continue
+            pruned[k] = v
+        return pruned
+    if isinstance(value, list):
+        return [prune_nulls(v) for v in value]
+    return value
+
+
+def share_routes(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Returns a copy; the input may be a cached payload shared with other requests
+    containers = payload.get("containers")
+    if not isinstance(containers, list) or len(containers) < 2:
+        return payload
+    shared: List[Any] = []
+    index_by_json: Dict[str, int] = {}
+    counts: Dict[str, int] = {}
+    keyed = []
+    for container in containers:
+        routes = container.get("routes") if isinstance(container, dict) else None
+        key = json.dumps(routes, sort_keys=True) if routes else None
+        keyed.append((container, key))
+        if key is not None:
+            counts[key] = counts.get(key, 0) + 1
+
+    compacted = []
+    for container, key in keyed:
+        if key is None or counts[key] < 2:
+            compacted.append(container)
+            continue
+        if key not in index_by_json:
+            index_by_json[key] = len(shared)
+            shared.append(container["routes"])
+        copy = {k: v for k, v in container.items() if k != "routes"}
+        copy["routesRef"] = index_by_json[key]
+        compacted.append(copy)
+
+    if not shared:
+        return payload
+    return {**payload, "containers": compacted, "sharedRoutes": shared}
+
+
+def compact_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return prune_nulls(share_routes(payload))
+
+
+def dumps(value: Any, compact: bool = False) -> bytes:
+    # The full schema keeps json.dumps output byte for byte; compact output
+    # uses orjson when it is installed (several times faster) and never pads
+    # separators
+    if not compact:
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def body_etag(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Compressed variants carry a "-gzip"/"-br" suffix; any variant of the
+    # same body counts as a match
+    for tag in (if_none_match or "").split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    encodings: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    # Brotli when the client takes it and the module is installed, else gzip
+    encodings = accepted_encodings(accept_encoding)
+    if brotli is not None and encodings.get("br", 0) > 0:
+        return brotli.compress(body, quality=5), "br"
+    if encodings.get("gzip", 0) > 0 or encodings.get("*", 0) > 0:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
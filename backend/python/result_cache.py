@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from tracking_model import TrackingResult
+
+log = logging.getLogger(__name__)
+
+HIT = "HIT"
+STALE = "STALE"
+MISS = "MISS"
+BYPASS = "BYPASS"
+
+
+def normalize_identifier(identifier: str) -> str:
+    return "".join((identifier or "").split()).upper()
+
+
+def cache_key(identifier: str, ref_type: str) -> Tuple[str, str]:
+    return normalize_identifier(identifier), (ref_type or "").strip().lower()
+
+
+class _Entry:
+    __slots__ = ("value", "size", "stored_at")
+
+    def __init__(self, value: Any, size: int, age: float = 0.0) -> None:
+        self.value = value
+        self.size = size
+        self.stored_at = time.monotonic() - age
+
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+
+# TTL + LRU cache for tracking payloads, bounded by entry count and by the
+# size of each payload's JSON encoding. Entries older than `ttl` can still be
+# served for `stale_ttl` more seconds while a background refresh runs
+# (stale-while-revalidate).
+class ResultCache:
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        stale_ttl: float = 1800.0,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        stale_while_revalidate: bool = True,
+        refresh_workers: int = 2,
+    ) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.stale_while_revalidate = stale_while_revalidate
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Any, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._refreshing: Set[Any] = set()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, refresh_workers), thread_name_prefix="cache-refresh")
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "staleHits": 0,
+            "misses": 0,
+            "bypasses": 0,
+            "evictions": 0,
+            "refreshes": 0,
+            "refreshFailures": 0,
+        }
+
+    def get_or_fetch(
+        self,
+        key: Any,
+        fetch: Callable[[], Any],
+        max_age: Optional[float] = None,
+    ) -> Tuple[Any, str, float]:
+        # Returns (value, cache status, age in seconds of the served value)
+        if max_age is not None and max_age <= 0:
+            with self._lock:
+                self._stats["bypasses"] += 1
+            value = fetch()
+            self.put(key, value)
+            return value, BYPASS, 0.0
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = entry.age()
+                fresh_for = self.ttl if max_age is None else min(self.ttl, max_age)
+                if age <= fresh_for:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value, HIT, age
+                # An explicit max-age from the caller never gets stale data
+                if (
+                    max_age is None
+                    and self.stale_while_revalidate
+                    and age <= self.ttl + self.stale_ttl
+                ):
+                    self._entries.move_to_end(key)
+                    self._stats["staleHits"] += 1
+                    self._schedule_refresh(key, fetch)
+                    return entry.value, STALE, age
+            self._stats["misses"] += 1
+
+        value = fetch()
+        self.put(key, value)
+        return value, MISS, 0.0
+
+    def peek(self, key: Any, max_age: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        # (value, age) of a fresh entry, or None; never fetches or serves stale
+        if max_age is not None and max_age <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            age = entry.age()
+            if age > (self.ttl if max_age is None else min(self.ttl, max_age)):
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry.value, age
+
+    def last(self, key: Any) -> Optional[Tuple[Any, float]]:
+        # (value, age) of whatever entry is held, however old; a fallback for
+        # when fetching is impossible
+        with self._lock:
+            entry = self._entries.get(key)
+            return (entry.value, entry.age()) if entry is not None else None
+
+    def put(self, key: Any, value: Any, age: float = 0.0) -> None:
+        # `age`: how old the value already is (fetched elsewhere earlier)
+        # A TrackingResult is sized by its body but does not keep it; the
+        # first response served from the entry builds it
+        if isinstance(value, TrackingResult):
+            size = value.body_size()
+        else:
+            size = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = _Entry(value, size, age)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stats["evictions"] += 1
+
+    def invalidate(self, key: Any) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def _schedule_refresh(self, key: Any, fetch: Callable[[], Any]) -> None:
+        # Caller holds self._lock
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        self._executor.submit(self._refresh, key, fetch)
+
+    def _refresh(self, key: Any, fetch: Callable[[], Any]) -> None:
+        try:
+            value = fetch()
+        except Exception:
+            log.exception("Background refresh failed for %s", key)
+            with self._lock:
+                self._stats["refreshFailures"] += 1
+            return
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+        self.put(key, value)
+        with self._lock:
+            self._stats["refreshes"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["staleHits"] + self._stats["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxEntries": self.max_entries,
+                "maxBytes": self.max_bytes,
+                "ttl": self.ttl,
+                "staleTtl": self.stale_ttl,
+                "refreshing": len(self._refreshing),
+                "hitRatio": round((self._stats["hits"] + self._stats["staleHits"]) / lookups, 4) if lookups else 0.0,
+                **self._stats,
+            }
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import logging
+import signal
+import threading
+
+import settings
+from durable_jobs import DurableJobStore, QueueWorker, RemoteJobStore
+
+# Scrape worker: runs tracking jobs from the durable queue, leaving the Flask
+# front end (ZIM_JOB_BACKEND=durable) to accept and report them. Start as many
+# as the hosts have browsers for; each leases up to ZIM_WORKER_CONCURRENCY jobs
+# at a time, so adding workers adds throughput.
+#
+# Same host as the front end:  python scrape_worker.py  (shares ZIM_JOB_STORE_PATH)
+# Other hosts:  ZIM_QUEUE_URL=http://frontend:8000 ZIM_WORKER_TOKEN=... python scrape_worker.py
+#
+# Results reach the front end through the queue: it serves finished lookups
+# from the job store and keeps the tracking history. A same-host worker
+# records its scrapes in the shared ZIM_STORE_PATH itself; a remote worker
+# keeps no store, since the front end records what it completes.
+#
+# SIGTERM/SIGINT stops leasing and lets running jobs finish (up to
+# ZIM_DRAIN_TIMEOUT); anything still running after that is retried elsewhere
+# once its lease lapses.
+
+log = logging.getLogger("scrape_worker")
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if settings.QUEUE_URL:
+        # A store file on this host would be a history nobody reads
+        settings.STORE_ENABLED = False
+    # Imported here so logging is configured before the service module sets up
+    import zim_tracker_service as service
+
+    if settings.QUEUE_URL:
+        if not settings.WORKER_TOKEN:
+            raise SystemExit("ZIM_QUEUE_URL needs ZIM_WORKER_TOKEN")
+        store = RemoteJobStore(settings.QUEUE_URL, settings.WORKER_TOKEN)
+    elif service.job_store is not None:
+        store = service.job_store
+    else:
+        store = DurableJobStore(
+            settings.JOB_STORE_PATH,
+            visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            retention=settings.JOB_RETENTION,
+        )
+
+    worker = QueueWorker(
+        store,
+        service.run_job,
+        concurrency=settings.WORKER_CONCURRENCY,
+        worker_id=settings.WORKER_ID,
+        heartbeat_interval=settings.WORKER_HEARTBEAT_INTERVAL,
+        poll_interval=settings.WORKER_POLL_INTERVAL,
+        retry_delay=settings.JOB_RETRY_DELAY,
+        callback_timeout=settings.CALLBACK_TIMEOUT,
+        callback_attempts=settings.CALLBACK_ATTEMPTS,
+        callback_secret=settings.CALLBACK_SECRET,
+        callback_policy=service.callback_policy,
+    )
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+
+    service.start_scraping()
+    worker.start()
+    log.info("Worker %s running %d jobs at a time", worker.worker_id, worker.concurrency)
+    # Wake now and then so the signal handlers get to run
+    while not stopping.wait(1.0):
+        pass
+
+    log.info("Stopping worker %s", worker.worker_id)
+    if not worker.stop(settings.DRAIN_TIMEOUT):
+        log.warning("Stopping with jobs still running after %.0fs", settings.DRAIN_TIMEOUT)
+    service.shutdown(settings.DRAIN_TIMEOUT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import List, Optional
+
+
+def env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip()
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(env_str(name) or default)
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(env_str(name) or default)
+    except ValueError:
+        return default
+
+
+def env_list(name: str, default: str = "") -> List[str]:
+    value = env_str(name, default) or ""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = env_str(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+# Point at a local stand-in (see benchmarks/mock_site.py) to scrape fixtures
+TRACK_URL = (env_str("ZIM_TRACK_URL", "https://www.zim.com/tools/track-a-shipment") or "").rstrip("/")
+
+# Driver pool
+POOL_MIN_SIZE = env_int("ZIM_POOL_MIN_SIZE", 1)
+POOL_MAX_SIZE = env_int("ZIM_POOL_MAX_SIZE", 4)
+POOL_IDLE_TIMEOUT = env_float("ZIM_POOL_IDLE_TIMEOUT", 300.0)
+POOL_CHECKOUT_TIMEOUT = env_float("ZIM_POOL_CHECKOUT_TIMEOUT", 30.0)
+POOL_REAP_INTERVAL = env_float("ZIM_POOL_REAP_INTERVAL", 30.0)
+# Lookups one browser serves at once, each in its own tab and browser context;
+# 1 keeps the one-browser-per-lookup model. The pool max size counts browsers.
+BROWSER_TABS = max(1, env_int("ZIM_BROWSER_TABS", 1))
+POOL_SLOTS = POOL_MAX_SIZE * BROWSER_TABS
+
+# Browser lifecycle: recycle a browser after this many scrapes or once its
+# process tree passes the RSS limit; the total cap covers every browser in the
+# process (largest recycled first). 0 disables a limit.
+BROWSER_MAX_USES = env_int("ZIM_BROWSER_MAX_USES", 50)
+BROWSER_MAX_RSS_MB = env_int("ZIM_BROWSER_MAX_RSS_MB", 1024)
+BROWSER_TOTAL_RSS_MB = env_int("ZIM_BROWSER_TOTAL_RSS_MB", BROWSER_MAX_RSS_MB * POOL_MAX_SIZE)
+# Orphaned chrome/chromedriver processes and stale profiles are swept this often
+BROWSER_SWEEP_INTERVAL = env_float("ZIM_BROWSER_SWEEP_INTERVAL", 60.0)
+BROWSER_PROFILE_ROOT = env_str("ZIM_BROWSER_PROFILE_ROOT", tempfile.gettempdir())
+
+# Start-up: patched chromedriver binaries are cached per Chrome version in a
+# directory shared by all workers, and this many browsers are launched and
+# parked before /readyz reports ready (0 = ready as soon as the app imports)
+CHROME_BINARY = env_str("ZIM_CHROME_BINARY")
+DRIVER_CACHE_DIR = env_str(
+    "ZIM_DRIVER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "zim-tracker", "chromedriver")
+)
+WARMUP_BROWSERS = env_int("ZIM_WARMUP_BROWSERS", max(1, POOL_MIN_SIZE))
+WARMUP_RETRY_INTERVAL = env_float("ZIM_WARMUP_RETRY_INTERVAL", 30.0)
+
+# Result cache
+CACHE_ENABLED = env_bool("ZIM_CACHE_ENABLED", True)
+CACHE_TTL = env_float("ZIM_CACHE_TTL", 300.0)
+CACHE_STALE_TTL = env_float("ZIM_CACHE_STALE_TTL", 1800.0)
+CACHE_MAX_ENTRIES = env_int("ZIM_CACHE_MAX_ENTRIES", 1000)
+CACHE_MAX_BYTES = env_int("ZIM_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+CACHE_STALE_WHILE_REVALIDATE = env_bool("ZIM_CACHE_STALE_WHILE_REVALIDATE", True)
+CACHE_REFRESH_WORKERS = env_int("ZIM_CACHE_REFRESH_WORKERS", 2)
+
+# Batch tracking
+BATCH_MAX_ITEMS = env_int("ZIM_BATCH_MAX_ITEMS", 5000)
+BATCH_CONCURRENCY = env_int("ZIM_BATCH_CONCURRENCY", POOL_SLOTS)
+
+# Result page extraction: "webdriver" walks elements one command at a time,
+# "script" collects everything with one injected script, "html" parses the
+# captured page source off-browser, "compare" runs webdriver and script
+EXTRACTION_MODE = (env_str("ZIM_EXTRACTION_MODE", "webdriver") or "webdriver").lower()
+
+# Page-source parser workers ("thread" or "process")
+PARSE_EXECUTOR = (env_str("ZIM_PARSE_EXECUTOR", "thread") or "thread").lower()
+PARSE_WORKERS = env_int("ZIM_PARSE_WORKERS", 2)
+
+# Resource blocking during tracking page loads
+BLOCK_RESOURCES = env_bool("ZIM_BLOCK_RESOURCES", True)
+BLOCK_RESOURCE_TYPES = env_list("ZIM_BLOCK_RESOURCE_TYPES", "image,font,media")
+BLOCK_DOMAINS = env_list(
+    "ZIM_BLOCK_DOMAINS",
+    "googletagmanager.com,google-analytics.com,analytics.google.com,doubleclick.net,"
+    "googleadservices.com,googlesyndication.com,facebook.net,facebook.com,hotjar.com,"
+    "clarity.ms,linkedin.com,licdn.com,bing.com,cookielaw.org,onetrust.com,"
+    "youtube.com,ytimg.com,vimeo.com",
+)
+ALLOW_DOMAINS = env_list("ZIM_ALLOW_DOMAINS", "zim.com")
+
+# Total time budget for one tracking request (?timeout= may lower it, up to the max)
+REQUEST_TIMEOUT = env_float("ZIM_REQUEST_TIMEOUT", 90.0)
+MAX_REQUEST_TIMEOUT = env_float("ZIM_MAX_REQUEST_TIMEOUT", 180.0)
+
+# Upstream health (per worker process): scrape starts per second (0 = no limit)
+# and burst, the adaptive concurrency range with the results latency above
+# which it backs off, the circuit breaker (failure share over a window, how
+# long it stays open), and jittered retries of page loads / results waits
+UPSTREAM_RATE = env_float("ZIM_UPSTREAM_RATE", 2.0)
+UPSTREAM_BURST = env_int("ZIM_UPSTREAM_BURST", POOL_SLOTS)
+UPSTREAM_MIN_CONCURRENCY = env_int("ZIM_UPSTREAM_MIN_CONCURRENCY", 1)
+UPSTREAM_MAX_CONCURRENCY = env_int("ZIM_UPSTREAM_MAX_CONCURRENCY", POOL_SLOTS)
+UPSTREAM_TARGET_LATENCY = env_float("ZIM_UPSTREAM_TARGET_LATENCY", 10.0)
+UPSTREAM_WAIT_TIMEOUT = env_float("ZIM_UPSTREAM_WAIT_TIMEOUT", 30.0)
+BREAKER_FAILURE_RATIO = env_float("ZIM_BREAKER_FAILURE_RATIO", 0.5)
+BREAKER_MIN_REQUESTS = env_int("ZIM_BREAKER_MIN_REQUESTS", 5)
+BREAKER_WINDOW = env_float("ZIM_BREAKER_WINDOW", 60.0)
+BREAKER_OPEN_SECONDS = env_float("ZIM_BREAKER_OPEN_SECONDS", 30.0)
+UPSTREAM_RETRIES = env_int("ZIM_UPSTREAM_RETRIES", 2)
+UPSTREAM_RETRY_BASE = env_float("ZIM_UPSTREAM_RETRY_BASE", 1.0)
+
+# Direct JSON fast path replaying the tracking XHR captured from a warm browser.
+# Off by default: a captured request is only used once its JSON maps to the
+# same payload the page showed, but the mapping is still a heuristic.
+FAST_PATH_ENABLED = env_bool("ZIM_FAST_PATH_ENABLED", False)
+FAST_PATH_SESSION_TTL = env_float("ZIM_FAST_PATH_SESSION_TTL", 600.0)
+FAST_PATH_POOL_SIZE = env_int("ZIM_FAST_PATH_POOL_SIZE", 10)
+FAST_PATH_TIMEOUT = env_float("ZIM_FAST_PATH_TIMEOUT", 10.0)
+FAST_PATH_URL_PATTERN = env_str("ZIM_FAST_PATH_URL_PATTERN")
+FAST_PATH_TEMPLATE = env_str("ZIM_FAST_PATH_TEMPLATE")
+
+# Asynchronous jobs (POST /api/zim/jobs): worker threads per process, queued
+# jobs beyond which submissions are refused, and how long finished jobs stay
+# readable. Job records are shared with the other workers through SQLite.
+JOB_WORKERS = env_int("ZIM_JOB_WORKERS", POOL_SLOTS)
+JOB_QUEUE_SIZE = env_int("ZIM_JOB_QUEUE_SIZE", 1000)
+JOB_RETENTION = env_float("ZIM_JOB_RETENTION", 3600.0)
+JOB_STORE_PATH = env_str("ZIM_JOB_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "jobs.sqlite3"))
+# Completion callbacks: per-attempt timeout, attempts, and the HMAC-SHA256 key
+# for the X-Zim-Signature header (unsigned when unset)
+CALLBACK_TIMEOUT = env_float("ZIM_CALLBACK_TIMEOUT", 10.0)
+CALLBACK_ATTEMPTS = env_int("ZIM_CALLBACK_ATTEMPTS", 3)
+CALLBACK_SECRET = env_str("ZIM_CALLBACK_SECRET")
+# Callback destinations: only hosts resolving to public addresses, unless
+# private ones are allowed; a non-empty host list (names, or ".example.com" for
+# subdomains) admits only those hosts
+CALLBACK_ALLOWED_HOSTS = env_list("ZIM_CALLBACK_ALLOWED_HOSTS")
+CALLBACK_ALLOW_PRIVATE = env_bool("ZIM_CALLBACK_ALLOW_PRIVATE", False)
+# Job backend: "memory" runs jobs on the threads above; "durable" only queues
+# them in JOB_STORE_PATH for scrape_worker.py processes, which lease a job for
+# the visibility timeout (extended by heartbeats while it runs) and hand it to
+# another worker when the lease lapses, up to the attempt limit. 503/504
+# failures are retried after the retry delay.
+JOB_BACKEND = env_str("ZIM_JOB_BACKEND", "memory").lower()
+JOB_VISIBILITY_TIMEOUT = env_float("ZIM_JOB_VISIBILITY_TIMEOUT", 60.0)
+JOB_MAX_ATTEMPTS = env_int("ZIM_JOB_MAX_ATTEMPTS", 3)
+JOB_RETRY_DELAY = env_float("ZIM_JOB_RETRY_DELAY", 15.0)
+# Scrape workers: concurrent jobs each, heartbeat / lease-extension interval,
+# idle poll interval, and an id (default host-pid). Workers on other hosts set
+# ZIM_QUEUE_URL to the front end; both sides share ZIM_WORKER_TOKEN, and the
+# front end only serves /api/zim/queue/* when it is set.
+WORKER_CONCURRENCY = env_int("ZIM_WORKER_CONCURRENCY", POOL_SLOTS)
+WORKER_HEARTBEAT_INTERVAL = env_float("ZIM_WORKER_HEARTBEAT_INTERVAL", 10.0)
+WORKER_POLL_INTERVAL = env_float("ZIM_WORKER_POLL_INTERVAL", 1.0)
+WORKER_ID = env_str("ZIM_WORKER_ID")
+QUEUE_URL = env_str("ZIM_QUEUE_URL")
+WORKER_TOKEN = env_str("ZIM_WORKER_TOKEN")
+
+# Persistent tracking store (SQLite) used for incremental event diffs
+STORE_ENABLED = env_bool("ZIM_STORE_ENABLED", True)
+STORE_PATH = env_str("ZIM_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tracking.sqlite3"))
+
+# Offline port/location index used to fill unloCode and coordinates on events
+PORT_INDEX_ENABLED = env_bool("ZIM_PORT_INDEX_ENABLED", True)
+PORT_INDEX_PATH = env_str("ZIM_PORT_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "port_locations.csv"))
+
+# Watchlist refresh scheduler
+WATCHLIST_ENABLED = env_bool("ZIM_WATCHLIST_ENABLED", True)
+WATCHLIST_BUDGET_PER_MINUTE = env_int("ZIM_WATCHLIST_BUDGET_PER_MINUTE", 6)
+WATCHLIST_WORKERS = env_int("ZIM_WATCHLIST_WORKERS", 2)
+# Fixed cron interval the scheduler is compared against for "scrapes saved"
+WATCHLIST_BASELINE_INTERVAL = env_float("ZIM_WATCHLIST_BASELINE_INTERVAL", 900.0)
+
+# Production serving (gunicorn.conf.py): worker processes each own a driver
+# pool; the admission limit caps browser scrapes across all of them
+SERVER_BIND = env_str("ZIM_BIND", "0.0.0.0:8000")
+SERVER_WORKERS = env_int("ZIM_WORKERS", max(1, min(os.cpu_count() or 1, 4)))
+# Threads per worker; extra threads keep cache hits flowing while scrapes wait
+SERVER_THREADS = env_int("ZIM_WORKER_THREADS", POOL_SLOTS * 2)
+ADMISSION_LIMIT = env_int("ZIM_ADMISSION_LIMIT", SERVER_WORKERS * POOL_SLOTS)
+ADMISSION_QUEUE = env_int("ZIM_ADMISSION_QUEUE", ADMISSION_LIMIT * 2)
+ADMISSION_TIMEOUT = env_float("ZIM_ADMISSION_TIMEOUT", 30.0)
+# How long a stopping worker waits for in-flight scrapes before quitting browsers
+DRAIN_TIMEOUT = env_float("ZIM_DRAIN_TIMEOUT", REQUEST_TIMEOUT + 10.0)
+# Restart a worker after this many requests (0 = never). Off by default: a
+# restart throws away the worker's warm browsers, cache and fast path
+WORKER_MAX_REQUESTS = env_int("ZIM_WORKER_MAX_REQUESTS", 0)
+WORKER_MAX_REQUESTS_JITTER = env_int("ZIM_WORKER_MAX_REQUESTS_JITTER", 0)
+
+# Response encoding: gzip/br for JSON bodies of at least this many bytes
+COMPRESSION_ENABLED = env_bool("ZIM_COMPRESSION_ENABLED", True)
+COMPRESS_MIN_BYTES = env_int("ZIM_COMPRESS_MIN_BYTES", 1024)
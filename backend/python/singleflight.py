@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from deadline import DeadlineExceeded
+
+# Stage named in the DeadlineExceeded of a follower that gave up waiting
+WAIT_STAGE = "coalescedWait"
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+# Coalesces concurrent calls for the same key: the first caller runs `fn`,
+# everyone who arrives while it is running waits for and shares its result
+# or its exception. A waiter gives up after its own `timeout` with
+# DeadlineExceeded; the call carries on for the others.
+class SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats: Dict[str, int] = {"leaders": 0, "coalesced": 0, "errors": 0, "waitsTimedOut": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        # Returns (result, shared) where shared is True for coalesced callers
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self._stats["waitsTimedOut"] += 1
+                raise DeadlineExceeded(WAIT_STAGE, timeout or 0.0)
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"inFlight": len(self._calls), **self._stats}
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+def process_age() -> Optional[float]:
+    # Seconds since this process was exec'd (Linux), so interpreter start-up
+    # and imports count towards the cold start
+    try:
+        with open("/proc/self/stat") as fh:
+            # The command name may contain spaces; fields resume after ")"
+            fields = fh.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as fh:
+            uptime = float(fh.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Cold-start bookkeeping behind /readyz: timed start-up phases, whether the
+# service is ready for traffic (a browser is warm) or draining, and the
+# timings of the first tracking request served.
+class StartupTracker:
+    def __init__(self) -> None:
+        age = process_age()
+        self.started = time.monotonic() - (age or 0.0)
+        self._lock = threading.Lock()
+        self._phases: Dict[str, float] = {}
+        self._marks: Dict[str, float] = {}
+        self._details: Dict[str, Any] = {}
+        self._ready = False
+        self._draining = False
+        self._error: Optional[str] = None
+        self._attempts = 0
+        self._first_request: Optional[Dict[str, float]] = None
+
+    def since_start(self) -> float:
+        return time.monotonic() - self.started
+
+    def mark(self, name: str) -> None:
+        with self._lock:
+            self._marks.setdefault(name, round(self.since_start(), 4))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases[name] = round(time.perf_counter() - started, 4)
+
+    def detail(self, name: str, value: Any) -> None:
+        with self._lock:
+            self._details[name] = value
+
+    def attempt_failed(self, exc: BaseException) -> None:
+        with self._lock:
+            self._attempts += 1
+            self._error = f"{exc.__class__.__name__}: {exc}"
+
+    def set_ready(self) -> None:
+        with self._lock:
+            self._ready = True
+            self._error = None
+        self.mark("ready")
+
+    def set_draining(self) -> None:
+        with self._lock:
+            self._draining = True
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return self._ready and not self._draining
+
+    def first_request(self, seconds: float) -> None:
+        with self._lock:
+            if self._first_request is None:
+                self._first_request = {
+                    "atSeconds": round(self.since_start(), 4),
+                    "durationSeconds": round(seconds, 4),
+                }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._draining:
+                status = "draining"
+            elif self._ready:
+                status = "ready"
+            else:
+                status = "warming"
+            return {
+                "status": status,
+                "uptimeSeconds": round(self.since_start(), 3),
+                "marks": dict(self._marks),
+                "phases": dict(self._phases),
+                "failedAttempts": self._attempts,
+                "lastError": self._error,
+                "firstRequest": self._first_request,
+                **self._details,
+            }
@@ -0,0 +1,13 @@
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "benchmarks"))
+
+# Keep the service import free of browsers, background threads and state files
+os.environ.setdefault("ZIM_WARMUP_BROWSERS", "0")
+os.environ.setdefault("ZIM_JOB_STORE_PATH", "")
+os.environ.setdefault("ZIM_STORE_ENABLED", "0")
+os.environ.setdefault("ZIM_WATCHLIST_ENABLED", "0")
+os.environ.setdefault("ZIM_FAST_PATH_ENABLED", "0")
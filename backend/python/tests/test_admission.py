@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+import signal
+import threading
+
+import pytest
+
+from admission import AdmissionControl, AdmissionRejected, AdmissionState
+
+
+def hold_slot_forever(state, ready):
+    control = AdmissionControl(state.limit, state.max_queue, 1.0, state=state)
+    with control.slot():
+        ready.set()
+        threading.Event().wait(60)
+
+
+def test_slot_of_killed_worker_is_reclaimed():
+    ctx = multiprocessing.get_context("fork")
+    state = AdmissionState(1, 2)
+    control = AdmissionControl(1, 2, 0.2, state=state)
+    ready = ctx.Event()
+    worker = ctx.Process(target=hold_slot_forever, args=(state, ready))
+    worker.start()
+    assert ready.wait(10)
+    assert control.stats()["inFlight"] == 1
+
+    os.kill(worker.pid, signal.SIGKILL)
+    worker.join()
+    with pytest.raises(AdmissionRejected):
+        with control.slot():
+            pass
+
+    assert state.reclaim(worker.pid) == 1
+    assert control.stats()["inFlight"] == 0
+    assert control.stats()["slotsReclaimed"] == 1
+    with control.slot():
+        assert control.stats()["inFlight"] == 1
+    assert control.stats()["inFlight"] == 0
+
+
+def test_queue_bound_and_waiting_count():
+    control = AdmissionControl(1, 1, 5.0)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with control.slot():
+            entered.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    assert entered.wait(5)
+    def wait():
+        with control.slot():
+            pass
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    for _ in range(500):
+        if control.stats()["waiting"] == 1:
+            break
+        threading.Event().wait(0.01)
+    assert control.stats()["waiting"] == 1
+
+    with pytest.raises(AdmissionRejected):
+        with control.slot(0.1):
+            pass
+    assert control.stats()["rejectedQueueFull"] == 1
+
+    release.set()
+    holder.join()
+    waiter.join()
+    assert control.stats()["waiting"] == 0
+
+
+def test_reclaim_ignores_other_processes():
+    state = AdmissionState(2, 0)
+    control = AdmissionControl(2, 0, 0.1, state=state)
+    with control.slot():
+        assert state.reclaim(os.getpid() + 100000) == 0
+        assert control.stats()["inFlight"] == 1
+    assert control.stats()["inFlight"] == 0
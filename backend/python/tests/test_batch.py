@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+import settings
+import zim_tracker_service as service
+from tracking_model import TrackingResult
+
+
+class FakeLookups:
+    # Stands in for lookup_tracking: records what ran and how many ran at once
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, identifier, ref_type, max_age=None, extraction=None, timeout=None, fields=None, **kwargs):
+        with self._lock:
+            self.calls.append((identifier, ref_type, max_age, fields))
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.delay)
+            if identifier.startswith("MISSING"):
+                raise service.TrackingNotFound(f"no results for {identifier}")
+            return TrackingResult(identifier, ref_type, "Discharged", None, ()), {}
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    fake = FakeLookups()
+    monkeypatch.setattr(service, "lookup_tracking", fake)
+    return fake
+
+
+def post(body, query=""):
+    return service.app.test_client().post(f"/api/zim/track/batch{query}", json=body)
+
+
+def test_parse_batch_items_accepts_every_shape():
+    body = {
+        "containers": [" ZIMU1234567 "],
+        "bolNums": ["ZIMUSHH30500001"],
+        "items": [{"refNum": "ZIMU7654321", "refType": "BillOfLanding"}, {"container": "ZIMU1111111"}, "ZIMU2222222"],
+    }
+    assert service.parse_batch_items(body) == [
+        ("ZIMU1234567", "Container"),
+        ("ZIMUSHH30500001", "BillOfLanding"),
+        ("ZIMU7654321", "BillOfLanding"),
+        ("ZIMU1111111", "Container"),
+        ("ZIMU2222222", "Container"),
+    ]
+    with pytest.raises(ValueError):
+        service.parse_batch_items(["ZIMU1234567"])
+
+
+def test_results_keep_request_order_and_report_failures_per_item(lookups):
+    response = post({"containers": ["ZIMU1234567", "MISSING1", ""], "bolNums": ["ZIMUSHH30500001"]}, "?maxAge=60")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["total"], body["succeeded"], body["failed"]) == (4, 2, 2)
+    assert [(r["refNum"], r["success"]) for r in body["results"]] == [
+        ("ZIMU1234567", True),
+        ("MISSING1", False),
+        ("", False),
+        ("ZIMUSHH30500001", True),
+    ]
+    assert body["results"][0]["result"]["currentStatus"] == "Discharged"
+    assert body["results"][1]["error"] == "no results for MISSING1"
+    assert body["results"][2]["error"] == "empty identifier"
+    # The empty identifier never reaches a lookup; the others share the query options
+    assert sorted(call[0] for call in lookups.calls) == ["MISSING1", "ZIMU1234567", "ZIMUSHH30500001"]
+    assert {call[2] for call in lookups.calls} == {60.0}
+
+
+def test_concurrency_is_bounded(lookups, monkeypatch):
+    lookups.delay = 0.05
+    monkeypatch.setattr(settings, "BATCH_CONCURRENCY", 3)
+    assert post({"containers": [f"ZIMU{i:07d}" for i in range(12)]}).get_json()["succeeded"] == 12
+    assert 1 < lookups.peak <= 3
+
+    # A batch may ask for less than the configured bound, never more
+    lookups.peak = 0
+    post({"containers": [f"ZIMU{i:07d}" for i in range(6)], "concurrency": 1})
+    assert lookups.peak == 1
+    lookups.peak = 0
+    post({"containers": [f"ZIMU{i:07d}" for i in range(6)], "concurrency": 50})
+    assert lookups.peak <= 3
+
+
+@pytest.mark.parametrize(
+    "body, status",
+    [
+        ([], 400),
+        ({"containers": []}, 400),
+        ({"containers": ["ZIMU1234567"] * 3}, 413),
+    ],
+)
+def test_bad_batches_are_refused_before_scraping(lookups, monkeypatch, body, status):
+    monkeypatch.setattr(settings, "BATCH_MAX_ITEMS", 2)
+    assert post(body).status_code == status
+    assert lookups.calls == []
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+
+import browser_lifecycle
+from browser_lifecycle import BrowserLifecycle
+
+
+class FakeDriver:
+    browser_pid = 0
+
+    def quit(self):
+        pass
+
+
+def test_sweep_during_launch_keeps_profile(tmp_path):
+    lifecycle = BrowserLifecycle(profile_root=str(tmp_path))
+    seen = []
+
+    def factory(profile_dir):
+        lifecycle.kill_orphans()
+        seen.append(os.path.isdir(profile_dir))
+        return FakeDriver()
+
+    driver = lifecycle.launch(factory)
+    assert seen == [True]
+    assert lifecycle.stats()["profilesRemoved"] == 0
+
+    lifecycle.quit(driver)
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_launch_removes_profile(tmp_path):
+    lifecycle = BrowserLifecycle(profile_root=str(tmp_path))
+
+    def factory(profile_dir):
+        raise RuntimeError("chrome did not start")
+
+    try:
+        lifecycle.launch(factory)
+    except RuntimeError:
+        pass
+    assert os.listdir(tmp_path) == []
+    assert not lifecycle._launching
+
+
+def fake_chromedriver(monkeypatch, parent):
+    killed = []
+    monkeypatch.setattr(browser_lifecycle, "process_ids", lambda: [4242])
+    monkeypatch.setattr(browser_lifecycle, "read_cmdline", lambda pid: ["/usr/bin/chromedriver", "--port=9515"])
+    monkeypatch.setattr(browser_lifecycle, "read_status", lambda pid: {"PPid": str(parent)})
+    monkeypatch.setattr(browser_lifecycle, "kill_pids", lambda pids: killed.extend(pids) or len(pids))
+    return killed
+
+
+def profile_with_marker(root, owner):
+    profile = root / f"{browser_lifecycle.PROFILE_PREFIX}{owner}-abc"
+    profile.mkdir()
+    (profile / browser_lifecycle.DRIVER_MARKER).write_text("4242")
+    return profile
+
+
+def dead_pid():
+    pid = 999999
+    while browser_lifecycle.pid_alive(pid):
+        pid -= 1
+    return pid
+
+
+def test_foreign_chromedriver_reparented_to_init_survives(tmp_path, monkeypatch):
+    killed = fake_chromedriver(monkeypatch, parent=1)
+    BrowserLifecycle(profile_root=str(tmp_path)).kill_orphans()
+    assert killed == []
+
+
+def test_marked_chromedriver_of_dead_owner_is_orphan(tmp_path, monkeypatch):
+    killed = fake_chromedriver(monkeypatch, parent=1)
+    profile_with_marker(tmp_path, dead_pid())
+    lifecycle = BrowserLifecycle(profile_root=str(tmp_path))
+    lifecycle.kill_orphans()
+    assert killed == [4242]
+    assert os.listdir(tmp_path) == []
+
+
+def test_marked_chromedriver_of_untracked_own_profile_is_orphan(tmp_path, monkeypatch):
+    killed = fake_chromedriver(monkeypatch, parent=os.getpid())
+    profile_with_marker(tmp_path, os.getpid())
+    BrowserLifecycle(profile_root=str(tmp_path)).kill_orphans()
+    assert killed == [4242]
+
+
+def test_marked_chromedriver_of_live_owner_is_kept(tmp_path, monkeypatch):
+    killed = fake_chromedriver(monkeypatch, parent=1)
+    profile = profile_with_marker(tmp_path, os.getppid())
+    BrowserLifecycle(profile_root=str(tmp_path)).kill_orphans()
+    assert killed == []
+    assert profile.is_dir()
+
+
+def test_launch_records_driver_pid(tmp_path):
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+
+    class Service:
+        process = child
+
+    class DriverWithService(FakeDriver):
+        service = Service()
+
+    lifecycle = BrowserLifecycle(profile_root=str(tmp_path))
+    driver = lifecycle.launch(lambda profile_dir: DriverWithService())
+    (profile,) = tmp_path.iterdir()
+    assert browser_lifecycle.read_driver_marker(str(profile)) == child.pid
+    lifecycle.quit(driver)
+    assert child.wait(timeout=5) != 0
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,134 @@
+import itertools
+
+import pytest
+from selenium.webdriver.remote.command import Command
+
+from browser_tabs import TabbedBrowsers
+
+ids = itertools.count()
+
+
+class FakeBrowser:
+    # Enough of a Chrome WebDriver for tabs: windows, CDP targets and a
+    # record of which window each command ran in
+    def __init__(self, isolated=True):
+        self.isolated = isolated
+        self.current_window_handle = f"anchor-{next(ids)}"
+        self.window = self.current_window_handle
+        self.window_handles = [self.current_window_handle]
+        self.contexts = set()
+        self.commands = []
+        self.switches = 0
+
+    def execute(self, command, params=None):
+        if command == Command.SWITCH_TO_WINDOW:
+            self.window = params["handle"]
+            self.switches += 1
+            return {"value": None}
+        self.commands.append((self.window, command))
+        return {"value": self.window}
+
+    def execute_cdp_cmd(self, command, params):
+        if command == "Target.createBrowserContext":
+            if not self.isolated:
+                raise RuntimeError("not supported")
+            context = f"context-{next(ids)}"
+            self.contexts.add(context)
+            return {"browserContextId": context}
+        if command == "Target.createTarget":
+            assert params.get("browserContextId") in self.contexts | {None}
+            handle = f"tab-{next(ids)}"
+            self.window_handles.append(handle)
+            return {"targetId": handle}
+        if command == "Target.closeTarget":
+            self.window_handles.remove(params["targetId"])
+        elif command == "Target.disposeBrowserContext":
+            self.contexts.remove(params["browserContextId"])
+        return {}
+
+
+@pytest.fixture
+def browsers():
+    launched, destroyed = [], []
+
+    def launch():
+        launched.append(FakeBrowser())
+        return launched[-1]
+
+    tabs = TabbedBrowsers(launch, destroyed.append, tabs_per_browser=2)
+    tabs.launched, tabs.destroyed = launched, destroyed
+    yield tabs
+    tabs.close()
+
+
+def test_browsers_fill_up_before_another_launches(browsers):
+    first, second, third = browsers.open_tab(), browsers.open_tab(), browsers.open_tab()
+    assert first.host is second.host and third.host is not first.host
+    assert len(browsers.launched) == 2
+    stats = browsers.stats()
+    assert stats["tabsByBrowser"] == [2, 1] and stats["openTabs"] == 3
+    assert stats["isolatedContexts"] == 3 and stats["sharedContexts"] == 0
+    # Every tab has its own window and browser context
+    assert len({first.handle, second.handle}) == 2 and len({first.context_id, second.context_id}) == 2
+
+
+def test_commands_run_in_their_own_tab(browsers):
+    first, second = browsers.open_tab(), browsers.open_tab()
+    browser = first.host.driver
+    assert first.execute_script("return 1;") == first.handle
+    switches = browser.switches
+    first.execute_script("return 2;")
+    assert browser.switches == switches
+    assert second.execute_script("return 3;") == second.handle
+    assert first.execute_script("return 4;") == first.handle
+    assert browser.switches == switches + 2
+    with pytest.raises(RuntimeError):
+        first.quit()
+
+
+def test_last_closed_tab_quits_its_browser(browsers):
+    first, second = browsers.open_tab(), browsers.open_tab()
+    browser = first.host.driver
+    browsers.close_tab(first)
+    assert browsers.destroyed == []
+    assert first.context_id not in browser.contexts and first.handle not in browser.window_handles
+    browsers.close_tab(second)
+    assert browsers.destroyed == [browser]
+    assert browsers.stats()["browsers"] == 0 and browser.contexts == set()
+
+
+def test_retiring_browser_takes_no_new_tabs(browsers):
+    browsers.retire = lambda driver, uses: uses >= 3
+    first, second = browsers.open_tab(), browsers.open_tab()
+    assert not browsers.should_recycle(first, 1)
+    assert browsers.should_recycle(second, 2)
+    # Once due, every tab of that browser retires as it is returned
+    assert browsers.should_recycle(first, 1)
+    browsers.close_tab(first)
+
+    third = browsers.open_tab()
+    assert third.host is not second.host
+    browsers.close_tab(second)
+    assert browsers.destroyed == [second.host.driver]
+    assert browsers.stats()["browsersRetired"] == 1
+
+
+def test_failed_prepare_gives_the_slot_back():
+    destroyed = []
+
+    def prepare(tab):
+        raise RuntimeError("consent dialog never appeared")
+
+    tabs = TabbedBrowsers(FakeBrowser, destroyed.append, tabs_per_browser=2, prepare=prepare)
+    with pytest.raises(RuntimeError):
+        tabs.open_tab()
+    assert len(destroyed) == 1
+    assert tabs.stats()["browsers"] == 0 and tabs.stats()["tabsOpened"] == 0
+
+
+def test_shared_context_when_isolation_is_unavailable():
+    tabs = TabbedBrowsers(lambda: FakeBrowser(isolated=False), lambda driver: None)
+    tab = tabs.open_tab()
+    assert tab.context_id is None
+    assert tabs.stats()["sharedContexts"] == 1
+    tabs.close_tab(tab)
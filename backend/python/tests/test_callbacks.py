@@ -0,0 +1,137 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import zim_tracker_service as service
+from jobs import CallbackPolicy, callback_session, deliver_callback
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1:8000/hook",
+        "http://10.1.2.3/hook",
+        "http://192.168.0.10/hook",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/hook",
+        "http://[::ffff:127.0.0.1]/hook",
+        "http://0.0.0.0/hook",
+        "http://224.0.0.1/hook",
+        "http://localhost/hook",
+    ],
+)
+def test_non_public_hosts_are_refused(url):
+    assert CallbackPolicy().check(url) is not None
+
+
+@pytest.mark.parametrize("url", ["ftp://93.184.216.34/hook", "/relative", "http:///nohost", "http://[::1/"])
+def test_malformed_urls_are_refused(url):
+    assert CallbackPolicy().check(url) == "must be an absolute http(s) URL"
+
+
+def test_public_address_is_accepted():
+    assert CallbackPolicy().check("https://93.184.216.34/hook") is None
+
+
+def test_allowed_hosts_narrow_the_destinations():
+    policy = CallbackPolicy(["hooks.example.com", ".partner.example"], allow_private=True)
+    assert policy.check("https://hooks.example.com/x") is None
+    assert policy.check("https://eu.partner.example/x") is None
+    assert policy.check("https://evil.example.com/x") is not None
+    assert policy.check("https://partner.example.evil/x") is not None
+
+
+def test_private_hosts_can_be_allowed():
+    assert CallbackPolicy(allow_private=True).check("http://10.1.2.3/hook") is None
+
+
+def test_delivery_rechecks_the_policy():
+    class NoSession:
+        def post(self, *args, **kwargs):
+            raise AssertionError("refused callbacks must not be sent")
+
+    callback = deliver_callback(NoSession(), "http://127.0.0.1/hook", {"id": "job"}, policy=CallbackPolicy())
+    assert callback["status"] == "failed"
+    assert callback["attempts"] == 0
+    assert callback["lastError"].startswith("refused")
+
+
+def test_job_submit_rejects_private_callback():
+    client = service.app.test_client()
+    response = client.post(
+        "/api/zim/jobs", json={"container": "ZIMU1234567", "callbackUrl": "http://169.254.169.254/latest/"}
+    )
+    assert response.status_code == 400
+    assert "non-public address" in response.get_json()["error"]
+
+
+class HookServer:
+    def __init__(self):
+        self.received = []
+        received = self.received
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append((self.headers["Host"], self.rfile.read(int(self.headers["Content-Length"]))))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def hook_server():
+    server = HookServer()
+    yield server
+    server.close()
+
+
+def test_rebinding_host_is_refused_at_connect(hook_server, monkeypatch):
+    # Resolves to a public address for the policy check, then to loopback
+    real_getaddrinfo = socket.getaddrinfo
+    lookups = []
+
+    def rebinding(host, port, *args, **kwargs):
+        if host == "hooks.rebind.test":
+            lookups.append(host)
+            target = "93.184.216.34" if len(lookups) == 1 else "127.0.0.1"
+            return real_getaddrinfo(target, port, *args, **kwargs)
+        return real_getaddrinfo(host, port, *args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", rebinding)
+    policy = CallbackPolicy()
+    callback = deliver_callback(
+        callback_session(policy),
+        f"http://hooks.rebind.test:{hook_server.port}/hook",
+        {"id": "job"},
+        attempts=1,
+        policy=policy,
+    )
+    assert len(lookups) == 2
+    assert callback["status"] == "failed"
+    assert "non-public address 127.0.0.1" in callback["lastError"]
+    assert hook_server.received == []
+
+
+def test_policy_session_keeps_host_header(hook_server):
+    class LoopbackPolicy(CallbackPolicy):
+        def address_refused(self, address):
+            return None
+
+    policy = LoopbackPolicy()
+    callback = deliver_callback(
+        callback_session(policy), f"http://localhost:{hook_server.port}/hook", {"id": "job"}, attempts=1, policy=policy
+    )
+    assert callback["status"] == "delivered"
+    assert hook_server.received == [(f"localhost:{hook_server.port}", b'{"id": "job"}')]
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from deadline import Deadline, DeadlineExceeded, StageStats, wait_any
+
+
+def test_budget_is_capped_by_what_is_left():
+    deadline = Deadline(10.0)
+    assert deadline.budget(3.0) == 3.0
+    assert 9.0 < deadline.budget() <= 10.0
+    assert 9.0 < deadline.budget(60.0) <= 10.0
+
+    spent = Deadline(0.0)
+    with spent.stage("submit"):
+        with pytest.raises(DeadlineExceeded) as exc:
+            spent.budget(5.0)
+    assert exc.value.stage == "submit"
+
+
+def test_innermost_failing_stage_is_blamed_and_timings_add_up():
+    deadline = Deadline(10.0)
+    with deadline.stage("search"):
+        pass
+    with pytest.raises(RuntimeError):
+        with deadline.stage("extract"):
+            with deadline.stage("rows"):
+                raise RuntimeError("stale element")
+    with deadline.stage("search"):
+        time.sleep(0.01)
+
+    assert deadline.failed_stage == "rows"
+    assert deadline.current_stage == "start"
+    timings = deadline.timings()
+    assert set(timings) == {"search", "extract", "rows", "total"}
+    assert timings["search"] >= 0.01
+    assert timings["total"] >= timings["search"]
+
+
+def test_wait_any_returns_the_first_condition_to_resolve():
+    calls = []
+
+    def later(driver):
+        calls.append("later")
+        return len(calls) > 4 and "results"
+
+    def broken(driver):
+        raise RuntimeError("no such element")
+
+    name, value = wait_any(object(), {"broken": broken, "results": later}, timeout=2.0, poll_frequency=0.01)
+    assert (name, value) == ("results", "results")
+
+    with pytest.raises(TimeoutException):
+        wait_any(object(), {"never": lambda driver: None}, timeout=0.05, poll_frequency=0.01)
+
+
+def test_waits_that_run_out_the_deadline_raise_deadline_exceeded():
+    deadline = Deadline(0.1)
+    with deadline.stage("resultsWait"):
+        with pytest.raises(DeadlineExceeded) as exc:
+            # The wait's own cap is longer than what the request has left
+            deadline.wait_any(object(), {"never": lambda driver: None}, cap=5.0)
+    assert exc.value.stage == "resultsWait"
+    assert deadline.elapsed() < 1.0
+
+    # A wait that hits its own cap first stays a plain timeout
+    roomy = Deadline(10.0)
+    with pytest.raises(TimeoutException) as exc:
+        roomy.wait_any(object(), {"never": lambda driver: None}, cap=0.05)
+    assert not isinstance(exc.value, DeadlineExceeded)
+
+
+def test_stage_stats_aggregate_requests():
+    stats = StageStats()
+    for _ in range(2):
+        deadline = Deadline(10.0)
+        with deadline.stage("submit"):
+            pass
+        stats.record(deadline)
+    stats.record_exceeded("resultsWait")
+
+    report = stats.stats()
+    assert report["stages"]["submit"]["count"] == 2
+    assert report["stages"]["total"]["count"] == 2
+    assert report["deadlinesExceeded"] == {"resultsWait": 1}
@@ -0,0 +1,106 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector, SelectorError
+
+import mock_site
+import port_index
+import settings
+import zim_tracker_service as service
+from dom_extract import EXTRACT_SCRIPT
+from html_parser import parse_snapshot
+
+NODE = shutil.which("node")
+
+# Runs EXTRACT_SCRIPT against a minimal DOM: every element carries its raw
+# textContent and the results of each selector the script uses, worked out
+# by the same cssselect the lxml parser uses. What is left to compare is the
+# script's own walk and text handling.
+SHIM = r"""
+const data = JSON.parse(require("fs").readFileSync(0, "utf8"));
+const elements = data.elements.map((e) => ({ textContent: e.text, _sel: e.sel }));
+for (const el of elements) {
+  el.querySelectorAll = (css) => (el._sel[css] || []).map((i) => elements[i]);
+  el.querySelector = (css) => el.querySelectorAll(css)[0] || null;
+}
+globalThis.document = elements[0];
+const extract = new Function(data.script);
+process.stdout.write(JSON.stringify(extract(null)));
+"""
+
+
+def script_selectors():
+    selectors = set()
+    for literal in re.findall(r'"((?:[^"\\]|\\.)*)"', EXTRACT_SCRIPT):
+        if not literal:
+            continue
+        try:
+            selectors.add((literal, CSSSelector(literal)))
+        except SelectorError:
+            continue
+    return selectors
+
+
+def run_script(page_source):
+    doc = lxml_html.fromstring(page_source)
+    elements = [el for el in doc.iter() if isinstance(el.tag, str)]
+    # Entry 0 is the document, which sits above the root element
+    index = {el: i + 1 for i, el in enumerate(elements)}
+    selectors = script_selectors()
+
+    def entry(node, include_self):
+        found = {}
+        for css, selector in selectors:
+            # querySelectorAll never returns the element it is called on
+            matches = [index[m] for m in selector(node) if include_self or m is not node]
+            if matches:
+                found[css] = matches
+        return {"text": node.text_content(), "sel": found}
+
+    dom = [entry(doc, True)] + [entry(el, False) for el in elements]
+    output = subprocess.run(
+        [NODE, "-e", SHIM],
+        input=json.dumps({"elements": dom, "script": EXTRACT_SCRIPT}),
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=60,
+    ).stdout
+    return json.loads(output)
+
+
+def reflowed(page_source):
+    # The same page with every space in its text turned into a line break and
+    # indentation, as a pretty-printed template would render it
+    doc = lxml_html.fromstring(page_source)
+    for el in doc.iter():
+        if isinstance(el.tag, str) and el.text:
+            el.text = el.text.replace(" ", "\n      ")
+    return lxml_html.tostring(doc, encoding="unicode")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def ports():
+    port_index.load_index(settings.PORT_INDEX_PATH)
+
+
+@pytest.mark.skipif(NODE is None, reason="node is not installed")
+@pytest.mark.parametrize("layout", [lambda page: page, reflowed], ids=["as-saved", "reflowed"])
+@pytest.mark.parametrize("identifier, fixture", sorted(mock_site.FIXTURES.items()))
+def test_script_and_lxml_give_the_same_payload(identifier, fixture, layout):
+    with open(os.path.join(mock_site.FIXTURES_DIR, fixture), encoding="utf-8") as fh:
+        page = layout(fh.read())
+
+    script_snapshot = run_script(page)
+    lxml_snapshot = parse_snapshot(page)
+
+    assert script_snapshot == lxml_snapshot
+    assert (
+        service.payload_from_snapshot(script_snapshot, identifier).dump()
+        == service.payload_from_snapshot(lxml_snapshot, identifier).dump()
+    )
@@ -0,0 +1,76 @@
+import time
+
+from driver_pool import DriverPool
+
+
+class FakeDriver:
+    def execute_script(self, script):
+        return "complete"
+
+    def quit(self):
+        pass
+
+
+def test_warm_up_is_not_counted_as_use():
+    seen_uses = []
+
+    def retire(driver, uses):
+        seen_uses.append(uses)
+        return False
+
+    pool = DriverPool(FakeDriver, min_size=0, max_size=2, retire=retire, destroy=lambda driver: None)
+    try:
+        assert pool.warm(2) == 2
+        stats = pool.stats()
+        assert stats["checkouts"] == 0 and stats["created"] == 2
+        assert seen_uses == [0, 0]
+
+        with pool.checkout():
+            pass
+        for _ in range(100):
+            if pool.stats()["idle"] == 2:
+                break
+            time.sleep(0.01)
+        assert pool.stats()["checkouts"] == 1
+        assert seen_uses[-1] == 1
+    finally:
+        pool.close()
+
+
+def test_reap_parks_replacements_like_warm_up():
+    reset_drivers = []
+    seen_uses = []
+
+    def retire(driver, uses):
+        seen_uses.append(uses)
+        return False
+
+    pool = DriverPool(
+        FakeDriver, reset=reset_drivers.append, min_size=2, max_size=2, retire=retire, destroy=lambda driver: None
+    )
+    try:
+        pool.reap()
+        stats = pool.stats()
+        assert stats["idle"] == 2 and stats["inUse"] == 0 and stats["launching"] == 0
+        assert stats["created"] == 2 and stats["checkouts"] == 0
+        assert len(reset_drivers) == 2
+        assert seen_uses == [0, 0]
+    finally:
+        pool.close()
+
+
+def test_reap_discards_replacement_that_fails_reset():
+    destroyed = []
+
+    def failing_reset(driver):
+        raise RuntimeError("reset failed")
+
+    pool = DriverPool(FakeDriver, reset=failing_reset, min_size=1, max_size=2, destroy=destroyed.append)
+    try:
+        pool.reap()
+        stats = pool.stats()
+        assert stats["idle"] == 0 and stats["size"] == 0
+        assert stats["created"] == 1 and stats["discarded"] == 1
+        assert len(destroyed) == 1
+    finally:
+        pool.close()
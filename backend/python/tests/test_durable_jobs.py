@@ -0,0 +1,167 @@
+import os
+import time
+
+import pytest
+
+import mock_site
+import settings
+import zim_tracker_service as service
+from durable_jobs import DurableJobQueue, DurableJobStore, QueueWorker
+from html_parser import parse_snapshot
+from jobs import Job, JobError, JobQueueFull
+from result_cache import HIT, ResultCache, cache_key
+from tracking_store import TrackingStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DurableJobStore(str(tmp_path / "jobs.sqlite3"), visibility_timeout=0.2, max_attempts=2, retention=60)
+
+
+def enqueue(store, identifier="ZIMU1234567", key=None, options=None):
+    job = Job(identifier, "Container", options or {}, None, key)
+    store.enqueue(job)
+    return job
+
+
+def test_lease_complete(store):
+    job = enqueue(store)
+    (lease,) = store.lease("w1", 5)
+    assert lease.job_id == job.id and lease.attempts == 1
+    assert store.lease("w2", 5) == []
+    assert store.load(job.id)["status"] == "running"
+
+    record = store.complete(lease.token, "succeeded", result={"refNum": job.identifier})
+    assert record["status"] == "succeeded"
+    assert store.load(job.id)["result"] == {"refNum": job.identifier}
+    # A repeated completion is a no-op
+    assert store.complete(lease.token, "failed", error="late") is None
+    assert store.load(job.id)["status"] == "succeeded"
+
+
+def test_lapsed_lease_goes_to_another_worker(store):
+    job = enqueue(store)
+    (first,) = store.lease("w1", 1)
+    time.sleep(0.25)
+    (second,) = store.lease("w2", 1)
+    assert second.job_id == job.id and second.attempts == 2
+    assert second.token != first.token
+
+    # The first worker's late result is dropped, and it cannot extend
+    assert store.extend([first.token, second.token]) == [first.token]
+    assert store.complete(first.token, "succeeded", result={}) is None
+    assert store.complete(second.token, "succeeded", result={"ok": True})["result"] == {"ok": True}
+
+
+def test_retry_until_attempts_run_out(store):
+    job = enqueue(store)
+    (lease,) = store.lease("w1", 1)
+    assert store.retry(lease.token, delay=0.05, error="HTTP 503")
+    assert store.load(job.id)["status"] == "queued"
+    assert store.lease("w1", 1) == []
+    time.sleep(0.06)
+    (lease,) = store.lease("w1", 1)
+    assert lease.attempts == 2
+    assert not store.retry(lease.token, delay=0.0)
+
+
+def test_queue_bound_and_idempotency(store):
+    queue = DurableJobQueue(store, max_queue=1)
+    first, created = queue.submit("ZIMU1234567", "Container", idempotency_key="k")
+    assert created
+    again, created = queue.submit("ZIMU1234567", "Container", idempotency_key="k")
+    assert not created and again["id"] == first["id"]
+    with pytest.raises(JobQueueFull):
+        queue.submit("ZIMU7654321", "Container")
+    assert queue.stats()["deduplicated"] == 1 and queue.stats()["rejected"] == 1
+
+
+def test_worker_retries_transient_failures(store):
+    attempts = []
+
+    def runner(job):
+        attempts.append(job.id)
+        if len(attempts) == 1:
+            raise JobError("site busy", 503)
+        return {"refNum": job.identifier}
+
+    job = enqueue(store)
+    worker = QueueWorker(store, runner, concurrency=1, poll_interval=0.01, heartbeat_interval=0.05, retry_delay=0.0)
+    worker.start()
+    try:
+        for _ in range(300):
+            if store.load(job.id)["status"] == "succeeded":
+                break
+            time.sleep(0.01)
+    finally:
+        worker.stop(1.0)
+    assert store.load(job.id)["status"] == "succeeded"
+    assert attempts == [job.id, job.id]
+
+
+def fixture_result(identifier="ZIMU1234567"):
+    with open(os.path.join(mock_site.FIXTURES_DIR, mock_site.FIXTURES[identifier]), encoding="utf-8") as fh:
+        return service.payload_from_snapshot(parse_snapshot(fh.read()), identifier)
+
+
+def finish(store, job, result):
+    (lease,) = store.lease("w1", 1)
+    assert lease.job_id == job.id
+    return store.complete(lease.token, "succeeded", result=result)
+
+
+def test_latest_result_skips_projections_and_other_identifiers(store):
+    full = enqueue(store)
+    finish(store, full, {"refNum": "full"})
+    finish(store, enqueue(store, options={"fields": ["refNum"]}), {"refNum": "projected"})
+    finish(store, enqueue(store, identifier="ZIMU7654321"), {"refNum": "other"})
+
+    result, age = store.latest_result("zimu1234567", "Container", 60)
+    assert result == {"refNum": "full"} and 0 <= age < 5
+    assert store.latest_result("ZIMU1234567", "BillOfLanding", 60) is None
+    time.sleep(0.05)
+    assert store.latest_result("ZIMU1234567", "Container", 0.01) is None
+
+
+@pytest.fixture
+def front_end(store, monkeypatch):
+    # This process as the front end of ZIM_JOB_BACKEND=durable, with no
+    # browsers of its own
+    def no_scrape(*args, **kwargs):
+        raise AssertionError("the front end should not scrape")
+
+    monkeypatch.setattr(service, "job_store", store)
+    monkeypatch.setattr(service, "result_cache", ResultCache(ttl=60))
+    monkeypatch.setattr(service, "track_identifier", no_scrape)
+    monkeypatch.setattr(settings, "CACHE_ENABLED", True)
+    return store
+
+
+def test_front_end_serves_what_a_worker_finished(front_end):
+    expected = fixture_result()
+    finish(front_end, enqueue(front_end), expected.to_dict())
+
+    result, headers = service.lookup_tracking("ZIMU1234567", "Container")
+    assert headers["X-Cache"] == HIT
+    assert result.dump() == expected.dump()
+    assert service.result_cache.last(cache_key("ZIMU1234567", "Container"))[0] is result
+
+
+def test_front_end_records_remote_completions(front_end, tmp_path, monkeypatch):
+    tracking = TrackingStore(str(tmp_path / "tracking.sqlite3"))
+    monkeypatch.setattr(service, "tracking_store", tracking)
+    monkeypatch.setattr(settings, "WORKER_TOKEN", "secret")
+    client = service.app.test_client()
+    auth = {"Authorization": "Bearer secret"}
+
+    full = enqueue(front_end)
+    projected = enqueue(front_end, identifier="ZIMU7654321", options={"fields": ["refNum"]})
+    for _ in range(2):
+        response = client.post("/api/zim/queue/lease", json={"workerId": "remote", "limit": 1}, headers=auth)
+        (lease,) = response.get_json()["leases"]
+        job = full if lease["jobId"] == full.id else projected
+        body = {"token": lease["token"], "status": "succeeded", "result": fixture_result(job.identifier).to_dict()}
+        assert client.post("/api/zim/queue/complete", json=body, headers=auth).status_code == 200
+
+    assert tracking.last_scraped_at("ZIMU1234567", "Container") is not None
+    assert tracking.last_scraped_at("ZIMU7654321", "Container") is None
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+from urllib.request import urlopen
+
+import pytest
+
+import mock_site
+import zim_tracker_service as service
+from fast_path import FastPathClient, FastPathError, RequestTemplate
+from html_parser import parse_snapshot
+
+
+class CapturingDriver:
+    # What capture() needs from a Selenium driver after a lookup
+    def __init__(self, body: str) -> None:
+        self.body = body
+
+    def execute_cdp_cmd(self, command, params):
+        assert command == "Network.getResponseBody"
+        return {"body": self.body, "base64Encoded": False}
+
+    def get_cookies(self):
+        return [{"name": "session", "value": "abc", "domain": "127.0.0.1", "path": "/"}]
+
+
+def network_log(url: str):
+    return [
+        {
+            "method": "Network.requestWillBeSent",
+            "params": {"requestId": "1", "type": "XHR", "request": {"method": "GET", "url": url, "headers": {}}},
+        },
+        {
+            "method": "Network.responseReceived",
+            "params": {"requestId": "1", "response": {"mimeType": "application/json", "status": 200}},
+        },
+    ]
+
+
+def dom_payload(identifier: str):
+    path = os.path.join(mock_site.FIXTURES_DIR, mock_site.FIXTURES[identifier])
+    with open(path, encoding="utf-8") as fh:
+        return service.payload_from_snapshot(parse_snapshot(fh.read()), identifier)
+
+
+@pytest.fixture(scope="module")
+def json_url():
+    server, url = mock_site.start_mock_site()
+    yield url.replace(mock_site.TRACK_PATH, mock_site.JSON_PATH) + "?consNumber="
+    server.shutdown()
+
+
+def capture(client: FastPathClient, json_url: str, identifier: str, tamper=None):
+    url = json_url + quote(identifier)
+    with urlopen(url) as response:
+        data = json.load(response)
+    if tamper:
+        tamper(data)
+    return client.capture(CapturingDriver(json.dumps(data)), network_log(url), identifier)
+
+
+def matches_dom(identifier: str):
+    expected = dom_payload(identifier).encode()
+    return lambda snapshot: service.payload_from_snapshot(snapshot, identifier).encode() == expected
+
+
+def test_capture_arms_when_json_matches_dom(json_url):
+    client = FastPathClient()
+    captured = capture(client, json_url, "ZIMU1234567")
+    assert captured is not None
+
+    assert client.arm(captured, "ZIMU1234567", matches_dom("ZIMU1234567"))
+    assert client.ready()
+    assert client.stats()["captures"] == 1
+
+    # The template replays for other identifiers and builds the DOM payload
+    snapshot = client.lookup("ZIMU7654321")
+    assert service.payload_from_snapshot(snapshot, "ZIMU7654321").encode() == dom_payload("ZIMU7654321").encode()
+
+
+def test_capture_rejected_when_json_differs(json_url):
+    def drop_vessels(data):
+        for activity in data["activities"]:
+            activity["vesselName"] = ""
+
+    client = FastPathClient()
+    captured = capture(client, json_url, "ZIMU7654321", drop_vessels)
+
+    assert not client.arm(captured, "ZIMU7654321", matches_dom("ZIMU7654321"))
+    assert not client.ready()
+    assert client.stats()["rejectedCaptures"] == 1
+
+
+def test_capture_rejected_when_check_raises(json_url):
+    def broken(snapshot):
+        raise ValueError("unexpected shape")
+
+    client = FastPathClient()
+    captured = capture(client, json_url, "ZIMU1234567")
+
+    assert not client.arm(captured, "ZIMU1234567", broken)
+    assert not client.ready()
+
+
+def test_reconfigure_during_lookup_keeps_new_template():
+    # The first replay is held until the template has been replaced, then
+    # rejected the way an expired session is
+    cookies = []
+    replaced = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            cookies.append(self.headers.get("Cookie"))
+            if self.headers.get("Cookie") == "session=old":
+                replaced.wait(5)
+                self.send_response(403)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/track/{{identifier}}"
+
+    def template(value):
+        return RequestTemplate("GET", url, cookies=[{"name": "session", "value": value, "domain": "127.0.0.1"}])
+
+    try:
+        client = FastPathClient()
+        client.configure(template("old"))
+        errors = []
+
+        def stale_lookup():
+            try:
+                client.lookup("ZIMU1234567")
+            except FastPathError as exc:
+                errors.append(exc)
+
+        thread = threading.Thread(target=stale_lookup)
+        thread.start()
+        while not cookies:
+            time.sleep(0.005)
+        new = template("new")
+        client.configure(new)
+        replaced.set()
+        thread.join(5)
+
+        assert [str(error) for error in errors] == ["upstream answered 403"]
+        assert client.ready()
+        assert client._template is new
+        assert client.stats()["invalidations"] == 0
+        with pytest.raises(FastPathError):
+            client.lookup("ZIMU1234567")
+        assert cookies == ["session=old", "session=new"]
+    finally:
+        server.shutdown()
+        server.server_close()
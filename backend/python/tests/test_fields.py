@@ -0,0 +1,123 @@
+import os
+
+import pytest
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+import mock_site
+import port_index
+import settings
+import zim_tracker_service as service
+from html_parser import parse_snapshot, txt
+from result_cache import HIT, ResultCache, cache_key
+
+
+@pytest.fixture(scope="module", autouse=True)
+def ports():
+    port_index.load_index(settings.PORT_INDEX_PATH)
+
+
+def fixture_page(identifier):
+    with open(os.path.join(mock_site.FIXTURES_DIR, mock_site.FIXTURES[identifier]), encoding="utf-8") as fh:
+        return fh.read()
+
+
+class Element:
+    # A WebDriver element over lxml that counts the lookups made through it,
+    # each of which would be an HTTP round-trip to chromedriver
+    def __init__(self, node, calls):
+        self.node = node
+        self.calls = calls
+
+    @property
+    def text(self):
+        return txt(self.node)
+
+    def find_elements(self, by, css):
+        self.calls.append(css)
+        return [Element(found, self.calls) for found in CSSSelector(css)(self.node) if found is not self.node]
+
+    def find_element(self, by, css):
+        found = self.find_elements(by, css)
+        if not found:
+            raise LookupError(css)
+        return found[0]
+
+
+def test_parse_fields():
+    assert service.parse_fields("currentstatus, PODETA") == frozenset({"currentStatus", "podETA"})
+    assert service.parse_fields("") is None and service.parse_fields(None) is None
+    with pytest.raises(ValueError) as exc:
+        service.parse_fields("podETA,vessel")
+    assert "vessel" in str(exc.value)
+
+
+@pytest.mark.parametrize("identifier", sorted(mock_site.FIXTURES))
+def test_projection_keeps_only_the_requested_fields(identifier):
+    full = service.payload_from_snapshot(parse_snapshot(fixture_page(identifier)), identifier)
+    projected = full.project(frozenset({"currentStatus", "podETA"})).to_dict()
+
+    assert projected["fields"] == ["currentStatus", "podETA"]
+    assert projected["currentStatus"] == full.current_status
+    assert projected["containers"] == [
+        {"containerNum": c["containerNum"], "podETA": c["podETA"]} for c in full.to_dict()["containers"]
+    ]
+    assert full.project(None) is full
+
+
+def test_status_only_walk_skips_the_timeline():
+    doc = lxml_html.fromstring(fixture_page("ZIMUSHH30500001"))
+    (card_node, *_) = CSSSelector(".routing-details-v2 li.card-container-v2")(doc)
+
+    full_calls, status_calls = [], []
+    full = service.read_reference_card(Element(card_node, full_calls))
+    status = service.read_reference_card(Element(card_node, status_calls), frozenset({"currentStatus"}))
+    assert full["activities"] and status["activities"] == []
+    assert status["containerNum"] == full["containerNum"]
+    assert len(status_calls) < 5 < len(full_calls)
+
+    details_calls = []
+    service.parse_details_card(Element(doc, details_calls), frozenset({"currentStatus"}))
+    assert details_calls == []
+    # podETA needs the ETA block, and the details card only when there is no ETA
+    eta_calls = []
+    details = service.parse_details_card(Element(doc, eta_calls), frozenset({"podETA"}))
+    assert details["eta"] == "18-Mar-2025" and eta_calls == ["#etaDate"]
+
+
+def test_projection_reuses_a_fresh_full_result(monkeypatch):
+    calls = []
+    full = service.payload_from_snapshot(parse_snapshot(fixture_page("ZIMU1234567")), "ZIMU1234567")
+
+    def track(identifier, ref_type, extraction=None, deadline=None, on_container=None, fields=None):
+        calls.append(fields)
+        return full.project(fields)
+
+    monkeypatch.setattr(service, "track_identifier", track)
+    monkeypatch.setattr(service, "result_cache", ResultCache(ttl=60))
+    monkeypatch.setattr(settings, "CACHE_ENABLED", True)
+    fields = frozenset({"currentStatus"})
+
+    # Without a full result, the partial scrape is cached under its own key
+    result, _ = service.lookup_tracking("ZIMU1234567", "Container", fields=fields)
+    assert calls == [fields] and result.fields == fields
+    assert service.result_cache.last(cache_key("ZIMU1234567", "Container")) is None
+    service.lookup_tracking("ZIMU1234567", "Container", fields=fields)
+    assert calls == [fields]
+
+    # Once a full lookup is cached, projections are served from it
+    service.lookup_tracking("ZIMU1234567", "Container")
+    result, headers = service.lookup_tracking("ZIMU1234567", "Container", fields=frozenset({"podETA"}))
+    assert calls == [fields, None]
+    assert headers["X-Cache"] == HIT
+    assert result.to_dict()["fields"] == ["podETA"]
+
+
+def test_unknown_field_is_refused_before_scraping(monkeypatch):
+    def lookup(*args, **kwargs):
+        raise AssertionError("the request should be refused before scraping")
+
+    monkeypatch.setattr(service, "lookup_tracking", lookup)
+    response = service.app.test_client().get("/api/zim/track?container=ZIMU1234567&fields=status")
+    assert response.status_code == 400
+    assert "unknown field" in response.get_json()["error"]
@@ -0,0 +1,36 @@
+import json
+import os
+
+import pytest
+
+import mock_site
+import port_index
+import settings
+import zim_tracker_service as service
+from html_parser import parse_snapshot
+
+EXPECTED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "expected")
+# ZIM_UPDATE_EXPECTED=1 rewrites the expected payloads after an intended change
+UPDATE = os.environ.get("ZIM_UPDATE_EXPECTED") == "1"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def ports():
+    port_index.load_index(settings.PORT_INDEX_PATH)
+
+
+@pytest.mark.parametrize("identifier, fixture", sorted(mock_site.FIXTURES.items()))
+def test_fixture_payload(identifier, fixture):
+    with open(os.path.join(mock_site.FIXTURES_DIR, fixture), encoding="utf-8") as fh:
+        payload = service.payload_from_snapshot(parse_snapshot(fh.read()), identifier)
+    path = os.path.join(EXPECTED_DIR, fixture.replace(".html", ".json"))
+    if UPDATE:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(payload.to_dict(), fh, indent=2, ensure_ascii=False)
+            fh.write("\n")
+    with open(path, encoding="utf-8") as fh:
+        expected = json.load(fh)
+
+    assert payload.to_dict() == expected
+    # The memoized body is the same document
+    assert json.loads(payload.encode()) == expected
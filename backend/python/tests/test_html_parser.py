@@ -0,0 +1,87 @@
+import os
+
+import pytest
+from lxml import html as lxml_html
+
+import mock_site
+from dom_extract import EXTRACT_SCRIPT, extract_snapshot
+from html_parser import parse_snapshot, txt
+
+
+def fixture_snapshot(identifier):
+    with open(os.path.join(mock_site.FIXTURES_DIR, mock_site.FIXTURES[identifier]), encoding="utf-8") as fh:
+        return parse_snapshot(fh.read())
+
+
+def test_container_fixture_snapshot():
+    snapshot = fixture_snapshot("ZIMU1234567")
+    assert snapshot["variant"] == "container"
+    assert snapshot["header"] == {
+        "containerNum": "ZIMU1234567",
+        "typeAndSize": "40' High Cube",
+        "lastActivity": "Discharged from vessel",
+    }
+    assert len(snapshot["rows"]) == 6
+    assert snapshot["rows"][0] == {
+        "date": "05-Mar-2025",
+        "time": "17:00",
+        "activity": "Discharged from vessel",
+        "location": "NINGBO, CHINA. PEOPLE'S REPUBLIC",
+        "vessel": "MSC SUAPE VII/36/E",
+    }
+    assert len(fixture_snapshot("ZIMU7654321")["rows"]) == 120
+
+
+def test_reference_fixture_snapshot():
+    snapshot = fixture_snapshot("ZIMUSHH30500001")
+    assert snapshot["variant"] == "reference"
+    assert set(snapshot) == {"variant", "cards", "eta", "detailBlocks", "vesselTexts"}
+    assert snapshot["cards"][0]["containerNum"] == "ZCSU8800000"
+    assert len(snapshot["cards"]) == 4
+    assert all(card["activities"] for card in snapshot["cards"])
+    assert snapshot["eta"] == "18-Mar-2025"
+    assert all(len(pair) == 2 for block in snapshot["detailBlocks"] for pair in block)
+    assert len(snapshot["vesselTexts"]) == 1
+
+
+def test_short_rows_and_missing_parts():
+    page = """
+    <div class="tracing-result-wrapper">
+      <div class="one-container-activities">
+        <div class="activity-row">
+          <div class="activity-item"><span class="date">01-Feb-2025</span></div>
+          <div class="activity-item"><span class="text-style">Gate in</span></div>
+        </div>
+      </div>
+    </div>
+    """
+    snapshot = parse_snapshot(page)
+    assert snapshot["header"] == {"containerNum": None, "typeAndSize": None, "lastActivity": None}
+    assert snapshot["rows"] == [{"date": "01-Feb-2025", "time": "", "activity": "Gate in", "location": "", "vessel": ""}]
+
+    assert parse_snapshot('<div class="tracing-result-wrapper"></div>')["rows"] is None
+    with pytest.raises(RuntimeError):
+        parse_snapshot("<html><body><p>Access denied</p></body></html>")
+
+
+def test_text_collapses_whitespace_like_rendered_text():
+    el = lxml_html.fromstring("<div>\n  ZIMU 1234567 <b>\n\t40'</b>  </div>")
+    assert txt(el) == "ZIMU 1234567 40'"
+    assert txt(None) == ""
+
+
+def test_extract_snapshot_runs_the_script_once():
+    class Driver:
+        def __init__(self, returned):
+            self.returned = returned
+            self.calls = []
+
+        def execute_script(self, script, *args):
+            self.calls.append((script, args))
+            return self.returned
+
+    driver = Driver({"variant": "container"})
+    assert extract_snapshot(driver, "results") == {"variant": "container"}
+    assert driver.calls == [(EXTRACT_SCRIPT, ("results",))]
+    # A page the script could not read gives an empty snapshot, not None
+    assert extract_snapshot(Driver(None)) == {}
@@ -0,0 +1,66 @@
+import threading
+
+from jobs import JobQueue, SharedJobRecords
+
+
+def blocked_runner(release):
+    def run(job):
+        release.wait(5)
+        return {"refNum": job.identifier}
+
+    return run
+
+
+def test_idempotency_key_is_single_use_across_processes(tmp_path):
+    # Two queues on one records file stand in for two gunicorn workers
+    path = str(tmp_path / "jobs.sqlite3")
+    release = threading.Event()
+    queues = [JobQueue(blocked_runner(release), records=SharedJobRecords(path)) for _ in range(2)]
+    barrier = threading.Barrier(8)
+    results = []
+
+    def submit(queue):
+        barrier.wait()
+        results.append(queue.submit("ZIMU1234567", "ContainerNumber", idempotency_key="order-1"))
+
+    threads = [threading.Thread(target=submit, args=(queues[i % 2],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+
+    assert sum(created for _, created in results) == 1
+    assert len({job["id"] for job, _ in results}) == 1
+    assert sum(q.stats()["submitted"] for q in queues) == 1
+    assert sum(q.stats()["deduplicated"] for q in queues) == 7
+
+
+def test_state_changes_update_the_record(tmp_path):
+    records = SharedJobRecords(str(tmp_path / "jobs.sqlite3"))
+    queue = JobQueue(lambda job: {"refNum": job.identifier}, records=records)
+    job, created = queue.submit("ZIMU1234567", "ContainerNumber", idempotency_key="order-2")
+    assert created
+
+    for _ in range(200):
+        stored = records.load(job["id"])
+        if stored and stored["status"] == "succeeded":
+            break
+        threading.Event().wait(0.01)
+    assert stored["status"] == "succeeded"
+    assert records.find_idempotent("order-2")["id"] == job["id"]
+
+
+def test_expired_key_can_be_reused(tmp_path):
+    records = SharedJobRecords(str(tmp_path / "jobs.sqlite3"))
+    queue = JobQueue(lambda job: {"refNum": job.identifier}, retention=0.0, records=records)
+    first, _ = queue.submit("ZIMU1234567", "ContainerNumber", idempotency_key="order-3")
+    for _ in range(200):
+        if queue.stats()["succeeded"]:
+            break
+        threading.Event().wait(0.01)
+
+    other = JobQueue(lambda job: {"refNum": job.identifier}, records=SharedJobRecords(str(tmp_path / "jobs.sqlite3")))
+    second, created = other.submit("ZIMU1234567", "ContainerNumber", idempotency_key="order-3")
+    assert created
+    assert second["id"] != first["id"]
@@ -0,0 +1,56 @@
+import zim_tracker_service as service
+from metrics import COUNTER_FIELDS, ScrapeMetrics
+
+
+def exposition(text):
+    types, values = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split()
+            types[name] = kind
+        elif line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    return types, values
+
+
+def test_monotonic_stats_are_counters():
+    text = ScrapeMetrics().render(
+        {
+            "pool": {"checkouts": 7, "created": 2, "recycled": 1, "idle": 3, "size": 4, "inUse": 1},
+            "cache": {"hits": 5, "misses": 2, "entries": 9, "hitRatio": 0.71},
+            "coalescing": {"inFlight": 1, "coalesced": 3},
+            "jobs": {"submitted": 4, "running": 2},
+        }
+    )
+    types, values = exposition(text)
+    for name in (
+        "zim_pool_checkouts_total",
+        "zim_pool_created_total",
+        "zim_pool_recycled_total",
+        "zim_cache_hits_total",
+        "zim_cache_misses_total",
+        "zim_coalescing_coalesced_total",
+        "zim_jobs_submitted_total",
+    ):
+        assert types[name] == "counter"
+    for name in ("zim_pool_idle", "zim_pool_size", "zim_pool_in_use", "zim_cache_entries", "zim_coalescing_in_flight"):
+        assert types[name] == "gauge"
+    assert values["zim_pool_checkouts_total"] == 7
+    assert "zim_pool_checkouts" not in types
+
+
+def test_counter_fields_exist_in_service_stats():
+    # A renamed stats field would silently turn back into a gauge
+    sections = {
+        "pool": service.driver_pool.stats(),
+        "browsers": service.browsers.stats(),
+        "cache": service.result_cache.stats(),
+        "coalescing": service.in_flight.stats(),
+        "admission": service.admission.stats(),
+        "upstream": service.upstream.stats(),
+        "jobs": service.job_queue.stats(),
+        "fast_path": service.fast_path.stats(),
+    }
+    for section, stats in sections.items():
+        assert set(COUNTER_FIELDS[section]) <= set(stats), section
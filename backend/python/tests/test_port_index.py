@@ -0,0 +1,38 @@
+import pytest
+
+import port_index
+import zim_tracker_service as service
+from port_index import PortIndex
+
+
+@pytest.fixture(scope="module")
+def index():
+    return PortIndex.load()
+
+
+@pytest.mark.parametrize(
+    "location, unlocode",
+    [
+        ("BUSAN, KOREA, REPUBLIC OF", "KRPUS"),
+        ("SHANGHAI (SH), CHINA. PEOPLE'S REPUBLIC", "CNSHA"),
+        ("LONG BEACH, CA, UNITED STATES", "USLGB"),
+        ("LAG, NIGERIA", "NGLOS"),
+        ("NHAVA", "INNSA"),
+        ("PORT KLANG WESTPORTS", "MYPKG"),
+        ("LA SPEZIA", "ITSPE"),
+    ],
+)
+def test_resolves(index, location, unlocode):
+    assert index.resolve(location).unlocode == unlocode
+
+
+@pytest.mark.parametrize("location", ["LA", "L", "SAN", "NEW", "PORT", "LA, ITALY", "ABC, CHINA"])
+def test_short_or_ambiguous_partials_do_not_resolve(index, location):
+    assert index.resolve(location) is None
+
+
+def test_location_keeps_site_split():
+    port_index.load_index()
+    location = service.build_location("BUSAN, KOREA, REPUBLIC OF")
+    assert (location.city, location.country) == ("BUSAN, KOREA", "REPUBLIC OF")
+    assert location.unlocode == "KRPUS"
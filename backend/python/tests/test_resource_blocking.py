@@ -0,0 +1,106 @@
+import json
+from fnmatch import fnmatch
+
+import settings
+from resource_blocking import BlockingProfile, NetworkStats, domain_matches, read_performance_log, summarize_network
+
+
+def blocked(profile, url):
+    # Network.setBlockedURLs patterns are globs where only * is special
+    return any(fnmatch(url, pattern) for pattern in profile.url_patterns())
+
+
+def test_domain_matches_whole_labels_only():
+    assert domain_matches("www.googletagmanager.com", "googletagmanager.com")
+    assert domain_matches("Cookielaw.org.", "cookielaw.org")
+    assert not domain_matches("notgoogletagmanager.com", "googletagmanager.com")
+
+
+def test_default_profile_blocks_trackers_and_heavy_types_but_not_the_site():
+    profile = BlockingProfile(settings.BLOCK_RESOURCE_TYPES, settings.BLOCK_DOMAINS, settings.ALLOW_DOMAINS)
+    assert profile.enabled and profile.blocks_consent
+
+    assert blocked(profile, "https://www.googletagmanager.com/gtm.js?id=GTM-1")
+    assert blocked(profile, "https://cdn.cookielaw.org/scripttemplates/otSDKStub.js")
+    assert blocked(profile, "https://www.zim.com/images/hero.jpg")
+    assert blocked(profile, "https://www.zim.com/fonts/brand.woff2?v=3")
+    assert not blocked(profile, "https://www.zim.com/tools/track-a-shipment")
+    assert not blocked(profile, "https://www.zim.com/api/v2/tracking?consnumber=ZIMU1234567")
+    # Stylesheets are not in the default types
+    assert not blocked(profile, "https://www.zim.com/css/site.css")
+
+
+def test_allow_list_wins_over_deny_list():
+    profile = BlockingProfile(
+        deny_domains=["zim.com", "static.zim.com", "example.com", "hotjar.com"],
+        allow_domains=["www.zim.com", "example.com"],
+    )
+    # zim.com would take www.zim.com with it; static.zim.com is unrelated
+    assert profile.deny_domains == ["static.zim.com", "hotjar.com"]
+    assert not blocked(profile, "https://www.zim.com/tools/track-a-shipment")
+    assert blocked(profile, "https://static.zim.com/app.js")
+    assert blocked(profile, "https://script.hotjar.com/modules.js")
+
+
+def test_unknown_types_and_empty_profile():
+    profile = BlockingProfile(resource_types=["Image", "video"])
+    assert profile.resource_types == ["image"]
+    assert profile.chrome_arguments() == ["--blink-settings=imagesEnabled=false"]
+
+    empty = BlockingProfile()
+    assert not empty.enabled and empty.url_patterns() == [] and empty.chrome_arguments() == []
+
+    class Driver:
+        def execute_cdp_cmd(self, command, params):
+            raise AssertionError("an empty profile sends nothing")
+
+    empty.apply(Driver())
+
+
+def test_apply_sends_the_patterns():
+    sent = []
+
+    class Driver:
+        def execute_cdp_cmd(self, command, params):
+            sent.append((command, params))
+
+    profile = BlockingProfile(["font"], ["hotjar.com"])
+    profile.apply(Driver())
+    assert sent == [("Network.enable", {}), ("Network.setBlockedURLs", {"urls": profile.url_patterns()})]
+
+
+def test_network_summary_counts_blocked_requests_by_type():
+    def message(method, **params):
+        return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+    log = [
+        message("Network.requestWillBeSent", requestId="1", type="Document"),
+        message("Network.loadingFinished", requestId="1", encodedDataLength=5000),
+        message("Network.requestWillBeSent", requestId="2", type="Image"),
+        message("Network.loadingFailed", requestId="2", blockedReason="inspector"),
+        message("Network.requestWillBeSent", requestId="3", type="Script"),
+        message("Network.loadingFailed", requestId="3", errorText="net::ERR_ABORTED"),
+    ]
+    log.append({"message": "not json"})
+
+    class Driver:
+        def get_log(self, kind):
+            assert kind == "performance"
+            return log
+
+    summary = summarize_network(read_performance_log(Driver()))
+    assert summary == {
+        "requests": 3,
+        "requestsBlocked": 1,
+        "requestsFailed": 1,
+        "bytesLoaded": 5000,
+        "blockedByType": {"image": 1},
+    }
+
+    stats = NetworkStats()
+    stats.record(summary)
+    stats.record(summary)
+    totals = stats.stats()
+    assert totals["scrapes"] == 2 and totals["requestsBlocked"] == 2
+    assert totals["blockedByType"] == {"image": 2}
+    assert totals["lastScrape"] == summary
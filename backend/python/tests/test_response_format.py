@@ -0,0 +1,131 @@
+import gzip
+import json
+import os
+
+import pytest
+
+import mock_site
+import port_index
+import settings
+import zim_tracker_service as service
+from html_parser import parse_snapshot
+from response_format import (
+    accepted_encodings,
+    body_etag,
+    compact_payload,
+    compress,
+    dumps,
+    etag_matches,
+    prune_nulls,
+)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def ports():
+    port_index.load_index(settings.PORT_INDEX_PATH)
+
+
+def fixture_result(identifier):
+    with open(os.path.join(mock_site.FIXTURES_DIR, mock_site.FIXTURES[identifier]), encoding="utf-8") as fh:
+        return service.payload_from_snapshot(parse_snapshot(fh.read()), identifier)
+
+
+def expand(compact):
+    # What a client does to read a compact body back as the full schema
+    containers = []
+    for container in compact["containers"]:
+        container = dict(container)
+        if "routesRef" in container:
+            container["routes"] = compact["sharedRoutes"][container.pop("routesRef")]
+        containers.append(container)
+    return {**{k: v for k, v in compact.items() if k != "sharedRoutes"}, "containers": containers}
+
+
+def test_prune_nulls_drops_empty_objects_but_keeps_falsy_values():
+    value = {"a": None, "b": {"c": None}, "d": [{"e": None, "f": 0}], "g": "", "h": False}
+    assert prune_nulls(value) == {"d": [{"f": 0}], "g": "", "h": False}
+
+
+@pytest.mark.parametrize("identifier", sorted(mock_site.FIXTURES))
+def test_compact_payload_loses_nothing_but_nulls(identifier):
+    full = fixture_result(identifier).to_dict()
+    compact = compact_payload(full)
+    assert len(dumps(compact, True)) < len(dumps(full))
+    assert expand(compact) == prune_nulls(full)
+    # The cached payload it was built from is left as it was
+    assert full == fixture_result(identifier).to_dict()
+
+
+def test_bol_routes_are_shared_once():
+    compact = compact_payload(fixture_result("ZIMUSHH30500001").to_dict())
+    assert len(compact["sharedRoutes"]) == 1
+    assert {container["routesRef"] for container in compact["containers"]} == {0}
+
+
+def test_full_schema_dumps_like_json_dumps():
+    value = {"refNum": "ZIMU1234567", "place": "HAIFA, ISRAEL", "none": None}
+    assert dumps(value) == json.dumps(value, ensure_ascii=False).encode("utf-8")
+    assert json.loads(dumps(value, True)) == value
+
+
+@pytest.mark.parametrize(
+    "header, matches",
+    [
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"abc-gzip"', True),
+        ('"other", "abc-br"', True),
+        ("*", True),
+        ('"abcd"', False),
+        (None, False),
+    ],
+)
+def test_etag_matches_any_variant(header, matches):
+    assert etag_matches(header, "abc") is matches
+
+
+def test_compression_follows_accept_encoding():
+    body = b'{"events": []}' * 200
+    assert accepted_encodings("gzip;q=0.5, br;q=0, identity") == {"gzip": 0.5, "br": 0.0, "identity": 1.0}
+    compressed, encoding = compress(body, "br;q=0, gzip")
+    assert encoding == "gzip" and gzip.decompress(compressed) == body
+    assert compress(body, "identity") == (body, None)
+    assert compress(body, None) == (body, None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    result = fixture_result("ZIMU7654321")
+    monkeypatch.setattr(service, "lookup_tracking", lambda *args, **kwargs: (result, {"X-Cache": "HIT", "Age": "3"}))
+    return service.app.test_client()
+
+
+def test_matching_if_none_match_gets_304(client):
+    first = client.get("/api/zim/track?container=ZIMU7654321")
+    assert first.status_code == 200 and "Content-Encoding" not in first.headers
+    etag = first.headers["ETag"]
+    assert etag == f'"{body_etag(first.get_data())}"'
+
+    again = client.get("/api/zim/track?container=ZIMU7654321", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.get_data() == b""
+    assert again.headers["ETag"] == etag
+    assert again.headers["X-Cache"] == "HIT" and again.headers["Age"] == "3"
+
+    # The compact body is a different representation with its own validator
+    compact = client.get("/api/zim/track?container=ZIMU7654321&compact=1", headers={"If-None-Match": etag})
+    assert compact.status_code == 200 and compact.headers["ETag"] != etag
+
+
+def test_compressed_variant_and_its_etag(client):
+    response = client.get("/api/zim/track?container=ZIMU7654321", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    etag = response.headers["ETag"]
+    assert etag.endswith('-gzip"')
+    assert json.loads(gzip.decompress(response.get_data())) == fixture_result("ZIMU7654321").to_dict()
+
+    revalidated = client.get(
+        "/api/zim/track?container=ZIMU7654321", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
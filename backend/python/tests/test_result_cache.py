@@ -0,0 +1,90 @@
+import time
+
+from result_cache import BYPASS, HIT, MISS, STALE, ResultCache, cache_key
+from tracking_model import Container, Event, Location, TrackingResult, Vessel
+
+
+def counting_fetch(value="v"):
+    calls = []
+
+    def fetch():
+        calls.append(time.monotonic())
+        return {"value": value, "call": len(calls)}
+
+    return fetch, calls
+
+
+def test_hit_after_miss():
+    cache = ResultCache(ttl=60)
+    fetch, calls = counting_fetch()
+    assert cache.get_or_fetch("k", fetch)[1] == MISS
+    value, status, _ = cache.get_or_fetch("k", fetch)
+    assert status == HIT and value["call"] == 1
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_max_age_zero_bypasses_and_refills():
+    cache = ResultCache(ttl=60)
+    fetch, calls = counting_fetch()
+    cache.get_or_fetch("k", fetch)
+    value, status, _ = cache.get_or_fetch("k", fetch, max_age=0)
+    assert status == BYPASS and value["call"] == 2
+    assert cache.get_or_fetch("k", fetch)[0]["call"] == 2
+
+
+def test_stale_while_revalidate():
+    cache = ResultCache(ttl=0.05, stale_ttl=60)
+    fetch, calls = counting_fetch()
+    cache.get_or_fetch("k", fetch)
+    time.sleep(0.1)
+    value, status, _ = cache.get_or_fetch("k", fetch)
+    assert status == STALE and value["call"] == 1
+    for _ in range(200):
+        if cache.stats()["refreshes"]:
+            break
+        time.sleep(0.01)
+    assert cache.peek("k")[0]["call"] == 2
+
+
+def test_explicit_max_age_never_gets_stale_data():
+    cache = ResultCache(ttl=0.05, stale_ttl=60)
+    fetch, calls = counting_fetch()
+    cache.get_or_fetch("k", fetch)
+    time.sleep(0.1)
+    value, status, _ = cache.get_or_fetch("k", fetch, max_age=30)
+    assert status == MISS and value["call"] == 2
+
+
+def test_evicts_least_recently_used_by_count_and_bytes():
+    cache = ResultCache(ttl=60, max_entries=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    cache.peek("a")
+    cache.put("c", {"v": 3})
+    assert cache.peek("b") is None
+    assert cache.peek("a") is not None and cache.peek("c") is not None
+
+    small = ResultCache(ttl=60, max_bytes=30)
+    small.put("a", {"v": "x" * 10})
+    small.put("b", {"v": "y" * 10})
+    assert small.peek("a") is None
+    assert small.stats()["bytes"] <= 30
+    small.put("huge", {"v": "z" * 100})
+    assert small.peek("huge") is None
+
+
+def test_cache_key_normalizes():
+    assert cache_key(" zimu 1234567 ", "Container ") == cache_key("ZIMU1234567", "container")
+
+
+def test_tracking_result_is_sized_without_keeping_its_body():
+    location = Location("SÃO PAULO, BRAZIL", "SÃO PAULO", "BRAZIL")
+    event = Event("Discharged", "01-Mar-2026 10:00", location, 0, Vessel("ZIM ROTTERDAM"), "12E")
+    container = Container("40HC", "ZIMU1234567", (event,), (), None)
+    result = TrackingResult("ZIMU1234567", "Container", None, None, (container,))
+    cache = ResultCache(ttl=60)
+    cache.put("k", result)
+    assert result._encoded is None
+    assert cache.stats()["bytes"] == len(result.dump())
+    assert result.body_size() == len(result.encode())
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from deadline import DeadlineExceeded
+from singleflight import WAIT_STAGE, SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    def caller():
+        results.append(flight.do("key", work))
+
+    threads = [threading.Thread(target=caller) for _ in range(5)]
+    threads[0].start()
+    while not calls:
+        threading.Event().wait(0.005)
+    for thread in threads[1:]:
+        thread.start()
+    while flight._calls["key"].waiters < 4:
+        threading.Event().wait(0.005)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {value for value, _ in results} == {"result"}
+    assert flight.stats() == {"inFlight": 0, "leaders": 1, "coalesced": 4, "errors": 0, "waitsTimedOut": 0}
+
+
+def test_error_reaches_every_waiter_and_is_not_kept():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    def caller():
+        try:
+            flight.do("key", failing)
+        except ValueError as exc:
+            errors.append(exc)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=caller)
+    follower.start()
+    while flight._calls["key"].waiters < 1:
+        threading.Event().wait(0.005)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 2
+    assert flight.do("key", lambda: "recovered") == ("recovered", False)
+    with pytest.raises(KeyError):
+        flight.do("other", lambda: {}["missing"])
+
+
+def test_follower_gives_up_at_its_own_timeout():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "late"
+
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", slow)))
+    leader.start()
+    started.wait(5)
+    began = time.monotonic()
+    with pytest.raises(DeadlineExceeded) as raised:
+        flight.do("key", slow, timeout=0.05)
+    assert time.monotonic() - began < 1
+    assert raised.value.stage == WAIT_STAGE
+
+    release.set()
+    leader.join()
+    assert results == [("late", False)]
+    assert flight.stats()["waitsTimedOut"] == 1
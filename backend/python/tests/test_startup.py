@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import zim_tracker_service as service
+from chromedriver_cache import PATCH_MARKER, ChromedriverCache
+from startup import StartupTracker
+
+
+def test_tracker_states_and_timings():
+    tracker = StartupTracker()
+    assert tracker.stats()["status"] == "warming" and not tracker.is_ready()
+
+    with pytest.raises(OSError):
+        with tracker.phase("chromedriver"):
+            raise OSError("download blocked")
+    tracker.attempt_failed(OSError("download blocked"))
+    stats = tracker.stats()
+    assert stats["failedAttempts"] == 1 and stats["lastError"] == "OSError: download blocked"
+    assert "chromedriver" in stats["phases"]
+
+    tracker.detail("browsersWarmed", 2)
+    tracker.set_ready()
+    tracker.first_request(0.25)
+    tracker.first_request(9.0)
+    stats = tracker.stats()
+    assert stats["status"] == "ready" and tracker.is_ready()
+    assert stats["lastError"] is None and stats["browsersWarmed"] == 2
+    assert stats["firstRequest"]["durationSeconds"] == 0.25
+    # Counted from process start, so interpreter start-up and imports are included
+    assert stats["marks"]["ready"] > 0
+
+    tracker.set_draining()
+    assert tracker.draining and not tracker.is_ready()
+    assert tracker.stats()["status"] == "draining"
+
+
+def test_readyz_follows_the_tracker(monkeypatch):
+    tracker = StartupTracker()
+    monkeypatch.setattr(service, "startup", tracker)
+    client = service.app.test_client()
+
+    response = client.get("/readyz")
+    assert response.status_code == 503 and response.get_json()["status"] == "warming"
+    tracker.set_ready()
+    assert client.get("/readyz").status_code == 200
+    tracker.set_draining()
+    response = client.get("/readyz")
+    assert response.status_code == 503 and response.get_json()["status"] == "draining"
+    # Liveness is unaffected
+    assert client.get("/healthz").status_code == 200
+
+
+def test_service_import_leaves_undetected_chromedriver_unloaded():
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = "import sys, zim_tracker_service; print('undetected_chromedriver' in sys.modules)"
+    root = os.path.dirname(here)
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([root, os.path.join(root, "benchmarks")])}
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env, timeout=120
+    ).stdout
+    assert output.strip() == "False"
+
+
+@pytest.fixture
+def browser(tmp_path):
+    # A stand-in Chrome whose --version the test can change
+    path = tmp_path / "chrome"
+
+    def install(version):
+        path.write_text(f"#!/bin/sh\necho 'Google Chrome {version}'\n")
+        path.chmod(0o755)
+        return str(path)
+
+    return install
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    built = []
+
+    def build(self, entry_dir, driver_path, version):
+        built.append(version)
+        os.makedirs(entry_dir, exist_ok=True)
+        with open(driver_path, "wb") as fh:
+            fh.write(b"\x7fELF..." + PATCH_MARKER)
+        os.chmod(driver_path, 0o755)
+        with open(os.path.join(entry_dir, "metadata.json"), "w", encoding="utf-8") as fh:
+            json.dump({"browserVersion": version}, fh)
+
+    monkeypatch.setattr(ChromedriverCache, "_build", build)
+    return built
+
+
+def test_driver_is_patched_once_per_chrome_version(tmp_path, browser, builds):
+    cache_dir = str(tmp_path / "drivers")
+    chrome = browser("126.0.6478.126")
+
+    first = ChromedriverCache(cache_dir, chrome).ensure()
+    assert first.source == "patched" and first.version_main == 126
+    assert first.uc_arguments() == {
+        "driver_executable_path": os.path.join(cache_dir, "126.0.6478.126", "undetected_chromedriver"),
+        "browser_executable_path": chrome,
+        "version_main": 126,
+    }
+    # Another worker, or a restart, finds it
+    assert ChromedriverCache(cache_dir, chrome).ensure().source == "cache"
+    assert builds == ["126.0.6478.126"]
+
+    browser("127.0.6533.72")
+    upgraded = ChromedriverCache(cache_dir, chrome).ensure()
+    assert upgraded.source == "patched" and upgraded.version_main == 127
+    assert sorted(os.listdir(cache_dir)) == [".lock", "127.0.6533.72"]
+
+
+def test_tampered_driver_is_rebuilt(tmp_path, browser, builds):
+    cache_dir = str(tmp_path / "drivers")
+    chrome = browser("126.0.6478.126")
+    info = ChromedriverCache(cache_dir, chrome).ensure()
+    with open(info.driver_path, "wb") as fh:
+        fh.write(b"\x7fELF unpatched")
+    assert ChromedriverCache(cache_dir, chrome).ensure().source == "patched"
+    assert len(builds) == 2
+
+
+def test_unknown_browser_version_is_left_to_uc(tmp_path, builds):
+    info = ChromedriverCache(str(tmp_path / "drivers"), str(tmp_path / "missing-chrome")).ensure()
+    assert info.source == "uc" and info.driver_path is None
+    assert info.uc_arguments() == {"browser_executable_path": str(tmp_path / "missing-chrome")}
+    assert builds == []
@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+import mock_site
+import port_index
+import settings
+import zim_tracker_service as service
+from html_parser import parse_snapshot
+
+
+@pytest.fixture(scope="module", autouse=True)
+def ports():
+    port_index.load_index(settings.PORT_INDEX_PATH)
+
+
+def fixture_result(identifier):
+    with open(os.path.join(mock_site.FIXTURES_DIR, mock_site.FIXTURES[identifier]), encoding="utf-8") as fh:
+        return service.payload_from_snapshot(parse_snapshot(fh.read()), identifier)
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    # Streams the first container while "parsing", as a live scrape does,
+    # and leaves the rest to be sent with the result
+    seen = []
+
+    def lookup(identifier, ref_type, max_age=None, extraction=None, timeout=None, on_container=None, fields=None):
+        seen.append(identifier)
+        if identifier not in mock_site.FIXTURES:
+            raise service.TrackingNotFound(f"no results for {identifier}")
+        result = fixture_result(identifier)
+        if on_container is not None:
+            on_container(result.containers[0].to_dict())
+        return result, {"X-Cache": "MISS"}
+
+    monkeypatch.setattr(service, "lookup_tracking", lookup)
+    return seen
+
+
+def records(response):
+    assert response.mimetype == service.NDJSON_MIMETYPE
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_single_lookup_streams_containers_then_the_result(lookups):
+    response = service.app.test_client().get(
+        "/api/zim/track?refNum=ZIMUSHH30500001&refType=BillOfLanding", headers={"Accept": service.NDJSON_MIMETYPE}
+    )
+    lines = records(response)
+    expected = fixture_result("ZIMUSHH30500001").to_dict()
+
+    assert [line["type"] for line in lines] == ["header"] + ["container"] * 4 + ["result"]
+    # Each container exactly once, in order, however it reached the stream
+    assert [line["container"] for line in lines[1:-1]] == expected["containers"]
+    result = lines[-1]
+    assert result["containerCount"] == 4 and result["cache"] == "MISS"
+    assert "containers" not in result
+    assert result["currentStatus"] == expected["currentStatus"]
+
+
+def test_batch_stream_reports_errors_and_a_summary(lookups):
+    response = service.app.test_client().post(
+        "/api/zim/track/batch?stream=1", json={"containers": ["ZIMU1234567", "MISSING1", ""]}
+    )
+    lines = records(response)
+
+    by_index = {}
+    for line in lines[:-1]:
+        by_index.setdefault(line["index"], []).append(line)
+    assert [line["type"] for line in by_index[0]] == ["header", "container", "result"]
+    assert by_index[1][-1]["type"] == "error" and by_index[1][-1]["status"] == 404
+    assert by_index[2][-1] == {
+        "type": "error",
+        "index": 2,
+        "refNum": "",
+        "refType": "Container",
+        "status": 400,
+        "error": "empty identifier",
+    }
+    assert lines[-1] == {"type": "summary", "total": 3, "succeeded": 1, "failed": 2}
+    assert sorted(lookups) == ["MISSING1", "ZIMU1234567"]
+
+
+def test_change_feeds_are_not_streamed(lookups, monkeypatch):
+    monkeypatch.setattr(service, "tracking_store", None)
+    response = service.app.test_client().get("/api/zim/track?container=ZIMU1234567&changesOnly=1&stream=1")
+    assert response.status_code == 404
+    assert lookups == []
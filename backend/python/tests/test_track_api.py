@@ -0,0 +1,50 @@
+import pytest
+
+import zim_tracker_service as service
+from tracking_model import TrackingResult
+from tracking_store import TrackingStore
+
+
+@pytest.fixture
+def no_scrape(monkeypatch):
+    def lookup(*args, **kwargs):
+        raise AssertionError("the request should be refused before scraping")
+
+    monkeypatch.setattr(service, "lookup_tracking", lookup)
+
+
+@pytest.mark.parametrize("query", ["changesOnly=1", "since=1700000000"])
+def test_change_feed_without_store_is_refused(monkeypatch, no_scrape, query):
+    monkeypatch.setattr(service, "tracking_store", None)
+    response = service.app.test_client().get(f"/api/zim/track?container=ZIMU1234567&{query}")
+    assert response.status_code == 404
+    assert response.get_json() == {"error": "tracking store is disabled"}
+
+
+def test_bad_since_is_refused_before_scraping(monkeypatch, no_scrape, tmp_path):
+    monkeypatch.setattr(service, "tracking_store", TrackingStore(str(tmp_path / "store.sqlite3")))
+    response = service.app.test_client().get("/api/zim/track?container=ZIMU1234567&since=yesterday")
+    assert response.status_code == 400
+    assert "since" in response.get_json()["error"]
+
+
+def test_changes_only_reports_what_the_latest_scrape_changed(monkeypatch, tmp_path):
+    store = TrackingStore(str(tmp_path / "store.sqlite3"))
+    monkeypatch.setattr(service, "tracking_store", store)
+    statuses = iter(["On board", "On board", "Discharged"])
+
+    def lookup(identifier, ref_type, *args, **kwargs):
+        # What track_identifier does after a scrape
+        result = TrackingResult(identifier, ref_type, next(statuses), None, ())
+        store.record(identifier, ref_type, result.to_dict())
+        return result, {"X-Cache": "MISS"}
+
+    monkeypatch.setattr(service, "lookup_tracking", lookup)
+    client = service.app.test_client()
+
+    first = client.get("/api/zim/track?container=ZIMU1234567&changesOnly=1").get_json()
+    assert first["changed"] and first["transitions"][0]["to"] == "On board"
+    assert not client.get("/api/zim/track?container=ZIMU1234567&changesOnly=1").get_json()["changed"]
+    third = client.get("/api/zim/track?container=ZIMU1234567&since=0").get_json()
+    assert third["currentStatus"] == "Discharged"
+    assert [(t["from"], t["to"]) for t in third["transitions"]] == [(None, "On board"), ("On board", "Discharged")]
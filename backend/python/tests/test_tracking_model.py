@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+
+import pytest
+
+import mock_site
+import port_index
+import settings
+import tracking_model
+import zim_tracker_service as service
+from html_parser import parse_snapshot
+from tracking_model import Event, Location, SharedTable, TrackingResult, shared_location, shared_vessel
+
+
+def test_shared_table_drops_least_recently_used():
+    table = SharedTable(capacity=2)
+    table.add("a", 1)
+    table.add("b", 2)
+    assert table.get("a") == 1
+    table.add("c", 3)
+    assert len(table) == 2
+    assert table.get("b") is None
+    assert table.get("a") == 1 and table.get("c") == 3
+
+
+def test_shared_table_keeps_first_entry_for_a_key():
+    table = SharedTable()
+    first = table.add("key", object())
+    assert table.add("key", object()) is first
+
+
+def test_threads_share_one_location_per_name(monkeypatch):
+    monkeypatch.setattr(tracking_model, "_locations", SharedTable())
+    barrier = threading.Barrier(16)
+    seen = []
+
+    def build(name):
+        return Location(name, name, None)
+
+    def lookup():
+        barrier.wait()
+        seen.append(shared_location("HAIFA, ISRAEL", build))
+        seen.append(shared_location("HAIFA, ISRAEL", build, "HAIFA PORT"))
+
+    threads = [threading.Thread(target=lookup) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(location) for location in seen}) == 2
+
+
+def test_vessel_table_is_bounded(monkeypatch):
+    monkeypatch.setattr(tracking_model, "_vessels", SharedTable(capacity=8))
+    for i in range(100):
+        shared_vessel(f"VESSEL {i}")
+    assert len(tracking_model._vessels) == 8
+
+
+def test_times_are_not_interned():
+    location = Location("HAIFA", "HAIFA", "ISRAEL")
+    vessel = shared_vessel("ZIM HAIFA")
+    stamp = "".join(["01-Feb-2025 ", "11:00"])
+    first = Event("Discharged", stamp, location, 0, vessel, "1/E")
+    second = Event("Discharged", "".join(["01-Feb-2025 ", "11:00"]), location, 0, vessel, "1/E")
+    assert first.event_time == second.event_time
+    assert first.event_time is not second.event_time
+    assert first.status is second.status
+
+
+@pytest.mark.parametrize("identifier, fixture", sorted(mock_site.FIXTURES.items()))
+def test_from_dict_rebuilds_the_same_body(identifier, fixture, monkeypatch):
+    port_index.load_index(settings.PORT_INDEX_PATH)
+    with open(os.path.join(mock_site.FIXTURES_DIR, fixture), encoding="utf-8") as fh:
+        result = service.payload_from_snapshot(parse_snapshot(fh.read()), identifier)
+    payload = json.loads(result.dump())
+
+    # Empty tables, so nothing is borrowed from the scrape that built `result`
+    monkeypatch.setattr(tracking_model, "_locations", SharedTable())
+    monkeypatch.setattr(tracking_model, "_vessels", SharedTable())
+    rebuilt = TrackingResult.from_dict(payload)
+
+    assert rebuilt.dump() == result.dump()
+    if len(rebuilt.containers) > 1:
+        assert rebuilt.containers[0].routes is rebuilt.containers[1].routes
@@ -0,0 +1,98 @@
+import copy
+
+import pytest
+
+from tracking_store import TrackingStore
+
+
+def event(status, location, event_time, stop_index, vessel=None):
+    return {
+        "status": status,
+        "eventTime": event_time,
+        "location": {"name": location},
+        "stopIndex": stop_index,
+        "vesselInfo": {"name": vessel},
+    }
+
+
+FIRST = {
+    "refNum": "ZIMU1234567",
+    "currentStatus": "On board",
+    "containers": [
+        {
+            "containerNum": "ZIMU1234567",
+            "podETA": "05-Mar-2025",
+            "events": [
+                event("Gate in", "SHANGHAI", "2025-02-01T11:00:00", 0),
+                event("Loaded on vessel", "SHANGHAI", "2025-02-03T09:00:00", 1, "ZIM ASIA"),
+            ],
+        }
+    ],
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TrackingStore(str(tmp_path / "tracking.sqlite3"))
+    yield store
+    store.close()
+
+
+def second_scrape():
+    payload = copy.deepcopy(FIRST)
+    payload["currentStatus"] = "Discharged"
+    container = payload["containers"][0]
+    container["podETA"] = "07-Mar-2025"
+    # A new first event shifts every stopIndex, which is not a change
+    container["events"].insert(0, event("Empty released", "SHANGHAI", "2025-01-30T08:00:00", 0))
+    container["events"][1]["stopIndex"] = 1
+    container["events"][2]["stopIndex"] = 2
+    container["events"][2]["vesselInfo"]["name"] = "ZIM ASIA II"
+    container["events"].append(event("Discharged from vessel", "HAIFA", "2025-03-07T06:00:00", 3, "ZIM ASIA II"))
+    return payload
+
+
+def test_changes_since_returns_only_what_moved(store):
+    first = store.record("ZIMU1234567", "Container", FIRST, now=100.0)
+    assert first["changed"] and len(first["newEvents"]) == 2
+    again = store.record("zimu1234567 ", "Container", copy.deepcopy(FIRST), now=150.0)
+    assert not again["changed"]
+    store.record("ZIMU1234567", "Container", second_scrape(), now=200.0)
+
+    changes = store.changes_since("ZIMU1234567", "Container", 150.0)
+    assert changes["changed"]
+    assert (changes["currentStatus"], changes["lastScrapedAt"], changes["lastChangedAt"]) == ("Discharged", 200.0, 200.0)
+    (container,) = changes["containers"]
+    assert container["podETA"] == "07-Mar-2025"
+    assert [(e["status"], e["changeType"]) for e in container["events"]] == [
+        ("Loaded on vessel", "changed"),
+        ("Empty released", "new"),
+        ("Discharged from vessel", "new"),
+    ]
+    assert [(t["field"], t["from"], t["to"]) for t in changes["transitions"]] == [
+        ("currentStatus", "On board", "Discharged"),
+        ("podETA", "05-Mar-2025", "07-Mar-2025"),
+    ]
+
+
+def test_since_is_exclusive_unless_asked(store):
+    store.record("ZIMU1234567", "Container", FIRST, now=100.0)
+    assert not store.changes_since("ZIMU1234567", "Container", 100.0)["changed"]
+    inclusive = store.changes_since("ZIMU1234567", "Container", 100.0, inclusive=True)
+    assert inclusive["changed"]
+    assert len(inclusive["containers"][0]["events"]) == 2
+
+    unknown = store.changes_since("ZIMU7654321", "Container", 0.0)
+    assert not unknown["changed"] and unknown["currentStatus"] is None and unknown["containers"] == []
+
+
+def test_changed_since_lists_identifiers_newest_first(store):
+    store.record("ZIMU1234567", "Container", FIRST, now=100.0)
+    store.record("ZIMU7654321", "Container", {**copy.deepcopy(FIRST), "refNum": "ZIMU7654321"}, now=120.0)
+    # An unchanged scrape does not move last_changed_at
+    store.record("ZIMU1234567", "Container", copy.deepcopy(FIRST), now=130.0)
+
+    assert [row["identifier"] for row in store.changed_since(0.0)] == ["ZIMU7654321", "ZIMU1234567"]
+    assert [row["identifier"] for row in store.changed_since(110.0)] == ["ZIMU7654321"]
+    assert store.changed_since(0.0, limit=1)[0]["ref_num"] == "ZIMU7654321"
+    assert store.stats()["tracked"] == 2 and store.stats()["events"] == 4
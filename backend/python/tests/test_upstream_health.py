@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from upstream_health import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ConcurrencyLimit, TokenBucket, UpstreamHealth
+from upstream_health import UpstreamUnavailable
+
+
+def controller(rate=0.0, burst=1, maximum=2, **breaker):
+    return UpstreamHealth(
+        TokenBucket(rate, burst),
+        ConcurrencyLimit(1, maximum, target_latency=1.0, cooldown=0.0),
+        CircuitBreaker(**{"min_requests": 2, "window": 60.0, "open_seconds": 0.05, **breaker}),
+    )
+
+
+def test_token_bucket_limits_start_rate():
+    bucket = TokenBucket(rate=10.0, burst=2)
+    assert bucket.acquire(0) and bucket.acquire(0)
+    assert not bucket.acquire(0)
+    started = time.monotonic()
+    assert bucket.acquire(1.0)
+    assert 0.05 <= time.monotonic() - started < 0.5
+
+
+def test_concurrency_limit_backs_off_and_recovers():
+    limit = ConcurrencyLimit(1, 4, target_latency=1.0, cooldown=0.0)
+    assert limit.acquire(0)
+    limit.release(latency=None, failed=True)
+    assert limit.limit == 2.0
+    for _ in range(10):
+        assert limit.acquire(0)
+        limit.release(latency=0.1, failed=False)
+    assert limit.limit > 2.0
+    assert limit.stats()["decreases"] == 1
+
+
+def test_concurrency_limited_acquire_fails_fast():
+    health = controller(maximum=1)
+    permit = health.acquire(1.0)
+    with pytest.raises(UpstreamUnavailable):
+        health.acquire(0.01)
+    health.release(permit, latency=0.1)
+    assert health.stats()["concurrencyLimited"] == 1
+
+
+def test_breaker_opens_probes_and_closes():
+    health = controller()
+    for _ in range(2):
+        health.release(health.acquire(1.0), failed=True)
+    assert health.breaker.state == OPEN
+    with pytest.raises(UpstreamUnavailable):
+        health.acquire(1.0)
+
+    time.sleep(0.06)
+    probe = health.acquire(1.0)
+    assert probe.probe and health.breaker.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(UpstreamUnavailable):
+        health.acquire(1.0)
+    health.release(probe, latency=0.1)
+    assert health.breaker.state == CLOSED
+    assert health.stats()["shortCircuited"] == 2
+
+
+def test_probe_that_never_reached_the_site_is_handed_on():
+    health = controller()
+    for _ in range(2):
+        health.release(health.acquire(1.0), failed=True)
+    time.sleep(0.06)
+    probe = health.acquire(1.0)
+    health.release(probe)
+    assert health.acquire(1.0).probe
+
+
+def test_retry_stops_when_breaker_opens_or_time_runs_out():
+    health = controller()
+    health.retry_base = 0.001
+    assert health.retry(0, remaining=1.0)
+    assert not health.retry(health.max_retries, remaining=1.0)
+    health.breaker.state = OPEN
+    assert not health.retry(0, remaining=1.0)
+
+
+def test_concurrency_limited_acquire_refunds_its_token():
+    health = controller(rate=0.001, burst=2, maximum=1)
+    permit = health.acquire(1.0)
+    with pytest.raises(UpstreamUnavailable):
+        health.acquire(0.01)
+    assert health.bucket.tokens() == pytest.approx(1.0, abs=0.01)
+    health.release(permit, latency=0.1)
+    health.release(health.acquire(1.0), latency=0.1)
@@ -0,0 +1,188 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from watchlist import HOUR, WatchEntry, Watchlist, refresh_interval
+
+
+def no_refresh(ref_num, ref_type):
+    raise AssertionError("not scheduled in these tests")
+
+
+def test_processes_share_the_watchlist_through_sqlite(tmp_path):
+    # Two instances on one file stand in for the scheduler process and
+    # another gunicorn worker answering the API
+    path = str(tmp_path / "watchlist.sqlite3")
+    scheduler = Watchlist(no_refresh, path)
+    api = Watchlist(no_refresh, path)
+
+    entry, created = api.add("ZIMU1234567", "Container")
+    assert created
+    assert [item["refNum"] for item in scheduler.entries()] == ["ZIMU1234567"]
+
+    _, created = scheduler.add("ZIMU1234567", "Container")
+    assert not created
+
+    assert scheduler.remove("ZIMU1234567", "Container")
+    assert api.entries() == []
+    assert not api.remove("ZIMU1234567", "Container")
+
+
+def test_repeated_add_keeps_refresh_state(tmp_path):
+    path = str(tmp_path / "watchlist.sqlite3")
+    scheduler = Watchlist(no_refresh, path)
+    api = Watchlist(no_refresh, path)
+    scheduler.add("ZIMU1234567", "Container")
+    scheduler._conn.execute("UPDATE watchlist SET current_status = 'Discharged', last_refreshed_at = 1.0")
+
+    entry, created = api.add("ZIMU1234567", "Container")
+    assert not created
+    assert entry.current_status == "Discharged"
+    assert api.entries()[0]["currentStatus"] == "Discharged"
+
+
+def test_other_workers_see_scheduled_refreshes(tmp_path):
+    path = str(tmp_path / "watchlist.sqlite3")
+    payload = {
+        "currentStatus": "On board",
+        "containers": [{"podETA": "01-Jan-2030", "events": [{"status": "Loaded on vessel"}]}],
+    }
+    scheduler = Watchlist(lambda ref_num, ref_type: payload, path)
+    api = Watchlist(no_refresh, path)
+    api.add("ZIMU1234567", "Container")
+    assert api.stats()["entries"] == 1 and api.stats()["queueDepth"] == 1
+
+    # What the scheduler thread does on a tick, run inline
+    scheduler._scheduling = True
+    scheduler._load()
+    (key,) = scheduler._entries
+    scheduler._refresh_entry(key, scheduler._entries[key])
+
+    (item,) = api.entries()
+    assert item["currentStatus"] == "On board"
+    assert item["lastEvent"] == "Loaded on vessel"
+    assert item["refreshes"] == 1
+    assert api.entries() == scheduler.entries()
+    stats = api.stats()
+    assert not stats["scheduling"]
+    assert stats["queueDepth"] == 0
+    assert api._entries == {}
+
+
+def test_older_files_gain_the_scheduling_columns(tmp_path):
+    path = str(tmp_path / "watchlist.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE watchlist (identifier TEXT NOT NULL, ref_type TEXT NOT NULL, ref_num TEXT NOT NULL, "
+        "ref_type_label TEXT NOT NULL, added_at REAL NOT NULL, last_refreshed_at REAL, current_status TEXT, "
+        "status_changed_at REAL, pod_eta TEXT, last_event_status TEXT, PRIMARY KEY (identifier, ref_type));"
+        "INSERT INTO watchlist VALUES ('ZIMU1234567', 'container', 'ZIMU1234567', 'Container', 5.0, "
+        "NULL, NULL, NULL, NULL, NULL);"
+    )
+    conn.close()
+
+    (item,) = Watchlist(no_refresh, path).entries()
+    assert item["nextDueAt"] == 5.0
+    assert item["refreshes"] == 0
+
+
+def entry_with(last_event=None, pod_eta=None, status_changed_at=None, now=0.0):
+    entry = WatchEntry("ZIMU1234567", "Container", now - 48 * HOUR)
+    entry.last_refreshed_at = now - HOUR
+    entry.last_event_status = last_event
+    entry.pod_eta = pod_eta
+    entry.status_changed_at = status_changed_at
+    return entry
+
+
+@pytest.mark.parametrize(
+    "last_event, pod_eta, interval",
+    [
+        ("Empty container returned", None, 24 * HOUR),
+        ("Delivered to consignee", "01-Jan-2020", 24 * HOUR),
+        ("Discharged from vessel", None, 6 * HOUR),
+        ("Loaded on vessel", None, 2 * HOUR),
+        ("Loaded on vessel", "not a date", 2 * HOUR),
+        ("Loaded on vessel", "02-Jan-2025", 0.5 * HOUR),
+        ("Loaded on vessel", "06-Jan-2025", 2 * HOUR),
+        ("Loaded on vessel", "01-Mar-2025", 6 * HOUR),
+    ],
+)
+def test_refresh_interval_follows_the_shipment(last_event, pod_eta, interval):
+    now = time.mktime(time.strptime("01-Jan-2025", "%d-%b-%Y"))
+    assert refresh_interval(entry_with(last_event, pod_eta, now=now), now) == interval
+
+
+def test_new_and_recently_changed_entries_come_sooner():
+    now = 1_000_000.0
+    never_refreshed = WatchEntry("ZIMU1234567", "Container", now)
+    assert refresh_interval(never_refreshed, now) == 0.0
+    moved = entry_with("Discharged from vessel", status_changed_at=now - HOUR, now=now)
+    assert refresh_interval(moved, now) == HOUR
+
+
+def scheduling(watchlist):
+    # The scheduler's state without its thread, so tests drive the ticks
+    watchlist._scheduling = True
+    watchlist._load()
+    return watchlist
+
+
+def wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def test_budget_caps_refreshes_and_earliest_due_go_first(tmp_path):
+    refreshed = []
+    lock = threading.Lock()
+
+    def refresh(ref_num, ref_type):
+        with lock:
+            refreshed.append(ref_num)
+        return {"currentStatus": "On board", "containers": []}
+
+    watchlist = scheduling(Watchlist(refresh, str(tmp_path / "watchlist.sqlite3"), budget_per_minute=2))
+    for i in range(4):
+        watchlist.add(f"ZIMU000000{i}", "Container")
+        time.sleep(0.002)
+
+    watchlist._dispatch_due()
+    wait_for(lambda: watchlist.stats()["refreshes"] == 2)
+    watchlist._dispatch_due()
+    stats = watchlist.stats()
+    assert sorted(refreshed) == ["ZIMU0000000", "ZIMU0000001"]
+    assert stats["budgetLimitedTicks"] == 2
+    assert stats["queueDepth"] == 2
+    watchlist.stop()
+
+
+def test_failed_refresh_is_retried_later(tmp_path):
+    def refresh(ref_num, ref_type):
+        raise RuntimeError("site busy")
+
+    path = str(tmp_path / "watchlist.sqlite3")
+    watchlist = scheduling(Watchlist(refresh, path))
+    watchlist.add("ZIMU1234567", "Container")
+    watchlist._dispatch_due()
+    wait_for(lambda: watchlist.stats()["refreshFailures"] == 1)
+
+    (item,) = Watchlist(no_refresh, path).entries()
+    assert item["nextDueAt"] >= time.time() + 290
+    assert item["lastRefreshedAt"] is None and item["refreshes"] == 0
+    watchlist.stop()
+
+
+def test_only_one_process_claims_the_scheduler(tmp_path):
+    path = str(tmp_path / "watchlist.sqlite3")
+    lock_path = path + ".scheduler.lock"
+    first, second = Watchlist(no_refresh, path), Watchlist(no_refresh, path)
+    assert first.claim_scheduler(lock_path)
+    assert not second.claim_scheduler(lock_path)
+    # Without a shared store every process schedules its own entries
+    assert second.claim_scheduler(None)
@@ -0,0 +1,445 @@
+from __future__ import annotations
+
+import json
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+VERSION = "1.00"
+# Top-level keys every ?fields= projection keeps
+PROJECTION_IDENTITY = ("version", "refNum", "refType", "bolNum")
+# Container keys a projection may keep besides containerNum, in schema order
+CONTAINER_FIELDS = ("containerType", "events", "routes", "podETA")
+# Flyweight tables keep this many of the most recently used entries
+MAX_SHARED = 65536
+
+T = TypeVar("T")
+
+# Streams the body for TrackingResult.body_size(); same separators as encode()
+_SIZE_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+def plain_text(value: Optional[str]) -> Optional[str]:
+    # str() turns lxml's smart strings (which keep their element alive) into
+    # plain ones
+    if value is None:
+        return None
+    return str(value)
+
+
+def intern_text(value: Optional[str]) -> Optional[str]:
+    # Only for small vocabularies that repeat across events, containers and
+    # cached results: ports, vessels, statuses, container types. Times, dates
+    # and voyage numbers stay plain; interning them would pin an unbounded set.
+    if value is None:
+        return None
+    return sys.intern(str(value))
+
+
+# Typed, immutable building blocks of a tracking result. Locations and
+# vessels are flyweights shared by every event (and result) naming the same
+# place or ship; to_dict() gives the JSON schema the API has always served.
+
+
+class Location:
+    __slots__ = ("name", "city", "country", "latitude", "longitude", "unlocode", "terminal")
+
+    def __init__(
+        self,
+        name: Optional[str],
+        city: Optional[str],
+        country: Optional[str],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        unlocode: Optional[str] = None,
+        terminal: Optional[str] = None,
+    ) -> None:
+        self.name = intern_text(name)
+        self.city = intern_text(city)
+        self.country = intern_text(country)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.unlocode = intern_text(unlocode)
+        self.terminal = intern_text(terminal)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "city": self.city,
+            "state": None,
+            "country": self.country,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "unloCode": self.unlocode,
+            "terminal": self.terminal,
+        }
+
+
+class Vessel:
+    __slots__ = ("name",)
+
+    def __init__(self, name: Optional[str]) -> None:
+        self.name = intern_text(name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "imo": None, "mmsi": None, "additionalInfo": None}
+
+
+# A flyweight table shared by every scraping thread, least recently used
+# entries dropped past `capacity`. Objects it dropped stay valid; later
+# lookups just get a new, equal object.
+class SharedTable(Generic[T]):
+    def __init__(self, capacity: int = MAX_SHARED) -> None:
+        self.capacity = max(1, capacity)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, T]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[T]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def add(self, key: Hashable, value: T) -> T:
+        # Returns the entry that won when two threads built the same key
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self._entries.move_to_end(key)
+                return existing
+            self._entries[key] = value
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            return value
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_locations: "SharedTable[Location]" = SharedTable()
+_vessels: "SharedTable[Vessel]" = SharedTable()
+
+
+def shared_location(
+    name: Optional[str], build: Callable[[str], Location], terminal: Optional[str] = None
+) -> Location:
+    # One Location per (name, terminal); `build` resolves an unseen name
+    # (outside the table's lock, it may be slow)
+    key = (name or "", terminal)
+    location = _locations.get(key)
+    if location is None:
+        if terminal is None:
+            location = build(name or "")
+        else:
+            base = shared_location(name, build)
+            location = Location(
+                base.name, base.city, base.country, base.latitude, base.longitude, base.unlocode, terminal
+            )
+        location = _locations.add(key, location)
+    return location
+
+
+def shared_vessel(name: Optional[str]) -> Vessel:
+    vessel = _vessels.get(name)
+    if vessel is None:
+        vessel = _vessels.add(name, Vessel(name))
+    return vessel
+
+
+class Event:
+    __slots__ = ("status", "event_time", "location", "stop_index", "vessel", "voyage_reference")
+
+    def __init__(
+        self,
+        status: Optional[str],
+        event_time: Optional[str],
+        location: Location,
+        stop_index: int,
+        vessel: Vessel,
+        voyage_reference: Optional[str],
+    ) -> None:
+        self.status = intern_text(status)
+        self.event_time = plain_text(event_time)
+        self.location = location
+        self.stop_index = stop_index
+        self.vessel = vessel
+        self.voyage_reference = plain_text(voyage_reference)
+
+    def key(self) -> Tuple[Any, ...]:
+        # Equal keys mean equal JSON, so such events can be one object
+        return (
+            self.status,
+            self.event_time,
+            id(self.location),
+            self.stop_index,
+            id(self.vessel),
+            self.voyage_reference,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": None,
+            "status": self.status,
+            "eventCode": None,
+            "eventTime": self.event_time,
+            "eventQualifier": None,
+            "location": self.location.to_dict(),
+            "stopIndex": str(self.stop_index),
+            "vesselInfo": self.vessel.to_dict(),
+            "voyageReference": self.voyage_reference,
+            "additionalInfo": None,
+        }
+
+
+class Route:
+    __slots__ = ("vessel", "voyage", "port_of_loading", "departure_date", "port_of_discharging", "arrival_time")
+
+    def __init__(
+        self,
+        vessel: Optional[str],
+        voyage: Optional[str],
+        port_of_loading: Optional[str],
+        departure_date: Optional[str],
+        port_of_discharging: Optional[str],
+        arrival_time: Optional[str],
+    ) -> None:
+        self.vessel = intern_text(vessel)
+        self.voyage = plain_text(voyage)
+        self.port_of_loading = intern_text(port_of_loading)
+        self.departure_date = plain_text(departure_date)
+        self.port_of_discharging = intern_text(port_of_discharging)
+        self.arrival_time = plain_text(arrival_time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "place": None,
+            "date": None,
+            "berthing": None,
+            "vessel": self.vessel,
+            "voyage": self.voyage,
+            "actualLoading": None,
+            "portOfLoading": self.port_of_loading,
+            "departureDate": self.departure_date,
+            "departureDateExpected": None,
+            "portOfDischarging": self.port_of_discharging,
+            "arrivalTime": self.arrival_time,
+            "arrivalTimeExpected": None,
+        }
+
+
+class Container:
+    # `routes` is the B/L's one tuple, shared by all of its containers
+    __slots__ = ("container_type", "container_num", "events", "routes", "pod_eta")
+
+    def __init__(
+        self,
+        container_type: Optional[str],
+        container_num: Optional[str],
+        events: Tuple[Event, ...],
+        routes: Tuple[Route, ...],
+        pod_eta: Optional[str],
+    ) -> None:
+        self.container_type = intern_text(container_type)
+        self.container_num = container_num
+        self.events = events
+        self.routes = routes
+        self.pod_eta = plain_text(pod_eta)
+
+    def to_dict(
+        self,
+        fields: Optional[FrozenSet[str]] = None,
+        route_dicts: Optional[Dict[int, List[Dict[str, Any]]]] = None,
+    ) -> Dict[str, Any]:
+        # `route_dicts` carries the serialized routes between the containers
+        # of one result, so they share one list as they share one tuple
+        routes = None
+        if fields is None or "routes" in fields:
+            routes = route_dicts.get(id(self.routes)) if route_dicts is not None else None
+            if routes is None:
+                routes = [route.to_dict() for route in self.routes]
+                if route_dicts is not None:
+                    route_dicts[id(self.routes)] = routes
+        values = {
+            "containerType": self.container_type,
+            "events": [event.to_dict() for event in self.events] if fields is None or "events" in fields else None,
+            "routes": routes,
+            "podETA": self.pod_eta,
+        }
+        if fields is not None:
+            projected = {"containerNum": self.container_num}
+            for name in CONTAINER_FIELDS:
+                if name in fields:
+                    projected[name] = values[name]
+            return projected
+        return {
+            "containerType": values["containerType"],
+            "containerNum": self.container_num,
+            "stops": [],
+            "events": values["events"],
+            "routes": values["routes"],
+            "vesselMovements": [],
+            "cargoDeliveryInformationUsImportOnly": None,
+            "podETA": values["podETA"],
+            "additionalInfo": None,
+        }
+
+
+def event_from_dict(event: Dict[str, Any]) -> Event:
+    data = event.get("location") or {}
+
+    def build(name: str) -> Location:
+        return Location(
+            name or None,
+            data.get("city"),
+            data.get("country"),
+            data.get("latitude"),
+            data.get("longitude"),
+            data.get("unloCode"),
+        )
+
+    return Event(
+        event.get("status"),
+        event.get("eventTime"),
+        shared_location(data.get("name"), build, data.get("terminal")),
+        int(event.get("stopIndex") or 0),
+        shared_vessel((event.get("vesselInfo") or {}).get("name")),
+        event.get("voyageReference"),
+    )
+
+
+def route_from_dict(route: Dict[str, Any]) -> Route:
+    return Route(
+        route.get("vessel"),
+        route.get("voyage"),
+        route.get("portOfLoading"),
+        route.get("departureDate"),
+        route.get("portOfDischarging"),
+        route.get("arrivalTime"),
+    )
+
+
+# A whole lookup result. It is what the result cache holds: the typed
+# containers are several times smaller than the nested dicts they stand for,
+# and the JSON body is only built when a response needs it, then kept
+# (encode()) for every later response served from the same result. Other
+# callers use dump() or body_size(), which keep nothing.
+# `fields` marks a ?fields= projection; project() makes one that shares
+# this result's containers.
+class TrackingResult:
+    __slots__ = ("ref_num", "ref_type", "current_status", "bol_num", "containers", "fields", "_encoded")
+
+    def __init__(
+        self,
+        ref_num: str,
+        ref_type: str,
+        current_status: Optional[str],
+        bol_num: Optional[str],
+        containers: Tuple[Container, ...],
+        fields: Optional[FrozenSet[str]] = None,
+    ) -> None:
+        self.ref_num = ref_num
+        self.ref_type = ref_type
+        self.current_status = intern_text(current_status)
+        self.bol_num = bol_num
+        self.containers = containers
+        self.fields = fields
+        self._encoded: Optional[bytes] = None
+
+    def set_reference(self, ref_type: str, bol_num: Optional[str]) -> None:
+        # Only before the result is shared; drops the memoized body
+        self.ref_type = ref_type
+        self.bol_num = bol_num
+        self._encoded = None
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "TrackingResult":
+        # The inverse of to_dict() for a full (unprojected) payload, such as a
+        # job result a scrape worker stored; encode() gives the same bytes
+        routes_by_json: Dict[str, Tuple[Route, ...]] = {}
+        containers = []
+        for container in payload.get("containers") or []:
+            events = tuple(event_from_dict(event) for event in container.get("events") or [])
+            route_list = container.get("routes") or []
+            # Containers of one B/L share their routes again
+            routes_json = json.dumps(route_list, sort_keys=True)
+            routes = routes_by_json.get(routes_json)
+            if routes is None:
+                routes = routes_by_json[routes_json] = tuple(route_from_dict(route) for route in route_list)
+            containers.append(
+                Container(
+                    container.get("containerType"),
+                    container.get("containerNum"),
+                    events,
+                    routes,
+                    container.get("podETA"),
+                )
+            )
+        return cls(
+            payload.get("refNum"),
+            payload.get("refType"),
+            payload.get("currentStatus"),
+            payload.get("bolNum"),
+            tuple(containers),
+        )
+
+    def project(self, fields: Optional[FrozenSet[str]]) -> "TrackingResult":
+        if fields is None or fields == self.fields:
+            return self
+        return TrackingResult(self.ref_num, self.ref_type, self.current_status, self.bol_num, self.containers, fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        # A fresh dict every call; callers may modify it
+        route_dicts: Dict[int, List[Dict[str, Any]]] = {}
+        containers = [container.to_dict(self.fields, route_dicts) for container in self.containers]
+        if self.fields is not None:
+            projected: Dict[str, Any] = {
+                "version": VERSION,
+                "refNum": self.ref_num,
+                "refType": self.ref_type,
+                "bolNum": self.bol_num,
+            }
+            if "currentStatus" in self.fields:
+                projected["currentStatus"] = self.current_status
+            projected["containers"] = containers
+            projected["fields"] = sorted(self.fields)
+            return projected
+        return {
+            "version": VERSION,
+            "scrapingType": None,
+            "refNum": self.ref_num,
+            "refType": self.ref_type,
+            "jtCarrierName": None,
+            "origin": None,
+            "destination": None,
+            "currentStatus": self.current_status,
+            "bookingNum": None,
+            "bolNum": self.bol_num,
+            "bl_Issue_Date": None,
+            "booking_Date": None,
+            "trackingnNo": None,
+            "additionalInfo": None,
+            "containers": containers,
+            "logs": [],
+        }
+
+    def encode(self) -> bytes:
+        # The full-schema response body (response_format.dumps without
+        # compact), built on first use and kept for later responses
+        encoded = self._encoded
+        if encoded is None:
+            encoded = self._encoded = self.dump()
+        return encoded
+
+    def dump(self) -> bytes:
+        # Same bytes as encode(), not memoized
+        return json.dumps(self.to_dict(), ensure_ascii=False).encode("utf-8")
+
+    def body_size(self) -> int:
+        # len(encode()) without building the body in one piece or keeping it
+        if self._encoded is not None:
+            return len(self._encoded)
+        return sum(len(chunk.encode("utf-8")) for chunk in _SIZE_ENCODER.iterencode(self.to_dict()))
+
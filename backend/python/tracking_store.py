@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from result_cache import normalize_identifier
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracked (
+    identifier TEXT NOT NULL,
+    ref_type TEXT NOT NULL,
+    ref_num TEXT,
+    current_status TEXT,
+    first_scraped_at REAL NOT NULL,
+    last_scraped_at REAL NOT NULL,
+    last_changed_at REAL NOT NULL,
+    PRIMARY KEY (identifier, ref_type)
+);
+CREATE INDEX IF NOT EXISTS idx_tracked_last_changed ON tracked (last_changed_at);
+
+CREATE TABLE IF NOT EXISTS containers (
+    identifier TEXT NOT NULL,
+    ref_type TEXT NOT NULL,
+    container_num TEXT NOT NULL,
+    pod_eta TEXT,
+    last_changed_at REAL NOT NULL,
+    PRIMARY KEY (identifier, ref_type, container_num)
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    identifier TEXT NOT NULL,
+    ref_type TEXT NOT NULL,
+    container_num TEXT NOT NULL,
+    status TEXT NOT NULL,
+    location TEXT NOT NULL,
+    event_time TEXT NOT NULL,
+    event_json TEXT NOT NULL,
+    first_seen_at REAL NOT NULL,
+    last_seen_at REAL NOT NULL,
+    changed_at REAL NOT NULL,
+    PRIMARY KEY (identifier, ref_type, container_num, status, location, event_time)
+);
+CREATE INDEX IF NOT EXISTS idx_events_changed ON events (identifier, ref_type, changed_at);
+
+CREATE TABLE IF NOT EXISTS transitions (
+    identifier TEXT NOT NULL,
+    ref_type TEXT NOT NULL,
+    container_num TEXT,
+    field TEXT NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    changed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transitions_changed ON transitions (identifier, ref_type, changed_at);
+"""
+
+
+def event_content(event_json: str) -> Dict[str, Any]:
+    # stopIndex shifts whenever the timeline grows, so it never counts as a change
+    content = json.loads(event_json)
+    content.pop("stopIndex", None)
+    return content
+
+
+def event_key(event: Dict[str, Any]) -> Tuple[str, str, str]:
+    location = (event.get("location") or {}).get("name") or ""
+    return event.get("status") or "", location, event.get("eventTime") or ""
+
+
+# Embedded SQLite store of every scraped timeline. Events are keyed by
+# container number, status, location and eventTime; `changed_at` is the time
+# of the scrape that first saw the event or last saw its content change, so
+# callers can ask for everything that moved since their previous poll.
+class TrackingStore:
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def record(self, identifier: str, ref_type: str, payload: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+        # Stores one scrape and returns what it changed relative to the stored state
+        now = time.time() if now is None else now
+        ident = normalize_identifier(identifier)
+        ref = (ref_type or "").strip().lower()
+        new_events: List[Dict[str, Any]] = []
+        changed_events: List[Dict[str, Any]] = []
+        transitions: List[Dict[str, Any]] = []
+
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT current_status FROM tracked WHERE identifier = ? AND ref_type = ?", (ident, ref)
+                ).fetchone()
+                current_status = payload.get("currentStatus")
+                if row is None or row["current_status"] != current_status:
+                    transitions.append(
+                        self._transition(ident, ref, None, "currentStatus", row["current_status"] if row else None, current_status, now)
+                    )
+
+                for container in payload.get("containers") or []:
+                    container_num = container.get("containerNum") or ident
+                    pod_eta = container.get("podETA")
+                    existing = conn.execute(
+                        "SELECT pod_eta FROM containers WHERE identifier = ? AND ref_type = ? AND container_num = ?",
+                        (ident, ref, container_num),
+                    ).fetchone()
+                    if existing is None or existing["pod_eta"] != pod_eta:
+                        transitions.append(
+                            self._transition(ident, ref, container_num, "podETA", existing["pod_eta"] if existing else None, pod_eta, now)
+                        )
+                        conn.execute(
+                            "INSERT OR REPLACE INTO containers (identifier, ref_type, container_num, pod_eta, last_changed_at) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (ident, ref, container_num, pod_eta, now),
+                        )
+
+                    for event in container.get("events") or []:
+                        status, location, event_time = event_key(event)
+                        event_json = json.dumps(event, ensure_ascii=False)
+                        stored = conn.execute(
+                            "SELECT event_json FROM events WHERE identifier = ? AND ref_type = ? AND container_num = ? "
+                            "AND status = ? AND location = ? AND event_time = ?",
+                            (ident, ref, container_num, status, location, event_time),
+                        ).fetchone()
+                        if stored is None:
+                            conn.execute(
+                                "INSERT INTO events (identifier, ref_type, container_num, status, location, event_time, "
+                                "event_json, first_seen_at, last_seen_at, changed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                (ident, ref, container_num, status, location, event_time, event_json, now, now, now),
+                            )
+                            new_events.append({"containerNum": container_num, **event})
+                        elif event_content(stored["event_json"]) != event_content(event_json):
+                            conn.execute(
+                                "UPDATE events SET event_json = ?, last_seen_at = ?, changed_at = ? WHERE identifier = ? "
+                                "AND ref_type = ? AND container_num = ? AND status = ? AND location = ? AND event_time = ?",
+                                (event_json, now, now, ident, ref, container_num, status, location, event_time),
+                            )
+                            changed_events.append({"containerNum": container_num, **event})
+                        else:
+                            conn.execute(
+                                "UPDATE events SET event_json = ?, last_seen_at = ? WHERE identifier = ? AND ref_type = ? "
+                                "AND container_num = ? AND status = ? AND location = ? AND event_time = ?",
+                                (event_json, now, ident, ref, container_num, status, location, event_time),
+                            )
+
+                changed = bool(new_events or changed_events or transitions)
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO tracked (identifier, ref_type, ref_num, current_status, first_scraped_at, "
+                        "last_scraped_at, last_changed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (ident, ref, payload.get("refNum"), current_status, now, now, now),
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE tracked SET current_status = ?, last_scraped_at = ?, "
+                        "last_changed_at = CASE WHEN ? THEN ? ELSE last_changed_at END "
+                        "WHERE identifier = ? AND ref_type = ?",
+                        (current_status, now, changed, now, ident, ref),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        return {
+            "changed": bool(new_events or changed_events or transitions),
+            "newEvents": new_events,
+            "changedEvents": changed_events,
+            "transitions": transitions,
+        }
+
+    def _transition(
+        self,
+        ident: str,
+        ref: str,
+        container_num: Optional[str],
+        field: str,
+        old_value: Optional[str],
+        new_value: Optional[str],
+        now: float,
+    ) -> Dict[str, Any]:
+        # Caller holds the lock inside an open transaction
+        self._conn.execute(
+            "INSERT INTO transitions (identifier, ref_type, container_num, field, old_value, new_value, changed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (ident, ref, container_num, field, old_value, new_value, now),
+        )
+        return {"containerNum": container_num, "field": field, "from": old_value, "to": new_value, "changedAt": now}
+
+    def last_scraped_at(self, identifier: str, ref_type: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_scraped_at FROM tracked WHERE identifier = ? AND ref_type = ?",
+                (normalize_identifier(identifier), (ref_type or "").strip().lower()),
+            ).fetchone()
+        return row["last_scraped_at"] if row else None
+
+    def changes_since(self, identifier: str, ref_type: str, since: float, inclusive: bool = False) -> Dict[str, Any]:
+        ident = normalize_identifier(identifier)
+        ref = (ref_type or "").strip().lower()
+        op = ">=" if inclusive else ">"
+        with self._lock:
+            tracked = self._conn.execute(
+                "SELECT * FROM tracked WHERE identifier = ? AND ref_type = ?", (ident, ref)
+            ).fetchone()
+            events = self._conn.execute(
+                f"SELECT container_num, event_json, first_seen_at, changed_at FROM events "
+                f"WHERE identifier = ? AND ref_type = ? AND changed_at {op} ? ORDER BY changed_at, rowid",
+                (ident, ref, since),
+            ).fetchall()
+            transitions = self._conn.execute(
+                f"SELECT container_num, field, old_value, new_value, changed_at FROM transitions "
+                f"WHERE identifier = ? AND ref_type = ? AND changed_at {op} ? ORDER BY changed_at, rowid",
+                (ident, ref, since),
+            ).fetchall()
+            pod_etas = self._conn.execute(
+                "SELECT container_num, pod_eta FROM containers WHERE identifier = ? AND ref_type = ?", (ident, ref)
+            ).fetchall()
+
+        containers: Dict[str, Dict[str, Any]] = {
+            row["container_num"]: {"containerNum": row["container_num"], "podETA": row["pod_eta"], "events": []}
+            for row in pod_etas
+        }
+        for row in events:
+            container = containers.setdefault(
+                row["container_num"], {"containerNum": row["container_num"], "podETA": None, "events": []}
+            )
+            event = json.loads(row["event_json"])
+            event["changeType"] = "new" if row["first_seen_at"] == row["changed_at"] else "changed"
+            container["events"].append(event)
+
+        return {
+            "since": since,
+            "currentStatus": tracked["current_status"] if tracked else None,
+            "lastScrapedAt": tracked["last_scraped_at"] if tracked else None,
+            "lastChangedAt": tracked["last_changed_at"] if tracked else None,
+            "changed": bool(events or transitions),
+            "containers": [c for c in containers.values() if c["events"]],
+            "transitions": [
+                {
+                    "containerNum": row["container_num"],
+                    "field": row["field"],
+                    "from": row["old_value"],
+                    "to": row["new_value"],
+                    "changedAt": row["changed_at"],
+                }
+                for row in transitions
+            ],
+        }
+
+    def changed_since(self, since: float, limit: int = 1000) -> List[Dict[str, Any]]:
+        # Identifiers whose timeline moved after `since`, newest first
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT identifier, ref_type, ref_num, current_status, last_scraped_at, last_changed_at FROM tracked "
+                "WHERE last_changed_at > ? ORDER BY last_changed_at DESC LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tracked = self._conn.execute("SELECT COUNT(*) FROM tracked").fetchone()[0]
+            events = self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        return {"path": self.path, "tracked": tracked, "events": events}
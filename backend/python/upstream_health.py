@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+# Numeric breaker state for /metrics
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamUnavailable(RuntimeError):
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    # `rate` scrape starts per second with bursts of up to `burst`; rate 0
+    # disables the limit. Tokens are reserved up front (the balance may go
+    # negative), so waiting callers are served in arrival order.
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = max(0.0, rate)
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: float) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (1.0 - self._tokens) / self.rate)
+            if wait > timeout:
+                return False
+            self._tokens -= 1.0
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def refund(self) -> None:
+        # Returns a token taken for a scrape that never started
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(float(self.burst), self._tokens + 1.0)
+
+    def wait_time(self) -> float:
+        # Seconds until a token would be free
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (1.0 - self._tokens) / self.rate)
+
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+# Concurrent scrapes allowed against the site, adjusted AIMD-style: each
+# result that arrives within `target_latency` adds 1/limit (about +1 per
+# limit's worth of good results); a failure or a slow result multiplies the
+# limit by `backoff`, at most once per `cooldown` so one bad burst is not
+# counted many times over.
+class ConcurrencyLimit:
+    def __init__(
+        self,
+        minimum: int,
+        maximum: int,
+        target_latency: float,
+        backoff: float = 0.5,
+        cooldown: Optional[float] = None,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.target_latency = target_latency
+        self.backoff = min(max(backoff, 0.1), 0.95)
+        self.cooldown = target_latency if cooldown is None else cooldown
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._last_decrease = 0.0
+        self._stats: Dict[str, int] = {"increases": 0, "decreases": 0}
+
+    def acquire(self, timeout: float) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout=max(0.0, timeout)):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: Optional[float], failed: bool) -> None:
+        # latency None and not failed: the scrape never reached the site
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if failed or (latency is not None and latency > self.target_latency):
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.minimum), self.limit * self.backoff)
+                    self._last_decrease = now
+                    self._stats["decreases"] += 1
+            elif latency is not None and self.limit < self.maximum:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+                self._stats["increases"] += 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "limitExact": round(self.limit, 3),
+                "minLimit": self.minimum,
+                "maxLimit": self.maximum,
+                "inFlight": self.in_flight,
+                "targetLatencySeconds": self.target_latency,
+                **self._stats,
+            }
+
+
+# Opens once at least `min_requests` outcomes in the last `window` seconds
+# include a `failure_ratio` share of failures. While open every scrape fails
+# fast; after `open_seconds` one probe is let through (half-open) and its
+# outcome closes the breaker or opens it again.
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_ratio: float = 0.5,
+        min_requests: int = 5,
+        window: float = 60.0,
+        open_seconds: float = 30.0,
+    ) -> None:
+        self.failure_ratio = failure_ratio
+        self.min_requests = max(1, min_requests)
+        self.window = window
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats: Dict[str, int] = {"opened": 0, "closed": 0}
+
+    def allow(self) -> Tuple[bool, bool]:
+        # (allowed, is the half-open probe)
+        with self._lock:
+            if self.state == CLOSED:
+                return True, False
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True, True
+            return False, False
+
+    def cancel_probe(self) -> None:
+        # The probe never reached the site; the next caller probes instead
+        with self._lock:
+            self._probing = False
+
+    def record(self, failed: bool, probe: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if probe:
+                self._probing = False
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    self._stats["closed"] += 1
+                return
+            if self.state != CLOSED:
+                return
+            self._outcomes.append((now, failed))
+            while self._outcomes and now - self._outcomes[0][0] > self.window:
+                self._outcomes.popleft()
+            if len(self._outcomes) >= self.min_requests:
+                failures = sum(1 for _, f in self._outcomes if f)
+                if failures / len(self._outcomes) >= self.failure_ratio:
+                    self._open(now)
+
+    def _open(self, now: float) -> None:
+        # Caller holds self._lock
+        self.state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self._stats["opened"] += 1
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = sum(1 for _, f in self._outcomes if f)
+            return {
+                "breakerState": self.state,
+                "breakerStateCode": STATE_CODES[self.state],
+                "windowRequests": len(self._outcomes),
+                "windowFailures": failures,
+                "breakerOpened": self._stats["opened"],
+                "breakerClosed": self._stats["closed"],
+            }
+
+
+class Permit:
+    __slots__ = ("probe",)
+
+    def __init__(self, probe: bool) -> None:
+        self.probe = probe
+
+
+# Upstream-health controller in front of every scrape start: the circuit
+# breaker (fail fast while the site is failing), a token bucket on start rate,
+# then the adaptive concurrency limit. Outcomes reported through release()
+# drive both the limit and the breaker. Per process, like the driver pool.
+class UpstreamHealth:
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        limit: ConcurrencyLimit,
+        breaker: CircuitBreaker,
+        max_retries: int = 2,
+        retry_base: float = 1.0,
+        retry_cap: float = 8.0,
+    ) -> None:
+        self.bucket = bucket
+        self.limit = limit
+        self.breaker = breaker
+        self.max_retries = max(0, max_retries)
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "shortCircuited": 0,
+            "rateLimited": 0,
+            "concurrencyLimited": 0,
+            "retries": 0,
+            "staleServed": 0,
+        }
+
+    def acquire(self, timeout: float) -> Permit:
+        allowed, probe = self.breaker.allow()
+        if not allowed:
+            self._count("shortCircuited")
+            raise UpstreamUnavailable(
+                "The carrier site is failing; lookups are paused.", max(1.0, self.breaker.retry_after())
+            )
+        started = time.monotonic()
+        if not self.bucket.acquire(timeout):
+            self._give_back(probe)
+            self._count("rateLimited")
+            raise UpstreamUnavailable(
+                "Scrape rate limit reached; try again shortly.", max(1.0, self.bucket.wait_time())
+            )
+        if not self.limit.acquire(timeout - (time.monotonic() - started)):
+            self.bucket.refund()
+            self._give_back(probe)
+            self._count("concurrencyLimited")
+            raise UpstreamUnavailable("Upstream concurrency limit reached; try again shortly.", 5.0)
+        return Permit(probe)
+
+    def release(self, permit: Permit, latency: Optional[float] = None, failed: bool = False) -> None:
+        # `latency`: seconds the site took to show results; neither it nor
+        # `failed` set means the scrape failed before or after the site was
+        # involved, which says nothing about upstream health
+        self.limit.release(latency, failed)
+        if failed or latency is not None:
+            self.breaker.record(failed, permit.probe)
+        else:
+            self._give_back(permit.probe)
+
+    def _give_back(self, probe: bool) -> None:
+        if probe:
+            self.breaker.cancel_probe()
+
+    def retry(self, attempt: int, remaining: float) -> bool:
+        # Sleeps a full-jitter backoff and takes a rate-limit token for retry
+        # `attempt` (0-based); False when retries are used up, the breaker has
+        # opened meanwhile, or the wait would not fit in `remaining` seconds
+        if attempt >= self.max_retries or self.breaker.state != CLOSED:
+            return False
+        delay = random.uniform(0.0, min(self.retry_cap, self.retry_base * 2 ** attempt))
+        if delay >= remaining:
+            return False
+        time.sleep(delay)
+        if not self.bucket.acquire(remaining - delay):
+            return False
+        self._count("retries")
+        return True
+
+    def served_stale(self) -> None:
+        self._count("staleServed")
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._stats)
+        return {
+            "ratePerSecond": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "tokens": round(self.bucket.tokens(), 3),
+            **self.limit.stats(),
+            **self.breaker.stats(),
+            "maxRetries": self.max_retries,
+            **counters,
+        }
@@ -0,0 +1,442 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from result_cache import cache_key
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+HOUR = 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlist (
+    identifier TEXT NOT NULL,
+    ref_type TEXT NOT NULL,
+    ref_num TEXT NOT NULL,
+    ref_type_label TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    last_refreshed_at REAL,
+    current_status TEXT,
+    status_changed_at REAL,
+    pod_eta TEXT,
+    last_event_status TEXT,
+    next_due_at REAL,
+    interval_seconds REAL,
+    refreshes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (identifier, ref_type)
+);
+"""
+
+# Scheduling state added after the first release; ALTERed into older files
+ADDED_COLUMNS = (
+    ("next_due_at", "REAL"),
+    ("interval_seconds", "REAL"),
+    ("refreshes", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+COLUMNS = (
+    "identifier, ref_type, ref_num, ref_type_label, added_at, last_refreshed_at, current_status, "
+    "status_changed_at, pod_eta, last_event_status, next_due_at, interval_seconds, refreshes"
+)
+
+ETA_FORMATS = ("%d-%b-%Y", "%d-%b-%Y %H:%M", "%Y-%m-%d", "%d/%m/%Y", "%d.%m.%Y", "%b %d, %Y")
+
+
+def parse_eta(value: Optional[str]) -> Optional[float]:
+    value = (value or "").strip()
+    if not value:
+        return None
+    for fmt in ETA_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class WatchEntry:
+    __slots__ = (
+        "ref_num",
+        "ref_type",
+        "added_at",
+        "last_refreshed_at",
+        "current_status",
+        "status_changed_at",
+        "pod_eta",
+        "last_event_status",
+        "next_due",
+        "interval",
+        "refreshes",
+    )
+
+    def __init__(self, ref_num: str, ref_type: str, added_at: float) -> None:
+        self.ref_num = ref_num
+        self.ref_type = ref_type
+        self.added_at = added_at
+        self.last_refreshed_at: Optional[float] = None
+        self.current_status: Optional[str] = None
+        self.status_changed_at: Optional[float] = None
+        self.pod_eta: Optional[str] = None
+        self.last_event_status: Optional[str] = None
+        self.next_due = added_at
+        self.interval = 0.0
+        self.refreshes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "refNum": self.ref_num,
+            "refType": self.ref_type,
+            "addedAt": self.added_at,
+            "lastRefreshedAt": self.last_refreshed_at,
+            "currentStatus": self.current_status,
+            "statusChangedAt": self.status_changed_at,
+            "podETA": self.pod_eta,
+            "lastEvent": self.last_event_status,
+            "intervalSeconds": self.interval,
+            "nextDueAt": self.next_due,
+            "refreshes": self.refreshes,
+        }
+
+
+def refresh_interval(entry: WatchEntry, now: float) -> float:
+    # Finished shipments barely change; arrivals close to their ETA change a
+    # lot; containers mid-ocean change rarely. A status that just moved is
+    # likely to move again soon.
+    if entry.last_refreshed_at is None:
+        return 0.0
+    last_event = (entry.last_event_status or "").lower()
+    if "delivered" in last_event or "empty container returned" in last_event:
+        return 24 * HOUR
+    if "discharge" in last_event:
+        interval = 6 * HOUR
+    else:
+        eta = parse_eta(entry.pod_eta)
+        if eta is None:
+            interval = 2 * HOUR
+        elif eta - now <= 48 * HOUR:
+            interval = 0.5 * HOUR
+        elif eta - now <= 7 * 24 * HOUR:
+            interval = 2 * HOUR
+        else:
+            interval = 6 * HOUR
+    if entry.status_changed_at and now - entry.status_changed_at < 6 * HOUR:
+        interval = min(interval, 1 * HOUR)
+    return interval
+
+
+# Watched identifiers plus the background scheduler that refreshes them
+# through the regular scrape path, paced by a global per-minute budget.
+# Only the process running the scheduler keeps entries in memory; it writes
+# each entry's refresh state back to SQLite, and every read (in any worker
+# process) is served from there.
+class Watchlist:
+    def __init__(
+        self,
+        refresh: Callable[[str, str], Dict[str, Any]],
+        path: str = ":memory:",
+        budget_per_minute: int = 6,
+        workers: int = 2,
+        baseline_interval: float = 900.0,
+        tick: float = 1.0,
+        sync_interval: float = 30.0,
+    ) -> None:
+        self.refresh = refresh
+        self.budget_per_minute = max(1, budget_per_minute)
+        self.baseline_interval = baseline_interval
+        self.tick = tick
+        self.sync_interval = sync_interval
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._entries: Dict[Tuple[str, str], WatchEntry] = {}
+        self._heap: List[Tuple[float, Tuple[str, str]]] = []
+        self._in_flight: set = set()
+        self._tokens = float(self.budget_per_minute)
+        self._tokens_at = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="watchlist")
+        self._thread: Optional[threading.Thread] = None
+        self._scheduling = False
+        self._stopped = False
+        self._lock_file = None
+        self._synced_at = time.monotonic()
+        self._stats: Dict[str, float] = {
+            "refreshes": 0,
+            "refreshFailures": 0,
+            "budgetLimitedTicks": 0,
+            "lagTotal": 0.0,
+            "lagMax": 0.0,
+        }
+
+    def _migrate(self) -> None:
+        present = {row[1] for row in self._conn.execute("PRAGMA table_info(watchlist)")}
+        for name, declaration in ADDED_COLUMNS:
+            if name in present:
+                continue
+            try:
+                self._conn.execute(f"ALTER TABLE watchlist ADD COLUMN {name} {declaration}")
+            except sqlite3.OperationalError as exc:
+                # Another worker added it first
+                if "duplicate column" not in str(exc):
+                    raise
+
+    @staticmethod
+    def _entry_from_row(row: Tuple[Any, ...], now: float) -> WatchEntry:
+        entry = WatchEntry(row[2], row[3], row[4])
+        entry.last_refreshed_at, entry.current_status, entry.status_changed_at = row[5], row[6], row[7]
+        entry.pod_eta, entry.last_event_status = row[8], row[9]
+        entry.refreshes = row[12] or 0
+        # Rows written before the scheduling columns existed derive them
+        entry.interval = row[11] if row[11] is not None else refresh_interval(entry, now)
+        entry.next_due = row[10]
+        if entry.next_due is None:
+            entry.next_due = (entry.last_refreshed_at or entry.added_at) + entry.interval
+        return entry
+
+    def _rows(self) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            return self._conn.execute(f"SELECT {COLUMNS} FROM watchlist").fetchall()
+
+    def _save_state(self, key: Tuple[str, str], entry: WatchEntry) -> None:
+        # Caller holds self._lock
+        self._conn.execute(
+            "UPDATE watchlist SET last_refreshed_at = ?, current_status = ?, status_changed_at = ?, pod_eta = ?, "
+            "last_event_status = ?, next_due_at = ?, interval_seconds = ?, refreshes = ? "
+            "WHERE identifier = ? AND ref_type = ?",
+            (
+                entry.last_refreshed_at,
+                entry.current_status,
+                entry.status_changed_at,
+                entry.pod_eta,
+                entry.last_event_status,
+                entry.next_due,
+                entry.interval,
+                entry.refreshes,
+                key[0],
+                key[1],
+            ),
+        )
+
+    def _load(self) -> None:
+        # Scheduler only: picks up rows this process has not seen and drops
+        # removed ones; with several worker processes the API may write from
+        # any of them
+        rows = self._rows()
+        now = time.time()
+        with self._lock:
+            keys = set()
+            for row in rows:
+                key = (row[0], row[1])
+                keys.add(key)
+                if key in self._entries:
+                    continue
+                entry = self._entry_from_row(row, now)
+                self._entries[key] = entry
+                heapq.heappush(self._heap, (entry.next_due, key))
+            for key in set(self._entries) - keys:
+                del self._entries[key]
+
+    # Watchlist API. Any worker process may serve these; SQLite is the truth.
+
+    def add(self, ref_num: str, ref_type: str) -> Tuple[WatchEntry, bool]:
+        key = cache_key(ref_num, ref_type)
+        now = time.time()
+        with self._lock:
+            created = self._conn.execute(
+                "INSERT OR IGNORE INTO watchlist (identifier, ref_type, ref_num, ref_type_label, added_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key[0], key[1], ref_num, ref_type, now),
+            ).rowcount
+            entry = self._entries.get(key)
+            if not created:
+                if entry is None:
+                    row = self._conn.execute(
+                        f"SELECT {COLUMNS} FROM watchlist WHERE identifier = ? AND ref_type = ?", key
+                    ).fetchone()
+                    entry = self._entry_from_row(row, now)
+                return entry, False
+            entry = WatchEntry(ref_num, ref_type, now)
+            if not self._scheduling:
+                return entry, True
+            self._entries[key] = entry
+            heapq.heappush(self._heap, (entry.next_due, key))
+        self._wake.set()
+        return entry, True
+
+    def remove(self, ref_num: str, ref_type: str) -> bool:
+        key = cache_key(ref_num, ref_type)
+        with self._lock:
+            self._entries.pop(key, None)
+            removed = self._conn.execute("DELETE FROM watchlist WHERE identifier = ? AND ref_type = ?", key).rowcount
+        # Stale heap items are skipped when popped
+        return removed > 0
+
+    def entries(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        items = [self._entry_from_row(row, now) for row in self._rows()]
+        return sorted((e.to_dict() for e in items), key=lambda e: e["nextDueAt"])
+
+    # Scheduler
+
+    def claim_scheduler(self, lock_path: Optional[str]) -> bool:
+        # Only the process holding the lock schedules refreshes, so several
+        # workers sharing one store do not refresh every entry several times
+        if lock_path is None or fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+        lock_file = open(lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._scheduling = True
+        self._load()
+        with self._lock:
+            self._thread = threading.Thread(target=self._run, name="watchlist-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wake.set()
+        self._executor.shutdown(wait=False)
+
+    def _take_token(self) -> bool:
+        # Caller holds self._lock
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.budget_per_minute),
+            self._tokens + (now - self._tokens_at) * self.budget_per_minute / 60.0,
+        )
+        self._tokens_at = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    def _run(self) -> None:
+        while not self._stopped:
+            if time.monotonic() - self._synced_at >= self.sync_interval:
+                self._synced_at = time.monotonic()
+                self._load()
+            self._dispatch_due()
+            self._wake.wait(self.tick)
+            self._wake.clear()
+
+    def _dispatch_due(self) -> None:
+        now = time.time()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due, key = self._heap[0]
+                entry = self._entries.get(key)
+                if entry is None or entry.next_due != due or key in self._in_flight:
+                    heapq.heappop(self._heap)
+                    continue
+                if not self._take_token():
+                    self._stats["budgetLimitedTicks"] += 1
+                    return
+                heapq.heappop(self._heap)
+                self._in_flight.add(key)
+                lag = now - due
+                self._stats["lagTotal"] += lag
+                self._stats["lagMax"] = max(self._stats["lagMax"], lag)
+                self._executor.submit(self._refresh_entry, key, entry)
+
+    def _refresh_entry(self, key: Tuple[str, str], entry: WatchEntry) -> None:
+        try:
+            payload = self.refresh(entry.ref_num, entry.ref_type)
+        except Exception as exc:
+            log.warning("Watchlist refresh failed for %s: %s", entry.ref_num, exc)
+            with self._lock:
+                self._stats["refreshFailures"] += 1
+                self._in_flight.discard(key)
+                if key in self._entries:
+                    # Retry sooner than a regular interval, but not in a tight loop
+                    entry.next_due = time.time() + max(300.0, entry.interval / 2)
+                    heapq.heappush(self._heap, (entry.next_due, key))
+                    self._save_state(key, entry)
+            return
+
+        now = time.time()
+        with self._lock:
+            self._in_flight.discard(key)
+            self._stats["refreshes"] += 1
+            entry.refreshes += 1
+            self._apply_payload(entry, payload, now)
+            if key not in self._entries:
+                return
+            entry.interval = refresh_interval(entry, now)
+            entry.next_due = now + entry.interval
+            heapq.heappush(self._heap, (entry.next_due, key))
+            self._save_state(key, entry)
+
+    @staticmethod
+    def _apply_payload(entry: WatchEntry, payload: Dict[str, Any], now: float) -> None:
+        status = payload.get("currentStatus")
+        if status != entry.current_status:
+            # The first observation is not a change
+            entry.status_changed_at = now if entry.last_refreshed_at is not None else entry.status_changed_at
+            entry.current_status = status
+        containers = payload.get("containers") or []
+        pod_etas = [c.get("podETA") for c in containers if c.get("podETA")]
+        entry.pod_eta = pod_etas[0] if pod_etas else None
+        last_events = [
+            (c.get("events") or [])[-1].get("status") for c in containers if c.get("events")
+        ]
+        entry.last_event_status = next((s for s in last_events if s), None)
+        entry.last_refreshed_at = now
+
+    def stats(self) -> Dict[str, Any]:
+        # Entry figures come from SQLite and read the same in every process;
+        # refresh and lag counters belong to the process that is scheduling
+        now = time.time()
+        entries = [self._entry_from_row(row, now) for row in self._rows()]
+        due = [e for e in entries if e.next_due <= now]
+        # Scrapes a fixed-interval cron would have made over the same time
+        baseline = sum((now - e.added_at) / self.baseline_interval for e in entries)
+        performed = sum(e.refreshes for e in entries)
+        with self._lock:
+            refreshes = int(self._stats["refreshes"])
+            return {
+                "scheduling": self._scheduling,
+                "entries": len(entries),
+                "queueDepth": len(due),
+                "inFlight": len(self._in_flight),
+                "currentLag": round(max((now - e.next_due for e in due), default=0.0), 3),
+                "avgLag": round(self._stats["lagTotal"] / refreshes, 3) if refreshes else 0.0,
+                "maxLag": round(self._stats["lagMax"], 3),
+                "budgetPerMinute": self.budget_per_minute,
+                "refreshes": refreshes,
+                "refreshFailures": int(self._stats["refreshFailures"]),
+                "budgetLimitedTicks": int(self._stats["budgetLimitedTicks"]),
+                "baselineIntervalSeconds": self.baseline_interval,
+                "scrapesSaved": max(0, int(baseline) - performed),
+            }
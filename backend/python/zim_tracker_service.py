@@ -1,36 +1,110 @@
 from __future__ import annotations
 
+import atexit
+import hmac
 import json
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
 
 from flask import Flask, Response, request
 
-import undetected_chromedriver as uc
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
+import port_index
+import settings
+from admission import AdmissionControl, AdmissionRejected, shared_state
+from browser_lifecycle import BrowserLifecycle
+from chromedriver_cache import ChromedriverCache
+from deadline import Deadline, DeadlineExceeded, StageStats
+from dom_extract import extract_snapshot
+from durable_jobs import DurableJobQueue, DurableJobStore, handle_remote
+from driver_pool import DriverPool, PoolTimeout
+from html_parser import parse_snapshot
+from jobs import SUCCEEDED, CallbackPolicy, Job, JobError, JobQueue, JobQueueFull, SharedJobRecords
+from metrics import ScrapeMetrics, command_count, instrument_commands
+from fast_path import FastPathClient, FastPathError, RequestTemplate
+from resource_blocking import BlockingProfile, NetworkStats, read_performance_log, summarize_network
+from response_format import body_etag, compact_payload, compress, dumps, etag_matches
+from result_cache import HIT, STALE, ResultCache, cache_key
+from singleflight import WAIT_STAGE, SingleFlight
+from startup import StartupTracker
+from tracking_model import Container, Event, Location, Route, TrackingResult, shared_location, shared_vessel
+from tracking_store import TrackingStore
+from upstream_health import CircuitBreaker, ConcurrencyLimit, TokenBucket, UpstreamHealth, UpstreamUnavailable
+from watchlist import Watchlist
 
 app = Flask(__name__)
+log = logging.getLogger(__name__)
+startup = StartupTracker()
+
+
+class TrackingNotFound(RuntimeError):
+    pass
+
+
+EXTRACTION_MODES = ("webdriver", "script", "html", "compare")
+# ?fields= projections. Parts of the page no requested field needs are never
+# walked; containerNum is always kept so projected containers stay identifiable.
+PROJECTABLE_FIELDS = ("currentStatus", "podETA", "events", "routes", "containerType")
+POD_ARRIVAL_STATUS = "vessel arrival to port of discharge"
+
+CONSENT_BUTTON_ID = "onetrust-accept-btn-handler"
+# The site has changed the search input id historically
+INPUT_IDS = ["shipment-main-search-2", "shipment-main-search"]
+SEARCH_BUTTONS = [
+    (By.CSS_SELECTOR, "input[type='submit'][value*='Search']"),
+    (By.XPATH, "//input[@type='submit' and contains(@value,'Search')]"),
+    (By.XPATH, "//button[contains(.,'Search')]"),
+]
+RESULTS_SELECTOR = "div.tracing-result-wrapper"
+# Banners shown in place of the results wrapper
+NO_RESULTS_SELECTORS = [".tracing-no-results", ".no-results", ".no-result-found"]
+ERROR_SELECTORS = [".tracing-error", ".tracing-result-error", ".alert-danger"]
+# How long ENTER gets to show an outcome before the search button is tried
+SUBMIT_GRACE_SECONDS = 2.0
+# Stages where a failure points at the carrier site rather than at us, and the
+# subset worth retrying (slow or dropped page loads, results that never came)
+UPSTREAM_STAGES = ("pageLoad", "consent", "findInput", "submit", "resultsWait")
+RETRYABLE_STAGES = ("pageLoad", "resultsWait")
+
+extraction_stats: Dict[str, Any] = {
+    "comparisons": 0,
+    "mismatches": 0,
+    "webdriverSeconds": 0.0,
+    "scriptSeconds": 0.0,
+}
+extraction_stats_lock = threading.Lock()
 
 
 def wait_and_click(driver, by: By, selector: str, timeout: int = 10) -> None:
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     WebDriverWait(driver, timeout).until(
         EC.element_to_be_clickable((by, selector))
     ).click()
 
 
-def find_first_clickable(driver, candidates: List[Tuple[By, str]], timeout_each: int = 5):
-    for by, selector in candidates:
-        try:
-            return WebDriverWait(driver, timeout_each).until(
-                EC.element_to_be_clickable((by, selector))
-            )
-        except Exception:
-            continue
-    return None
+def first_visible(selectors: List[str]):
+    # Expected condition: the first displayed element matching any selector
+    css = ", ".join(selectors)
+
+    def condition(driver):
+        for el in driver.find_elements(By.CSS_SELECTOR, css):
+            if el.is_displayed():
+                return el
+        return False
+
+    return condition
 
 
 def text_of(el) -> str:
@@ -83,6 +157,21 @@ def combine_date_time(date_text: str, time_text: str) -> Optional[str]:
     return date_text or time_text
 
 
+def build_location(location_name: str) -> Location:
+    # city/country keep the site's last-comma split; the index only adds
+    # coordinates and the UN/LOCODE
+    city, country = split_city_country(location_name)
+    port = port_index.lookup_location(location_name)
+    return Location(
+        location_name or None,
+        city,
+        country,
+        port.latitude if port else None,
+        port.longitude if port else None,
+        port.unlocode if port else None,
+    )
+
+
 def build_event(
     status: Optional[str],
     date_text: Optional[str],
@@ -90,47 +179,31 @@ def build_event(
     location_name: Optional[str],
     vessel_voyage_text: Optional[str],
     stop_index: int,
-) -> Dict[str, Any]:
-    city, country = split_city_country(location_name or "")
+    terminals: Optional[Dict[str, str]] = None,
+) -> Event:
+    # `terminals` (UN/LOCODE -> terminal name) fills location.terminal
+    location = shared_location(location_name, build_location)
+    if terminals and location.unlocode in terminals:
+        location = shared_location(location_name, build_location, terminals[location.unlocode])
     vessel_name, voyage_reference = parse_vessel_and_voyage(vessel_voyage_text or "")
-    event_time = combine_date_time(date_text or "", time_text or "")
+    return Event(
+        status or None,
+        combine_date_time(date_text or "", time_text or ""),
+        location,
+        stop_index,
+        shared_vessel(vessel_name),
+        voyage_reference or (vessel_voyage_text or None),
+    )
 
-    return {
-        "mode": None,
-        "status": (status or None),
-        "eventCode": None,
-        "eventTime": event_time,
-        "eventQualifier": None,
-        "location": {
-            "name": (location_name or None),
-            "city": city,
-            "state": None,
-            "country": country,
-            "latitude": None,
-            "longitude": None,
-            "unloCode": None,
-            "terminal": None,
-        },
-        "stopIndex": str(stop_index),
-        "vesselInfo": {
-            "name": vessel_name,
-            "imo": None,
-            "mmsi": None,
-            "additionalInfo": None,
-        },
-        "voyageReference": voyage_reference or (vessel_voyage_text or None),
-        "additionalInfo": None,
-    }
 
-
-def derive_routes(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def derive_routes(events: Sequence[Event]) -> Tuple[Route, ...]:
     if not events:
-        return []
+        return ()
 
     pol_event = None
     pod_event = None
     for ev in events:
-        status_text = (ev.get("status") or "").lower()
+        status_text = (ev.status or "").lower()
         if pol_event is None and "port of loading" in status_text:
             pol_event = ev
         # Prefer explicit POD; fall back to destination
@@ -140,10 +213,10 @@ def derive_routes(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             pod_event = ev
 
     if not pol_event and not pod_event:
-        return []
+        return ()
 
-    def event_date_only(ev: Dict[str, Any]) -> Optional[str]:
-        dt = ev.get("eventTime") or ""
+    def event_date_only(ev: Event) -> Optional[str]:
+        dt = ev.event_time or ""
         return dt.split(" ")[0] if dt else None
 
     vessel_name = None
@@ -154,52 +227,40 @@ def derive_routes(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     arrival_date = None
 
     if pol_event:
-        vessel_name = pol_event.get("vesselInfo", {}).get("name") or vessel_name
-        voyage_ref = pol_event.get("voyageReference") or voyage_ref
-        loc = pol_event.get("location") or {}
-        port_of_loading_name = loc.get("name")
+        vessel_name = pol_event.vessel.name or vessel_name
+        voyage_ref = pol_event.voyage_reference or voyage_ref
+        port_of_loading_name = pol_event.location.name
         departure_date = event_date_only(pol_event)
 
     if pod_event:
-        vessel_name = pod_event.get("vesselInfo", {}).get("name") or vessel_name
-        voyage_ref = pod_event.get("voyageReference") or voyage_ref
-        loc = pod_event.get("location") or {}
-        port_of_discharging_name = loc.get("name")
+        vessel_name = pod_event.vessel.name or vessel_name
+        voyage_ref = pod_event.voyage_reference or voyage_ref
+        port_of_discharging_name = pod_event.location.name
         arrival_date = event_date_only(pod_event)
 
-    return [
-        {
-            "place": None,
-            "date": None,
-            "berthing": None,
-            "vessel": vessel_name,
-            "voyage": voyage_ref,
-            "actualLoading": None,
-            "portOfLoading": (
-                f"{port_of_loading_name} ~~ POL" if port_of_loading_name else None
-            ),
-            "departureDate": departure_date,
-            "departureDateExpected": None,
-            "portOfDischarging": (
-                f"{port_of_discharging_name} ~~ POD" if port_of_discharging_name else None
-            ),
-            "arrivalTime": arrival_date,
-            "arrivalTimeExpected": None,
-        }
-    ]
-
-
-def derive_pod_eta(events: List[Dict[str, Any]]) -> Optional[str]:
+    return (
+        Route(
+            vessel=vessel_name,
+            voyage=voyage_ref,
+            port_of_loading=f"{port_of_loading_name} ~~ POL" if port_of_loading_name else None,
+            departure_date=departure_date,
+            port_of_discharging=f"{port_of_discharging_name} ~~ POD" if port_of_discharging_name else None,
+            arrival_time=arrival_date,
+        ),
+    )
+
+
+def derive_pod_eta(events: Sequence[Event]) -> Optional[str]:
     for ev in events:
-        status_text = (ev.get("status") or "").lower()
-        if "vessel arrival to port of discharge" in status_text:
-            dt = ev.get("eventTime") or ""
+        status_text = (ev.status or "").lower()
+        if POD_ARRIVAL_STATUS in status_text:
+            dt = ev.event_time or ""
             return dt.split(" ")[0] if dt else None
     return None
 
 
-def parse_details_card(driver) -> Dict[str, Optional[str]]:
-    details: Dict[str, Optional[str]] = {
+def empty_details() -> Dict[str, Optional[str]]:
+    return {
         "pol": None,
         "pol_terminal": None,
         "sailing": None,
@@ -211,69 +272,96 @@ def parse_details_card(driver) -> Dict[str, Optional[str]]:
         "route_voyage": None,
     }
 
+
+def details_from_blocks(
+    eta_text: Optional[str],
+    blocks: List[List[Tuple[str, str]]],
+    vessel_texts: List[str],
+) -> Dict[str, Optional[str]]:
+    # Each block holds the (label, value) pairs of one `.block-new` in the
+    # tracing details card; the first label tells POL and POD blocks apart
+    details = empty_details()
+    details["eta"] = (eta_text or "").strip() or None
+
+    for block in blocks:
+        if not block:
+            continue
+        first_label = (block[0][0] or "").lower()
+        if "port of loading" in first_label:
+            for label, value in block:
+                lbl = (label or "").lower()
+                if "port of loading" in lbl:
+                    details["pol"] = value or None
+                elif "terminal name" in lbl:
+                    details["pol_terminal"] = value or None
+                elif "sailing" in lbl:
+                    details["sailing"] = value or None
+        elif "port of discharge" in first_label:
+            for label, value in block:
+                lbl = (label or "").lower()
+                if "port of discharge" in lbl:
+                    details["pod"] = value or None
+                elif "terminal name" in lbl:
+                    details["pod_terminal"] = value or None
+                elif "actual time of arrival" in lbl:
+                    details["ata"] = value or None
+
+    # Vessel/voyage from the progress bar
+    for text in vessel_texts:
+        text = (text or "").replace("Vessel / Voyage", "").strip()
+        if not text:
+            continue
+        vessel_name, voyage = parse_vessel_and_voyage(text)
+        details["route_vessel"] = vessel_name
+        details["route_voyage"] = voyage
+        break
+
+    return details
+
+
+def parse_details_card(driver, fields: Optional[FrozenSet[str]] = None) -> Dict[str, Optional[str]]:
     # Top ETA block
-    try:
-        details["eta"] = text_of(driver.find_element(By.CSS_SELECTOR, "#etaDate")) or None
-    except Exception:
-        pass
+    eta_text = ""
+    if wants(fields, "podETA") or wants(fields, "routes"):
+        try:
+            eta_text = text_of(driver.find_element(By.CSS_SELECTOR, "#etaDate"))
+        except Exception:
+            eta_text = ""
 
-    # Tracing details card with POL/POD/terminals/dates
+    # Tracing details card with POL/POD/terminals/dates. Events only need it
+    # for terminal names, podETA only for the ATA when there is no ETA.
+    blocks: List[List[Tuple[str, str]]] = []
+    if not (wants(fields, "routes") or wants(fields, "events") or (wants(fields, "podETA") and not eta_text.strip())):
+        return details_from_blocks(eta_text, blocks, [])
     try:
         card = driver.find_element(By.CSS_SELECTOR, ".tracing-details-card .card-body")
-        blocks = card.find_elements(By.CSS_SELECTOR, ".block-new")
-        for block in blocks:
-            # Look at first label in block to determine POL vs POD
-            label_els = block.find_elements(By.CSS_SELECTOR, ".card-content-text .label")
-            if not label_els:
-                continue
-            first_label = text_of(label_els[0]).lower()
-            content_items = block.find_elements(By.CSS_SELECTOR, ".card-content-text")
-            if "port of loading" in first_label:
-                for ci in content_items:
-                    lbl = text_of(ci.find_element(By.CSS_SELECTOR, ".label")).lower()
-                    # Value is the last div inside the card-content-text
-                    all_divs = ci.find_elements(By.CSS_SELECTOR, "div")
-                    value = text_of(all_divs[-1]) if all_divs else ""
-                    if "port of loading" in lbl:
-                        details["pol"] = value or None
-                    elif "terminal name" in lbl:
-                        details["pol_terminal"] = value or None
-                    elif "sailing" in lbl:
-                        details["sailing"] = value or None
-            elif "port of discharge" in first_label:
-                for ci in content_items:
-                    lbl = text_of(ci.find_element(By.CSS_SELECTOR, ".label")).lower()
-                    all_divs = ci.find_elements(By.CSS_SELECTOR, "div")
-                    value = text_of(all_divs[-1]) if all_divs else ""
-                    if "port of discharge" in lbl:
-                        details["pod"] = value or None
-                    elif "terminal name" in lbl:
-                        details["pod_terminal"] = value or None
-                    elif "actual time of arrival" in lbl:
-                        details["ata"] = value or None
+        for block in card.find_elements(By.CSS_SELECTOR, ".block-new"):
+            pairs: List[Tuple[str, str]] = []
+            for ci in block.find_elements(By.CSS_SELECTOR, ".card-content-text"):
+                label_els = ci.find_elements(By.CSS_SELECTOR, ".label")
+                if not label_els:
+                    continue
+                # Value is the last div inside the card-content-text
+                all_divs = ci.find_elements(By.CSS_SELECTOR, "div")
+                pairs.append((text_of(label_els[0]), text_of(all_divs[-1]) if all_divs else ""))
+            blocks.append(pairs)
     except Exception:
         pass
 
     # Try to get vessel/voyage from progress bar
-    try:
-        vessel_blocks = driver.find_elements(By.CSS_SELECTOR, ".progress-bar-v2 .vessel")
-        for vb in vessel_blocks:
-            text = vb.text.replace("Vessel / Voyage", "").strip()
-            if not text:
-                continue
-            vessel_name, voyage = parse_vessel_and_voyage(text)
-            details["route_vessel"] = vessel_name
-            details["route_voyage"] = voyage
-            break
-    except Exception:
-        pass
+    vessel_texts: List[str] = []
+    if wants(fields, "routes"):
+        try:
+            vessel_texts = [vb.text for vb in driver.find_elements(By.CSS_SELECTOR, ".progress-bar-v2 .vessel")]
+        except Exception:
+            vessel_texts = []
 
-    return details
+    return details_from_blocks(eta_text, blocks, vessel_texts)
 
 
-def build_routes_from_details(details: Dict[str, Optional[str]]) -> List[Dict[str, Any]]:
+def build_routes_from_details(details: Dict[str, Optional[str]]) -> Tuple[Route, ...]:
     if not any([details.get("pol"), details.get("pod")]):
-        return []
+        return ()
     pol_composed = None
     pod_composed = None
     if details.get("pol") and details.get("pol_terminal"):
@@ -285,28 +373,106 @@ def build_routes_from_details(details: Dict[str, Optional[str]]) -> List[Dict[st
     elif details.get("pod"):
         pod_composed = f"{details['pod']} ~~ POD"
 
-    return [
-        {
-            "place": None,
-            "date": None,
-            "berthing": None,
-            "vessel": details.get("route_vessel"),
-            "voyage": details.get("route_voyage"),
-            "actualLoading": None,
-            "portOfLoading": pol_composed,
-            "departureDate": details.get("sailing"),
-            "departureDateExpected": None,
-            "portOfDischarging": pod_composed,
-            "arrivalTime": details.get("ata") or details.get("eta"),
-            "arrivalTimeExpected": None,
-        }
-    ]
-
-
-def parse_reference_variant(results, driver) -> Tuple[List[Dict[str, Any]], Optional[str], List[Dict[str, Any]], Optional[str]]:
-    # Returns (containers, current_status, routes, pod_eta)
-    containers: List[Dict[str, Any]] = []
+    return (
+        Route(
+            vessel=details.get("route_vessel"),
+            voyage=details.get("route_voyage"),
+            port_of_loading=pol_composed,
+            departure_date=details.get("sailing"),
+            port_of_discharging=pod_composed,
+            arrival_time=details.get("ata") or details.get("eta"),
+        ),
+    )
+
+
+def build_events(
+    rows: List[Dict[str, Any]],
+    terminals: Optional[Dict[str, str]] = None,
+    shared: Optional[Dict[Tuple[Any, ...], Event]] = None,
+) -> Tuple[Event, ...]:
+    # Rows hold the raw date/time/activity/location/vessel text of one timeline
+    # entry. Events equal to one already in `shared` (the same move seen by
+    # another container of a B/L) reuse that object.
+    events = []
+    for idx, row in enumerate(rows):
+        event = build_event(
+            status=row.get("activity"),
+            date_text=row.get("date"),
+            time_text=row.get("time"),
+            location_name=row.get("location"),
+            vessel_voyage_text=row.get("vessel"),
+            stop_index=idx,
+            terminals=terminals,
+        )
+        if shared is not None:
+            event = shared.setdefault(event.key(), event)
+        events.append(event)
+    return tuple(events)
+
+
+def terminals_by_port(details: Dict[str, Optional[str]]) -> Dict[str, str]:
+    # UN/LOCODE -> terminal named on the details card for the POL and POD
+    terminals: Dict[str, str] = {}
+    for port_key, terminal_key in (("pol", "pol_terminal"), ("pod", "pod_terminal")):
+        port = port_index.lookup_location(details.get(port_key) or "")
+        if port is not None and details.get(terminal_key):
+            terminals.setdefault(port.unlocode, details[terminal_key])
+    return terminals
+
+
+def reference_container(
+    card: Dict[str, Any],
+    routes: Tuple[Route, ...],
+    pod_eta: Optional[str],
+    terminals: Optional[Dict[str, str]] = None,
+    shared: Optional[Dict[Tuple[Any, ...], Event]] = None,
+) -> Container:
+    return Container(
+        card.get("containerType"),
+        (card.get("containerNum") or "").strip() or None,
+        build_events(card.get("activities") or [], terminals, shared),
+        routes,
+        pod_eta,
+    )
+
+
+def build_reference_containers(
+    cards: Iterable[Dict[str, Any]],
+    details: Dict[str, Optional[str]],
+    on_container: Optional[Callable[[Container], None]] = None,
+) -> Tuple[List[Container], Optional[str], Tuple[Route, ...], Optional[str]]:
+    # Returns (containers, current_status, routes, pod_eta). Routes and podETA
+    # come from the details card and are shared by every container, so each
+    # container is complete (and handed to on_container) as soon as its card is.
+    containers: List[Container] = []
     current_status: Optional[str] = None
+    routes = build_routes_from_details(details)
+    pod_eta = details.get("eta") or details.get("ata")
+    terminals = terminals_by_port(details)
+    shared: Dict[Tuple[Any, ...], Event] = {}
+
+    for card in cards:
+        last_activity = card.get("lastActivity")
+        if last_activity and not current_status:
+            current_status = last_activity
+
+        container = reference_container(card, routes, pod_eta, terminals, shared)
+        containers.append(container)
+        if on_container is not None:
+            on_container(container)
+
+    return containers, current_status, routes, pod_eta
+
+
+def parse_reference_variant(
+    results,
+    driver,
+    on_container: Optional[Callable[[Container], None]] = None,
+    fields: Optional[FrozenSet[str]] = None,
+) -> Tuple[List[Container], Optional[str], Tuple[Route, ...], Optional[str]]:
+    # Returns (containers, current_status, routes, pod_eta). The details card is
+    # read first so containers can be emitted while later cards are still parsed.
+    details = parse_details_card(driver, fields)
 
     # Parse routing details containers and activity timeline
     try:
@@ -314,308 +480,1172 @@ def parse_reference_variant(results, driver) -> Tuple[List[Dict[str, Any]], Opti
     except Exception:
         container_cards = []
 
-    for card in container_cards:
-        # Top-level info within card header
-        try:
-            container_num = text_of(card.find_element(By.CSS_SELECTOR, ".unit-number"))
-        except Exception:
-            container_num = None
+    return build_reference_containers(read_reference_cards(container_cards, fields), details, on_container)
+
+
+def read_reference_cards(cards: Iterable[Any], fields: Optional[FrozenSet[str]] = None) -> Iterator[Dict[str, Any]]:
+    # currentStatus is the first last-activity found, so later cards skip it
+    status_needed = wants(fields, "currentStatus")
+    for card in cards:
+        data = read_reference_card(card, fields, last_activity=status_needed)
+        if data["lastActivity"]:
+            status_needed = False
+        yield data
+
+
+def read_reference_card(card, fields: Optional[FrozenSet[str]] = None, last_activity: bool = True) -> Dict[str, Any]:
+    # Top-level info within card header
+    try:
+        container_num = text_of(card.find_element(By.CSS_SELECTOR, ".unit-number"))
+    except Exception:
+        container_num = None
+    container_type = None
+    if wants(fields, "containerType"):
         try:
             container_type = text_of(card.find_element(By.CSS_SELECTOR, "div[id$='_cargoType']"))
         except Exception:
             container_type = None
+    last_activity_text = None
+    if last_activity:
         try:
-            last_activity = text_of(card.find_element(By.CSS_SELECTOR, "div[id$='_activityDesc']"))
+            last_activity_text = text_of(card.find_element(By.CSS_SELECTOR, "div[id$='_activityDesc']"))
         except Exception:
-            last_activity = None
-        if last_activity and not current_status:
-            current_status = last_activity
+            last_activity_text = None
 
-        # Activities within the expanded timeline
-        events: List[Dict[str, Any]] = []
-        activity_items = []
+    # Activities within the expanded timeline
+    activities: List[Dict[str, str]] = []
+    activity_items = []
+    if wants(fields, "events"):
         try:
             activity_items = card.find_elements(By.CSS_SELECTOR, ".card-desktop-inner li.card-container-activity")
         except Exception:
             activity_items = []
 
-        for idx, item in enumerate(activity_items):
-            try:
-                date_text = text_of(item.find_element(By.CSS_SELECTOR, "div[id$='_activityDateTz'] .date"))
-            except Exception:
-                date_text = ""
-            try:
-                time_text = text_of(item.find_element(By.CSS_SELECTOR, "div[id$='_activityDateTz'] .time"))
-            except Exception:
-                time_text = ""
-            try:
-                activity_text = text_of(item.find_element(By.CSS_SELECTOR, "div[id$='_activityDesc']"))
-            except Exception:
-                activity_text = ""
+    for item in activity_items:
+        try:
+            date_text = text_of(item.find_element(By.CSS_SELECTOR, "div[id$='_activityDateTz'] .date"))
+        except Exception:
+            date_text = ""
+        try:
+            time_text = text_of(item.find_element(By.CSS_SELECTOR, "div[id$='_activityDateTz'] .time"))
+        except Exception:
+            time_text = ""
+        try:
+            activity_text = text_of(item.find_element(By.CSS_SELECTOR, "div[id$='_activityDesc']"))
+        except Exception:
+            activity_text = ""
+        try:
+            location_text = text_of(item.find_element(By.CSS_SELECTOR, "div[id$='_placeFromDesc']"))
+        except Exception:
+            location_text = ""
+        vessel_text = ""
+        try:
+            vessel_block = item.find_element(By.CSS_SELECTOR, "div[id$='_vessel']")
             try:
-                location_text = text_of(item.find_element(By.CSS_SELECTOR, "div[id$='_placeFromDesc']"))
+                vessel_text = text_of(vessel_block.find_element(By.CSS_SELECTOR, "a"))
             except Exception:
-                location_text = ""
+                vessel_text = text_of(vessel_block)
+        except Exception:
             vessel_text = ""
-            try:
-                vessel_block = item.find_element(By.CSS_SELECTOR, "div[id$='_vessel']")
-                try:
-                    vessel_text = text_of(vessel_block.find_element(By.CSS_SELECTOR, "a"))
-                except Exception:
-                    vessel_text = text_of(vessel_block)
-            except Exception:
-                vessel_text = ""
-
-            events.append(
-                build_event(
-                    status=activity_text,
-                    date_text=date_text,
-                    time_text=time_text,
-                    location_name=location_text,
-                    vessel_voyage_text=vessel_text,
-                    stop_index=idx,
-                )
-            )
 
-        containers.append(
+        activities.append(
             {
-                "containerType": container_type,
-                "containerNum": (container_num or "").strip() or None,
-                "stops": [],
-                "events": events,
-                "routes": [],  # Filled later from details card
-                "vesselMovements": [],
-                "cargoDeliveryInformationUsImportOnly": None,
-                "podETA": None,  # Filled later from details card
-                "additionalInfo": None,
+                "date": date_text,
+                "time": time_text,
+                "activity": activity_text,
+                "location": location_text,
+                "vessel": vessel_text,
             }
         )
 
-    details = parse_details_card(driver)
-    routes = build_routes_from_details(details)
-    pod_eta = details.get("eta") or details.get("ata")
+    return {
+        "containerNum": container_num,
+        "containerType": container_type,
+        "lastActivity": last_activity_text,
+        "activities": activities,
+    }
 
-    # Attach routes and podETA to each container
-    for c in containers:
-        c["routes"] = routes
-        c["podETA"] = pod_eta
 
-    return containers, current_status, routes, pod_eta
+def reference_payload(identifier: str, containers: List[Container], current_status: Optional[str]) -> TrackingResult:
+    return TrackingResult(identifier, "BillOfLanding", current_status, identifier, tuple(containers))
 
 
-def scrape_container_or_bol(identifier: str) -> Dict[str, Any]:
+def container_payload(
+    identifier: str,
+    container_num: Optional[str],
+    type_and_size: Optional[str],
+    last_activity_text: Optional[str],
+    events: Tuple[Event, ...],
+) -> TrackingResult:
+    container = Container(type_and_size, container_num or identifier, events, derive_routes(events), derive_pod_eta(events))
+    # refType can be overridden by the caller (track_identifier)
+    return TrackingResult(identifier, "Container", last_activity_text, None, (container,))
+
+
+def payload_from_snapshot(snapshot: Dict[str, Any], identifier: str) -> TrackingResult:
+    # Builds the payload from the structure produced by dom_extract.EXTRACT_SCRIPT
+    if snapshot.get("variant") == "reference":
+        details = details_from_blocks(
+            snapshot.get("eta"),
+            snapshot.get("detailBlocks") or [],
+            snapshot.get("vesselTexts") or [],
+        )
+        containers, current_status, _, _ = build_reference_containers(snapshot.get("cards") or [], details)
+        return reference_payload(identifier, containers, current_status)
+
+    rows = snapshot.get("rows")
+    if rows is None:
+        raise RuntimeError("Unable to locate container activities table.")
+    header = snapshot.get("header") or {}
+    # Reverse to oldest->newest for stable indexing like sample
+    events = build_events(list(reversed(rows)))
+    return container_payload(
+        identifier,
+        header.get("containerNum"),
+        header.get("typeAndSize"),
+        header.get("lastActivity"),
+        events,
+    )
+
+
+def wants(fields: Optional[FrozenSet[str]], name: str) -> bool:
+    # None means the whole payload
+    return fields is None or name in fields
+
+
+def parse_fields(value: Optional[str]) -> Optional[FrozenSet[str]]:
+    # "currentStatus,podETA" -> frozenset of canonical names; empty means all
+    canonical = {name.lower(): name for name in PROJECTABLE_FIELDS}
+    names = [part.strip() for part in (value or "").split(",") if part.strip()]
+    if not names:
+        return None
+    unknown = sorted(name for name in names if name.lower() not in canonical)
+    if unknown:
+        raise ValueError(f"unknown field(s) {', '.join(unknown)}; expected {', '.join(PROJECTABLE_FIELDS)}")
+    return frozenset(canonical[name.lower()] for name in names)
+
+
+blocking_profile = BlockingProfile(
+    resource_types=settings.BLOCK_RESOURCE_TYPES if settings.BLOCK_RESOURCES else (),
+    deny_domains=settings.BLOCK_DOMAINS if settings.BLOCK_RESOURCES else (),
+    allow_domains=settings.ALLOW_DOMAINS,
+)
+network_stats = NetworkStats()
+stage_stats = StageStats()
+scrape_metrics = ScrapeMetrics()
+
+fast_path = FastPathClient(
+    session_ttl=settings.FAST_PATH_SESSION_TTL,
+    pool_size=settings.FAST_PATH_POOL_SIZE,
+    timeout=settings.FAST_PATH_TIMEOUT,
+    url_pattern=settings.FAST_PATH_URL_PATTERN,
+)
+tracking_store: Optional[TrackingStore] = TrackingStore(settings.STORE_PATH) if settings.STORE_ENABLED else None
+
+watchlist = Watchlist(
+    # Scheduled refreshes bypass the cache but still update it and the store
+    refresh=lambda ref_num, ref_type: lookup_tracking(ref_num, ref_type, max_age=0)[0].to_dict(),
+    path=settings.STORE_PATH if settings.STORE_ENABLED else ":memory:",
+    budget_per_minute=settings.WATCHLIST_BUDGET_PER_MINUTE,
+    workers=settings.WATCHLIST_WORKERS,
+    baseline_interval=settings.WATCHLIST_BASELINE_INTERVAL,
+)
+atexit.register(watchlist.stop)
+
+if settings.FAST_PATH_ENABLED and settings.FAST_PATH_TEMPLATE:
+    # A saved template (e.g. pointing at a local stand-in server) skips capture
+    fast_path.load(settings.FAST_PATH_TEMPLATE)
+
+
+def create_driver(profile_dir: Optional[str] = None):
+    # Deferred so start-up (and /healthz) does not wait for uc and selenium
+    import undetected_chromedriver as uc
+
     options = uc.ChromeOptions()
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--disable-gpu")
     options.add_argument("--headless=new")
+    for argument in blocking_profile.chrome_arguments():
+        options.add_argument(argument)
+    if blocking_profile.enabled or settings.FAST_PATH_ENABLED:
+        # Performance log feeds the per-scrape request counts and fast-path capture
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    if settings.BROWSER_TABS > 1:
+        # Tabs take turns on one WebDriver session, so no command may block
+        # on a page load (Tab.get waits by polling instead), and tabs that are
+        # not in front must keep running at full speed
+        options.page_load_strategy = "none"
+        options.add_argument("--disable-background-timer-throttling")
+        options.add_argument("--disable-backgrounding-occluded-windows")
+        options.add_argument("--disable-renderer-backgrounding")
 
-    driver = uc.Chrome(options=options)
+    try:
+        # The cached, already patched driver spares uc its download and patch
+        cached = driver_cache.ensure().uc_arguments()
+    except Exception as exc:
+        log.warning("Chromedriver cache unavailable, letting uc fetch the driver: %s", exc)
+        cached = {}
+
+    started = time.perf_counter()
+    # A caller-supplied profile is kept by uc; browsers.quit() removes it
+    driver = uc.Chrome(options=options, user_data_dir=profile_dir, **cached)
+    scrape_metrics.observe_stage("browserLaunch", time.perf_counter() - started)
+    prepare_target(driver)
+    return driver
+
+
+def prepare_target(driver) -> None:
+    # Per-page setup, run for every browser and every tab
+    instrument_commands(driver)
     driver.set_page_load_timeout(60)
+    if settings.FAST_PATH_ENABLED:
+        # Response bodies are only retrievable with the Network domain enabled
+        driver.execute_cdp_cmd("Network.enable", {})
+    blocking_profile.apply(driver)
+
+
+def track_origin() -> str:
+    parts = urlsplit(settings.TRACK_URL)
+    return f"{parts.scheme}://{parts.netloc}"
+
 
+def reset_driver(driver) -> None:
+    # Drop cookies and storage left by the previous lookup, then park the
+    # browser on the tracking page so the next borrower skips the initial load
+    if getattr(driver, "context_id", "") is None:
+        # A tab sharing the default context shares its cookie jar with the
+        # other tabs, which may be mid-lookup; clearing would break them
+        driver.get(settings.TRACK_URL)
+        return
     try:
-        url = "https://www.zim.com/tools/track-a-shipment"
-        driver.get(url)
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd(
+            "Storage.clearDataForOrigin",
+            {"origin": track_origin(), "storageTypes": "all"},
+        )
+    except Exception:
+        driver.delete_all_cookies()
+        driver.execute_script(
+            "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+        )
+    driver.set_page_load_timeout(60)
+    driver.get(settings.TRACK_URL)
+
+
+driver_cache = ChromedriverCache(settings.DRIVER_CACHE_DIR, settings.CHROME_BINARY)
+
+browsers = BrowserLifecycle(
+    max_uses=settings.BROWSER_MAX_USES,
+    max_rss=settings.BROWSER_MAX_RSS_MB * 1024 * 1024,
+    total_rss=settings.BROWSER_TOTAL_RSS_MB * 1024 * 1024,
+    sweep_interval=settings.BROWSER_SWEEP_INTERVAL,
+    profile_root=settings.BROWSER_PROFILE_ROOT,
+)
+
+# With several tabs per browser the pool hands out tabs: its size counts
+# lookups, and browsers are opened and quit underneath as tabs need them
+tabs = None
+if settings.BROWSER_TABS > 1:
+    from browser_tabs import TabbedBrowsers
+
+    tabs = TabbedBrowsers(
+        lambda: browsers.launch(create_driver),
+        browsers.quit,
+        tabs_per_browser=settings.BROWSER_TABS,
+        prepare=prepare_target,
+        retire=browsers.should_recycle,
+    )
+    driver_pool = DriverPool(
+        tabs.open_tab,
+        reset=reset_driver,
+        min_size=settings.POOL_MIN_SIZE,
+        max_size=settings.POOL_SLOTS,
+        idle_timeout=settings.POOL_IDLE_TIMEOUT,
+        checkout_timeout=settings.POOL_CHECKOUT_TIMEOUT,
+        reap_interval=settings.POOL_REAP_INTERVAL,
+        retire=tabs.should_recycle,
+        destroy=tabs.close_tab,
+    )
+else:
+    driver_pool = DriverPool(
+        lambda: browsers.launch(create_driver),
+        reset=reset_driver,
+        min_size=settings.POOL_MIN_SIZE,
+        max_size=settings.POOL_MAX_SIZE,
+        idle_timeout=settings.POOL_IDLE_TIMEOUT,
+        checkout_timeout=settings.POOL_CHECKOUT_TIMEOUT,
+        reap_interval=settings.POOL_REAP_INTERVAL,
+        retire=browsers.should_recycle,
+        destroy=browsers.quit,
+    )
+atexit.register(driver_pool.close)
+
+result_cache = ResultCache(
+    ttl=settings.CACHE_TTL,
+    stale_ttl=settings.CACHE_STALE_TTL,
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    max_bytes=settings.CACHE_MAX_BYTES,
+    stale_while_revalidate=settings.CACHE_STALE_WHILE_REVALIDATE,
+    refresh_workers=settings.CACHE_REFRESH_WORKERS,
+)
+
+# Loaded once; lookups are memoised per location string
+if settings.PORT_INDEX_ENABLED:
+    try:
+        port_index.load_index(settings.PORT_INDEX_PATH)
+    except (OSError, ValueError, KeyError) as exc:
+        log.warning("Port index not loaded from %s: %s", settings.PORT_INDEX_PATH, exc)
+
+# Concurrent lookups of one identifier share a single scrape
+in_flight = SingleFlight()
+
+job_records: Optional[SharedJobRecords] = None
+# The durable queue behind /api/zim/jobs when ZIM_JOB_BACKEND=durable; jobs are
+# then run by scrape_worker.py processes rather than by this one
+job_store: Optional[DurableJobStore] = None
+if settings.JOB_BACKEND == "durable":
+    job_store = DurableJobStore(
+        settings.JOB_STORE_PATH,
+        visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        retention=settings.JOB_RETENTION,
+    )
+elif settings.JOB_STORE_PATH:
+    try:
+        job_records = SharedJobRecords(settings.JOB_STORE_PATH)
+    except Exception:
+        log.exception("Job records unavailable at %s; jobs are visible to this process only", settings.JOB_STORE_PATH)
+
+callback_policy = CallbackPolicy(settings.CALLBACK_ALLOWED_HOSTS, settings.CALLBACK_ALLOW_PRIVATE)
+
+job_queue: Any
+if job_store is not None:
+    job_queue = DurableJobQueue(job_store, max_queue=settings.JOB_QUEUE_SIZE)
+else:
+    job_queue = JobQueue(
+        lambda job: run_job(job),
+        workers=settings.JOB_WORKERS,
+        max_queue=settings.JOB_QUEUE_SIZE,
+        retention=settings.JOB_RETENTION,
+        records=job_records,
+        callback_timeout=settings.CALLBACK_TIMEOUT,
+        callback_attempts=settings.CALLBACK_ATTEMPTS,
+        callback_secret=settings.CALLBACK_SECRET,
+        callback_policy=callback_policy,
+    )
+
+# Caps browser scrapes; under gunicorn the limit is shared by all workers
+admission = AdmissionControl(
+    settings.ADMISSION_LIMIT,
+    settings.ADMISSION_QUEUE,
+    settings.ADMISSION_TIMEOUT,
+    state=shared_state(),
+)
+
+upstream = UpstreamHealth(
+    TokenBucket(settings.UPSTREAM_RATE, settings.UPSTREAM_BURST),
+    ConcurrencyLimit(
+        settings.UPSTREAM_MIN_CONCURRENCY, settings.UPSTREAM_MAX_CONCURRENCY, settings.UPSTREAM_TARGET_LATENCY
+    ),
+    CircuitBreaker(
+        settings.BREAKER_FAILURE_RATIO,
+        settings.BREAKER_MIN_REQUESTS,
+        settings.BREAKER_WINDOW,
+        settings.BREAKER_OPEN_SECONDS,
+    ),
+    max_retries=settings.UPSTREAM_RETRIES,
+    retry_base=settings.UPSTREAM_RETRY_BASE,
+)
+
+
+_parse_executor: Optional[Executor] = None
+_parse_executor_lock = threading.Lock()
+
+
+def parse_executor() -> Executor:
+    # Page-source parsing is CPU-bound; a process pool keeps it off the GIL
+    global _parse_executor
+    with _parse_executor_lock:
+        if _parse_executor is None:
+            if settings.PARSE_EXECUTOR == "process":
+                _parse_executor = ProcessPoolExecutor(max_workers=settings.PARSE_WORKERS)
+            else:
+                _parse_executor = ThreadPoolExecutor(
+                    max_workers=settings.PARSE_WORKERS, thread_name_prefix="zim-parse"
+                )
+            atexit.register(_parse_executor.shutdown, wait=False)
+        return _parse_executor
+
 
+def is_on_tracking_page(driver) -> bool:
+    try:
+        return (driver.current_url or "").split("?", 1)[0].rstrip("/") == settings.TRACK_URL
+    except Exception:
+        return False
+
+
+def scrape_container_or_bol(
+    identifier: str,
+    extraction: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+    on_container: Optional[Callable[[Container], None]] = None,
+    fields: Optional[FrozenSet[str]] = None,
+) -> TrackingResult:
+    # `fields` limits the element walk to what those fields need; the other
+    # extraction modes build the whole payload and callers project it
+    mode = (extraction or settings.EXTRACTION_MODE).lower()
+    deadline = deadline or Deadline(settings.REQUEST_TIMEOUT)
+
+    if settings.FAST_PATH_ENABLED and fast_path.ready():
         try:
-            wait_and_click(driver, By.ID, "onetrust-accept-btn-handler", timeout=5)
+            with deadline.stage("fastPath"):
+                return payload_from_snapshot(fast_path.lookup(identifier, deadline.budget()), identifier)
+        except FastPathError as exc:
+            log.info("Fast path fell back to Selenium for %s: %s", identifier, exc)
+
+    payload: Optional[TrackingResult] = None
+    page_source = ""
+    captured = None
+    with ExitStack() as stack:
+        with deadline.stage("admission"):
+            stack.enter_context(admission.slot(deadline.budget(settings.ADMISSION_TIMEOUT)))
+        with deadline.stage("checkout"):
+            driver = stack.enter_context(
+                driver_pool.checkout(timeout=deadline.budget(settings.POOL_CHECKOUT_TIMEOUT))
+            )
+        succeeded = False
+        commands_before = command_count(driver)
+        try:
+            results = search_with_retries(driver, identifier, deadline)
+            with deadline.stage("extract"):
+                if mode == "html":
+                    page_source = driver.page_source
+                else:
+                    payload = extract_payload(driver, results, identifier, mode, deadline, on_container, fields)
+            succeeded = True
+        finally:
+            deadline.details["webdriverCommands"] = command_count(driver) - commands_before
+            # A projected scrape is partial, so it cannot vouch for a capture
+            captured = inspect_network(driver, identifier, succeeded and fields is None)
+
+    if payload is None:
+        # The browser is already on its way back to the pool; parse off-browser
+        with deadline.stage("parse"):
+            payload = parse_page_source(page_source, identifier)
+    if captured is not None:
+        arm_fast_path(captured, identifier, payload)
+    return payload
+
+
+def arm_fast_path(captured: Tuple[RequestTemplate, Any], identifier: str, payload: TrackingResult) -> None:
+    # The captured JSON must build byte-for-byte the payload the DOM gave
+    expected = payload.dump()
+    fast_path.arm(
+        captured, identifier, lambda snapshot: payload_from_snapshot(snapshot, identifier).dump() == expected
+    )
+
+
+def inspect_network(driver, identifier: str, capture: bool) -> Optional[Tuple[RequestTemplate, Any]]:
+    # One performance-log read per scrape feeds both the blocking report and
+    # fast-path capture. It covers this scrape plus the reset navigation that
+    # parked the browser. Returns a fast-path capture for arm_fast_path().
+    if not (blocking_profile.enabled or settings.FAST_PATH_ENABLED):
+        return None
+    messages = read_performance_log(driver)
+
+    if blocking_profile.enabled:
+        summary = summarize_network(messages)
+        network_stats.record(summary)
+        log.info(
+            "Network for %s: %d requests, %d blocked, %d bytes loaded",
+            identifier,
+            summary["requests"],
+            summary["requestsBlocked"],
+            summary["bytesLoaded"],
+        )
+
+    if capture and settings.FAST_PATH_ENABLED and not fast_path.ready():
+        try:
+            return fast_path.capture(driver, messages, identifier)
         except Exception:
-            pass
+            log.exception("Fast path capture failed for %s", identifier)
+    return None
 
-        # Locate the input (site has changed ids historically)
-        container_input = None
-        for input_id in ["shipment-main-search-2", "shipment-main-search"]:
+
+def search_with_retries(driver, identifier: str, deadline: Deadline):
+    # Transient page-load and results-wait failures are retried on the same
+    # browser after a jittered backoff, reloading the page, within the deadline
+    attempt = 0
+    while True:
+        try:
+            return search_identifier(driver, identifier, deadline, reload=attempt > 0)
+        except WebDriverException as exc:
+            if deadline.failed_stage not in RETRYABLE_STAGES or not upstream.retry(attempt, deadline.remaining()):
+                raise
+            log.info("Retrying %s after %s failed: %s", identifier, deadline.failed_stage, exc.__class__.__name__)
+            attempt += 1
+            deadline.failed_stage = None
+            deadline.details["retries"] = attempt
+
+
+def search_identifier(driver, identifier: str, deadline: Deadline, reload: bool = False):
+    # Runs the search form and returns the results wrapper element. Every wait
+    # races its alternatives and draws on the request's shared deadline.
+    from selenium.webdriver.support import expected_conditions as EC
+
+    with deadline.stage("pageLoad"):
+        if reload or not is_on_tracking_page(driver):
+            driver.set_page_load_timeout(deadline.budget(60))
+            driver.get(settings.TRACK_URL)
+
+    input_conditions = {
+        input_id: EC.element_to_be_clickable((By.ID, input_id)) for input_id in INPUT_IDS
+    }
+
+    with deadline.stage("consent"):
+        if blocking_profile.blocks_consent:
+            # The OneTrust bundle is blocked, so the banner normally never shows;
+            # click it only if a self-hosted copy rendered one anyway
+            for button in driver.find_elements(By.ID, CONSENT_BUTTON_ID):
+                try:
+                    button.click()
+                except Exception:
+                    pass
+        else:
+            # Stop waiting for the banner as soon as the search box is usable
             try:
-                container_input = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.ID, input_id))
+                name, element = deadline.wait_any(
+                    driver,
+                    {"consent": EC.element_to_be_clickable((By.ID, CONSENT_BUTTON_ID)), **input_conditions},
+                    5,
                 )
-                break
+                if name == "consent":
+                    element.click()
+            except TimeoutException:
+                pass
+            except DeadlineExceeded:
+                raise
             except Exception:
-                continue
-        if not container_input:
+                pass
+
+    with deadline.stage("findInput"):
+        try:
+            _, container_input = deadline.wait_any(driver, input_conditions, 10)
+        except TimeoutException:
             raise RuntimeError("Unable to locate container/BOL input box.")
 
+    outcome_conditions = {
+        "results": EC.presence_of_element_located((By.CSS_SELECTOR, RESULTS_SELECTOR)),
+        "noResults": first_visible(NO_RESULTS_SELECTORS),
+        "error": first_visible(ERROR_SELECTORS),
+    }
+
+    with deadline.stage("submit"):
         container_input.clear()
         container_input.send_keys(identifier)
-
-        # Try ENTER and also fallback to clicking any visible search button
         container_input.send_keys(Keys.ENTER)
-        search_button = find_first_clickable(
-            driver,
-            [
-                (By.CSS_SELECTOR, "input[type='submit'][value*='Search']"),
-                (By.XPATH, "//input[@type='submit' and contains(@value,'Search')]"),
-                (By.XPATH, "//button[contains(.,'Search')]")
-            ],
-            timeout_each=3,
-        )
-        if search_button:
+
+        # ENTER normally submits; fall back to any visible search button only
+        # if nothing has happened after a short grace period
+        outcome = None
+        try:
+            outcome = deadline.wait_any(driver, outcome_conditions, SUBMIT_GRACE_SECONDS)
+        except TimeoutException:
             try:
+                _, search_button = deadline.wait_any(
+                    driver,
+                    {selector: EC.element_to_be_clickable((by, selector)) for by, selector in SEARCH_BUTTONS},
+                    3,
+                )
                 search_button.click()
+            except DeadlineExceeded:
+                raise
             except Exception:
                 pass
 
-        # Wait for results
-        results = WebDriverWait(driver, 45).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div.tracing-result-wrapper"))
-        )
+    with deadline.stage("resultsWait"):
+        if outcome is None:
+            outcome = deadline.wait_any(driver, outcome_conditions, 45)
+
+    name, element = outcome
+    if name != "results":
+        raise TrackingNotFound(text_of(element) or f"No tracking results for {identifier}.")
+    return element
+
+
+def extract_payload(
+    driver,
+    results,
+    identifier: str,
+    mode: str,
+    deadline: Deadline,
+    on_container: Optional[Callable[[Container], None]] = None,
+    fields: Optional[FrozenSet[str]] = None,
+) -> TrackingResult:
+    # Only the element walk emits B/L containers as it goes and skips what
+    # `fields` does not need; the other modes produce the whole payload at once
+    if mode == "script":
+        return payload_from_snapshot(extract_snapshot(driver, results), identifier)
+    if mode == "html":
+        return parse_page_source(driver.page_source, identifier)
+    if mode == "compare":
+        return compare_extractions(driver, results, identifier, deadline)
+    return extract_with_webdriver(driver, results, identifier, deadline, on_container, fields)
+
+
+def parse_page_source(page_source: str, identifier: str) -> TrackingResult:
+    snapshot = parse_executor().submit(parse_snapshot, page_source).result()
+    return payload_from_snapshot(snapshot, identifier)
+
+
+def read_activity_row(items: List[Any]) -> Dict[str, str]:
+    # `items` are the `.activity-item` cells of one timeline row
+    date_text = ""
+    time_text = ""
+    activity_text = ""
+    location_text = ""
+    vessel_text = ""
+
+    if len(items) >= 1:
+        date_block = items[0]
+        try:
+            date_text = text_of(date_block.find_element(By.CSS_SELECTOR, ".date"))
+        except Exception:
+            date_text = ""
+        try:
+            time_text = text_of(date_block.find_element(By.CSS_SELECTOR, ".time"))
+        except Exception:
+            time_text = ""
 
-        # Decide variant: container-number vs B/L reference
-        is_reference_variant = False
+    if len(items) >= 2:
         try:
-            results.find_element(By.CSS_SELECTOR, ".routing-details-v2")
-            is_reference_variant = True
+            activity_text = text_of(items[1].find_element(By.CSS_SELECTOR, ".text-style"))
         except Exception:
-            is_reference_variant = False
-
-        if is_reference_variant:
-            # Parse B/L layout
-            containers, current_status, routes, pod_eta = parse_reference_variant(results, driver)
-
-            # Compose payload using parsed details
-            payload: Dict[str, Any] = {
-                "version": "1.00",
-                "scrapingType": None,
-                "refNum": identifier,
-                "refType": "BillOfLanding",
-                "jtCarrierName": None,
-                "origin": None,
-                "destination": None,
-                "currentStatus": current_status,
-                "bookingNum": None,
-                "bolNum": identifier,
-                "bl_Issue_Date": None,
-                "booking_Date": None,
-                "trackingnNo": None,
-                "additionalInfo": None,
-                "containers": containers,
-                "logs": [],
-            }
-            return payload
-        else:
-            # Container-number layout parsing (existing path)
-            # Header fields
-            try:
-                header_container_num = text_of(results.find_element(By.CSS_SELECTOR, ".cons-number")).lstrip("\u00a0").strip()
-            except Exception:
-                header_container_num = None
+            activity_text = ""
 
+    if len(items) >= 3:
+        try:
+            location_text = text_of(items[2].find_element(By.CSS_SELECTOR, ".text-style"))
+        except Exception:
+            location_text = ""
+
+    if len(items) >= 4:
+        try:
+            vessel_container = items[3].find_element(By.CSS_SELECTOR, ".text-style")
             try:
-                type_and_size = text_of(driver.find_element(By.CSS_SELECTOR, "#typeAndSize"))
+                vessel_text = text_of(vessel_container.find_element(By.CSS_SELECTOR, "a"))
             except Exception:
-                type_and_size = None
+                vessel_text = text_of(vessel_container)
+        except Exception:
+            vessel_text = ""
+
+    return {
+        "date": date_text,
+        "time": time_text,
+        "activity": activity_text,
+        "location": location_text,
+        "vessel": vessel_text,
+    }
 
+
+def pod_arrival_rows(row_els: List[Any]) -> List[Dict[str, str]]:
+    # podETA comes from the earliest arrival at the port of discharge. Rows are
+    # listed newest first, so walk from the bottom, read only the activity
+    # cell, and stop at the first match.
+    for row in reversed(row_els):
+        items = row.find_elements(By.CSS_SELECTOR, ".activity-item")
+        if len(items) < 2:
+            continue
+        try:
+            activity_text = text_of(items[1].find_element(By.CSS_SELECTOR, ".text-style"))
+        except Exception:
+            continue
+        if POD_ARRIVAL_STATUS in activity_text.lower():
+            return [read_activity_row(items)]
+    return []
+
+
+def extract_with_webdriver(
+    driver,
+    results,
+    identifier: str,
+    deadline: Deadline,
+    on_container: Optional[Callable[[Container], None]] = None,
+    fields: Optional[FrozenSet[str]] = None,
+) -> TrackingResult:
+    # Decide variant: container-number vs B/L reference
+    is_reference_variant = False
+    try:
+        results.find_element(By.CSS_SELECTOR, ".routing-details-v2")
+        is_reference_variant = True
+    except Exception:
+        is_reference_variant = False
+
+    if is_reference_variant:
+        # Parse B/L layout
+        with deadline.stage("parseReference"):
+            containers, current_status, routes, pod_eta = parse_reference_variant(
+                results, driver, on_container, fields
+            )
+        return reference_payload(identifier, containers, current_status)
+
+    # Container-number layout parsing
+    # Header fields
+    try:
+        header_container_num = text_of(results.find_element(By.CSS_SELECTOR, ".cons-number")).lstrip("\u00a0").strip()
+    except Exception:
+        header_container_num = None
+
+    type_and_size = None
+    if wants(fields, "containerType"):
+        try:
+            type_and_size = text_of(driver.find_element(By.CSS_SELECTOR, "#typeAndSize"))
+        except Exception:
+            type_and_size = None
+
+    last_activity_text = None
+    if wants(fields, "currentStatus"):
+        try:
+            last_activity_els = driver.find_elements(By.CSS_SELECTOR, ".last-activity-value")
+            for el in last_activity_els:
+                txt = text_of(el)
+                if txt:
+                    last_activity_text = txt
+                    break
+        except Exception:
             last_activity_text = None
-            try:
-                last_activity_els = driver.find_elements(By.CSS_SELECTOR, ".last-activity-value")
-                for el in last_activity_els:
-                    txt = text_of(el)
-                    if txt:
-                        last_activity_text = txt
-                        break
-            except Exception:
-                last_activity_text = None
 
-            # Activities table
+    # Activities table; routes and podETA are derived from it
+    rows: List[Dict[str, str]] = []
+    if wants(fields, "events") or wants(fields, "routes") or wants(fields, "podETA"):
+        with deadline.stage("activityRows"):
             activities_container = results.find_element(By.CSS_SELECTOR, ".one-container-activities")
             row_els = activities_container.find_elements(By.CSS_SELECTOR, ".activity-row")
+            if wants(fields, "events") or wants(fields, "routes"):
+                rows = [read_activity_row(row.find_elements(By.CSS_SELECTOR, ".activity-item")) for row in row_els]
+            else:
+                rows = pod_arrival_rows(row_els)
+
+    # Build events from rows. Reverse to oldest->newest for stable indexing like sample
+    events = build_events(list(reversed(rows)))
+    return container_payload(identifier, header_container_num, type_and_size, last_activity_text, events)
+
+
+def compare_extractions(driver, results, identifier: str, deadline: Deadline) -> TrackingResult:
+    # Runs both extraction paths on the same page and records how they differ;
+    # the injected-script result is the one returned
+    started = time.perf_counter()
+    webdriver_payload = extract_with_webdriver(driver, results, identifier, deadline)
+    webdriver_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    script_payload = payload_from_snapshot(extract_snapshot(driver, results), identifier)
+    script_seconds = time.perf_counter() - started
+
+    matched = webdriver_payload.dump() == script_payload.dump()
+    with extraction_stats_lock:
+        extraction_stats["comparisons"] += 1
+        extraction_stats["webdriverSeconds"] += webdriver_seconds
+        extraction_stats["scriptSeconds"] += script_seconds
+        if not matched:
+            extraction_stats["mismatches"] += 1
+    if not matched:
+        log.warning("Extraction mismatch for %s (webdriver vs script)", identifier)
+    log.info(
+        "Extraction compare for %s: webdriver %.3fs, script %.3fs",
+        identifier,
+        webdriver_seconds,
+        script_seconds,
+    )
+    return script_payload
+
+
+def track_identifier(
+    identifier: str,
+    ref_type: str,
+    extraction: Optional[str] = None,
+    timeout: Optional[float] = None,
+    deadline: Optional[Deadline] = None,
+    on_container: Optional[Callable[[Container], None]] = None,
+    fields: Optional[FrozenSet[str]] = None,
+) -> TrackingResult:
+    deadline = deadline or Deadline(timeout or settings.REQUEST_TIMEOUT)
+    error: Optional[BaseException] = None
+    permit = None
+    try:
+        with deadline.stage("upstream"):
+            permit = upstream.acquire(deadline.budget(settings.UPSTREAM_WAIT_TIMEOUT))
+        result = scrape_container_or_bol(identifier, extraction, deadline, on_container, fields).project(fields)
+        # The builders stamp the variant they parsed before refType is overridden
+        deadline.details["variant"] = "reference" if result.ref_type == "BillOfLanding" else "container"
+    except BaseException as exc:
+        error = exc
+        if isinstance(exc, DeadlineExceeded):
+            stage_stats.record_exceeded(exc.stage)
+        raise
+    finally:
+        if permit is not None:
+            upstream.release(permit, *upstream_outcome(deadline, error))
+        stage_stats.record(deadline)
+        scrape_metrics.record(deadline, error)
+        log.info("Stage timings for %s: %s", identifier, deadline.timings())
+    # Override refType if the caller provided one (e.g., BillOfLanding)
+    result.set_reference(ref_type, identifier if ref_type.lower().startswith("bill") else result.bol_num)
 
-            # Build events from rows. Reverse to oldest->newest for stable indexing like sample
-            events: List[Dict[str, Any]] = []
-            for row_index, row in enumerate(reversed(row_els)):
-                items = row.find_elements(By.CSS_SELECTOR, ".activity-item")
-                date_text = ""
-                time_text = ""
-                activity_text = ""
-                location_text = ""
-                vessel_text = ""
-
-                if len(items) >= 1:
-                    date_block = items[0]
-                    try:
-                        date_text = text_of(date_block.find_element(By.CSS_SELECTOR, ".date"))
-                    except Exception:
-                        date_text = ""
-                    try:
-                        time_text = text_of(date_block.find_element(By.CSS_SELECTOR, ".time"))
-                    except Exception:
-                        time_text = ""
-
-                if len(items) >= 2:
-                    try:
-                        activity_text = text_of(items[1].find_element(By.CSS_SELECTOR, ".text-style"))
-                    except Exception:
-                        activity_text = ""
-
-                if len(items) >= 3:
-                    try:
-                        location_text = text_of(items[2].find_element(By.CSS_SELECTOR, ".text-style"))
-                    except Exception:
-                        location_text = ""
-
-                if len(items) >= 4:
-                    try:
-                        vessel_container = items[3].find_element(By.CSS_SELECTOR, ".text-style")
-                        try:
-                            vessel_text = text_of(vessel_container.find_element(By.CSS_SELECTOR, "a"))
-                        except Exception:
-                            vessel_text = text_of(vessel_container)
-                    except Exception:
-                        vessel_text = ""
-
-                events.append(
-                    build_event(
-                        status=activity_text,
-                        date_text=date_text,
-                        time_text=time_text,
-                        location_name=location_text,
-                        vessel_voyage_text=vessel_text,
-                        stop_index=row_index,
-                    )
-                )
+    # A projection would read as events disappearing; only full scrapes are stored
+    if tracking_store is not None and fields is None:
+        try:
+            tracking_store.record(identifier, ref_type, result.to_dict())
+        except Exception:
+            log.exception("Failed to store tracking result for %s", identifier)
+    return result
+
+
+def upstream_outcome(deadline: Deadline, error: Optional[BaseException]) -> Tuple[Optional[float], bool]:
+    # (seconds the site took to produce results, whether the site failed).
+    # Not-found answers and local failures (pool, admission) report neither.
+    if error is None:
+        timings = deadline.timings()
+        if "fastPath" in timings and "resultsWait" not in timings:
+            return timings["fastPath"], False
+        return timings.get("submit", 0.0) + timings.get("resultsWait", 0.0), False
+    if isinstance(error, TrackingNotFound):
+        return None, False
+    return None, (deadline.failed_stage or deadline.current_stage) in UPSTREAM_STAGES
+
+
+def adopt_job_result(identifier: str, ref_type: str, key: Any, max_age: Optional[float]) -> None:
+    # Scrape workers (scrape_worker.py) fill their own caches; a full lookup
+    # one of them finished more recently than this process's copy is taken
+    # from the durable queue instead of scraping the site again
+    if job_store is None or not settings.CACHE_ENABLED:
+        return
+    fresh_for = settings.CACHE_TTL if max_age is None else min(settings.CACHE_TTL, max_age)
+    if fresh_for <= 0:
+        return
+    held = result_cache.last(key)
+    if held is not None and held[1] <= fresh_for:
+        return
+    try:
+        found = job_store.latest_result(identifier, ref_type, fresh_for)
+    except Exception:
+        log.exception("Failed to read finished jobs for %s", identifier)
+        return
+    if found is None:
+        return
+    payload, age = found
+    if held is None or age < held[1]:
+        result_cache.put(key, TrackingResult.from_dict(payload), age)
+
+
+def lookup_tracking(
+    identifier: str,
+    ref_type: str,
+    max_age: Optional[float] = None,
+    extraction: Optional[str] = None,
+    timeout: Optional[float] = None,
+    debug_timing: bool = False,
+    on_container: Optional[Callable[[Dict[str, Any]], None]] = None,
+    fields: Optional[FrozenSet[str]] = None,
+) -> Tuple[TrackingResult, Dict[str, str]]:
+    # Returns (result, response headers describing how it was served).
+    # on_container sees containers as they are parsed, but only when this
+    # caller runs the scrape itself (not for cache hits, coalesced waits or
+    # background revalidation). With `fields`, a fresh full payload is
+    # projected; otherwise the partial scrape is cached and coalesced under
+    # its own key.
+    started = time.perf_counter()
+    # Bounds the wait for another request's scrape; a scrape this request
+    # runs gets its own Deadline
+    waiting = Deadline(timeout or settings.REQUEST_TIMEOUT)
+    key = cache_key(identifier, ref_type)
+    coalesced = []
+    scrapes: List[Deadline] = []
+    caller = threading.current_thread()
+
+    def scrape() -> TrackingResult:
+        deadline = Deadline(timeout or settings.REQUEST_TIMEOUT)
+        scrapes.append(deadline)
+        emit = None
+        if on_container is not None and threading.current_thread() is caller:
+            emit = lambda container: on_container(container.to_dict(fields))
+        return track_identifier(identifier, ref_type, extraction, deadline=deadline, on_container=emit, fields=fields)
+
+    def fetch() -> TrackingResult:
+        try:
+            result, shared = in_flight.do(key, scrape, waiting.remaining())
+        except DeadlineExceeded as exc:
+            if exc.stage == WAIT_STAGE:
+                stage_stats.record_exceeded(exc.stage)
+            raise
+        if shared:
+            coalesced.append(True)
+        return result
+
+    headers: Dict[str, str] = {}
+    full_key = key
+    adopt_job_result(identifier, ref_type, key, max_age)
+    full = result_cache.peek(key, max_age) if settings.CACHE_ENABLED and fields is not None else None
+    if full is not None:
+        result, age = full[0].project(fields), full[1]
+        headers.update({"X-Cache": HIT, "Age": str(int(age))})
+    else:
+        if fields is not None:
+            key = (*key, ",".join(sorted(fields)))
+        try:
+            if settings.CACHE_ENABLED:
+                result, cache_status, age = result_cache.get_or_fetch(key, fetch, max_age=max_age)
+                headers.update({"X-Cache": cache_status, "Age": str(int(age))})
+            else:
+                result = fetch()
+        except UpstreamUnavailable:
+            # While the site is unhealthy any cached copy beats an error, however
+            # old; callers that set a max age (or forced a refresh) get the error
+            cached = None
+            if settings.CACHE_ENABLED and max_age is None:
+                cached = result_cache.last(full_key) or result_cache.last(key)
+            if cached is None:
+                raise
+            upstream.served_stale()
+            result, age = cached[0].project(fields), cached[1]
+            headers.update({"X-Cache": STALE, "Age": str(int(age)), "X-Upstream": upstream.breaker.state})
+    if coalesced:
+        headers["X-Coalesced"] = "1"
+    if debug_timing:
+        headers["X-Debug-Timing"] = debug_timing_header(scrapes[0] if scrapes else None, bool(coalesced))
+    startup.first_request(time.perf_counter() - started)
+    return result, headers
+
+
+def debug_timing_header(deadline: Optional[Deadline], coalesced: bool) -> str:
+    # "stage=seconds, ..." for the scrape this request ran itself; requests
+    # answered from the cache or another request's scrape only say so
+    if deadline is None:
+        return "source=coalesced" if coalesced else "source=cache"
+    parts = [f"{name}={seconds:.4f}" for name, seconds in deadline.timings().items()]
+    for name, value in deadline.details.items():
+        parts.append(f"{name}={value}")
+    return ", ".join(parts)
+
+
+def requested_max_age() -> Optional[float]:
+    # ?max-age=N wins over the Cache-Control request header; 0 forces a fresh scrape
+    raw = request.args.get("max-age") or request.args.get("maxAge")
+    if raw is None:
+        for directive in (request.headers.get("Cache-Control") or "").lower().split(","):
+            directive = directive.strip()
+            if directive in ("no-cache", "no-store"):
+                return 0.0
+            if directive.startswith("max-age="):
+                raw = directive.split("=", 1)[1]
+    if raw is None:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return None
 
-            routes = derive_routes(events)
-            pod_eta = derive_pod_eta(events)
-
-            # Compose final payload matching the provided schema
-            payload: Dict[str, Any] = {
-                "version": "1.00",
-                "scrapingType": None,
-                "refNum": identifier,
-                "refType": "Container",  # Can be overridden via query param if provided
-                "jtCarrierName": None,
-                "origin": None,
-                "destination": None,
-                "currentStatus": last_activity_text,
-                "bookingNum": None,
-                "bolNum": None,
-                "bl_Issue_Date": None,
-                "booking_Date": None,
-                "trackingnNo": None,
-                "additionalInfo": None,
-                "containers": [
-                    {
-                        "containerType": type_and_size,
-                        "containerNum": header_container_num or identifier,
-                        "stops": [],
-                        "events": events,
-                        "routes": routes,
-                        "vesselMovements": [],
-                        "cargoDeliveryInformationUsImportOnly": None,
-                        "podETA": pod_eta,
-                        "additionalInfo": None,
-                    }
-                ],
-                "logs": [],
-            }
 
-            return payload
+def requested_extraction() -> Optional[str]:
+    # ?extract=webdriver|script|html|compare overrides ZIM_EXTRACTION_MODE
+    mode = (request.args.get("extract") or "").strip().lower()
+    return mode if mode in EXTRACTION_MODES else None
 
-    finally:
+
+def requested_debug_timing() -> bool:
+    # X-Debug-Timing: 1 (or ?debug=timing) returns the stage breakdown in a header
+    return is_truthy(request.headers.get("X-Debug-Timing")) or request.args.get("debug") == "timing"
+
+
+def requested_compact() -> bool:
+    # ?compact=1: no null fields, shared routes listed once, faster encoder
+    return is_truthy(request.args.get("compact"))
+
+
+def requested_fields() -> Optional[FrozenSet[str]]:
+    # ?fields=currentStatus,podETA returns (and scrapes) only those fields;
+    # raises ValueError for unknown names
+    return parse_fields(request.args.get("fields"))
+
+
+def requested_timeout() -> Optional[float]:
+    # ?timeout=N bounds the whole request, from pool checkout to parsing
+    try:
+        value = float(request.args.get("timeout") or 0)
+    except ValueError:
+        return None
+    if value <= 0:
+        return None
+    return min(value, settings.MAX_REQUEST_TIMEOUT)
+
+
+def parse_timestamp(value: str) -> float:
+    # Accepts epoch seconds or ISO 8601
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def is_truthy(value: Optional[str]) -> bool:
+    return (value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def error_status(exc: Exception) -> Optional[Tuple[int, Dict[str, str]]]:
+    # HTTP status and headers for expected tracking failures; None means unexpected
+    if isinstance(exc, (PoolTimeout, AdmissionRejected, JobQueueFull)):
+        return 503, {"Retry-After": "5"}
+    if isinstance(exc, UpstreamUnavailable):
+        return 503, {"Retry-After": str(max(1, int(round(exc.retry_after))))}
+    if isinstance(exc, TrackingNotFound):
+        return 404, {}
+    if isinstance(exc, DeadlineExceeded):
+        return 504, {}
+    return None
+
+
+def error_response(exc: Exception) -> Optional[Response]:
+    mapped = error_status(exc)
+    if mapped is None:
+        return None
+    status, headers = mapped
+    return Response(json.dumps({"error": str(exc)}), status=status, headers=headers, mimetype="application/json")
+
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def requested_stream() -> bool:
+    # Accept: application/x-ndjson or ?stream=1 switches to NDJSON streaming
+    return is_truthy(request.args.get("stream")) or NDJSON_MIMETYPE in (request.headers.get("Accept") or "")
+
+
+def ndjson(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def stream_lookups(
+    items: List[Tuple[str, str]],
+    max_age: Optional[float],
+    extraction: Optional[str],
+    timeout: Optional[float],
+    concurrency: int = 1,
+    fields: Optional[FrozenSet[str]] = None,
+) -> Iterator[str]:
+    # Per identifier: a "header" record when its lookup starts, a "container"
+    # record for each container as soon as it is parsed, then "result" (the
+    # top-level payload fields) or "error". Identifiers run concurrently and
+    # their records interleave; multi-identifier streams end with "summary".
+    records: "queue.Queue[Tuple[str, int, Any]]" = queue.Queue()
+    closed = threading.Event()
+
+    def run(index: int, identifier: str, ref_type: str) -> None:
+        def on_container(container: Dict[str, Any]) -> None:
+            if not closed.is_set():
+                records.put(("container", index, container))
+
+        records.put(("header", index, None))
         try:
-            driver.quit()
-        except Exception:
-            pass
+            if not identifier:
+                raise ValueError("empty identifier")
+            value = lookup_tracking(
+                identifier, ref_type, max_age, extraction, timeout, on_container=on_container, fields=fields
+            )
+        except Exception as exc:
+            records.put(("error", index, exc))
+            return
+        records.put(("result", index, value))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(items))), thread_name_prefix="zim-stream")
+    try:
+        for index, (identifier, ref_type) in enumerate(items):
+            executor.submit(run, index, identifier, ref_type)
+
+        emitted = [0] * len(items)
+        pending, succeeded = len(items), 0
+        while pending:
+            kind, index, value = records.get()
+            base = {"index": index, "refNum": items[index][0], "refType": items[index][1]}
+            if kind == "header":
+                yield ndjson({"type": "header", **base})
+            elif kind == "container":
+                emitted[index] += 1
+                yield ndjson({"type": "container", **base, "container": value})
+            elif kind == "result":
+                result, headers = value[0].to_dict(), value[1]
+                containers = result.get("containers") or []
+                # Whatever was not streamed while parsing (cache hits, snapshot modes)
+                for container in containers[emitted[index]:]:
+                    yield ndjson({"type": "container", **base, "container": container})
+                top_level = {k: v for k, v in result.items() if k != "containers"}
+                yield ndjson(
+                    {
+                        "type": "result",
+                        **top_level,
+                        "index": index,
+                        "containerCount": len(containers),
+                        "cache": headers.get("X-Cache"),
+                    }
+                )
+                pending -= 1
+                succeeded += 1
+            else:
+                response = error_response(value)
+                status = response.status_code if response is not None else (400 if isinstance(value, ValueError) else 500)
+                if response is None and status == 500:
+                    log.error("Streaming lookup failed for %s", base["refNum"], exc_info=value)
+                yield ndjson({"type": "error", **base, "status": status, "error": str(value) or value.__class__.__name__})
+                pending -= 1
+
+        if len(items) > 1:
+            yield ndjson({"type": "summary", "total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded})
+    finally:
+        # Also reached when the client disconnects mid-stream
+        closed.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_response(records: Iterator[str]) -> Response:
+    # X-Accel-Buffering keeps nginx from holding records back
+    return Response(records, mimetype=NDJSON_MIMETYPE, headers={"X-Accel-Buffering": "no"})
+
+
+def render_body(body: Any, compact: bool) -> bytes:
+    # A TrackingResult's full-schema body is encoded once and kept with it
+    if isinstance(body, TrackingResult):
+        return dumps(compact_payload(body.to_dict()), compact) if compact else body.encode()
+    return dumps(compact_payload(body) if compact else body, compact)
+
+
+@app.after_request
+def encode_response(response: Response) -> Response:
+    # ETag / If-None-Match on GET lookups, then gzip or br for large JSON bodies.
+    # Streams are left alone so records are not held back by the compressor.
+    if response.is_streamed or response.status_code != 200 or response.mimetype != "application/json":
+        return response
+    body = response.get_data()
+    etag = None
+    if request.method == "GET":
+        etag = body_etag(body)
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            headers = {k: v for k, v in response.headers.items() if k in ("X-Cache", "Age", "X-Coalesced")}
+            return Response(status=304, headers={**headers, "ETag": f'"{etag}"'})
+        response.headers["ETag"] = f'"{etag}"'
+    if settings.COMPRESSION_ENABLED and len(body) >= settings.COMPRESS_MIN_BYTES and "Content-Encoding" not in response.headers:
+        response.vary.add("Accept-Encoding")
+        compressed, encoding = compress(body, request.headers.get("Accept-Encoding"))
+        if encoding is not None:
+            response.set_data(compressed)
+            response.headers["Content-Encoding"] = encoding
+            if etag is not None:
+                # A compressed variant needs its own strong validator
+                response.headers["ETag"] = f'"{etag}-{encoding}"'
+    return response
 
 
 @app.get("/api/zim/track")
@@ -630,15 +1660,458 @@ def api_track() -> Response:
         )
 
     ref_type = (request.args.get("refType") or "Container").strip() or "Container"
-    result = scrape_container_or_bol(identifier)
-    # Override refType if the caller provided one (e.g., BillOfLanding)
-    result["refType"] = ref_type
-    if ref_type.lower().startswith("bill"):
-        result["bolNum"] = identifier
+    since_arg = request.args.get("since")
+    changes_only = bool(since_arg or is_truthy(request.args.get("changesOnly")))
+    since: Optional[float] = None
+    if changes_only:
+        # Refused before scraping: a full body instead would look like a diff
+        if tracking_store is None:
+            return Response(json.dumps({"error": "tracking store is disabled"}), status=404, mimetype="application/json")
+        if since_arg:
+            try:
+                since = parse_timestamp(since_arg)
+            except ValueError:
+                return Response(
+                    json.dumps({"error": "'since' must be epoch seconds or ISO 8601"}),
+                    status=400,
+                    mimetype="application/json",
+                )
+    try:
+        # Change feeds are diffs of full scrapes, so they ignore ?fields=
+        fields = None if changes_only else requested_fields()
+    except ValueError as exc:
+        return Response(json.dumps({"error": str(exc)}), status=400, mimetype="application/json")
+    if requested_stream() and not changes_only:
+        return stream_response(
+            stream_lookups(
+                [(identifier, ref_type)],
+                requested_max_age(),
+                requested_extraction(),
+                requested_timeout(),
+                fields=fields,
+            )
+        )
+
+    try:
+        result, headers = lookup_tracking(
+            identifier,
+            ref_type,
+            requested_max_age(),
+            requested_extraction(),
+            requested_timeout(),
+            debug_timing=requested_debug_timing(),
+            fields=fields,
+        )
+    except (PoolTimeout, AdmissionRejected, TrackingNotFound, DeadlineExceeded, UpstreamUnavailable) as exc:
+        return error_response(exc)
+
+    if changes_only:
+        # Only events and status/ETA transitions recorded after `since`; with
+        # changesOnly alone, whatever the most recent scrape changed
+        inclusive = since is None
+        if since is None:
+            since = tracking_store.last_scraped_at(identifier, ref_type) or 0.0
+        changes = tracking_store.changes_since(identifier, ref_type, since, inclusive=inclusive)
+        body = {"refNum": identifier, "refType": ref_type, "asOf": time.time(), **changes}
+        return Response(render_body(body, requested_compact()), headers=headers, mimetype="application/json")
+
+    return Response(render_body(result, requested_compact()), headers=headers, mimetype="application/json")
+
+
+@app.get("/api/zim/changes")
+def api_changes() -> Response:
+    # Identifiers whose stored timeline changed after ?since=
+    if tracking_store is None:
+        return Response(json.dumps({"error": "tracking store is disabled"}), status=404, mimetype="application/json")
+    try:
+        since = parse_timestamp(request.args.get("since") or "0")
+        limit = int(request.args.get("limit") or 1000)
+    except ValueError:
+        return Response(
+            json.dumps({"error": "'since' must be epoch seconds or ISO 8601"}),
+            status=400,
+            mimetype="application/json",
+        )
+    body = {"since": since, "asOf": time.time(), "items": tracking_store.changed_since(since, limit)}
+    return Response(json.dumps(body, ensure_ascii=False), mimetype="application/json")
+
+
+def parse_batch_items(body: Any) -> List[Tuple[str, str]]:
+    # Accepts {"containers": [...], "bolNums": [...]} and/or
+    # {"items": [{"refNum" | "container": ..., "refType": ...}, ...]}
+    if not isinstance(body, dict):
+        raise ValueError("request body must be a JSON object")
+    items: List[Tuple[str, str]] = []
+    for value in body.get("containers") or []:
+        items.append((str(value).strip(), "Container"))
+    for value in body.get("bolNums") or body.get("billsOfLading") or []:
+        items.append((str(value).strip(), "BillOfLanding"))
+    for item in body.get("items") or []:
+        if isinstance(item, dict):
+            identifier = str(item.get("refNum") or item.get("container") or "").strip()
+            ref_type = str(item.get("refType") or "Container").strip() or "Container"
+        else:
+            identifier, ref_type = str(item).strip(), "Container"
+        items.append((identifier, ref_type))
+    return items
+
+
+def track_batch_item(
+    identifier: str,
+    ref_type: str,
+    max_age: Optional[float],
+    extraction: Optional[str],
+    timeout: Optional[float],
+    fields: Optional[FrozenSet[str]] = None,
+) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {"refNum": identifier, "refType": ref_type}
+    if not identifier:
+        entry.update(success=False, error="empty identifier")
+        return entry
+    try:
+        result, _ = lookup_tracking(identifier, ref_type, max_age, extraction, timeout, fields=fields)
+    except Exception as exc:
+        entry.update(success=False, error=str(exc) or exc.__class__.__name__)
+        return entry
+    entry.update(success=True, result=result.to_dict())
+    return entry
+
+
+@app.post("/api/zim/track/batch")
+def api_track_batch() -> Response:
+    body = request.get_json(silent=True)
+    try:
+        items = parse_batch_items(body)
+        fields = requested_fields()
+    except ValueError as exc:
+        return Response(json.dumps({"error": str(exc)}), status=400, mimetype="application/json")
+    if not items:
+        return Response(
+            json.dumps({"error": "no identifiers in 'containers', 'bolNums' or 'items'"}),
+            status=400,
+            mimetype="application/json",
+        )
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        return Response(
+            json.dumps({"error": f"batch exceeds {settings.BATCH_MAX_ITEMS} identifiers"}),
+            status=413,
+            mimetype="application/json",
+        )
+
+    # Browsers are still bounded by the driver pool; this caps the threads
+    # a single batch keeps queued on it
+    concurrency = settings.BATCH_CONCURRENCY
+    try:
+        concurrency = min(concurrency, int(body.get("concurrency") or concurrency))
+    except (TypeError, ValueError):
+        pass
+    concurrency = max(1, min(concurrency, len(items)))
+
+    max_age = requested_max_age()
+    extraction = requested_extraction()
+    timeout = requested_timeout()
+    compact = requested_compact()
+    if requested_stream():
+        # Each identifier's records are written as its lookup progresses
+        return stream_response(stream_lookups(items, max_age, extraction, timeout, concurrency, fields))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="zim-batch") as executor:
+        results = list(
+            executor.map(
+                lambda item: track_batch_item(item[0], item[1], max_age, extraction, timeout, fields), items
+            )
+        )
+
+    succeeded = sum(1 for r in results if r["success"])
+    if compact:
+        results = [{**r, "result": compact_payload(r["result"])} if r.get("result") else r for r in results]
+    return Response(
+        dumps(
+            {"total": len(results), "succeeded": succeeded, "failed": len(results) - succeeded, "results": results},
+            compact,
+        ),
+        mimetype="application/json",
+    )
+
+
+def run_job(job: Job) -> Dict[str, Any]:
+    options = job.options
+    fields = options.get("fields")
+    try:
+        result, _ = lookup_tracking(
+            job.identifier,
+            job.ref_type,
+            options.get("maxAge"),
+            options.get("extraction"),
+            options.get("timeout"),
+            fields=frozenset(fields) if fields else None,
+        )
+    except (PoolTimeout, AdmissionRejected, TrackingNotFound, DeadlineExceeded, UpstreamUnavailable) as exc:
+        raise JobError(str(exc), error_status(exc)[0])
+    return result.to_dict()
+
+
+@app.post("/api/zim/jobs")
+def api_jobs_submit() -> Response:
+    # Queues one lookup and answers at once with the job id to poll. Body (or
+    # query): refNum|container, refType, callbackUrl, fields; maxAge/extract/
+    # timeout as for /api/zim/track. An Idempotency-Key header makes retries return the
+    # original job.
+    body = request.get_json(silent=True)
+    if body is None:
+        body = {}
+    if not isinstance(body, dict):
+        return Response(json.dumps({"error": "request body must be a JSON object"}), status=400, mimetype="application/json")
+    args = request.args
+    identifier = str(body.get("refNum") or body.get("container") or args.get("refNum") or args.get("container") or "").strip()
+    if not identifier:
+        return Response(
+            json.dumps({"error": "missing 'container' or 'refNum'"}),
+            status=400,
+            mimetype="application/json",
+        )
+    ref_type = str(body.get("refType") or args.get("refType") or "Container").strip() or "Container"
+    callback_url = str(body.get("callbackUrl") or args.get("callbackUrl") or "").strip() or None
+    refused = callback_policy.check(callback_url) if callback_url else None
+    if refused:
+        return Response(json.dumps({"error": f"'callbackUrl' {refused}"}), status=400, mimetype="application/json")
 
-    return Response(json.dumps(result, ensure_ascii=False), mimetype="application/json")
+    try:
+        raw_fields = body.get("fields") or args.get("fields") or ""
+        if isinstance(raw_fields, list):
+            raw_fields = ",".join(str(name) for name in raw_fields)
+        fields = parse_fields(str(raw_fields))
+    except ValueError as exc:
+        return Response(json.dumps({"error": str(exc)}), status=400, mimetype="application/json")
+    options = {
+        "maxAge": requested_max_age(),
+        "extraction": requested_extraction(),
+        "timeout": requested_timeout(),
+        "fields": sorted(fields) if fields else None,
+    }
+    try:
+        job, created = job_queue.submit(
+            identifier,
+            ref_type,
+            options,
+            callback_url=callback_url,
+            idempotency_key=(request.headers.get("Idempotency-Key") or "").strip() or None,
+        )
+    except JobQueueFull as exc:
+        return error_response(exc)
+
+    status_url = f"/api/zim/jobs/{job['id']}"
+    return Response(
+        json.dumps({**job, "statusUrl": status_url}),
+        status=202 if created else 200,
+        headers={"Location": status_url},
+        mimetype="application/json",
+    )
+
+
+@app.get("/api/zim/jobs/<job_id>")
+def api_jobs_status(job_id: str) -> Response:
+    job = job_queue.get(job_id)
+    if job is None:
+        return Response(json.dumps({"error": "unknown or expired job"}), status=404, mimetype="application/json")
+    compact = requested_compact()
+    if compact and job.get("result"):
+        job["result"] = compact_payload(job["result"])
+    # Pollers are told when to come back while the job is still going
+    headers = {} if job["status"] in ("succeeded", "failed") else {"Retry-After": "2"}
+    return Response(dumps(job, compact), headers=headers, mimetype="application/json")
+
+
+@app.post("/api/zim/queue/<operation>")
+def api_queue(operation: str) -> Response:
+    # Lease protocol for scrape workers on other hosts (durable_jobs.RemoteJobStore)
+    if job_store is None or not settings.WORKER_TOKEN:
+        return Response(json.dumps({"error": "not found"}), status=404, mimetype="application/json")
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode("utf-8"), settings.WORKER_TOKEN.encode("utf-8")):
+        return Response(json.dumps({"error": "unauthorized"}), status=401, mimetype="application/json")
+    body = request.get_json(silent=True)
+    try:
+        if not isinstance(body, dict):
+            raise ValueError("expected a JSON object")
+        result = handle_remote(job_store, operation, body)
+    except (KeyError, TypeError, ValueError) as exc:
+        return Response(json.dumps({"error": f"bad queue request: {exc}"}), status=400, mimetype="application/json")
+    if operation == "complete":
+        record_remote_result(result["record"])
+    return Response(json.dumps(result), mimetype="application/json")
+
+
+def record_remote_result(record: Optional[Dict[str, Any]]) -> None:
+    # Workers on other hosts have no access to the store file, so their full
+    # results are recorded here, as track_identifier records local scrapes
+    if tracking_store is None or job_store is None or record is None or record.get("status") != SUCCEEDED:
+        return
+    payload = job_store.payload(record["id"])
+    # A ?fields= projection would read as events disappearing
+    if not record.get("result") or payload is None or (payload.get("options") or {}).get("fields"):
+        return
+    try:
+        tracking_store.record(record["identifier"], record["refType"], record["result"])
+    except Exception:
+        log.exception("Failed to store tracking result for %s", record["identifier"])
+
+
+@app.get("/api/zim/watchlist")
+def api_watchlist() -> Response:
+    return Response(json.dumps({"items": watchlist.entries()}, ensure_ascii=False), mimetype="application/json")
+
+
+@app.post("/api/zim/watchlist")
+def api_watchlist_add() -> Response:
+    # Same body shapes as the batch endpoint
+    try:
+        items = parse_batch_items(request.get_json(silent=True))
+    except ValueError as exc:
+        return Response(json.dumps({"error": str(exc)}), status=400, mimetype="application/json")
+    items = [(identifier, ref_type) for identifier, ref_type in items if identifier]
+    if not items:
+        return Response(
+            json.dumps({"error": "no identifiers in 'containers', 'bolNums' or 'items'"}),
+            status=400,
+            mimetype="application/json",
+        )
+    added = []
+    for identifier, ref_type in items:
+        entry, created = watchlist.add(identifier, ref_type)
+        added.append({**entry.to_dict(), "created": created})
+    return Response(json.dumps({"items": added}, ensure_ascii=False), status=201, mimetype="application/json")
+
+
+@app.delete("/api/zim/watchlist/<identifier>")
+def api_watchlist_remove(identifier: str) -> Response:
+    ref_type = (request.args.get("refType") or "Container").strip() or "Container"
+    if not watchlist.remove(identifier, ref_type):
+        return Response(json.dumps({"error": "not on the watchlist"}), status=404, mimetype="application/json")
+    return Response(status=204)
+
+
+@app.get("/api/zim/stats")
+def api_stats() -> Response:
+    return Response(
+        json.dumps(
+            {
+                "pool": driver_pool.stats(),
+                "browsers": browsers.stats(),
+                "tabs": tabs.stats() if tabs is not None else None,
+                "cache": result_cache.stats(),
+                "coalescing": in_flight.stats(),
+                "admission": admission.stats(),
+                "upstream": upstream.stats(),
+                "jobs": job_queue.stats(),
+                "extraction": {"mode": settings.EXTRACTION_MODE, **extraction_stats},
+                "timing": stage_stats.stats(),
+                "scheduler": {"enabled": settings.WATCHLIST_ENABLED, **watchlist.stats()},
+                "store": tracking_store.stats() if tracking_store is not None else None,
+                "fastPath": {"enabled": settings.FAST_PATH_ENABLED, **fast_path.stats()},
+                "network": {"blockedUrlPatterns": len(blocking_profile.url_patterns()), **network_stats.stats()},
+                "startup": startup.stats(),
+                "portIndex": {"enabled": settings.PORT_INDEX_ENABLED, **port_index.stats()},
+            }
+        ),
+        mimetype="application/json",
+    )
+
+
+@app.get("/metrics")
+def api_metrics() -> Response:
+    # Prometheus text exposition; the pool/cache/coalescing/... stats ride along
+    # as counters and gauges (see metrics.COUNTER_FIELDS)
+    return Response(
+        scrape_metrics.render(
+            {
+                "pool": driver_pool.stats(),
+                "browsers": browsers.stats(),
+                "tabs": tabs.stats() if tabs is not None else None,
+                "cache": result_cache.stats(),
+                "coalescing": in_flight.stats(),
+                "admission": admission.stats(),
+                "upstream": upstream.stats(),
+                "jobs": job_queue.stats(),
+                "fast_path": fast_path.stats(),
+            }
+        ),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/healthz")
+def api_healthz() -> Response:
+    # Liveness: the process is up and serving requests
+    return Response(json.dumps({"status": "ok"}), mimetype="application/json")
+
+
+@app.get("/readyz")
+def api_readyz() -> Response:
+    # Readiness: only route traffic here once a browser is warm, and stop
+    # while draining for shutdown
+    stats = startup.stats()
+    return Response(json.dumps(stats), status=200 if startup.is_ready() else 503, mimetype="application/json")
+
+
+def warm_up() -> None:
+    # Resolves the patched chromedriver and parks the first browsers on the
+    # tracking page; /readyz turns ready once this succeeds. Failures (no
+    # Chrome yet, download blocked) are retried until shutdown.
+    while not startup.draining:
+        try:
+            with startup.phase("chromedriver"):
+                startup.detail("chromedriver", driver_cache.ensure().to_dict())
+            with startup.phase("warmBrowsers"):
+                if settings.WARMUP_BROWSERS > 0:
+                    startup.detail("browsersWarmed", driver_pool.warm(settings.WARMUP_BROWSERS))
+            startup.set_ready()
+            log.info("Ready %.2fs after process start", startup.since_start())
+            return
+        except Exception as exc:
+            startup.attempt_failed(exc)
+            log.warning("Warm-up failed, retrying in %.0fs: %s", settings.WARMUP_RETRY_INTERVAL, exc)
+            time.sleep(settings.WARMUP_RETRY_INTERVAL)
+
+
+def start_scraping() -> None:
+    # Browsers, the driver pool and warm-up; all a scrape worker needs
+    browsers.start()
+    driver_pool.start()
+    if settings.WARMUP_BROWSERS > 0:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    else:
+        startup.set_ready()
+
+
+def start_background() -> None:
+    start_scraping()
+    if settings.WATCHLIST_ENABLED and watchlist.claim_scheduler(
+        settings.STORE_PATH + ".scheduler.lock" if settings.STORE_ENABLED else None
+    ):
+        watchlist.start()
+    job_queue.start()
+
+
+def shutdown(timeout: float) -> None:
+    # Graceful stop: fail readiness, no new scheduled refreshes, let in-flight
+    # scrapes finish, then quit every browser this process owns
+    startup.set_draining()
+    watchlist.stop()
+    job_queue.stop()
+    if not admission.drain(timeout):
+        log.warning("Shutting down with scrapes still in flight after %.0fs", timeout)
+    driver_pool.close(wait=True)
+    if tabs is not None:
+        tabs.close()
+    browsers.stop()
+
+
+startup.mark("imported")
 
 
 if __name__ == "__main__":
+    # Development server; production runs gunicorn -c gunicorn.conf.py zim_tracker_service:app
+    start_background()
     app.run(host="0.0.0.0", port=8000)
 